@@ -1,17 +1,14 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import os
 import time
 from abc import abstractmethod, ABCMeta
 from datetime import datetime
 
-from helpers.jsonhelpers import save_to_json_file
+from helpers.storagehelpers import get_storage
+from storage.storage import ACTIONS
 from validators.validators import valid_action_type
 
-ACTIONS_DIR = 'json/public/actions'
-
-
 class Action(object):
     __metaclass__ = ABCMeta
 
@@ -26,6 +23,9 @@ class Action(object):
         self.action_type = None
         self.created = None
 
+        # Actions that must never run twice for the same activation, they are not retried when they fail
+        self.at_most_once = False
+
     def configure(self, **config):
         """
         Configure the action with given config settings
@@ -41,9 +41,9 @@ class Action(object):
 
     def save(self):
         """
-        Save the action as a json file
+        Save the action in the storage
         """
-        save_to_json_file(os.path.join(ACTIONS_DIR, '%s.json' % self.id), self.json_encodable())
+        get_storage().save(ACTIONS, self.id, self.json_encodable())
 
     def json_encodable(self):
         """
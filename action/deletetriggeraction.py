@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from helpers.loghelpers import LOG
+from helpers.storagehelpers import get_storage
 from .action import Action
 from .actiontype import ActionType
 
@@ -27,12 +28,13 @@ class DeleteTriggerAction(Action):
 
         LOG.info('Deleting triggers %s' % self.trigger_ids)
         configured_triggers = get_triggers()
-        for trigger_id in self.trigger_ids:
-            if trigger_id not in configured_triggers:
-                LOG.error('Can not delete trigger: unknown trigger id: %s' % self.trigger_ids)
-            else:
-                delete_trigger(trigger_id=trigger_id)
-                LOG.info('Trigger %s is deleted' % trigger_id)
+        with get_storage().transaction():
+            for trigger_id in self.trigger_ids:
+                if trigger_id not in configured_triggers:
+                    LOG.error('Can not delete trigger: unknown trigger id: %s' % self.trigger_ids)
+                else:
+                    delete_trigger(trigger_id=trigger_id)
+                    LOG.info('Trigger %s is deleted' % trigger_id)
 
         return True
 
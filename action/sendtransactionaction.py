@@ -1,18 +1,22 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import operator
-
 from helpers.loghelpers import LOG
 from .action import Action
 from .actiontype import ActionType
 from data.data import utxos, prime_input_address, push_tx
-from bips.BIP44 import get_xpriv_key, get_private_key
+from bips.BIP44 import get_private_key
+from helpers.coinselectionhelpers import select_coins, ALL, COIN_SELECTION_STRATEGIES, DEFAULT_CONSOLIDATION_FEE_RATE
 from helpers.configurationhelpers import get_max_tx_fee_percentage
 from helpers.configurationhelpers import get_minimum_output_value
+from helpers.configurationhelpers import get_parallel_signing_min_inputs, get_signing_processes
+from helpers.distributionhelpers import distribute
 from helpers.feehelpers import get_medium_priority_fee, get_high_priority_fee, get_low_priority_fee
 from helpers.hotwallethelpers import get_address_from_wallet
-from helpers.hotwallethelpers import get_hot_wallet
+from helpers.hotwallethelpers import get_hot_wallet, get_xpriv_key_from_wallet
+from helpers.lockhelpers import address_lock
+from helpers.privatekeyhelpers import get_privkey_format
+from helpers.txsizehelpers import estimate_transaction_size
 from inputs.inputs import get_sil
 from linker.linker import get_lbl, get_lrl, get_lsl, get_lal
 from transactionfactory import make_custom_tx, txhash
@@ -26,6 +30,7 @@ class SendTransactionAction(Action):
     def __init__(self, action_id):
         super(SendTransactionAction, self).__init__(action_id=action_id)
         self.action_type = ActionType.SENDTRANSACTION
+        self.at_most_once = True
 
         # These are for the spellbook fees, not to be confused with transaction fees
         self.fee_address = None
@@ -36,6 +41,10 @@ class SendTransactionAction(Action):
         self.tx_fee_type = 'High'
         self.tx_fee = 0
 
+        # These are for the selection of the utxos to spend
+        self.coin_selection = ALL
+        self.consolidation_fee_rate = DEFAULT_CONSOLIDATION_FEE_RATE
+
         self.wallet_type = None
         self.sending_address = None
         self.bip44_account = None
@@ -57,8 +66,9 @@ class SendTransactionAction(Action):
         self.utxo_confirmations = 1
         self.private_key = None
 
-        # Used to store the txid after it has been sent
+        # Used to store the txid and the indexes of the receiving outputs after it has been sent
         self.txid = None
+        self.outputs = None
 
     def configure(self, **config):
         """
@@ -79,6 +89,8 @@ class SendTransactionAction(Action):
                        - config['registration_block_height'] : An block height used for the registration of a SIL
                        - config['registration_xpub']         : An xpub key used for the registration of a LBL, LRL or LSL
                        - config['distribution']              : A dict containing a distribution (each address should be a key in the dict with the value being the share)
+                       - config['coin_selection']            : The strategy to select the utxos to spend (All, BranchAndBound, Knapsack, LargestFirst or Consolidate)
+                       - config['consolidation_fee_rate']    : The fee rate in sat/b at or below which the Consolidate strategy spends all utxos
         """
         super(SendTransactionAction, self).configure(**config)
         if 'fee_address' in config and valid_address(config['fee_address']):
@@ -141,6 +153,12 @@ class SendTransactionAction(Action):
         if 'tx_fee' in config and valid_amount(config['tx_fee']) and self.tx_fee_type == 'Fixed':
             self.tx_fee = config['tx_fee']
 
+        if 'coin_selection' in config and config['coin_selection'] in COIN_SELECTION_STRATEGIES:
+            self.coin_selection = config['coin_selection']
+
+        if 'consolidation_fee_rate' in config and valid_amount(config['consolidation_fee_rate']):
+            self.consolidation_fee_rate = config['consolidation_fee_rate']
+
         if 'utxo_confirmations' in config and valid_amount(config['utxo_confirmations']):
             self.utxo_confirmations = config['utxo_confirmations']
 
@@ -177,6 +195,8 @@ class SendTransactionAction(Action):
                     'registration_xpub': self.registration_xpub,
                     'tx_fee_type': self.tx_fee_type,
                     'tx_fee': self.tx_fee,
+                    'coin_selection': self.coin_selection,
+                    'consolidation_fee_rate': self.consolidation_fee_rate,
                     'utxo_confirmations': self.utxo_confirmations,
                     'distribution': self.distribution,
                     'private_key': self.private_key})
@@ -184,7 +204,7 @@ class SendTransactionAction(Action):
 
     def run(self):
         """
-        Run the action
+        Run the action, the transaction is sent right away: batching is done by the workers of the activation queue
 
         :return: True upon success, False upon failure
         """
@@ -192,28 +212,45 @@ class SendTransactionAction(Action):
             LOG.error('Can not activate SendTransaction action: sending address is None!')
             return False
 
+        # Only one transaction at a time can be sent from the same address, otherwise they would try to spend the same utxos
+        with address_lock(self.sending_address):
+            return self.send_transaction()
+
+    def is_batchable(self):
+        """
+        Check if the transaction of this action can be merged with those of other actions
+        Only actions that send a specific amount can be merged, because sending all available funds spends all utxos,
+        and a transaction can only contain 1 OP_RETURN output
+
+        :return: True or False
+        """
+        return self.sending_address is not None and self.amount > 0 and self.op_return_data is None
+
+    def get_batch_key(self):
+        """
+        Get the key of the batch this action can join, actions with the same key can be paid by the same transaction
+
+        :return: A tuple
+        """
+        return (self.sending_address, self.change_address, self.wallet_type, self.bip44_account, self.bip44_index,
+                self.private_key is not None, self.tx_fee_type, self.tx_fee if self.tx_fee_type == 'Fixed' else None,
+                self.utxo_confirmations, self.coin_selection, self.consolidation_fee_rate)
+
+    def send_transaction(self):
+        """
+        Construct, sign and broadcast the transaction, this must only be called while holding the lock of the sending address
+
+        :return: True upon success, False upon failure
+        """
         LOG.info('Activating SendTransaction action %s' % self.id)
 
         # Retrieve the available utxos of the sending address and construct a list of TransactionInput objects containing the necessary information for the inputs of a transaction
-        # All available utxos will be used even if a subset would be enough, this is to avoid a scenario where the transaction fee would cause another utxo to be needed
-        # which would increase the transaction fee which could cause another utxo to be needed .... and so on
+        # By default all available utxos will be used even if a subset would be enough, this results in automatic consolidation of utxos, in the long run this is preferred
+        # otherwise you will end up with many small utxos that might cost more in fees than they are worth
         #
-        # The benefit of this is that it will result in automatic consolidation of utxos, in the long run this is preferred otherwise you will end up with many small
-        # utxos that might cost more in fees than they are worth
-        data = utxos(address=self.sending_address, confirmations=self.utxo_confirmations)
-        if 'utxos' in data:
-            self.unspent_outputs = [TransactionInput(address=self.sending_address,
-                                                     value=utxo['value'],
-                                                     output_hash=utxo['output_hash'],
-                                                     output_n=utxo['output_n'],
-                                                     confirmations=utxo['confirmations']) for utxo in data['utxos']]
-        else:
-            error_msg = data['error'] if 'error' in data else ''
-            LOG.error('Error while retrieving utxos: %s' % error_msg)
-            return False
-
-        tx_inputs = self.construct_transaction_inputs()
-        if len(tx_inputs) == 0:
+        # When sending a specific amount, another coin selection strategy can be configured to spend only a subset of the utxos, see helpers/coinselectionhelpers.py
+        tx_inputs = self.get_transaction_inputs()
+        if tx_inputs is None or len(tx_inputs) == 0:
             return False
 
         total_value_in_inputs = int(sum([utxo['value'] for utxo in tx_inputs]))
@@ -239,54 +276,60 @@ class SendTransactionAction(Action):
             LOG.error('SendTransaction action aborted: There are no receiving outputs!')
             return False
 
-        change_output = None
-        # There should only be a change output if we are sending a specific amount, when sending all available funds there should never be a change output
-        if self.amount != 0:
-            total_value_in_outputs = sum([output.value for output in receiving_outputs])
-            change_amount = total_value_in_inputs - total_value_in_outputs - spellbook_fee
-            change_address = self.change_address if self.change_address is not None else self.sending_address
-            change_output = TransactionOutput(change_address, change_amount)
-
         spellbook_fee_output = None
         if self.fee_address is not None and spellbook_fee > 0:
             spellbook_fee_output = TransactionOutput(self.fee_address, spellbook_fee)
 
-        # Construct temporary transaction outputs so we can calculate the transaction fee
-        tx_outputs = self.construct_transaction_outputs(receiving_outputs=receiving_outputs,
-                                                        change_output=change_output,
-                                                        spellbook_fee_output=spellbook_fee_output)
-
         # Get the necessary private keys from the hot wallet if no private key is given
         private_keys = self.get_private_key() if self.private_key is None else {self.sending_address: self.private_key}
         if len(private_keys) == 0:
             return False
 
-        # Make transaction without fee first to get the size
-        transaction = make_custom_tx(private_keys=private_keys, tx_inputs=tx_inputs, tx_outputs=tx_outputs, op_return_data=self.op_return_data, allow_zero_conf=True if self.utxo_confirmations == 0 else False)
+        compressed = all(['compressed' in get_privkey_format(private_key) for private_key in private_keys.values()])
+        satoshis_per_byte = self.get_fee_rate()
+
+        # Select the utxos to spend, only possible when sending a specific amount because sending all available funds always spends all utxos
+        selection = None
+        if self.amount != 0 and self.coin_selection != ALL:
+            selection = select_coins(utxos=tx_inputs,
+                                     outputs=self.construct_transaction_outputs(receiving_outputs=receiving_outputs, spellbook_fee_output=spellbook_fee_output),
+                                     change_address=self.change_address if self.change_address is not None else self.sending_address,
+                                     fee_rate=satoshis_per_byte,
+                                     strategy=self.coin_selection,
+                                     op_return_data=self.op_return_data,
+                                     compressed=compressed,
+                                     consolidation_fee_rate=self.consolidation_fee_rate,
+                                     minimum_change=self.minimum_output_value)
+            if selection is None:
+                LOG.error('SendTransaction action aborted: The utxos are not enough to pay for the outputs and the transaction fee')
+                return False
 
-        if transaction is None:
-            return False
+            LOG.info('%s coin selection: spending %s of %s utxos %s change' % (self.coin_selection, len(selection['inputs']), len(tx_inputs), 'with' if selection['change'] else 'without'))
+            tx_inputs = selection['inputs']
+            total_value_in_inputs = int(sum([utxo['value'] for utxo in tx_inputs]))
 
-        # Get the transaction fee in satoshis per byte
-        if self.tx_fee_type == 'High':
-            satoshis_per_byte = get_high_priority_fee()
-        elif self.tx_fee_type == 'Medium':
-            satoshis_per_byte = get_medium_priority_fee()
-        elif self.tx_fee_type == 'Low':
-            satoshis_per_byte = get_low_priority_fee()
-        elif self.tx_fee_type == 'Fixed' and isinstance(self.tx_fee, int) and self.tx_fee >= 0:
-            satoshis_per_byte = self.tx_fee
-        elif self.tx_fee_type == 'Fixed':
-            raise Exception('Invalid fixed transaction fee amount: %s' % self.tx_fee)
-        else:
-            raise NotImplementedError('Unknown transaction fee type: %s' % self.tx_fee_type)
+        change_output = None
+        # There should only be a change output if we are sending a specific amount, when sending all available funds there should never be a change output
+        # If the selected utxos leave less change than the minimum output value, the change goes to the transaction fee instead
+        if self.amount != 0 and (selection is None or selection['change'] is True):
+            total_value_in_outputs = sum([output.value for output in receiving_outputs])
+            change_amount = total_value_in_inputs - total_value_in_outputs - spellbook_fee
+            change_address = self.change_address if self.change_address is not None else self.sending_address
+            change_output = TransactionOutput(change_address, change_amount)
 
-        LOG.info('%s transaction fee is %s sat/b' % (self.tx_fee_type, satoshis_per_byte))
+        if selection is not None:
+            transaction_fee = selection['fee']
+            LOG.info('Total transaction fee = %s (%s sat/b)' % (transaction_fee, satoshis_per_byte))
+        else:
+            # Construct temporary transaction outputs so we can calculate the transaction fee
+            tx_outputs = self.construct_transaction_outputs(receiving_outputs=receiving_outputs,
+                                                            change_output=change_output,
+                                                            spellbook_fee_output=spellbook_fee_output)
 
-        # Because the transaction is in hexadecimal, to calculate the size in bytes all we need to do is divide the number of characters by 2
-        transaction_size = int(len(transaction) / 2)
-        transaction_fee = transaction_size * satoshis_per_byte
-        LOG.info('Transaction size is %s bytes, total transaction fee = %s (%s sat/b)' % (transaction_size, transaction_fee, satoshis_per_byte))
+            # Estimate the size of the signed transaction, so the transaction only needs to be signed once
+            transaction_size = estimate_transaction_size(tx_inputs=tx_inputs, tx_outputs=tx_outputs, op_return_data=self.op_return_data, compressed=compressed)['vsize']
+            transaction_fee = transaction_size * satoshis_per_byte
+            LOG.info('Estimated transaction size is %s vbytes, total transaction fee = %s (%s sat/b)' % (transaction_size, transaction_fee, satoshis_per_byte))
 
         # if the total available amount needs to be sent, then transaction fee should be equally subtracted from all receiving_outputs
         if self.amount == 0:
@@ -321,12 +364,17 @@ class SendTransactionAction(Action):
 
         self.log_transaction_info(tx_inputs=tx_inputs, tx_outputs=tx_outputs)
 
+        # The change is the first output if there is any
+        first_receiving_output = 1 if change_output is not None and change_output.value > 0 else 0
+        receiving_outputs_count = len([output for output in receiving_outputs if output.value > 0])
+
         # Do a sanity check on the transaction fee compared to the total value in inputs, abort if the fee is to high
         if not self.is_fee_acceptable(transaction_fee=transaction_fee, total_value_in_inputs=total_value_in_inputs):
             return False
 
         # Now make the real transaction including the transaction fee
-        transaction = make_custom_tx(private_keys=private_keys, tx_inputs=tx_inputs, tx_outputs=tx_outputs, op_return_data=self.op_return_data, tx_fee=transaction_fee, allow_zero_conf=True if self.utxo_confirmations == 0 else False)
+        transaction = make_custom_tx(private_keys=private_keys, tx_inputs=tx_inputs, tx_outputs=tx_outputs, op_return_data=self.op_return_data, tx_fee=transaction_fee, allow_zero_conf=True if self.utxo_confirmations == 0 else False,
+                                     parallel_signing_min_inputs=get_parallel_signing_min_inputs(), signing_processes=get_signing_processes())
 
         # explicitly delete local variable private_keys for security reasons as soon as possible
         del private_keys
@@ -338,6 +386,7 @@ class SendTransactionAction(Action):
         LOG.info('Raw transaction: %s' % transaction)
 
         self.txid = txhash(tx=transaction)
+        self.outputs = list(range(first_receiving_output, first_receiving_output + receiving_outputs_count))
         LOG.info('Txid: %s' % self.txid)
 
         # Broadcast the transaction to the network
@@ -348,6 +397,169 @@ class SendTransactionAction(Action):
             LOG.error('Broadcasting tx failed: %s' % response['error'])
             return False
 
+    @staticmethod
+    def send_batch(actions):
+        """
+        Construct, sign and broadcast one transaction that pays the receiving outputs and spellbook fees of several actions
+        with the same batch key, this must only be called while holding the lock of the sending address
+
+        The settings of the sending address, the change and the transaction fee are taken from the first action.
+        Actions that can not be paid are left out of the transaction, the others still get their outputs.
+
+        :param actions: A list of SendTransactionAction objects with the same batch key
+        :return: A list with True or False for each action
+        """
+        first_action = actions[0]
+        results = [False] * len(actions)
+        LOG.info('Activating batch of SendTransaction actions: %s' % ', '.join([action.id for action in actions]))
+
+        tx_inputs = first_action.get_transaction_inputs()
+        if tx_inputs is None or len(tx_inputs) == 0:
+            return results
+
+        total_value_in_inputs = int(sum([utxo['value'] for utxo in tx_inputs]))
+        LOG.info('Total available value in utxos: %d' % total_value_in_inputs)
+
+        # The outputs of each action that can be paid
+        payments = []
+        total_value_in_outputs = 0
+        for i, action in enumerate(actions):
+            if action.minimum_amount is not None and total_value_in_inputs < action.minimum_amount:
+                LOG.error('SendTransaction action %s left out of batch: Total value is less than minimum amount: %s' % (action.id, action.minimum_amount))
+                continue
+
+            # The spellbook fee is a share of the amount of the action, the same as when the action is not batched
+            spellbook_fee = action.calculate_spellbook_fee(action.amount)
+            if total_value_in_inputs < total_value_in_outputs + action.amount + spellbook_fee:
+                LOG.error('SendTransaction action %s left out of batch: Total input value is not enough: %s < %s + %s + %s' % (action.id, total_value_in_inputs, total_value_in_outputs, action.amount, spellbook_fee))
+                continue
+
+            receiving_outputs = action.get_receiving_outputs(action.amount)
+            if len(receiving_outputs) == 0:
+                LOG.error('SendTransaction action %s left out of batch: There are no receiving outputs!' % action.id)
+                continue
+
+            spellbook_fee_output = TransactionOutput(action.fee_address, spellbook_fee) if action.fee_address is not None and spellbook_fee > 0 else None
+            payments.append((i, action.construct_transaction_outputs(receiving_outputs=receiving_outputs, spellbook_fee_output=spellbook_fee_output),
+                             len([output for output in receiving_outputs if output.value > 0])))
+            total_value_in_outputs += action.amount + spellbook_fee
+
+        if len(payments) == 0:
+            return results
+
+        payment_outputs = [tx_output for _, action_outputs, _ in payments for tx_output in action_outputs]
+        change_address = first_action.change_address if first_action.change_address is not None else first_action.sending_address
+
+        # Get the necessary private keys from the hot wallet if no private key is given
+        private_keys = first_action.get_private_key() if first_action.private_key is None else {first_action.sending_address: first_action.private_key}
+        if len(private_keys) == 0:
+            return results
+
+        compressed = all(['compressed' in get_privkey_format(private_key) for private_key in private_keys.values()])
+        satoshis_per_byte = first_action.get_fee_rate()
+
+        if first_action.coin_selection != ALL:
+            selection = select_coins(utxos=tx_inputs,
+                                     outputs=payment_outputs,
+                                     change_address=change_address,
+                                     fee_rate=satoshis_per_byte,
+                                     strategy=first_action.coin_selection,
+                                     compressed=compressed,
+                                     consolidation_fee_rate=first_action.consolidation_fee_rate,
+                                     minimum_change=first_action.minimum_output_value)
+            if selection is None:
+                LOG.error('Batch of SendTransaction actions aborted: The utxos are not enough to pay for the outputs and the transaction fee')
+                return results
+
+            tx_inputs = selection['inputs']
+            total_value_in_inputs = int(sum([utxo['value'] for utxo in tx_inputs]))
+            transaction_fee = selection['fee']
+            change = selection['change']
+        else:
+            transaction_size = estimate_transaction_size(tx_inputs=tx_inputs, tx_outputs=payment_outputs + [{'address': change_address, 'value': 0}], compressed=compressed)['vsize']
+            transaction_fee = transaction_size * satoshis_per_byte
+            change = True
+
+        change_value = total_value_in_inputs - total_value_in_outputs - transaction_fee if change is True else 0
+        if change_value < 0:
+            LOG.error('Batch of SendTransaction actions aborted: The value of the change output is less than the transaction fee: %s < %s' % (change_value + transaction_fee, transaction_fee))
+            return results
+        elif 0 < change_value < first_action.minimum_output_value:
+            # A change output below the minimum output value would be dust, the change goes to the transaction fee instead
+            LOG.info('Change of %s is less than the minimum output value, it is added to the transaction fee' % change_value)
+            change_value = 0
+
+        # The change is the first output if there is any, followed by the outputs of each action in order
+        tx_outputs = [{'address': change_address, 'value': change_value}] if change_value > 0 else []
+        first_outputs = {}
+        for i, action_outputs, receiving_outputs_count in payments:
+            first_outputs[i] = len(tx_outputs)
+            tx_outputs.extend(action_outputs)
+
+        transaction_fee = total_value_in_inputs - sum([tx_output['value'] for tx_output in tx_outputs])
+        LOG.info('Batch of %s actions: %s inputs, %s outputs, total transaction fee = %s (%s sat/b)' % (len(payments), len(tx_inputs), len(tx_outputs), transaction_fee, satoshis_per_byte))
+
+        for tx_input in tx_inputs:
+            LOG.info('INPUT: %s -> %s (%s)' % (tx_input['address'], tx_input['value'], tx_input['output']))
+
+        for tx_output in tx_outputs:
+            LOG.info('OUTPUT: %s -> %s' % (tx_output['address'], tx_output['value']))
+
+        # Do a sanity check on the transaction fee compared to the total value in inputs, abort if the fee is to high
+        if not first_action.is_fee_acceptable(transaction_fee=transaction_fee, total_value_in_inputs=total_value_in_inputs):
+            return results
+
+        transaction = make_custom_tx(private_keys=private_keys, tx_inputs=tx_inputs, tx_outputs=tx_outputs, tx_fee=transaction_fee, allow_zero_conf=True if first_action.utxo_confirmations == 0 else False,
+                                     parallel_signing_min_inputs=get_parallel_signing_min_inputs(), signing_processes=get_signing_processes())
+
+        # explicitly delete local variable private_keys for security reasons as soon as possible
+        del private_keys
+
+        if transaction is None:
+            LOG.error('No transaction to be sent!')
+            return results
+
+        LOG.info('Raw transaction: %s' % transaction)
+
+        txid = txhash(tx=transaction)
+        LOG.info('Txid: %s' % txid)
+
+        # Broadcast the transaction to the network
+        response = push_tx(tx=transaction)
+        if 'success' not in response or response['success'] is not True:
+            LOG.error('Broadcasting tx failed: %s' % response['error'])
+            return results
+
+        for i, action_outputs, receiving_outputs_count in payments:
+            actions[i].txid = txid
+            actions[i].outputs = list(range(first_outputs[i], first_outputs[i] + receiving_outputs_count))
+            LOG.info('SendTransaction action %s: outputs %s of transaction %s' % (actions[i].id, actions[i].outputs, txid))
+            results[i] = True
+
+        return results
+
+    def get_fee_rate(self):
+        """
+        Get the transaction fee in satoshis per byte according to the transaction fee type
+
+        :return: The transaction fee in satoshis per byte
+        """
+        if self.tx_fee_type == 'High':
+            satoshis_per_byte = get_high_priority_fee()
+        elif self.tx_fee_type == 'Medium':
+            satoshis_per_byte = get_medium_priority_fee()
+        elif self.tx_fee_type == 'Low':
+            satoshis_per_byte = get_low_priority_fee()
+        elif self.tx_fee_type == 'Fixed' and isinstance(self.tx_fee, int) and self.tx_fee >= 0:
+            satoshis_per_byte = self.tx_fee
+        elif self.tx_fee_type == 'Fixed':
+            raise Exception('Invalid fixed transaction fee amount: %s' % self.tx_fee)
+        else:
+            raise NotImplementedError('Unknown transaction fee type: %s' % self.tx_fee_type)
+
+        LOG.info('%s transaction fee is %s sat/b' % (self.tx_fee_type, satoshis_per_byte))
+        return satoshis_per_byte
+
     def get_private_key(self):
         """
         Get the private key of the sending address from the hot wallet
@@ -355,9 +567,9 @@ class SendTransactionAction(Action):
         :return: a dict containing the private key of the sending address
         """
         private_keys = {}
-        hot_wallet = get_hot_wallet()
 
         if self.wallet_type == 'Single':
+            hot_wallet = get_hot_wallet()
             if self.sending_address in hot_wallet:
                 private_keys[self.sending_address] = hot_wallet[self.sending_address]
             else:
@@ -367,13 +579,10 @@ class SendTransactionAction(Action):
             del hot_wallet
 
         elif self.wallet_type == 'BIP44':
-            xpriv_key = get_xpriv_key(mnemonic=' '.join(hot_wallet['mnemonic']), passphrase=hot_wallet['passphrase'], account=self.bip44_account)
-            # explicitly delete local variable hot_wallet for security reasons as soon as possible
-            del hot_wallet
+            # The account key comes from the key cache, the hot wallet only needs to be decrypted when the cache is empty
+            xpriv_key = get_xpriv_key_from_wallet(account=self.bip44_account)
             private_keys.update(get_private_key(xpriv_key, self.bip44_index))
         else:
-            # explicitly delete local variable hot_wallet for security reasons as soon as possible
-            del hot_wallet
             raise NotImplementedError('Unknown wallet type: %s' % self.wallet_type)
 
         return private_keys
@@ -399,6 +608,27 @@ class SendTransactionAction(Action):
 
         return spellbook_fee
 
+    def get_transaction_inputs(self):
+        """
+        Retrieve the available utxos of the sending address and construct the transaction inputs
+
+        :return: A list of dicts containing the following keys for each utxo: 'address', 'value', 'output' and 'confirmations',
+                 or None if the utxos could not be retrieved
+        """
+        data = utxos(address=self.sending_address, confirmations=self.utxo_confirmations)
+        if 'utxos' in data:
+            self.unspent_outputs = [TransactionInput(address=self.sending_address,
+                                                     value=utxo['value'],
+                                                     output_hash=utxo['output_hash'],
+                                                     output_n=utxo['output_n'],
+                                                     confirmations=utxo['confirmations']) for utxo in data['utxos']]
+        else:
+            error_msg = data['error'] if 'error' in data else ''
+            LOG.error('Error while retrieving utxos: %s' % error_msg)
+            return
+
+        return self.construct_transaction_inputs()
+
     def construct_transaction_inputs(self):
         """
         Construct a list of dict object containing the necessary information for the inputs of a transaction
@@ -576,45 +806,17 @@ class SendTransactionAction(Action):
 
         Each output value must be greater or equal than the minimum output value, otherwise that output is excluded from the distribution
 
-        Important: the total of the output values must be the same as the sending_amount,
-                   sometimes rounding errors can occur because of the distribution, if this happens
-                   then the first output gets the remaining amount
+        Important: the total of the output values is always exactly the sending_amount,
+                   satoshis that remain after rounding down go to the outputs with the largest remainders
 
         :param sending_amount: The total amount to send in satoshis (integer)
         :return: A list of TransactionOutputs
         """
         distribution = self.get_distribution(transaction_type=self.transaction_type, sending_amount=sending_amount)
-        receiving_outputs = []
-        remaining_amount = sending_amount
-
-        # Sort the distribution from highest share to lowest share
-        sorted_distribution = sorted(distribution.items(), key=operator.itemgetter(1), reverse=True)
-
-        # Now iterate over the sorted distribution starting at the end, so we can safely delete the items with the
-        # lowest value until the receiving value is at least the minimum output value
-        for i in range(len(sorted_distribution)-1, -1, -1):
-            # We need to re-calculate the total shares at each step because an item could have been deleted in the previous step
-            total_shares = float(sum([share for address, share in sorted_distribution]))
-
-            address = sorted_distribution[i][0]
-            share = sorted_distribution[i][1]/float(total_shares) if total_shares > 0 else 0  # Calculate the share, this must be a float between 0 and 1
-
-            receiving_value = int(share * sending_amount)
-
-            if receiving_value < self.minimum_output_value:
-                LOG.info('Excluding %s from distribution because output value is less than minimum output value: %s < %s' % (address, receiving_value, self.minimum_output_value))
-                del sorted_distribution[i]
-            else:
-                remaining_amount -= receiving_value
-                receiving_outputs.append(TransactionOutput(address, receiving_value))
-                LOG.info('receiving output: %s -> %s' % (receiving_value, address))
-
-        # If rounding errors are causing a few satoshis remaining, the first output gets them
-        if remaining_amount > 0 and len(receiving_outputs) > 0:
-            LOG.info('Remaining %s Satoshi(s) go to address %s' % (remaining_amount, receiving_outputs[0].address))
-            receiving_outputs[0].value += remaining_amount
 
-        return receiving_outputs
+        return [TransactionOutput(address, value) for address, value in distribute(amount=sending_amount,
+                                                                                   distribution=distribution,
+                                                                                   minimum_output_value=self.minimum_output_value)]
 
     def log_transaction_info(self, tx_inputs, tx_outputs):
         """
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare signing a transaction as a hex string with signing it as a BinaryTransaction
+
+  - hex: sign each input with transactionfactory.sign, which deserializes the hex transaction into dicts, changes the
+         input and serializes everything again
+  - binary: sign each input of a BinaryTransaction, which splices the signature into a bytearray in place
+
+Both methods make exactly the same transaction. Each transaction spends the given number of P2PKH utxos of a random key,
+so the legacy signature form is used for every input.
+
+Run from the spellbook directory: python -m benchmarks.benchmark_binary_tx -n 10 50 100 200
+"""
+
+import argparse
+import logging
+import os
+import random
+import time
+
+# The spellbook modules expect the spellbook directory as the current working directory
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.benchmarkhelpers import write_results
+from helpers.loghelpers import LOG
+from helpers.privatekeyhelpers import encode_privkey, privkey_to_address
+from transactionfactory import BinaryTransaction, mktx, sign
+
+UTXO_VALUE = 100000
+
+
+def run_benchmark(n_inputs, seed=0):
+    """
+    Sign the same transaction with both methods
+
+    :param n_inputs: The number of inputs
+    :param seed: The seed of the random key and utxos
+    :return: A dict containing the results
+    """
+    generator = random.Random(seed)
+    private_key = encode_privkey(generator.randrange(1, 2 ** 255), 'wif_compressed')
+    address = privkey_to_address(private_key)
+
+    tx_inputs = [{'address': address,
+                  'value': UTXO_VALUE,
+                  'output': '%064x:%s' % (generator.getrandbits(256), i),
+                  'confirmations': 1} for i in range(n_inputs)]
+    tx_outputs = [{'address': '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E', 'value': n_inputs * UTXO_VALUE - 10000}]
+
+    start_time = time.time()
+    hex_tx = mktx(tx_inputs, tx_outputs)
+    for i in range(n_inputs):
+        hex_tx = sign(hex_tx, i, private_key)
+    hex_time = time.time() - start_time
+
+    start_time = time.time()
+    binary_tx = BinaryTransaction.build(tx_inputs=tx_inputs, tx_outputs=tx_outputs)
+    for i in range(n_inputs):
+        binary_tx.sign(i, private_key)
+    binary_hex_tx = binary_tx.to_hex()
+    binary_time = time.time() - start_time
+
+    return {'inputs': n_inputs,
+            'hex_time': hex_time,
+            'binary_time': binary_time,
+            'speedup': hex_time / binary_time if binary_time > 0 else None,
+            'identical': hex_tx == binary_hex_tx}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark signing a hex transaction against signing a binary transaction')
+    parser.add_argument('-n', '--inputs', help='The numbers of inputs (default: 10 50 100 200)', type=int, nargs='+', default=[10, 50, 100, 200])
+    parser.add_argument('-o', '--output', help='The file to write the results to as json (default: benchmarks/results/binary_tx_<timestamp>.json)', default=None)
+
+    args = parser.parse_args()
+
+    LOG.setLevel(logging.WARNING)
+
+    results = []
+    print('%8s %10s %12s %8s %10s' % ('inputs', 'hex (s)', 'binary (s)', 'speedup', 'identical'))
+    for n_inputs in args.inputs:
+        result = run_benchmark(n_inputs=n_inputs)
+        results.append(result)
+        print('%8s %10.2f %12.2f %8.2f %10s' % (result['inputs'], result['hex_time'], result['binary_time'], result['speedup'], result['identical']))
+
+    output = write_results('binary_tx', results, output=args.output)
+    print('Results written to %s' % output)
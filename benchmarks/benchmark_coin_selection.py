@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the coin selection strategies of SendTransactionAction on large sets of utxos
+
+Each run selects the utxos for a payment from a synthetic address with the given number of P2PKH utxos, the values of
+the utxos are spread log-uniformly between 1000 and 10 million satoshis like the utxos of a busy address that receives
+payments of very different sizes.
+
+Run from the spellbook directory: python -m benchmarks.benchmark_coin_selection -n 10000 -a 1000000 -r 20
+"""
+
+import argparse
+import logging
+import math
+import os
+import random
+import time
+
+# The spellbook modules expect the spellbook directory as the current working directory
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.benchmarkhelpers import write_results
+from helpers.coinselectionhelpers import select_coins, COIN_SELECTION_STRATEGIES
+from helpers.loghelpers import LOG
+
+ADDRESS = '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E'
+RECEIVING_ADDRESS = 'bc1qnda5w4t7zp00hz79tylsa4kwhmda68puv82yav'
+
+
+def make_utxos(count, generator):
+    """
+    Make a list of synthetic utxos
+
+    :param count: The number of utxos
+    :param generator: A random.Random object
+    :return: A list of dicts containing the 'address', 'value', 'output' and 'confirmations' of each utxo
+    """
+    return [{'address': ADDRESS,
+             'value': int(math.exp(generator.uniform(math.log(1000), math.log(10000000)))),
+             'output': '%064x:%s' % (generator.getrandbits(256), i),
+             'confirmations': 1} for i in range(count)]
+
+
+def run_benchmark(count, amount, fee_rate, seed=0):
+    """
+    Select the utxos for the same payment with each strategy
+
+    :param count: The number of utxos
+    :param amount: The amount to send in satoshis
+    :param fee_rate: The transaction fee in satoshis per byte
+    :param seed: The seed of the synthetic utxos
+    :return: A list of dicts containing the results of each strategy
+    """
+    utxos = make_utxos(count=count, generator=random.Random(seed))
+    outputs = [{'address': RECEIVING_ADDRESS, 'value': amount}]
+
+    results = []
+    for strategy in COIN_SELECTION_STRATEGIES:
+        start_time = time.time()
+        selection = select_coins(utxos=utxos, outputs=outputs, change_address=ADDRESS, fee_rate=fee_rate, strategy=strategy, generator=random.Random(seed))
+        selection_time = time.time() - start_time
+
+        result = {'strategy': strategy, 'utxos': count, 'amount': amount, 'fee_rate': fee_rate, 'time': selection_time}
+        if selection is not None:
+            result.update({'inputs': len(selection['inputs']),
+                           'fee': selection['fee'],
+                           'change': sum([utxo['value'] for utxo in selection['inputs']]) - amount - selection['fee']})
+        results.append(result)
+
+    return results
+
+
+def print_results(results):
+    print('%16s %8s %8s %10s %10s %12s %12s' % ('strategy', 'utxos', 'fee rate', 'time (ms)', 'inputs', 'fee', 'change'))
+    for result in results:
+        print('%16s %8s %8s %10.1f %10s %12s %12s' % (result['strategy'], result['utxos'], result['fee_rate'], result['time'] * 1000,
+                                                       result.get('inputs', '-'), result.get('fee', '-'), result.get('change', '-')))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the coin selection strategies')
+    parser.add_argument('-n', '--utxos', help='The numbers of utxos (default: 1000 10000)', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('-a', '--amount', help='The amount to send in satoshis (default: 1000000)', type=int, default=1000000)
+    parser.add_argument('-r', '--fee_rates', help='The transaction fees in satoshis per byte (default: 2 20)', type=int, nargs='+', default=[2, 20])
+    parser.add_argument('-o', '--output', help='The file to write the results to as json (default: benchmarks/results/coin_selection_<timestamp>.json)', default=None)
+
+    args = parser.parse_args()
+
+    LOG.setLevel(logging.WARNING)
+
+    results = []
+    for n_utxos in args.utxos:
+        for fee_rate in args.fee_rates:
+            results.extend(run_benchmark(count=n_utxos, amount=args.amount, fee_rate=fee_rate))
+
+    print_results(results)
+    output = write_results('coin_selection', results, output=args.output, amount=args.amount)
+    print('Results written to %s' % output)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare the crypto backends of helpers/cryptobackendhelpers.py
+
+Each available backend multiplies G and another point, signs and verifies hashes and runs the self-test on the BIP32
+test vectors. The native coincurve backend is only benchmarked if it is installed.
+
+Run from the spellbook directory: python -m benchmarks.benchmark_crypto_backends -n 200
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import random
+import time
+
+# The spellbook modules expect the spellbook directory as the current working directory
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import helpers.cryptobackendhelpers as cryptobackendhelpers
+from benchmarks.benchmarkhelpers import write_results
+from helpers.cryptobackendhelpers import PythonBackend, CoincurveBackend, self_test
+from helpers.jacobianhelpers import generator_table, N
+from helpers.loghelpers import LOG
+
+OPERATIONS = ['generator_multiply', 'point_multiply', 'sign', 'verify', 'self_test']
+
+
+def run_benchmark(backend, operations, seed=0):
+    """
+    Time the operations of a crypto backend
+
+    :param backend: A crypto backend object
+    :param operations: The number of times to run each operation
+    :param seed: The seed of the random private keys and hashes
+    :return: A dict containing the results
+    """
+    generator = random.Random(seed)
+    secrets = [generator.randrange(1, N) for _ in range(operations)]
+    hashes = [hashlib.sha256(str(secret).encode()).digest() for secret in secrets]
+    point = PythonBackend.generator_multiply(generator.randrange(1, N))
+
+    times = {}
+    start_time = time.time()
+    points = [backend.generator_multiply(secret) for secret in secrets]
+    times['generator_multiply'] = time.time() - start_time
+
+    start_time = time.time()
+    for secret in secrets:
+        backend.point_multiply(point, secret)
+    times['point_multiply'] = time.time() - start_time
+
+    start_time = time.time()
+    signatures = [backend.sign(msghash, secret) for msghash, secret in zip(hashes, secrets)]
+    times['sign'] = time.time() - start_time
+
+    start_time = time.time()
+    valid = all([backend.verify(msghash, r, s, public_point) for msghash, (v, r, s), public_point in zip(hashes, signatures, points)])
+    times['verify'] = time.time() - start_time
+
+    start_time = time.time()
+    errors = self_test(backend=backend)
+    times['self_test'] = time.time() - start_time
+
+    return {'backend': backend.name,
+            'operations': operations,
+            'times': times,
+            'signatures': signatures,
+            'valid': valid and len(errors) == 0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the crypto backends')
+    parser.add_argument('-n', '--operations', help='The number of times to run each operation (default: 200)', type=int, default=200)
+    parser.add_argument('-o', '--output', help='The file to write the results to as json (default: benchmarks/results/crypto_backends_<timestamp>.json)', default=None)
+
+    args = parser.parse_args()
+
+    LOG.setLevel(logging.WARNING)
+
+    # The pure python backend uses the precomputed multiples of G, build the table before measuring
+    generator_table()
+
+    backends = [PythonBackend()]
+    if cryptobackendhelpers.coincurve is not None:
+        backends.append(CoincurveBackend())
+    else:
+        print('coincurve is not installed, only the pure python backend is benchmarked')
+
+    results = [run_benchmark(backend=backend, operations=args.operations) for backend in backends]
+
+    print('%20s' % 'operation' + ''.join(['%16s' % ('%s (ms)' % result['backend']) for result in results]) + ('%10s' % 'speedup' if len(results) > 1 else ''))
+    for operation in OPERATIONS:
+        # The self-test runs once, the other operations are timed per operation
+        divisor = 1 if operation == 'self_test' else args.operations
+        line = '%20s' % operation + ''.join(['%16.3f' % (result['times'][operation] / divisor * 1000) for result in results])
+        if len(results) > 1:
+            line += '%10.1f' % (results[0]['times'][operation] / results[1]['times'][operation])
+        print(line)
+
+    identical = all([result['signatures'] == results[0]['signatures'] for result in results])
+    print('Identical signatures: %s, all valid: %s' % (identical, all([result['valid'] for result in results])))
+
+    for result in results:
+        result['identical'] = identical
+        del result['signatures']
+
+    output = write_results('crypto_backends', results, output=args.output)
+    print('Results written to %s' % output)
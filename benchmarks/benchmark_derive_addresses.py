@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare deriving a range of addresses from an xpub key one child key at a time with derive_addresses
+
+  - one by one: derive each child with bip32_ckd, which serializes the child xpub and converts the child public key to
+                affine coordinates with its own modular inversion
+  - batch: derive_addresses keeps the child public keys in jacobian coordinates and converts them all at once with a
+           single modular inversion
+
+Run from the spellbook directory: python -m benchmarks.benchmark_derive_addresses -n 10 100 1000
+"""
+
+import argparse
+import logging
+import os
+import time
+
+# The spellbook modules expect the spellbook directory as the current working directory
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.benchmarkhelpers import write_results
+from bips.BIP32 import bip32_ckd, bip32_extract_key, set_chain_mode
+from bips.BIP44 import derive_addresses, MAGICBYTE
+from helpers.jacobianhelpers import generator_table
+from helpers.loghelpers import LOG
+from helpers.publickeyhelpers import encode_pubkey, pubkey_to_address
+
+XPUB = 'xpub6D4BDPcP2GT577Vvch3R8wDkScZWzQzMMUm3PWbmWvVJrZwQY4VUNgqFJPMM3No2dFDFGTsxxpG5uJh7n7epu4trkrX7x7DogT5Uv6fcLW5'
+
+
+def derive_one_by_one(xpub, start, count):
+    """
+    Derive the addresses one child key at a time, like get_addresses_from_xpub did before derive_addresses
+
+    :param xpub: The xpub key
+    :param start: The index of the first address
+    :param count: The number of addresses
+    :return: A list of Bitcoin addresses
+    """
+    pub0 = bip32_ckd(xpub, 0)
+    return [pubkey_to_address(encode_pubkey(bip32_extract_key(bip32_ckd(pub0, i)), 'hex_compressed'), magicbyte=MAGICBYTE) for i in range(start, start + count)]
+
+
+def run_benchmark(count):
+    """
+    Derive the same addresses with both methods
+
+    :param count: The number of addresses
+    :return: A dict containing the results
+    """
+    start_time = time.time()
+    expected = derive_one_by_one(xpub=XPUB, start=0, count=count)
+    one_by_one_time = time.time() - start_time
+
+    start_time = time.time()
+    addresses = derive_addresses(xpub=XPUB, start=0, count=count)
+    batch_time = time.time() - start_time
+
+    return {'addresses': count,
+            'one_by_one_time': one_by_one_time,
+            'batch_time': batch_time,
+            'speedup': one_by_one_time / batch_time if batch_time > 0 else None,
+            'identical': addresses == expected}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark deriving addresses one by one against deriving them in a batch')
+    parser.add_argument('-n', '--addresses', help='The numbers of addresses (default: 10 100 1000)', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('-o', '--output', help='The file to write the results to as json (default: benchmarks/results/derive_addresses_<timestamp>.json)', default=None)
+
+    args = parser.parse_args()
+
+    LOG.setLevel(logging.WARNING)
+    set_chain_mode(mainnet=True)
+
+    # Both methods use the precomputed multiples of G, build the table before measuring
+    generator_table()
+
+    results = []
+    print('%10s %16s %10s %8s %10s' % ('addresses', 'one by one (s)', 'batch (s)', 'speedup', 'identical'))
+    for n_addresses in args.addresses:
+        result = run_benchmark(count=n_addresses)
+        results.append(result)
+        print('%10s %16.3f %10.3f %8.2f %10s' % (result['addresses'], result['one_by_one_time'], result['batch_time'], result['speedup'], result['identical']))
+
+    output = write_results('derive_addresses', results, output=args.output)
+    print('Results written to %s' % output)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare the recursive double-and-add point multiplication with the precomputed multiples of G and the iterative wNAF
+multiplication of helpers/jacobianhelpers.py
+
+  - BIP32: derive the xpriv and xpub of every BIP32 test vector, every derivation step multiplies G with a private key
+  - generator: multiply G with random integers
+  - point: multiply another point with random integers
+
+The table with the multiples of G is built the first time it is needed, the time to build it is reported separately.
+
+Run from the spellbook directory: python -m benchmarks.benchmark_ec_multiply -r 3 -m 200
+"""
+
+import argparse
+import logging
+import os
+import random
+import time
+
+# The spellbook modules expect the spellbook directory as the current working directory
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import helpers.jacobianhelpers as jacobianhelpers
+import helpers.privatekeyhelpers as privatekeyhelpers
+from benchmarks.benchmarkhelpers import write_results
+from bips.BIP32 import get_xpriv, get_xpub, set_chain_mode
+from helpers.loghelpers import LOG
+from bips.BIP32_test_vectors import bip32_test_vectors
+
+
+def double_and_add_multiply(a, n):
+    """
+    The recursive double-and-add multiplication that was used before the precomputed tables
+
+    :param a: A point in jacobian coordinates
+    :param n: An integer
+    :return: The point n*a in jacobian coordinates
+    """
+    if a[1] == 0 or n == 0:
+        return 0, 0, 1
+    if n == 1:
+        return a
+    if n < 0 or n >= jacobianhelpers.N:
+        return double_and_add_multiply(a, n % jacobianhelpers.N)
+    if (n % 2) == 0:
+        return jacobianhelpers.jacobian_double(double_and_add_multiply(a, n // 2))
+    if (n % 2) == 1:
+        return jacobianhelpers.jacobian_add(jacobianhelpers.jacobian_double(double_and_add_multiply(a, n // 2)), a)
+
+
+def double_and_add_fast_multiply(a, n):
+    return jacobianhelpers.from_jacobian(double_and_add_multiply(jacobianhelpers.to_jacobian(a), n))
+
+
+def derive_test_vectors(rounds):
+    """
+    Derive the xpriv and xpub of all BIP32 test vectors
+
+    :param rounds: The number of times to derive all test vectors
+    :return: A tuple containing the time and the list of derived keys of the last round
+    """
+    start_time = time.time()
+    for _ in range(rounds):
+        keys = [(get_xpriv(vector['seed'], vector['derivation_path']), get_xpub(vector['seed'], vector['derivation_path'])) for vector in bip32_test_vectors]
+
+    return time.time() - start_time, keys
+
+
+def run_benchmark(rounds, multiplications, seed=0):
+    """
+    Run the benchmarks with the double-and-add multiplication and with the precomputed tables and wNAF
+
+    :param rounds: The number of times to derive all BIP32 test vectors
+    :param multiplications: The number of random multiplications
+    :param seed: The seed of the random integers
+    :return: A dict containing the results
+    """
+    generator = random.Random(seed)
+    scalars = [generator.randrange(1, jacobianhelpers.N) for _ in range(multiplications)]
+    point = double_and_add_fast_multiply(jacobianhelpers.G, generator.randrange(1, jacobianhelpers.N))
+
+    # Derive the keys with the double-and-add multiplication first, the keys are derived with privkey_to_pubkey
+    privatekeyhelpers.fast_multiply = double_and_add_fast_multiply
+    try:
+        old_bip32_time, expected_keys = derive_test_vectors(rounds=rounds)
+    finally:
+        privatekeyhelpers.fast_multiply = jacobianhelpers.fast_multiply
+
+    start_time = time.time()
+    jacobianhelpers.generator_table()
+    table_time = time.time() - start_time
+
+    new_bip32_time, keys = derive_test_vectors(rounds=rounds)
+
+    start_time = time.time()
+    expected_points = [double_and_add_fast_multiply(jacobianhelpers.G, n) for n in scalars]
+    old_generator_time = time.time() - start_time
+
+    start_time = time.time()
+    points = [jacobianhelpers.fast_multiply(jacobianhelpers.G, n) for n in scalars]
+    new_generator_time = time.time() - start_time
+
+    start_time = time.time()
+    expected_variable_points = [double_and_add_fast_multiply(point, n) for n in scalars]
+    old_point_time = time.time() - start_time
+
+    start_time = time.time()
+    variable_points = [jacobianhelpers.fast_multiply(point, n) for n in scalars]
+    new_point_time = time.time() - start_time
+
+    return {'rounds': rounds,
+            'test_vectors': len(bip32_test_vectors),
+            'multiplications': multiplications,
+            'table_time': table_time,
+            'bip32': {'old_time': old_bip32_time, 'new_time': new_bip32_time, 'speedup': old_bip32_time / new_bip32_time, 'identical': keys == expected_keys},
+            'generator': {'old_time': old_generator_time, 'new_time': new_generator_time, 'speedup': old_generator_time / new_generator_time, 'identical': points == expected_points},
+            'point': {'old_time': old_point_time, 'new_time': new_point_time, 'speedup': old_point_time / new_point_time, 'identical': variable_points == expected_variable_points}}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the point multiplication on the BIP32 test vectors')
+    parser.add_argument('-r', '--rounds', help='The number of times to derive all BIP32 test vectors (default: 3)', type=int, default=3)
+    parser.add_argument('-m', '--multiplications', help='The number of random multiplications (default: 200)', type=int, default=200)
+    parser.add_argument('-o', '--output', help='The file to write the results to as json (default: benchmarks/results/ec_multiply_<timestamp>.json)', default=None)
+
+    args = parser.parse_args()
+
+    LOG.setLevel(logging.WARNING)
+    set_chain_mode(mainnet=True)
+
+    result = run_benchmark(rounds=args.rounds, multiplications=args.multiplications)
+
+    print('Table of multiples of G built in %.3f seconds' % result['table_time'])
+    print('%10s %16s %10s %8s %10s' % ('benchmark', 'double-add (s)', 'new (s)', 'speedup', 'identical'))
+    for name in ['bip32', 'generator', 'point']:
+        print('%10s %16.3f %10.3f %8.2f %10s' % (name, result[name]['old_time'], result[name]['new_time'], result[name]['speedup'], result[name]['identical']))
+
+    output = write_results('ec_multiply', [result], output=args.output, generator_window=jacobianhelpers.GENERATOR_WINDOW, wnaf_width=jacobianhelpers.WNAF_WIDTH)
+    print('Results written to %s' % output)
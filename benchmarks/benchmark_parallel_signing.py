@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare signing all inputs of a transaction in a single process with signing them in a pool of worker processes
+
+The hashes that are signed are calculated in the main process, the workers only calculate the signatures. Starting the
+worker processes takes a fixed amount of time, so parallel signing only pays off for transactions with many inputs and
+the speedup can never be more than the number of cpus.
+
+Run from the spellbook directory: python -m benchmarks.benchmark_parallel_signing -n 50 200 500 -p 2 4
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import time
+
+# The spellbook modules expect the spellbook directory as the current working directory
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.benchmarkhelpers import write_results
+from helpers.loghelpers import LOG
+from helpers.privatekeyhelpers import encode_privkey, privkey_to_address
+from transactionfactory import make_custom_tx
+
+UTXO_VALUE = 100000
+FEE = 10000
+
+
+def run_benchmark(n_inputs, processes, seed=0):
+    """
+    Sign the same transaction in a single process and with pools of worker processes
+
+    :param n_inputs: The number of inputs
+    :param processes: A list containing the numbers of worker processes
+    :param seed: The seed of the random key and utxos
+    :return: A list of dicts containing the results
+    """
+    generator = random.Random(seed)
+    private_key = encode_privkey(generator.randrange(1, 2 ** 255), 'wif_compressed')
+    address = privkey_to_address(private_key)
+
+    tx_inputs = [{'address': address,
+                  'value': UTXO_VALUE,
+                  'output': '%064x:%s' % (generator.getrandbits(256), i),
+                  'confirmations': 1} for i in range(n_inputs)]
+    tx_outputs = [{'address': '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E', 'value': n_inputs * UTXO_VALUE - FEE}]
+
+    start_time = time.time()
+    expected = make_custom_tx(private_keys={address: private_key}, tx_inputs=tx_inputs, tx_outputs=tx_outputs, tx_fee=FEE)
+    single_time = time.time() - start_time
+
+    results = []
+    for n_processes in processes:
+        start_time = time.time()
+        transaction = make_custom_tx(private_keys={address: private_key}, tx_inputs=tx_inputs, tx_outputs=tx_outputs, tx_fee=FEE,
+                                     parallel_signing_min_inputs=1, signing_processes=n_processes)
+        parallel_time = time.time() - start_time
+
+        results.append({'inputs': n_inputs,
+                        'processes': n_processes,
+                        'single_time': single_time,
+                        'parallel_time': parallel_time,
+                        'speedup': single_time / parallel_time if parallel_time > 0 else None,
+                        'identical': transaction == expected})
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark signing in a single process against signing with a pool of worker processes')
+    parser.add_argument('-n', '--inputs', help='The numbers of inputs (default: 50 200 500)', type=int, nargs='+', default=[50, 200, 500])
+    parser.add_argument('-p', '--processes', help='The numbers of worker processes (default: 2 4)', type=int, nargs='+', default=[2, 4])
+    parser.add_argument('-o', '--output', help='The file to write the results to as json (default: benchmarks/results/parallel_signing_<timestamp>.json)', default=None)
+
+    args = parser.parse_args()
+
+    LOG.setLevel(logging.WARNING)
+
+    results = []
+    print('%8s %10s %10s %14s %8s %10s' % ('inputs', 'processes', 'single (s)', 'parallel (s)', 'speedup', 'identical'))
+    for n_inputs in args.inputs:
+        for result in run_benchmark(n_inputs=n_inputs, processes=args.processes):
+            results.append(result)
+            print('%8s %10s %10.2f %14.2f %8.2f %10s' % (result['inputs'], result['processes'], result['single_time'],
+                                                         result['parallel_time'], result['speedup'], result['identical']))
+
+    output = write_results('parallel_signing', results, output=args.output, cpus=multiprocessing.cpu_count())
+    print('Results written to %s' % output)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare signing a consolidation transaction that spends legacy P2PKH utxos with one that spends P2WPKH utxos
+
+Legacy inputs sign a copy of the whole transaction, so signing all inputs is quadratic in the number of inputs.
+Segwit inputs sign a BIP143 digest built from hashes that are calculated once per transaction, so signing is linear.
+The witness discount also makes the segwit transaction smaller in vbytes, which lowers the fee.
+
+Run from the spellbook directory: python -m benchmarks.benchmark_segwit_signing -n 10 50 100 200
+"""
+
+import argparse
+import binascii
+import logging
+import os
+import random
+import time
+
+# The spellbook modules expect the spellbook directory as the current working directory
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.benchmarkhelpers import write_results
+from helpers.bech32 import encode as bech32_encode
+from helpers.loghelpers import LOG
+from helpers.privatekeyhelpers import encode_privkey, privkey_to_address, privkey_to_pubkey
+from helpers.txsizehelpers import estimate_transaction_size
+from transactionfactory import make_custom_tx, p2wpkh_redeem_script
+
+UTXO_VALUE = 100000
+FEE_RATE = 10
+
+
+def sign_consolidation(private_key, address, n_inputs, generator):
+    """
+    Make and sign a transaction that spends the given number of utxos of an address to a single output
+
+    :param private_key: The private key of the address
+    :param address: The address
+    :param n_inputs: The number of inputs
+    :param generator: A random.Random object for the txids of the utxos
+    :return: A dict containing the signing time, the size in bytes and the size in vbytes
+    """
+    tx_inputs = [{'address': address,
+                  'value': UTXO_VALUE,
+                  'output': '%064x:%s' % (generator.getrandbits(256), i),
+                  'confirmations': 1} for i in range(n_inputs)]
+    tx_outputs = [{'address': '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E', 'value': UTXO_VALUE * n_inputs}]
+
+    vsize = estimate_transaction_size(tx_inputs=tx_inputs, tx_outputs=tx_outputs)['vsize']
+    tx_outputs[0]['value'] -= vsize * FEE_RATE
+
+    start_time = time.time()
+    transaction = make_custom_tx(private_keys={address: private_key}, tx_inputs=tx_inputs, tx_outputs=tx_outputs, tx_fee=vsize * FEE_RATE)
+
+    return {'time': time.time() - start_time, 'size': len(transaction) // 2, 'vsize': vsize}
+
+
+def run_benchmark(n_inputs, seed=0):
+    """
+    Sign the same consolidation spending legacy utxos and spending segwit utxos
+
+    :param n_inputs: The number of inputs
+    :param seed: The seed of the random key and utxos
+    :return: A dict containing the results
+    """
+    generator = random.Random(seed)
+    private_key = encode_privkey(generator.randrange(1, 2 ** 255), 'wif_compressed')
+    legacy_address = privkey_to_address(private_key)
+    segwit_address = bech32_encode('bc', 0, list(binascii.unhexlify(p2wpkh_redeem_script(privkey_to_pubkey(private_key))[4:])))
+
+    legacy = sign_consolidation(private_key=private_key, address=legacy_address, n_inputs=n_inputs, generator=generator)
+    segwit = sign_consolidation(private_key=private_key, address=segwit_address, n_inputs=n_inputs, generator=generator)
+
+    return {'inputs': n_inputs,
+            'legacy_time': legacy['time'],
+            'segwit_time': segwit['time'],
+            'speedup': legacy['time'] / segwit['time'] if segwit['time'] > 0 else None,
+            'legacy_vsize': legacy['vsize'],
+            'segwit_vsize': segwit['vsize'],
+            'legacy_fee': legacy['vsize'] * FEE_RATE,
+            'segwit_fee': segwit['vsize'] * FEE_RATE}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark signing legacy inputs against signing segwit inputs')
+    parser.add_argument('-n', '--inputs', help='The numbers of inputs (default: 10 50 100 200)', type=int, nargs='+', default=[10, 50, 100, 200])
+    parser.add_argument('-o', '--output', help='The file to write the results to as json (default: benchmarks/results/segwit_signing_<timestamp>.json)', default=None)
+
+    args = parser.parse_args()
+
+    LOG.setLevel(logging.WARNING)
+
+    results = []
+    print('%8s %12s %12s %8s %14s %14s' % ('inputs', 'legacy (s)', 'segwit (s)', 'speedup', 'legacy vsize', 'segwit vsize'))
+    for n_inputs in args.inputs:
+        result = run_benchmark(n_inputs=n_inputs)
+        results.append(result)
+        print('%8s %12.2f %12.2f %8.2f %14s %14s' % (result['inputs'], result['legacy_time'], result['segwit_time'],
+                                                     result['speedup'], result['legacy_vsize'], result['segwit_vsize']))
+
+    output = write_results('segwit_signing', results, output=args.output, fee_rate=FEE_RATE)
+    print('Results written to %s' % output)
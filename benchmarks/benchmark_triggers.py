@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure how the trigger engine scales with the number of triggers
+
+For each requested number of triggers, synthetic triggers of every trigger type are saved in a fresh temporary storage
+and checked against a local stand-in for the blockchain data, so no explorers or other services are needed.
+The triggers all run a single RevealSecret action, which only saves itself to the storage.
+
+Measured per number of triggers:
+  - save: the time to save all triggers
+  - load: the time and memory to load all triggers into the trigger registry
+  - sweep: the time to check all active triggers while none of their conditions are fulfilled
+  - activation: the number of activations per second of the triggers whose conditions are fulfilled
+  - storage: the size of the storage on disk and the bytes read and written by the process
+
+Run from the spellbook directory: python -m benchmarks.benchmark_triggers -n 1000 10000 100000
+"""
+
+import argparse
+import logging
+import os
+import platform
+import resource
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+# The spellbook modules expect the spellbook directory as the current working directory
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import helpers.storagehelpers as storagehelpers
+import helpers.triggerregistry as triggerregistry
+from action.revealsecretaction import RevealSecretAction
+from benchmarks.benchmarkhelpers import write_results
+from data.snapshot import Snapshot
+from helpers.loghelpers import LOG
+from helpers.triggerhelpers import save_trigger, get_trigger, check_conditions, check_trigger_ids, activate_checked_trigger
+from helpers.triggerregistry import TriggerRegistry
+from storage.jsonstorage import JSONStorage
+from storage.sqlitestorage import SQLiteStorage
+from trigger.triggertype import TriggerType
+
+BENCHMARK_ACTION = 'benchmark_action'
+
+# The synthetic blockchain data of the local data source
+LATEST_BLOCK_HEIGHT = 700000
+BALANCE = 100000000
+CONFIRMATIONS = 6
+
+BASE58_CHARACTERS = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+TRIGGER_TYPES = [TriggerType.MANUAL, TriggerType.BALANCE, TriggerType.RECEIVED, TriggerType.SENT,
+                 TriggerType.BLOCK_HEIGHT, TriggerType.TX_CONFIRMATION, TriggerType.TIMESTAMP, TriggerType.RECURRING,
+                 TriggerType.TRIGGERSTATUS, TriggerType.DEADMANSSWITCH, TriggerType.SIGNEDMESSAGE,
+                 TriggerType.HTTPGETREQUEST, TriggerType.HTTPPOSTREQUEST, TriggerType.HTTPDELETEREQUEST]
+
+
+class LocalSnapshot(Snapshot):
+    """
+    A Snapshot that serves the same synthetic blockchain data for every address and transaction instead of querying the
+    explorers: every address has a balance of BALANCE and every transaction has CONFIRMATIONS confirmations
+    """
+    def fetch(self, dependency):
+        dependency_type, key = dependency
+        if dependency_type == Snapshot.BALANCE:
+            data = {'balance': {'final': BALANCE, 'received': BALANCE, 'sent': BALANCE}}
+        elif dependency_type == Snapshot.TRANSACTION:
+            data = {'transaction': {'txid': key, 'confirmations': CONFIRMATIONS, 'block_height': LATEST_BLOCK_HEIGHT - CONFIRMATIONS + 1}}
+        elif dependency_type == Snapshot.LATEST_BLOCK:
+            data = {'block': {'height': LATEST_BLOCK_HEIGHT}}
+        else:
+            raise NotImplementedError('Unknown dependency type: %s' % dependency_type)
+
+        with self.lock:
+            return self.data.setdefault(dependency, data)
+
+
+def synthetic_address(index):
+    """
+    Get a synthetic address that passes the address validation (it does not have a valid checksum)
+
+    :param index: The index of the address
+    :return: An address
+    """
+    encoded = ''
+    while index > 0:
+        index, remainder = divmod(index, 58)
+        encoded = BASE58_CHARACTERS[remainder] + encoded
+
+    return '1Bench' + encoded.rjust(28, '1')
+
+
+def synthetic_txid(index):
+    return '%064x' % (index + 1)
+
+
+def synthetic_trigger_config(index, trigger_type, fulfilled, addresses, now):
+    """
+    Get the configuration of a synthetic trigger
+
+    :param index: The index of the trigger
+    :param trigger_type: The type of the trigger
+    :param fulfilled: True if the conditions of the trigger must be fulfilled by the local data source
+    :param addresses: The number of distinct addresses the triggers watch
+    :param now: The current time
+    :return: A dict containing the configuration of the trigger
+    """
+    config = {'trigger_type': trigger_type,
+              'status': 'Active',
+              'actions': [BENCHMARK_ACTION],
+              'description': 'Benchmark trigger %s' % index}
+
+    if trigger_type in [TriggerType.BALANCE, TriggerType.RECEIVED, TriggerType.SENT]:
+        config.update({'address': synthetic_address(index % addresses),
+                       'amount': BALANCE if fulfilled else BALANCE + 1})
+    elif trigger_type == TriggerType.BLOCK_HEIGHT:
+        config.update({'block_height': LATEST_BLOCK_HEIGHT if fulfilled else LATEST_BLOCK_HEIGHT + 1 + index,
+                       'confirmations': 0})
+    elif trigger_type == TriggerType.TX_CONFIRMATION:
+        config.update({'txid': synthetic_txid(index),
+                       'confirmations': CONFIRMATIONS if fulfilled else CONFIRMATIONS + 1})
+    elif trigger_type == TriggerType.TIMESTAMP:
+        config.update({'timestamp': now - 60 if fulfilled else now + 3600 + index})
+    elif trigger_type == TriggerType.RECURRING:
+        config.update({'interval': 3600,
+                       'begin_time': now - 3600,
+                       'next_activation': now - 60 if fulfilled else now + 3600 + index})
+    elif trigger_type == TriggerType.TRIGGERSTATUS:
+        # The previous trigger never succeeds during the benchmark
+        config.update({'previous_trigger': 'benchmark_trigger_0',
+                       'previous_trigger_status': 'Succeeded'})
+    elif trigger_type == TriggerType.DEADMANSSWITCH:
+        # Dead Man's Switches are never activated, they would send warning emails
+        config.update({'timeout': 3600,
+                       'warning_email': 'benchmark@example.com',
+                       'phase': 1,
+                       'activation_time': now + 86400 + index})
+    elif trigger_type == TriggerType.SIGNEDMESSAGE:
+        config.update({'address': synthetic_address(index % addresses)})
+
+    return config
+
+
+def is_fulfilled(index, interval):
+    """
+    Check if the conditions of a synthetic trigger are generated to be fulfilled
+
+    :param index: The index of the trigger
+    :param interval: One in every interval triggers of each type is fulfilled (None if no triggers are fulfilled)
+    :return: True or False
+    """
+    return interval is not None and (index // len(TRIGGER_TYPES)) % interval == 0
+
+
+def get_index(trigger_id):
+    return int(trigger_id.split('_')[-1])
+
+
+def get_storage_size(directory):
+    return sum([os.path.getsize(os.path.join(root, filename)) for root, dirs, filenames in os.walk(directory) for filename in filenames])
+
+
+def get_io_counters():
+    """
+    Get the number of bytes the process has read from and written to the storage devices (only available on linux)
+
+    :return: A dict containing read_bytes and write_bytes, or an empty dict if the counters are not available
+    """
+    if not os.path.isfile('/proc/self/io'):
+        return {}
+
+    with open('/proc/self/io', 'r') as input_file:
+        counters = dict([line.split(':') for line in input_file.read().splitlines()])
+
+    return {'read_bytes': int(counters['read_bytes']), 'write_bytes': int(counters['write_bytes'])}
+
+
+def get_max_rss():
+    """
+    Get the peak memory usage of the process in bytes
+
+    :return: The maximum resident set size
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return max_rss if platform.system() == 'Darwin' else max_rss * 1024
+
+
+def run_benchmark(count, backend='sqlite', fulfilled_ratio=0.1):
+    """
+    Run the benchmark for a number of triggers in a fresh temporary storage
+
+    :param count: The number of triggers, divided evenly over all trigger types
+    :param backend: The storage backend: sqlite or json
+    :param fulfilled_ratio: The fraction of the triggers that can be activated whose conditions are fulfilled
+    :return: A dict containing the results
+    """
+    directory = tempfile.mkdtemp(prefix='spellbook_benchmark_')
+    try:
+        if backend == 'sqlite':
+            storage = SQLiteStorage(database_file=os.path.join(directory, 'spellbook.db'))
+        elif backend == 'json':
+            storage = JSONStorage(directory=directory)
+        else:
+            raise NotImplementedError('Unknown storage backend: %s' % backend)
+
+        storagehelpers.STORAGE = storage
+        triggerregistry.TRIGGER_REGISTRY = TriggerRegistry(storage=storage, refresh_interval=3600)
+
+        action = RevealSecretAction(BENCHMARK_ACTION)
+        action.configure(action_type='RevealSecret', reveal_text='benchmark')
+        action.save()
+
+        now = int(time.time())
+        interval = max(1, int(round(1 / fulfilled_ratio))) if fulfilled_ratio > 0 else None
+        addresses = max(1, count // 10)
+        io_start = get_io_counters()
+
+        start_time = time.time()
+        for i in range(count):
+            save_trigger('benchmark_trigger_%s' % i, **synthetic_trigger_config(index=i,
+                                                                             trigger_type=TRIGGER_TYPES[i % len(TRIGGER_TYPES)],
+                                                                             fulfilled=is_fulfilled(i, interval),
+                                                                             addresses=addresses,
+                                                                             now=now))
+        save_time = time.time() - start_time
+
+        # Load the triggers into a new registry, as the server does when it starts
+        tracemalloc.start()
+        start_time = time.time()
+        registry = TriggerRegistry(storage=storage, refresh_interval=3600)
+        registry.refresh(force=True)
+        load_time = time.time() - start_time
+        registry_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        triggerregistry.TRIGGER_REGISTRY = registry
+
+        trigger_ids = registry.find(status='Active')
+
+        # A sweep in which no conditions are fulfilled: the cost of checking all triggers on each run
+        unfulfilled_ids = [trigger_id for trigger_id in trigger_ids if not is_fulfilled(get_index(trigger_id), interval)]
+        start_time = time.time()
+        check_trigger_ids(trigger_ids=unfulfilled_ids, snapshot=LocalSnapshot())
+        sweep_time = time.time() - start_time
+
+        # Activate the triggers with fulfilled conditions
+        triggers = [get_trigger(trigger_id) for trigger_id in trigger_ids if is_fulfilled(get_index(trigger_id), interval)]
+        conditions_fulfilled = check_conditions(triggers=triggers, snapshot=LocalSnapshot())
+        start_time = time.time()
+        activations = 0
+        for trigger in triggers:
+            if conditions_fulfilled[trigger.id] is True:
+                activate_checked_trigger(trigger=trigger)
+                activations += 1
+        activation_time = time.time() - start_time
+
+        io_end = get_io_counters()
+
+        return {'triggers': count,
+                'backend': backend,
+                'save_time': save_time,
+                'saves_per_second': count / save_time if save_time > 0 else None,
+                'load_time': load_time,
+                'registry_memory_bytes': registry_memory,
+                'sweep_triggers': len(unfulfilled_ids),
+                'sweep_time': sweep_time,
+                'sweep_triggers_per_second': len(unfulfilled_ids) / sweep_time if sweep_time > 0 else None,
+                'activations': activations,
+                'activation_time': activation_time,
+                'activations_per_second': activations / activation_time if activation_time > 0 else None,
+                'storage_bytes': get_storage_size(directory),
+                'io_read_bytes': io_end['read_bytes'] - io_start['read_bytes'] if io_start else None,
+                'io_write_bytes': io_end['write_bytes'] - io_start['write_bytes'] if io_start else None,
+                'max_rss_bytes': get_max_rss()}
+    finally:
+        storagehelpers.STORAGE = None
+        triggerregistry.TRIGGER_REGISTRY = None
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def print_results(results):
+    print('%10s %10s %12s %10s %12s %14s %12s %14s %14s' % ('triggers', 'save (s)', 'saves/s', 'load (s)', 'memory (MB)',
+                                                            'sweep (s)', 'sweep/s', 'activations', 'activations/s'))
+    for result in results:
+        print('%10s %10.2f %12.0f %10.2f %12.1f %14.2f %12.0f %14s %14.0f' % (result['triggers'],
+                                                                              result['save_time'],
+                                                                              result['saves_per_second'] or 0,
+                                                                              result['load_time'],
+                                                                              result['registry_memory_bytes'] / 1e6,
+                                                                              result['sweep_time'],
+                                                                              result['sweep_triggers_per_second'] or 0,
+                                                                              result['activations'],
+                                                                              result['activations_per_second'] or 0))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the trigger engine with synthetic triggers of every trigger type')
+    parser.add_argument('-n', '--counts', help='The numbers of triggers (default: 1000 10000 100000)', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('-b', '--backend', help='The storage backend (default: sqlite)', choices=['sqlite', 'json'], default='sqlite')
+    parser.add_argument('-f', '--fulfilled', help='The fraction of the triggers whose conditions are fulfilled (default: 0.1)', type=float, default=0.1)
+    parser.add_argument('-o', '--output', help='The file to write the results to as json (default: benchmarks/results/triggers_<timestamp>.json)', default=None)
+
+    args = parser.parse_args()
+
+    # Logging every check and activation would dominate the measurements
+    LOG.setLevel(logging.WARNING)
+
+    results = []
+    for count in args.counts:
+        print('Benchmarking %s triggers' % count)
+        results.append(run_benchmark(count=count, backend=args.backend, fulfilled_ratio=args.fulfilled))
+
+    print_results(results)
+
+    output = write_results('triggers', results, output=args.output, backend=args.backend, fulfilled_ratio=args.fulfilled)
+    print('Results written to %s' % output)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare the two ways to get the fee of a transaction in SendTransactionAction
+
+  - sign twice: sign the transaction without fee to measure its size, then sign it again with the fee
+  - estimate: estimate the size of the signed transaction from its script types, then sign it once
+
+Each transaction spends the given number of P2PKH utxos of a random key and has a receiving output, a change output
+and an OP_RETURN output, like a consolidation of the utxos of a busy address.
+
+Run from the spellbook directory: python -m benchmarks.benchmark_tx_size -n 10 50 100 150
+"""
+
+import argparse
+import logging
+import os
+import random
+import time
+
+# The spellbook modules expect the spellbook directory as the current working directory
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.benchmarkhelpers import write_results
+from helpers.loghelpers import LOG
+from helpers.privatekeyhelpers import encode_privkey, privkey_to_address
+from helpers.txsizehelpers import estimate_transaction_size
+from transactionfactory import make_custom_tx
+
+UTXO_VALUE = 100000
+FEE_RATE = 10
+OP_RETURN_DATA = 'Spellbook benchmark'
+
+
+def make_transaction(private_keys, tx_inputs, tx_outputs, fee):
+    """
+    Make a signed transaction that pays the given fee, the fee is subtracted from the first output
+
+    :param private_keys: A dict containing the private key of each address
+    :param tx_inputs: The transaction inputs
+    :param tx_outputs: The transaction outputs without fee
+    :param fee: The transaction fee in satoshis
+    :return: The signed transaction in hex format
+    """
+    tx_outputs = [dict(tx_output) for tx_output in tx_outputs]
+    tx_outputs[0]['value'] -= fee
+
+    return make_custom_tx(private_keys=private_keys, tx_inputs=tx_inputs, tx_outputs=tx_outputs, tx_fee=fee, op_return_data=OP_RETURN_DATA)
+
+
+def run_benchmark(n_inputs, seed=0):
+    """
+    Make the same transaction with both methods
+
+    :param n_inputs: The number of inputs
+    :param seed: The seed of the random key and utxos
+    :return: A dict containing the results
+    """
+    generator = random.Random(seed)
+    private_key = encode_privkey(generator.randrange(1, 2 ** 255), 'wif_compressed')
+    address = privkey_to_address(private_key)
+    private_keys = {address: private_key}
+
+    tx_inputs = [{'address': address,
+                  'value': UTXO_VALUE,
+                  'output': '%064x:%s' % (generator.getrandbits(256), i),
+                  'confirmations': 1} for i in range(n_inputs)]
+    tx_outputs = [{'address': address, 'value': n_inputs * UTXO_VALUE - 50000},
+                  {'address': '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E', 'value': 50000}]
+
+    start_time = time.time()
+    unsigned_size = len(make_transaction(private_keys=private_keys, tx_inputs=tx_inputs, tx_outputs=tx_outputs, fee=0)) // 2
+    double_transaction = make_transaction(private_keys=private_keys, tx_inputs=tx_inputs, tx_outputs=tx_outputs, fee=unsigned_size * FEE_RATE)
+    double_time = time.time() - start_time
+
+    start_time = time.time()
+    estimated_size = estimate_transaction_size(tx_inputs=tx_inputs, tx_outputs=tx_outputs, op_return_data=OP_RETURN_DATA)['vsize']
+    estimated_transaction = make_transaction(private_keys=private_keys, tx_inputs=tx_inputs, tx_outputs=tx_outputs, fee=estimated_size * FEE_RATE)
+    estimate_time = time.time() - start_time
+
+    return {'inputs': n_inputs,
+            'sign_twice_time': double_time,
+            'estimate_time': estimate_time,
+            'speedup': double_time / estimate_time if estimate_time > 0 else None,
+            'actual_size': len(estimated_transaction) // 2,
+            'measured_size': len(double_transaction) // 2,
+            'estimated_size': estimated_size,
+            'estimate_error_bytes': estimated_size - len(estimated_transaction) // 2}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark estimating the transaction size against signing the transaction twice')
+    parser.add_argument('-n', '--inputs', help='The numbers of inputs (default: 10 50 100 150)', type=int, nargs='+', default=[10, 50, 100, 150])
+    parser.add_argument('-o', '--output', help='The file to write the results to as json (default: benchmarks/results/tx_size_<timestamp>.json)', default=None)
+
+    args = parser.parse_args()
+
+    LOG.setLevel(logging.WARNING)
+
+    results = []
+    print('%8s %16s %14s %8s %12s %14s' % ('inputs', 'sign twice (s)', 'estimate (s)', 'speedup', 'actual size', 'estimate error'))
+    for n_inputs in args.inputs:
+        result = run_benchmark(n_inputs=n_inputs)
+        results.append(result)
+        print('%8s %16.2f %14.2f %8.2f %12s %14s' % (result['inputs'], result['sign_twice_time'], result['estimate_time'],
+                                                     result['speedup'], result['actual_size'], result['estimate_error_bytes']))
+
+    output = write_results('tx_size', results, output=args.output, fee_rate=FEE_RATE)
+    print('Results written to %s' % output)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+
+
+def write_results(benchmark, results, output=None, **parameters):
+    """
+    Write the results of a benchmark as json, so they can be compared between runs
+
+    :param benchmark: The name of the benchmark
+    :param results: A list of dicts containing the results
+    :param output: The file to write the results to (optional, by default benchmarks/results/<benchmark>_<timestamp>.json)
+    :param parameters: The parameters the benchmark was run with
+    :return: The file the results were written to
+    """
+    if output is None:
+        output = os.path.join(RESULTS_DIR, '%s_%s.json' % (benchmark, datetime.now().strftime('%Y%m%d_%H%M%S')))
+
+    if os.path.dirname(output) != '' and not os.path.isdir(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+
+    with open(output, 'w') as output_file:
+        json.dump({'benchmark': benchmark,
+                   'timestamp': int(time.time()),
+                   'python': sys.version.split()[0],
+                   'platform': platform.platform(),
+                   'parameters': parameters,
+                   'results': results}, output_file, indent=4)
+
+    return output
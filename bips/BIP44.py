@@ -1,11 +1,17 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import hashlib
+import hmac
 from binascii import hexlify, unhexlify
 
 
 from .BIP32 import bip32_ckd, bip32_extract_key, MAGICBYTE, bip32_master_key, VERSION_BYTES, bip32_privtopub
+from .BIP32 import bip32_deserialize, raw_bip32_ckd
 from .BIP39 import get_seed
-from helpers.publickeyhelpers import encode_pubkey, pubkey_to_address
+from helpers.cryptobackendhelpers import get_crypto_backend, PYTHON
+from helpers.jacobianhelpers import batch_from_jacobian, generator_multiply, jacobian_add_affine, to_jacobian
+from helpers.publickeyhelpers import decode_pubkey, pubkey_to_address
+from helpers.py3specials import encode, decode
 from helpers.privatekeyhelpers import encode_privkey, privkey_to_address
 from helpers.configurationhelpers import get_use_testnet
 
@@ -13,6 +19,35 @@ HARDENED = 2**31
 COIN_TYPE = 1 if get_use_testnet() is True else 0
 
 
+def derive_addresses(xpub, start, count, k=0):
+    """
+    Get a range of Bitcoin addresses derived from an xpub key
+
+    The child public keys are kept in jacobian coordinates and converted to affine coordinates all at once, so only a
+    single modular inversion is needed for all addresses instead of one per address.
+
+    :param xpub: The xpub key
+    :param start: The index of the first address
+    :param count: The number of addresses to derive
+    :param k: 0=normal addresses, 1=change addresses
+    :return: A list of Bitcoin addresses
+    """
+    chaincode, key = raw_bip32_ckd(bip32_deserialize(xpub), k)[4:]
+    parent_point = decode_pubkey(key)
+
+    tweaks = [decode(hmac.new(chaincode, key + encode(i, 256, 4), hashlib.sha512).digest()[:32], 256) for i in range(start, start + count)]
+
+    backend = get_crypto_backend()
+    if backend.name == PYTHON:
+        points = [generator_multiply(tweak) for tweak in tweaks]
+    else:
+        points = [to_jacobian(backend.generator_multiply(tweak)) for tweak in tweaks]
+
+    points = batch_from_jacobian([jacobian_add_affine(point, parent_point) for point in points])
+
+    return [pubkey_to_address(backend.serialize_pubkey(point, compressed=True), magicbyte=MAGICBYTE) for point in points]
+
+
 def get_address_from_xpub(xpub, i):
     """
     Get a Bitcoin address from an xpub key
@@ -21,12 +56,7 @@ def get_address_from_xpub(xpub, i):
     :param i: The index of the address
     :return: A Bitcoin Address
     """
-    pub0 = bip32_ckd(xpub, 0)
-    public_key = bip32_ckd(pub0, i)
-    hex_key = encode_pubkey(bip32_extract_key(public_key), 'hex_compressed')
-    address = pubkey_to_address(hex_key, magicbyte=MAGICBYTE)
-
-    return address
+    return derive_addresses(xpub=xpub, start=i, count=1)[0]
 
 
 def get_addresses_from_xpub(xpub, i=100):
@@ -37,16 +67,7 @@ def get_addresses_from_xpub(xpub, i=100):
     :param i: The number of addresses to derive
     :return: A list of Bitcoin addresses
     """
-    address_list = []
-    pub0 = bip32_ckd(xpub, 0)
-
-    for i in range(0, i):
-        public_key = bip32_ckd(pub0, i)
-        hex_key = encode_pubkey(bip32_extract_key(public_key), 'hex_compressed')
-        address_from_public_key = pubkey_to_address(hex_key, magicbyte=MAGICBYTE)
-        address_list.append(address_from_public_key)
-
-    return address_list
+    return derive_addresses(xpub=xpub, start=0, count=i)
 
 
 def get_change_addresses_from_xpub(xpub, i=100):
@@ -57,16 +78,7 @@ def get_change_addresses_from_xpub(xpub, i=100):
     :param i: The number of addresses to derive
     :return: A list of Bitcoin addresses
     """
-    address_list = []
-    pub0 = bip32_ckd(xpub, 1)
-
-    for i in range(0, i):
-        public_key = bip32_ckd(pub0, i)
-        hex_key = encode_pubkey(bip32_extract_key(public_key), 'hex_compressed')
-        address_from_public_key = pubkey_to_address(hex_key, magicbyte=MAGICBYTE)
-        address_list.append(address_from_public_key)
-
-    return address_list
+    return derive_addresses(xpub=xpub, start=0, count=i, k=1)
 
 
 def get_xpriv_key(mnemonic, passphrase="", account=0):
@@ -75,8 +87,18 @@ def get_xpriv_key(mnemonic, passphrase="", account=0):
     # path for bitcoin mainnet is m/44'/0'/0'/0/0
     # path for bitcoin testnet is m/44'/1'/0'/0/0
 
-    seed = hexlify(get_seed(mnemonic=mnemonic, passphrase=passphrase))
-    master_key = bip32_master_key(unhexlify(seed), vbytes=VERSION_BYTES)
+    return get_xpriv_key_from_seed(seed=get_seed(mnemonic=mnemonic, passphrase=passphrase), account=account)
+
+
+def get_xpriv_key_from_seed(seed, account=0):
+    """
+    Get the xpriv key of an account from a BIP39 seed, this skips the key stretching of the mnemonic
+
+    :param seed: The seed in binary format
+    :param account: The index of the account
+    :return: The xpriv key of the account (m/44'/coin_type'/account')
+    """
+    master_key = bip32_master_key(seed, vbytes=VERSION_BYTES)
     xpriv_key = bip32_ckd(bip32_ckd(bip32_ckd(master_key, 44+HARDENED), HARDENED+COIN_TYPE), HARDENED+account)
 
     return xpriv_key
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+from concurrent.futures import TimeoutError
+
+from helpers.loghelpers import LOG
+from .data import balance, latest_block, transaction
+
+
+class Snapshot(object):
+    """
+    A snapshot of the blockchain data that is needed to check the conditions of the triggers
+
+    Each dependency is retrieved from the explorers only once, no matter how many triggers depend on it, so a thousand
+    triggers waiting for the same address or block height only cost a single lookup.
+    A dependency is a tuple of (dependency type, key), for example ('balance', '1BitcoinEaterAddressDontSendf59kuE')
+    """
+    BALANCE = 'balance'
+    TRANSACTION = 'transaction'
+    LATEST_BLOCK = 'latest_block'
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def prefetch(self, dependencies, pool, timeout):
+        """
+        Retrieve all given dependencies in parallel
+
+        A dependency that can not be retrieved within the timeout is stored as None, so the triggers that depend on it
+        are not fulfilled during this run
+
+        :param dependencies: A list of dependencies, duplicates are only retrieved once
+        :param pool: A ThreadPoolExecutor object
+        :param timeout: The maximum number of seconds to wait for a single dependency
+        """
+        futures = [(dependency, pool.submit(self.fetch, dependency)) for dependency in set(dependencies) if dependency not in self.data]
+        if len(futures) > 0:
+            LOG.info('Retrieving %s dependencies for the trigger conditions' % len(futures))
+
+        for dependency, future in futures:
+            try:
+                future.result(timeout=timeout)
+            except TimeoutError:
+                LOG.error('Retrieving %s %s timed out after %s seconds' % (dependency[0], dependency[1], timeout))
+                future.cancel()
+                with self.lock:
+                    self.data[dependency] = None
+            except Exception as ex:
+                LOG.error('Failed to retrieve %s %s: %s' % (dependency[0], dependency[1], ex))
+                with self.lock:
+                    self.data[dependency] = None
+
+    def fetch(self, dependency):
+        dependency_type, key = dependency
+        if dependency_type == Snapshot.BALANCE:
+            data = balance(address=key)
+        elif dependency_type == Snapshot.TRANSACTION:
+            data = transaction(txid=key)
+        elif dependency_type == Snapshot.LATEST_BLOCK:
+            data = latest_block()
+        else:
+            raise NotImplementedError('Unknown dependency type: %s' % dependency_type)
+
+        with self.lock:
+            # Keep the first value that was stored, so every trigger sees the same data
+            return self.data.setdefault(dependency, data)
+
+    def get(self, dependency):
+        """
+        Get the data of a dependency, dependencies that were not prefetched are retrieved the first time they are needed
+
+        :param dependency: A tuple of (dependency type, key)
+        :return: The data as returned by the explorers (or None if the dependency could not be retrieved)
+        """
+        with self.lock:
+            if dependency in self.data:
+                return self.data[dependency]
+
+        return self.fetch(dependency)
+
+    def set(self, dependency, data):
+        """
+        Store data that is already known, for example the latest block from a new block event
+
+        :param dependency: A tuple of (dependency type, key)
+        :param data: The data in the same format as returned by the explorers
+        """
+        with self.lock:
+            self.data[dependency] = data
+
+    def balance(self, address):
+        return self.get((Snapshot.BALANCE, address))
+
+    def transaction(self, txid):
+        return self.get((Snapshot.TRANSACTION, txid))
+
+    def latest_block(self):
+        return self.get((Snapshot.LATEST_BLOCK, None))
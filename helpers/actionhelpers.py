@@ -1,22 +1,17 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import glob
-import os
-
 from action.actiontype import ActionType
 from action.commandaction import CommandAction
 from action.spawnprocessaction import SpawnProcessAction
 from action.launchevolveraction import LaunchEvolverAction
-from helpers.jsonhelpers import load_from_json_file
+from helpers.storagehelpers import get_storage
 from action.revealsecretaction import RevealSecretAction
 from action.sendmailaction import SendMailAction
 from action.sendtransactionaction import SendTransactionAction
 from action.webhookaction import WebhookAction
 from action.deletetriggeraction import DeleteTriggerAction
-
-
-ACTIONS_DIR = 'json/public/actions'
+from storage.storage import ACTIONS
 
 
 def get_actions():
@@ -25,9 +20,7 @@ def get_actions():
 
     :return: A list of action_ids
     """
-    actions = glob.glob(os.path.join(ACTIONS_DIR, '*.json'))
-
-    return [os.path.splitext(os.path.basename(action))[0] for action in actions]
+    return get_storage().get_ids(ACTIONS)
 
 
 def get_action_config(action_id):
@@ -37,13 +30,10 @@ def get_action_config(action_id):
     :param action_id: id of the action
     :return: a dict containing the configuration of the action
     """
-    try:
-        action_config = load_from_json_file(os.path.join(ACTIONS_DIR, '%s.json' % action_id))
-    except IOError:
-        # Action does not exist yet, return empty dict
-        action_config = {}
+    action_config = get_storage().get(ACTIONS, action_id)
 
-    return action_config
+    # Return an empty dict if the action does not exist yet
+    return action_config if action_config is not None else {}
 
 
 def get_action(action_id, action_type=None):
@@ -116,10 +106,7 @@ def delete_action(action_id):
 
     :param action_id: The id of the action to delete
     """
-    filename = os.path.join(ACTIONS_DIR, '%s.json' % action_id)
-    if os.path.isfile(filename):
-        os.remove(filename)
-    else:
+    if not get_storage().delete(ACTIONS, action_id):
         return {'error': 'Unknown action id: %s' % action_id}
 
 
@@ -0,0 +1,636 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from action.sendtransactionaction import SendTransactionAction
+from helpers.actionhelpers import get_action, get_actions
+from helpers.batchhelpers import get_payment_batcher
+from helpers.configurationhelpers import get_activation_workers, get_activation_max_attempts, get_activation_retry_delay
+from helpers.configurationhelpers import get_batch_window
+from helpers.configurationhelpers import get_shard_synchronous_timeout
+from helpers.lockhelpers import trigger_lock, activation_lock
+from helpers.loghelpers import LOG
+from helpers.shardhelpers import get_shard_manager, owns_trigger, LeaseLost
+from helpers.storagehelpers import get_storage
+from helpers.triggerregistry import get_trigger_registry
+from storage.storage import JOBS, TRIGGERS
+
+# The status of a trigger that only activates once while its job is not finished yet, only the activation queue sets it
+ACTIVATING = 'Activating'
+
+# Jobs with these statuses still need to be run, a job is Waiting while the transaction of one of its actions is in a payment batch
+UNFINISHED_STATUSES = ['Queued', 'Running', 'Retrying', 'Waiting']
+
+# Finished jobs are deleted when the activation queue starts and they are older than this many seconds
+JOB_RETENTION = 7 * 24 * 3600
+
+# With sharding, the jobs that other spellbook processes queued for the triggers of this process are picked up this often
+JOB_POLL_INTERVAL = 1
+
+ACTIVATION_QUEUE = None
+
+
+def get_activation_queue():
+    """
+    Get the process-wide activation queue, the queue is created the first time it is needed
+
+    :return: The ActivationQueue object
+    """
+    global ACTIVATION_QUEUE
+
+    if ACTIVATION_QUEUE is None:
+        ACTIVATION_QUEUE = ActivationQueue(workers=get_activation_workers())
+
+    return ACTIVATION_QUEUE
+
+
+def activation_queue_running():
+    """
+    Check if activations are queued as jobs, otherwise triggers are activated synchronously
+
+    :return: True or False
+    """
+    return ACTIVATION_QUEUE is not None and ACTIVATION_QUEUE.running is True
+
+
+def get_job_id(trigger_id, triggered):
+    """
+    Get the id of the job of an activation, which is also its idempotency key: the same activation of a trigger always
+    gets the same job id, so it is never queued twice
+
+    :param trigger_id: The id of the trigger
+    :param triggered: The number of times the trigger had been activated before this activation
+    :return: The job id
+    """
+    return '%s-%s' % (trigger_id, triggered)
+
+
+def get_job(job_id):
+    """
+    Get a job
+
+    :param job_id: The id of the job
+    :return: A dict containing the job or an empty dict if the job does not exist
+    """
+    job = get_storage().get(JOBS, job_id)
+
+    return job if job is not None else {}
+
+
+def restore_activating_status(trigger, trigger_config):
+    """
+    Restore the Activating status of a trigger that is loaded from its stored configuration
+
+    Clients can not set the Activating status (see valid_status), so Trigger.configure does not accept it either.
+
+    :param trigger: A Trigger object that was configured with the stored configuration
+    :param trigger_config: The stored configuration of the trigger
+    """
+    if trigger_config.get('status') == ACTIVATING:
+        trigger.status = ACTIVATING
+
+
+def queue_activation(trigger):
+    """
+    Queue the activation of a trigger as a job
+
+    The trigger counts as activated right away, so it is not activated again while its job is waiting: a trigger that
+    only activates once gets the status 'Activating' until its job is finished
+
+    :param trigger: A Trigger object
+    :return: A dict containing the job_id
+    """
+    storage = get_storage()
+
+    # The job and the new state of the trigger are saved together, so a crash can not lose the activation
+    with storage.transaction():
+        # The trigger could have been activated by another spellbook process in the meantime
+        trigger_config = storage.get(TRIGGERS, trigger.id)
+        if trigger_config is not None and trigger_config.get('triggered', 0) > trigger.triggered:
+            if trigger.multi is False:
+                LOG.info('Trigger %s has already been activated' % trigger.id)
+                return {'job_id': get_job_id(trigger_id=trigger.id, triggered=trigger.triggered)}
+
+            trigger.triggered = trigger_config['triggered']
+
+        job_id = get_job_id(trigger_id=trigger.id, triggered=trigger.triggered)
+        if get_job(job_id).get('status') in UNFINISHED_STATUSES:
+            LOG.info('Activation %s of trigger %s is already queued' % (job_id, trigger.id))
+            return {'job_id': job_id}
+
+        now = int(time.time())
+        job = {'job_id': job_id,
+               'trigger_id': trigger.id,
+               'status': 'Queued',
+               'triggered': trigger.triggered + 1,
+               'script_variables': trigger.get_script_variables() if trigger.script is not None else None,
+               'script_done': False,
+               'actions': list(trigger.actions),
+               'next_action': 0,
+               'attempts': 0,
+               'next_attempt': now,
+               'started_actions': [],
+               'transactions': {},
+               'result': None,
+               'error': None,
+               'created': now,
+               'finished': None}
+
+        storage.save(JOBS, job_id, job)
+        trigger.triggered += 1
+        if trigger.multi is False:
+            trigger.status = ACTIVATING
+        trigger.save()
+
+    LOG.info('Queued activation %s of trigger %s' % (job_id, trigger.id))
+
+    # With sharding, the job of a trigger of another spellbook process is picked up by that process
+    if owns_trigger(trigger.id):
+        get_activation_queue().schedule(job_id=job_id, run_time=job['next_attempt'])
+
+    return {'job_id': job_id}
+
+
+def save_job(job):
+    storage = get_storage()
+    with storage.transaction():
+        check_claim(job)
+        storage.save(JOBS, job['job_id'], job)
+
+
+def claim_job(job_id):
+    """
+    Read a job again and mark it as running, this must be called while holding the activation lock of its trigger
+
+    The job could have been run by another worker while waiting for the lock, so a job that was read before the lock was
+    taken must not be used: its list of started actions could be outdated.
+    With sharding, the job is claimed with the epoch of the lease on the shard of its trigger (a fencing token) within the
+    same storage transaction that checks the lease, a process that loses the lease can no longer save the job.
+
+    :param job_id: The id of the job
+    :return: The job or None if the job is already finished or this process does not hold the lease on its shard
+    """
+    storage = get_storage()
+    shard_manager = get_shard_manager()
+
+    with storage.transaction():
+        job = get_job(job_id)
+        if job.get('status') not in UNFINISHED_STATUSES:
+            return
+
+        if shard_manager is not None:
+            epoch = shard_manager.get_lease_epoch(job['trigger_id'])
+            if epoch is None or not shard_manager.holds_lease(job['trigger_id'], epoch):
+                LOG.info('Not running activation %s: trigger %s is handled by another spellbook process' % (job_id, job['trigger_id']))
+                return
+
+            job['owner'] = shard_manager.worker_id
+            job['lease_epoch'] = epoch
+
+        job['status'] = 'Running'
+        storage.save(JOBS, job_id, job)
+
+    return job
+
+
+def check_claim(job):
+    """
+    Check that this process still holds the claim on a job, call this within a storage transaction to make the check and
+    the changes that depend on it atomic
+
+    :param job: The job as claimed by claim_job
+    :raises LeaseLost: If sharding is enabled and the lease on the shard of the trigger was lost or the job was claimed
+                       by another spellbook process
+    """
+    shard_manager = get_shard_manager()
+    if shard_manager is None:
+        return
+
+    stored_job = get_job(job['job_id'])
+    claimed = job.get('owner') == shard_manager.worker_id and (stored_job.get('owner'), stored_job.get('lease_epoch')) == (job['owner'], job.get('lease_epoch'))
+    if not claimed or not shard_manager.holds_lease(job['trigger_id'], job['lease_epoch']):
+        raise LeaseLost('Activation %s of trigger %s is no longer claimed by worker %s' % (job['job_id'], job['trigger_id'], shard_manager.worker_id))
+
+
+def run_job(job_id, queue=None):
+    """
+    Run the script and the remaining actions of a job
+
+    Actions that fail are retried with an exponential backoff, the actions that succeeded are not run again.
+    Actions that must run at most once (SendTransaction) are marked as started before they run and are never run again
+    once they have been started, not even after a crash, if they fail the job fails.
+    With sharding, the claim on the job is checked before the script, before each action and each time the job is saved,
+    the activation stops as soon as another spellbook process has taken over the shard of the trigger.
+    If payments are batched, the worker of the activation queue does not wait for the transaction of a batchable
+    SendTransaction action: the job is Waiting until the transaction of the batch has been sent and then it is run again.
+
+    :param job_id: The id of the job
+    :param queue: The ActivationQueue that runs the job, only the jobs of the queue are batched (optional)
+    """
+    # avoid circular import
+    from helpers.triggerhelpers import get_trigger
+
+    # The action that was sent in a batch while the job was waiting
+    batch_result = queue.pop_batch_result(job_id=job_id) if queue is not None else None
+
+    job = get_job(job_id)
+    if job.get('status') not in UNFINISHED_STATUSES:
+        return
+
+    # The job is resumed by the spellbook process that takes over the shard of the trigger
+    if not owns_trigger(job['trigger_id']):
+        LOG.info('Not running activation %s: trigger %s is handled by another spellbook process' % (job_id, job['trigger_id']))
+        return
+
+    try:
+        # The activations of the same trigger are run one after the other
+        with activation_lock(job['trigger_id']):
+            job = claim_job(job_id)
+            if job is None:
+                return
+
+            if not get_trigger_registry().exists(job['trigger_id']):
+                finish_job(job=job, status='Failed', error='Trigger %s has been deleted' % job['trigger_id'])
+                return
+
+            LOG.info('Running activation %s of trigger %s' % (job_id, job['trigger_id']))
+
+            trigger = get_trigger(job['trigger_id'])
+            script = None
+            if job['script_done'] is False:
+                if job['script_variables'] is not None:
+                    script = trigger.load_script(variables=job['script_variables'])
+
+                if script is not None:
+                    check_claim(job)
+                    script.run()
+                    job['result'] = script.http_response
+                    if len(script.new_actions) >= 1:
+                        LOG.info('Adding actions %s to trigger %s' % (script.new_actions, trigger.id))
+                        job['actions'].extend(script.new_actions)
+                        with trigger_lock(trigger.id):
+                            trigger = get_trigger(trigger.id)
+                            trigger.actions.extend(script.new_actions)
+                            trigger.save()
+
+                job['script_done'] = True
+                save_job(job)
+
+            configured_actions = get_actions()
+            unknown_actions = [action_id for action_id in job['actions'] if action_id not in configured_actions]
+            if len(unknown_actions) > 0:
+                finish_job(job=job, status='Failed', error='Unknown action ids: %s' % unknown_actions)
+                return
+
+            while job['next_action'] < len(job['actions']):
+                # Another spellbook process could have taken over the shard of the trigger while the previous action ran
+                check_claim(job)
+
+                action_id = job['actions'][job['next_action']]
+                if batch_result is not None and batch_result[0] == job['next_action']:
+                    action, success = batch_result[1:]
+                    batch_result = None
+                else:
+                    LOG.info('Running action %s: %s' % (job['next_action'] + 1, action_id))
+                    action = get_action(action_id)
+
+                    if action.at_most_once is True:
+                        # The positions of the started actions are saved, the same action could be in the list more than once
+                        if job['next_action'] in job['started_actions']:
+                            finish_job(job=job, status='Failed', error='Action %s was started before but did not finish, it will not be run again' % action_id)
+                            return
+
+                        job['started_actions'].append(job['next_action'])
+                        save_job(job)
+
+                    # The worker does not wait for the transaction of a batch, the job is run again once it has been sent
+                    if queue is not None and get_batch_window() > 0 and isinstance(action, SendTransactionAction) and action.is_batchable():
+                        job['status'] = 'Waiting'
+                        save_job(job)
+                        queue.add_to_batch(job=job, action=action)
+                        return
+
+                    try:
+                        success = action.run()
+                    except Exception as ex:
+                        LOG.error('Action %s failed: %s' % (action_id, ex))
+                        success = False
+
+                if success is True:
+                    # Keep the transaction of a SendTransaction action and its outputs, the transaction can be shared with other actions when it was batched
+                    if getattr(action, 'txid', None) is not None:
+                        job.setdefault('transactions', {})[str(job['next_action'])] = {'txid': action.txid, 'outputs': action.outputs}
+
+                    job['next_action'] += 1
+                    job['attempts'] = 0
+                    save_job(job)
+                    continue
+
+                job['attempts'] += 1
+                if action.at_most_once is True or job['attempts'] >= get_activation_max_attempts():
+                    finish_job(job=job, status='Failed', error='Action %s failed after %s attempts' % (action_id, job['attempts']))
+                    return
+
+                job['status'] = 'Retrying'
+                job['next_attempt'] = int(time.time()) + get_activation_retry_delay() * 2 ** (job['attempts'] - 1)
+                job['error'] = 'Action %s failed' % action_id
+                save_job(job)
+                LOG.warning('Action %s of activation %s failed, retrying at %s' % (action_id, job_id, job['next_attempt']))
+                get_activation_queue().schedule(job_id=job_id, run_time=job['next_attempt'])
+                return
+
+            # The script object is gone if the job was resumed after a retry or a restart
+            if script is None and job['script_variables'] is not None:
+                script = trigger.load_script(variables=job['script_variables'])
+
+            if script is not None:
+                script.cleanup()
+
+            finish_job(job=job, status='Succeeded')
+
+    except LeaseLost as ex:
+        LOG.warning('Stopped activation %s: %s' % (job_id, ex))
+
+def wait_for_activation(response, synchronous):
+    """
+    With sharding, run or wait for the job of a synchronous activation
+
+    This must be called after releasing the trigger lock, the job needs that lock to finish
+
+    :param response: The response of Trigger.activate
+    :param synchronous: True if the script and actions must run before responding
+    :return: The response of the activation
+    """
+    if get_shard_manager() is not None and synchronous is True and isinstance(response, dict) and 'job_id' in response:
+        return run_job_synchronously(job_id=response['job_id'])
+
+    return response
+
+
+def run_job_synchronously(job_id):
+    """
+    Run a job right away if this process handles its trigger, otherwise wait until the spellbook process that handles
+    the trigger has run it (at most synchronous_timeout seconds)
+
+    :param job_id: The id of the job
+    :return: The http response of the script if the job succeeded, otherwise a dict containing the job_id (and the error if the job failed)
+    """
+    job = get_job(job_id)
+    if owns_trigger(job['trigger_id']):
+        run_job(job_id=job_id)
+
+    timeout = time.time() + get_shard_synchronous_timeout()
+    job = get_job(job_id)
+    while job.get('status') in ['Queued', 'Running', 'Waiting'] and time.time() < timeout:
+        time.sleep(0.1)
+        job = get_job(job_id)
+
+    if job.get('status') == 'Succeeded':
+        return job['result']
+    elif job.get('status') == 'Failed':
+        return {'job_id': job_id, 'error': job['error']}
+
+    return {'job_id': job_id}
+
+
+def finish_job(job, status, error=None):
+    """
+    Set the final status of a job and update the status of its trigger
+
+    :param job: The job
+    :param status: 'Succeeded' or 'Failed'
+    :param error: The reason why the job failed (optional)
+    """
+    # avoid circular import
+    from helpers.triggerhelpers import get_trigger
+
+    job.update({'status': status,
+                'error': error,
+                'finished': int(time.time())})
+
+    if error is not None:
+        LOG.error('Activation %s of trigger %s failed: %s' % (job['job_id'], job['trigger_id'], error))
+    else:
+        LOG.info('Activation %s of trigger %s succeeded' % (job['job_id'], job['trigger_id']))
+
+    storage = get_storage()
+    with trigger_lock(job['trigger_id']):
+        with storage.transaction():
+            # With sharding, the job can only be saved by the process that still holds its claim
+            save_job(job)
+
+            if get_trigger_registry().exists(job['trigger_id']):
+                trigger = get_trigger(job['trigger_id'])
+                trigger.triggered = max(trigger.triggered, job['triggered'])
+                if trigger.status == ACTIVATING:
+                    trigger.status = status
+                trigger.save()
+
+
+class ActivationQueue(threading.Thread):
+    """
+    Runs the queued activation jobs with a pool of workers, so a slow action of one trigger doesn't hold up the others
+
+    The jobs are saved in the storage, when the queue starts all jobs that were not finished are resumed
+    """
+    def __init__(self, workers=4):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.heap = []
+        self.scheduled = set()
+        # The jobs that are being run by the workers
+        self.active = set()
+        # The job of each trigger that is waiting for a payment batch, the results of the batched actions and the
+        # jobs of those triggers that are run after the waiting job
+        self.waiting = {}
+        self.batch_results = {}
+        self.deferred = {}
+        self.changes_token = None
+        self.next_poll = 0
+        self.condition = threading.Condition()
+        self.running = False
+        self.stopped = False
+
+    def load(self):
+        """
+        Schedule all unfinished jobs and delete the finished jobs that are older than the retention period
+        """
+        shard_manager = get_shard_manager()
+        if shard_manager is not None:
+            shard_manager.add_listener(self.resume)
+            # Only the jobs that are saved after the jobs are resumed need to be polled
+            self.changes_token = get_storage().get_changes(JOBS)[0]
+
+        self.resume()
+
+        storage = get_storage()
+        now = int(time.time())
+
+        for status in ['Succeeded', 'Failed']:
+            for job_id in storage.find(JOBS, status=status):
+                if (get_job(job_id).get('finished') or now) < now - JOB_RETENTION:
+                    storage.delete(JOBS, job_id)
+
+        LOG.info('Activation queue loaded %s unfinished jobs' % len(self.heap))
+
+    def resume(self, shards=None):
+        """
+        Schedule the unfinished jobs of the triggers this process handles
+
+        :param shards: Only schedule the jobs of the triggers in these shards (optional)
+        """
+        storage = get_storage()
+        shard_manager = get_shard_manager()
+        now = int(time.time())
+        for status in UNFINISHED_STATUSES:
+            for job_id in storage.find(JOBS, status=status):
+                job = get_job(job_id)
+                if shards is not None and shard_manager.get_shard(job['trigger_id']) not in shards:
+                    continue
+
+                if owns_trigger(job['trigger_id']):
+                    self.schedule(job_id=job_id, run_time=job.get('next_attempt', now))
+
+    def poll(self):
+        """
+        Schedule the jobs that other spellbook processes queued for the triggers of this process since the last poll
+        """
+        self.changes_token, changed, deleted = get_storage().get_changes(JOBS, token=self.changes_token)
+        with self.condition:
+            active = set(self.active)
+
+        for job_id, job in changed.items():
+            if job.get('status') in ['Queued', 'Retrying'] and job_id not in active and owns_trigger(job['trigger_id']):
+                self.schedule(job_id=job_id, run_time=job['next_attempt'])
+
+    def schedule(self, job_id, run_time):
+        """
+        Run a job at the given time
+
+        :param job_id: The id of the job
+        :param run_time: A timestamp
+        """
+        with self.condition:
+            if job_id in self.scheduled:
+                return
+
+            self.scheduled.add(job_id)
+            heapq.heappush(self.heap, (run_time, job_id))
+            self.condition.notify()
+
+    def pop_due(self, now):
+        # This must be called while holding the condition
+        job_ids = []
+        while len(self.heap) > 0 and self.heap[0][0] <= now:
+            job_ids.append(heapq.heappop(self.heap)[1])
+            self.scheduled.discard(job_ids[-1])
+
+        return job_ids
+
+    def run(self):
+        self.load()
+        self.running = True
+
+        try:
+            while not self.stopped:
+                # With sharding, other spellbook processes can queue jobs for the triggers of this process
+                if get_shard_manager() is not None and time.time() >= self.next_poll:
+                    self.next_poll = time.time() + JOB_POLL_INTERVAL
+                    try:
+                        self.poll()
+                    except Exception as ex:
+                        LOG.error('Failed to poll the activation jobs: %s' % ex)
+
+                with self.condition:
+                    now = time.time()
+                    if len(self.heap) == 0 or self.heap[0][0] > now:
+                        timeout = None if len(self.heap) == 0 else self.heap[0][0] - now
+                        if get_shard_manager() is not None:
+                            poll_timeout = max(0, self.next_poll - now)
+                            timeout = poll_timeout if timeout is None else min(timeout, poll_timeout)
+
+                        self.condition.wait(timeout=timeout)
+                        continue
+
+                    job_ids = self.pop_due(now=now)
+                    self.active.update(job_ids)
+
+                for job_id in job_ids:
+                    self.pool.submit(self.run_job, job_id)
+        finally:
+            self.running = False
+
+    def add_to_batch(self, job, action):
+        """
+        Add the SendTransaction action of a job to a payment batch, the job is run again once the transaction of the
+        batch has been sent
+
+        :param job: The job
+        :param action: The SendTransactionAction object of the next action of the job
+        """
+        job_id, index = job['job_id'], job['next_action']
+
+        def batch_sent(success):
+            with self.condition:
+                self.batch_results[job_id] = (index, action, success)
+            self.schedule(job_id=job_id, run_time=0)
+
+        with self.condition:
+            self.waiting[job['trigger_id']] = job_id
+
+        get_payment_batcher().add(action=action, callback=batch_sent)
+
+    def pop_batch_result(self, job_id):
+        """
+        Get the result of the action of a job that was sent in a payment batch
+
+        :param job_id: The id of the job
+        :return: A tuple containing the position of the action in the job, the action and True if the transaction was
+                 sent, or None if the job is not waiting for a batch
+        """
+        with self.condition:
+            if job_id not in self.batch_results:
+                return
+
+            for trigger_id in [trigger_id for trigger_id, waiting_job_id in self.waiting.items() if waiting_job_id == job_id]:
+                del self.waiting[trigger_id]
+
+            return self.batch_results.pop(job_id)
+
+    def run_job(self, job_id):
+        trigger_id = None
+        try:
+            trigger_id = get_job(job_id).get('trigger_id')
+            with self.condition:
+                waiting_job_id = self.waiting.get(trigger_id)
+                if waiting_job_id is not None and job_id not in self.batch_results:
+                    # The activations of the same trigger are run one after the other, also while a job waits for a batch
+                    if waiting_job_id != job_id:
+                        self.deferred.setdefault(trigger_id, []).append(job_id)
+                    return
+
+            run_job(job_id=job_id, queue=self)
+        except Exception as ex:
+            job = get_job(job_id)
+            if job.get('status') in UNFINISHED_STATUSES:
+                try:
+                    finish_job(job=job, status='Failed', error='Unexpected error: %s' % ex)
+                except LeaseLost as lease_lost:
+                    LOG.warning('Stopped activation %s: %s' % (job_id, lease_lost))
+        finally:
+            with self.condition:
+                self.active.discard(job_id)
+                if trigger_id is not None and trigger_id not in self.waiting:
+                    for deferred_job_id in self.deferred.pop(trigger_id, []):
+                        self.schedule(job_id=deferred_job_id, run_time=0)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
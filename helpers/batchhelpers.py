@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+from helpers.configurationhelpers import get_batch_window, get_batch_max_size
+from helpers.lockhelpers import address_lock
+from helpers.loghelpers import LOG
+
+PAYMENT_BATCHER = None
+PAYMENT_BATCHER_LOCK = threading.Lock()
+
+
+def get_payment_batcher():
+    """
+    Get the process-wide payment batcher, the batcher is created the first time it is needed
+
+    :return: The PaymentBatcher object
+    """
+    global PAYMENT_BATCHER
+
+    with PAYMENT_BATCHER_LOCK:
+        if PAYMENT_BATCHER is None:
+            PAYMENT_BATCHER = PaymentBatcher(window=get_batch_window(), max_size=get_batch_max_size())
+
+    return PAYMENT_BATCHER
+
+
+class Batch(object):
+    def __init__(self, key, deadline):
+        self.key = key
+        self.deadline = deadline
+        self.actions = []
+        self.callbacks = []
+        self.results = None
+
+
+class PaymentBatcher(object):
+    """
+    Merges the SendTransaction actions that are added within a short window of each other into one transaction
+
+    Adding an action never waits for the transaction: the first action of a batch starts the window and a flusher thread
+    sends the transaction for all actions that joined the batch once the window has passed, or right away when the batch
+    is full. Then the callback of each action is called with its result. Only actions with the same batch key (same
+    sending address, change address, fee policy and coin selection) are merged.
+    """
+    def __init__(self, window, max_size=50):
+        self.window = window
+        self.max_size = max_size
+        self.condition = threading.Condition()
+        self.batches = {}
+        self.flusher = None
+
+    def add(self, action, callback):
+        """
+        Add a SendTransaction action to a batch
+
+        :param action: A SendTransactionAction object
+        :param callback: A function that is called with the result of the action once the transaction of the batch has
+                         been sent: True if the transaction was sent and contains the outputs of the action, False otherwise
+        """
+        key = action.get_batch_key()
+
+        with self.condition:
+            batch = self.batches.get(key)
+            if batch is None:
+                batch = Batch(key=key, deadline=time.time() + self.window)
+                self.batches[key] = batch
+
+            batch.actions.append(action)
+            batch.callbacks.append(callback)
+            if len(batch.actions) >= self.max_size:
+                # A full batch does not need to wait for the rest of the window
+                batch.deadline = 0
+
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self.flush)
+                self.flusher.daemon = True
+                self.flusher.start()
+
+            self.condition.notify()
+
+    def flush(self):
+        """
+        Send the transaction of each batch once its window has passed, this runs in the flusher thread
+        """
+        while True:
+            with self.condition:
+                now = time.time()
+                due = [batch for batch in self.batches.values() if batch.deadline <= now]
+                if len(due) == 0:
+                    deadlines = [batch.deadline for batch in self.batches.values()]
+                    self.condition.wait(timeout=min(deadlines) - now if len(deadlines) > 0 else None)
+                    continue
+
+                # No more actions can join a batch once it is being sent
+                for batch in due:
+                    del self.batches[batch.key]
+
+            # The batches of different addresses are sent at the same time, the flusher thread does not wait for them
+            for batch in due:
+                threading.Thread(target=self.send, args=(batch,)).start()
+
+    @staticmethod
+    def send(batch):
+        # avoid circular import
+        from action.sendtransactionaction import SendTransactionAction
+
+        start_time = time.time()
+        try:
+            # Only one transaction at a time can be sent from the same address, otherwise they would try to spend the same utxos
+            with address_lock(batch.actions[0].sending_address):
+                if len(batch.actions) == 1:
+                    batch.results = [batch.actions[0].send_transaction()]
+                else:
+                    batch.results = SendTransactionAction.send_batch(batch.actions)
+        except Exception as ex:
+            LOG.error('Batch of %s SendTransaction actions failed: %s' % (len(batch.actions), ex))
+            batch.results = [False] * len(batch.actions)
+        finally:
+            if batch.results is None:
+                batch.results = [False] * len(batch.actions)
+
+            LOG.info('Batch of %s SendTransaction actions done in %.2f seconds' % (len(batch.actions), time.time() - start_time))
+
+        for callback, result in zip(batch.callbacks, batch.results):
+            try:
+                callback(result)
+            except Exception as ex:
+                LOG.error('Unable to process the result of a batched SendTransaction action: %s' % ex)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+from helpers.txsizehelpers import estimate_size, input_size, output_size, op_return_output_size, get_input_type, get_script_type
+from helpers.txsizehelpers import TRANSACTION_BASE_SIZE, P2PKH, var_int_size
+
+ALL = 'All'  # Spend all utxos, this consolidates the utxos of the address each time a transaction is sent
+BRANCH_AND_BOUND = 'BranchAndBound'  # Search a set of utxos that needs no change output, fall back to Knapsack
+KNAPSACK = 'Knapsack'  # Randomly search a set of utxos that is as close as possible to the amount
+LARGEST_FIRST = 'LargestFirst'  # Spend the largest utxos until the amount is reached
+CONSOLIDATE = 'Consolidate'  # Spend all utxos while fees are low, otherwise the same as BranchAndBound
+
+COIN_SELECTION_STRATEGIES = [ALL, BRANCH_AND_BOUND, KNAPSACK, LARGEST_FIRST, CONSOLIDATE]
+
+# The fee rate in satoshis per vbyte at or below which the Consolidate strategy spends all utxos
+DEFAULT_CONSOLIDATION_FEE_RATE = 5
+
+BRANCH_AND_BOUND_MAX_TRIES = 100000
+KNAPSACK_ITERATIONS = 1000
+KNAPSACK_MAX_STEPS = 1000000  # Fewer iterations are done for large sets of utxos, so the search time stays bounded
+
+
+def select_coins(utxos, outputs, change_address, fee_rate, strategy=ALL, op_return_data=None, compressed=True,
+                 consolidation_fee_rate=DEFAULT_CONSOLIDATION_FEE_RATE, minimum_change=546, generator=None):
+    """
+    Select the utxos to spend in a transaction
+
+    Each utxo is valued at its effective value: its value minus the fee to spend it, so a selection always pays for its
+    own inputs. A change output is only added if the change is at least the minimum change, otherwise the remainder goes
+    to the transaction fee.
+
+    :param utxos: A list of dicts containing at least the 'address' and the 'value' of each utxo
+    :param outputs: A list of dicts containing the 'address' and the 'value' of each output, not including the change
+    :param change_address: The address that receives the change
+    :param fee_rate: The transaction fee in satoshis per vbyte
+    :param strategy: One of the COIN_SELECTION_STRATEGIES (default=All)
+    :param op_return_data: The message of the OP_RETURN output (optional)
+    :param compressed: True if the public keys of the inputs are compressed (default=True)
+    :param consolidation_fee_rate: The fee rate at or below which the Consolidate strategy spends all utxos
+    :param minimum_change: The minimum value of the change output (default=546)
+    :param generator: A random.Random object for the Knapsack strategy (optional)
+    :return: A dict containing the selected 'inputs', True or False for 'change' and the transaction 'fee',
+             or None if the utxos are not enough to pay for the outputs and the transaction fee
+    """
+    if strategy not in COIN_SELECTION_STRATEGIES:
+        raise NotImplementedError('Unknown coin selection strategy: %s' % strategy)
+
+    target = sum([output['value'] for output in outputs])
+    output_types = [get_script_type(output['address']) for output in outputs]
+    input_types = [get_input_type(utxo['address']) for utxo in utxos]
+    segwit = any([input_type != P2PKH for input_type in input_types])
+
+    # The fees are overestimated by at most a few bytes here, the exact fee of the selection is calculated at the end
+    input_fees = [input_fee(input_type=input_type, fee_rate=fee_rate, compressed=compressed, segwit=segwit) for input_type in input_types]
+    effective_values = [utxo['value'] - fee for utxo, fee in zip(utxos, input_fees)]
+
+    overhead_size = TRANSACTION_BASE_SIZE + var_int_size(len(utxos)) + var_int_size(len(outputs) + 2)
+    overhead_size += sum([output_size(output_type) for output_type in output_types]) + (1 if segwit else 0)
+    if op_return_data is not None:
+        overhead_size += op_return_output_size(op_return_data)
+
+    change_type = get_script_type(change_address)
+    change_output_fee = output_size(change_type) * fee_rate
+    # The change output is worth it if the change is more than adding it and spending it later costs
+    cost_of_change = change_output_fee + input_fee(input_type=get_input_type(change_address), fee_rate=fee_rate, compressed=compressed, segwit=segwit)
+
+    target_without_change = target + overhead_size * fee_rate
+    target_with_change = target_without_change + change_output_fee + minimum_change
+
+    if strategy == ALL:
+        selected = list(range(len(utxos)))
+    elif strategy == LARGEST_FIRST:
+        selected = select_largest_first(effective_values=effective_values, target_without_change=target_without_change, target_with_change=target_with_change)
+    elif strategy == CONSOLIDATE and fee_rate <= consolidation_fee_rate:
+        selected = [i for i, effective_value in enumerate(effective_values) if effective_value > 0]
+    elif strategy == KNAPSACK:
+        selected = select_knapsack(effective_values=effective_values, target_without_change=target_without_change, target_with_change=target_with_change, generator=generator)
+    else:
+        selected = branch_and_bound(effective_values=effective_values, target=target_without_change, cost_of_change=cost_of_change)
+        if selected is None:
+            selected = select_knapsack(effective_values=effective_values, target_without_change=target_without_change, target_with_change=target_with_change, generator=generator)
+
+    if selected is None:
+        return
+
+    return finish_selection(inputs=[utxos[i] for i in sorted(selected)],
+                            input_types=[input_types[i] for i in sorted(selected)],
+                            output_types=output_types,
+                            change_type=change_type,
+                            target=target,
+                            fee_rate=fee_rate,
+                            op_return_data=op_return_data,
+                            compressed=compressed,
+                            minimum_change=minimum_change)
+
+
+def input_fee(input_type, fee_rate, compressed=True, segwit=False):
+    """
+    Get the fee to spend an input, rounded up to whole vbytes
+
+    :param input_type: The script type of the input
+    :param fee_rate: The transaction fee in satoshis per vbyte
+    :param compressed: True if the public key is compressed (default=True)
+    :param segwit: True if the transaction has a witness, then P2PKH inputs need an empty witness (default=False)
+    :return: The fee in satoshis
+    """
+    non_witness_size, witness_size = input_size(input_type=input_type, compressed=compressed)
+    weight = non_witness_size * 4 + witness_size + (1 if segwit and input_type == P2PKH else 0)
+
+    return (weight + 3) // 4 * fee_rate
+
+
+def finish_selection(inputs, input_types, output_types, change_type, target, fee_rate, op_return_data, compressed, minimum_change):
+    total = sum([tx_input['value'] for tx_input in inputs])
+    fee_without_change = estimate_size(input_types=input_types, output_types=output_types, op_return_data=op_return_data, compressed=compressed)['vsize'] * fee_rate
+    if len(inputs) == 0 or total < target + fee_without_change:
+        return
+
+    fee_with_change = estimate_size(input_types=input_types, output_types=output_types + [change_type], op_return_data=op_return_data, compressed=compressed)['vsize'] * fee_rate
+    change = total - target - fee_with_change >= minimum_change
+
+    return {'inputs': inputs,
+            'change': change,
+            'fee': fee_with_change if change else total - target}
+
+
+def select_largest_first(effective_values, target_without_change, target_with_change):
+    """
+    Select the utxos with the largest effective values until there is enough for the outputs, the fee and the change
+
+    :param effective_values: The effective value of each utxo
+    :param target_without_change: The value needed for the outputs and the fee of a transaction without change
+    :param target_with_change: The value needed for the outputs, the fee and the minimum change of a transaction with change
+    :return: A list with the indexes of the selected utxos or None if the utxos are not enough
+    """
+    selected = []
+    total = 0
+    for i in sorted(range(len(effective_values)), key=lambda i: -effective_values[i]):
+        if effective_values[i] <= 0 or total >= target_with_change:
+            break
+
+        selected.append(i)
+        total += effective_values[i]
+
+    return selected if total >= target_without_change else None
+
+
+def branch_and_bound(effective_values, target, cost_of_change, max_tries=BRANCH_AND_BOUND_MAX_TRIES):
+    """
+    Search a set of utxos whose effective value is between the target and the target plus the cost of change, so the
+    transaction needs no change output, with a depth-first search over the utxos sorted by effective value
+
+    Of the sets that were found, the one that wastes the least (the value above the target) is returned
+
+    :param effective_values: The effective value of each utxo
+    :param target: The value needed for the outputs and the fee of a transaction without change
+    :param cost_of_change: The cost of adding a change output and spending it later
+    :param max_tries: The maximum number of steps of the search
+    :return: A list with the indexes of the selected utxos or None if no set was found
+    """
+    order = sorted([i for i in range(len(effective_values)) if effective_values[i] > 0], key=lambda i: -effective_values[i])
+    values = [effective_values[i] for i in order]
+
+    remaining = sum(values)  # the total value of the utxos that have not been decided on yet
+    if remaining < target:
+        return
+
+    selection = []  # for each decided utxo: True if it is included
+    current = 0
+    best, best_waste = None, None
+
+    for _ in range(max_tries):
+        if current + remaining < target or current > target + cost_of_change:
+            backtrack = True
+        elif current >= target:
+            if best_waste is None or current - target < best_waste:
+                best = [order[depth] for depth, included in enumerate(selection) if included]
+                best_waste = current - target
+                if best_waste == 0:
+                    break
+            backtrack = True
+        else:
+            backtrack = False
+
+        if backtrack:
+            # Undo the excluded utxos at the end, then exclude the last included utxo instead
+            while len(selection) > 0 and selection[-1] is False:
+                selection.pop()
+                remaining += values[len(selection)]
+
+            if len(selection) == 0:
+                break
+
+            selection[-1] = False
+            current -= values[len(selection) - 1]
+        else:
+            depth = len(selection)
+            remaining -= values[depth]
+            # Including a utxo with the same value as the previous excluded one would only repeat the same search
+            if depth > 0 and selection[-1] is False and values[depth] == values[depth - 1]:
+                selection.append(False)
+            else:
+                selection.append(True)
+                current += values[depth]
+
+    return best
+
+
+def select_knapsack(effective_values, target_without_change, target_with_change, generator=None, iterations=KNAPSACK_ITERATIONS):
+    """
+    Randomly search the set of utxos with the lowest effective value that is enough for a transaction without change
+    or with change
+
+    The utxos that are larger than the target with change are not part of the search, the smallest of them is used
+    instead if no smaller set is found
+
+    :param effective_values: The effective value of each utxo
+    :param target_without_change: The value needed for the outputs and the fee of a transaction without change
+    :param target_with_change: The value needed for the outputs, the fee and the minimum change of a transaction with change
+    :param generator: A random.Random object (optional)
+    :param iterations: The number of random sets to try
+    :return: A list with the indexes of the selected utxos or None if the utxos are not enough
+    """
+    generator = generator if generator is not None else random.Random()
+
+    smaller = sorted([i for i in range(len(effective_values)) if 0 < effective_values[i] < target_with_change], key=lambda i: -effective_values[i])
+    larger = [i for i in range(len(effective_values)) if effective_values[i] >= target_with_change]
+    lowest_larger = min(larger, key=lambda i: effective_values[i]) if len(larger) > 0 else None
+
+    for i in smaller:
+        if effective_values[i] == target_without_change:
+            return [i]
+
+    best = None
+    total_smaller = sum([effective_values[i] for i in smaller])
+    if total_smaller == target_without_change:
+        return smaller
+
+    if total_smaller >= target_with_change:
+        best = approximate_best_subset(values=[effective_values[i] for i in smaller], target=target_with_change, generator=generator, iterations=iterations)
+        best = [smaller[j] for j in best] if best is not None else None
+
+    if lowest_larger is not None and (best is None or effective_values[lowest_larger] <= sum([effective_values[i] for i in best])):
+        return [lowest_larger]
+
+    if best is None and total_smaller >= target_without_change:
+        # Not enough for a change output, spend everything
+        return smaller
+
+    return best
+
+
+def approximate_best_subset(values, target, generator, iterations):
+    """
+    Randomly include values until the target is reached and keep the set with the lowest total that reaches the target,
+    each iteration first includes each value with a chance of 50 percent, then includes the remaining values in order
+
+    :param values: The values, sorted from large to small
+    :param target: The target
+    :param generator: A random.Random object
+    :param iterations: The maximum number of iterations
+    :return: A list with the indexes of the best set or None if the values are not enough
+    """
+    best_included = [True] * len(values)
+    best_total = sum(values)
+    if best_total < target:
+        return
+
+    for _ in range(max(min(iterations, KNAPSACK_MAX_STEPS // len(values)), 1)):
+        if best_total == target:
+            break
+
+        included = [False] * len(values)
+        total = 0
+        reached = False
+        # Draw all random bits of the iteration at once, this is much faster than a random number per value
+        coin_flips = format(generator.getrandbits(len(values)), '0%db' % len(values)) if len(values) > 0 else ''
+        for random_pass in [True, False]:
+            if reached:
+                break
+
+            for i in range(len(values)):
+                if included[i] is True or (random_pass is True and coin_flips[i] == '0'):
+                    continue
+
+                total += values[i]
+                included[i] = True
+                if total >= target:
+                    reached = True
+                    if total < best_total:
+                        best_total = total
+                        best_included = included[:]
+
+                    # Try to reach the target with smaller values instead
+                    total -= values[i]
+                    included[i] = False
+
+    return [i for i in range(len(values)) if best_included[i]]
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import socket
 from configparser import ConfigParser
 from decorators import verify_config
 
@@ -60,6 +61,16 @@ def get_use_testnet():
     return True if spellbook_config().get('Wallet', 'use_testnet') in ['True', 'true'] else False
 
 
+def get_key_cache_lifetime():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Wallet', 'key_cache_lifetime', fallback=3600)
+
+
+def get_crypto_backend_name():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().get('Wallet', 'crypto_backend', fallback='auto')
+
+
 @verify_config('Transactions', 'max_tx_fee_percentage')
 def get_max_tx_fee_percentage():
     return float(spellbook_config().get('Transactions', 'max_tx_fee_percentage'))
@@ -128,3 +139,129 @@ def get_ipfs_gateway_port():
 @verify_config('APPS', 'app_data_dir')
 def get_app_data_dir():
     return spellbook_config().get('APPS', 'app_data_dir')
+
+
+def get_random_number_cache_confirmations():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('RandomNumbers', 'cache_confirmations', fallback=6)
+
+
+def get_trigger_registry_refresh_interval():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Triggers', 'registry_refresh_interval', fallback=5)
+
+
+def get_check_triggers_workers():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Triggers', 'check_workers', fallback=8)
+
+
+def get_condition_timeout():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Triggers', 'condition_timeout', fallback=60)
+
+
+def get_enable_event_listener():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getboolean('Triggers', 'enable_event_listener', fallback=False)
+
+
+def get_enable_scheduler():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getboolean('Triggers', 'enable_scheduler', fallback=False)
+
+
+def get_storage_backend():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().get('Storage', 'backend', fallback='sqlite')
+
+
+def get_storage_database_file():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().get('Storage', 'database_file', fallback='json/private/spellbook.db')
+
+
+def get_storage_fsync():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getboolean('Storage', 'fsync', fallback=False)
+
+
+def get_storage_write_behind():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getboolean('Storage', 'write_behind', fallback=False)
+
+
+def get_storage_write_behind_delay():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Storage', 'write_behind_delay', fallback=5)
+
+
+def get_preload_scripts():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getboolean('Triggers', 'preload_scripts', fallback=True)
+
+
+def get_enable_activation_queue():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getboolean('Activations', 'enable_queue', fallback=False)
+
+
+def get_activation_workers():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Activations', 'workers', fallback=4)
+
+
+def get_activation_max_attempts():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Activations', 'max_attempts', fallback=5)
+
+
+def get_activation_retry_delay():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Activations', 'retry_delay', fallback=60)
+
+
+def get_enable_sharding():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getboolean('Sharding', 'enable_sharding', fallback=False)
+
+
+def get_shards():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Sharding', 'shards', fallback=64)
+
+
+def get_shard_lease_duration():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Sharding', 'lease_duration', fallback=60)
+
+
+def get_shard_worker_id():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    worker_id = spellbook_config().get('Sharding', 'worker_id', fallback='')
+    return worker_id if worker_id != '' else '%s-%s' % (socket.gethostname(), os.getpid())
+
+
+def get_shard_synchronous_timeout():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Sharding', 'synchronous_timeout', fallback=30)
+
+
+def get_batch_window():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getfloat('Transactions', 'batch_window', fallback=0)
+
+
+def get_batch_max_size():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Transactions', 'batch_max_size', fallback=50)
+
+
+def get_parallel_signing_min_inputs():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Transactions', 'parallel_signing_min_inputs', fallback=0)
+
+
+def get_signing_processes():
+    # This option was added later, fall back to the default so existing configuration files keep working
+    return spellbook_config().getint('Transactions', 'signing_processes', fallback=0)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import hmac
+import threading
+
+try:
+    import coincurve
+    from coincurve.ecdsa import cdata_to_der, deserialize_compact
+except ImportError:
+    coincurve = None
+
+from bips.BIP32_test_vectors import bip32_test_vectors
+from helpers.jacobianhelpers import fast_multiply, from_jacobian, generator_multiply, jacobian_add, jacobian_multiply, to_jacobian, inv, N
+from helpers.loghelpers import LOG
+from helpers.publickeyhelpers import encode_pubkey
+from helpers.py3specials import encode, decode
+
+AUTO = 'auto'
+PYTHON = 'python'
+COINCURVE = 'coincurve'
+CRYPTO_BACKENDS = [AUTO, PYTHON, COINCURVE]
+
+CRYPTO_BACKEND = None
+CRYPTO_BACKEND_LOCK = threading.Lock()
+
+
+def get_crypto_backend():
+    """
+    Get the process-wide crypto backend, the backend is selected the first time it is needed
+
+    With the default configuration (crypto_backend=auto) the native coincurve backend is used if it is installed and it
+    passes the self-test, otherwise the pure python backend is used.
+
+    :return: A PythonBackend or CoincurveBackend object
+    """
+    global CRYPTO_BACKEND
+
+    with CRYPTO_BACKEND_LOCK:
+        if CRYPTO_BACKEND is None:
+            # avoid circular import
+            from helpers.configurationhelpers import get_crypto_backend_name
+            CRYPTO_BACKEND = select_crypto_backend(name=get_crypto_backend_name())
+
+    return CRYPTO_BACKEND
+
+
+def set_crypto_backend(name):
+    """
+    Use the crypto backend that was selected by another process, without running the self-test again
+
+    This is used by the worker processes that sign for the spellbook process, the backend already passed the self-test
+    in that process.
+
+    :param name: python or coincurve
+    :return: A PythonBackend or CoincurveBackend object
+    """
+    global CRYPTO_BACKEND
+
+    with CRYPTO_BACKEND_LOCK:
+        CRYPTO_BACKEND = CoincurveBackend() if name == COINCURVE and coincurve is not None else PythonBackend()
+
+    return CRYPTO_BACKEND
+
+
+def select_crypto_backend(name=AUTO):
+    """
+    Select a crypto backend, a native backend is only used if it passes the self-test
+
+    :param name: auto, python or coincurve
+    :return: A PythonBackend or CoincurveBackend object
+    """
+    if name not in CRYPTO_BACKENDS:
+        LOG.error('Unknown crypto backend %s, using the pure python backend' % name)
+        return PythonBackend()
+
+    if name in [AUTO, COINCURVE]:
+        if coincurve is not None:
+            backend = CoincurveBackend()
+            errors = self_test(backend=backend)
+            if len(errors) == 0:
+                LOG.info('Using the coincurve crypto backend')
+                return backend
+
+            LOG.error('The coincurve crypto backend failed the self-test, using the pure python backend: %s' % '; '.join(errors))
+        elif name == COINCURVE:
+            LOG.error('The coincurve crypto backend is not installed, using the pure python backend')
+
+    return PythonBackend()
+
+
+def self_test(backend):
+    """
+    Check a crypto backend against the BIP32 test vectors and against the pure python backend
+
+    Every xpriv and xpub of the BIP32 test vectors is derived with the public keys of the backend, then a hash is signed
+    with the private key of each xpriv and the signature is compared with the signature of the pure python backend.
+
+    :param backend: A crypto backend object
+    :return: A list of errors, empty if the backend passed the self-test
+    """
+    # avoid circular import
+    from bips.BIP32 import bip32_deserialize, bip32_master_key, bip32_serialize, parse_derivation_path, MAINNET_PUBLIC
+    from bips.BIP32 import HARDENED
+    from helpers.publickeyhelpers import bin_hash160
+
+    def pubkey(secret):
+        return backend.serialize_pubkey(backend.generator_multiply(secret), compressed=True)
+
+    errors = []
+    reference = PythonBackend()
+    for vector in bip32_test_vectors:
+        vbytes, depth, fingerprint, i, chaincode, key = bip32_deserialize(bip32_master_key(seed=bytes.fromhex(vector['seed'])))
+        secret = decode(key[:32], 256)
+
+        for index in parse_derivation_path(vector['derivation_path']):
+            data = b'\x00' + encode(secret, 256, 32) if index >= HARDENED else pubkey(secret)
+            I = hmac.new(chaincode, data + encode(index, 256, 4), hashlib.sha512).digest()
+
+            fingerprint = bin_hash160(pubkey(secret))[:4]
+            secret = (decode(I[:32], 256) + secret) % N
+            chaincode = I[32:]
+            depth += 1
+            i = index
+
+        xpriv = bip32_serialize((vbytes, depth, fingerprint, i, chaincode, encode(secret, 256, 32) + b'\x01'))
+        xpub = bip32_serialize((MAINNET_PUBLIC, depth, fingerprint, i, chaincode, pubkey(secret)))
+        if xpriv != vector['xpriv'] or xpub != vector['xpub']:
+            errors.append('BIP32 test vector %s %s derived incorrectly' % (vector['seed'], vector['derivation_path']))
+            continue
+
+        msghash = hashlib.sha256(xpub.encode()).digest()
+        signature = backend.sign(msghash, secret)
+        if signature != reference.sign(msghash, secret):
+            errors.append('Signature with the key of %s does not match the pure python signature' % vector['derivation_path'])
+        elif not backend.verify(msghash, signature[1], signature[2], backend.generator_multiply(secret)):
+            errors.append('Signature with the key of %s is not valid' % vector['derivation_path'])
+
+    return errors
+
+
+def rfc6979_nonce(msghash, secret):
+    """
+    Generate the deterministic nonce k of a signature (RFC6979 with HMAC-SHA256)
+
+    :param msghash: The hash to sign as 32 bytes
+    :param secret: The private key as an integer
+    :return: The nonce as an integer
+    """
+    v = b'\x01' * 32
+    k = b'\x00' * 32
+    priv = encode(secret, 256, 32)
+    k = hmac.new(k, v + b'\x00' + priv + msghash, hashlib.sha256).digest()
+    v = hmac.new(k, v, hashlib.sha256).digest()
+    k = hmac.new(k, v + b'\x01' + priv + msghash, hashlib.sha256).digest()
+    v = hmac.new(k, v, hashlib.sha256).digest()
+
+    return decode(hmac.new(k, v, hashlib.sha256).digest(), 256)
+
+
+class PythonBackend(object):
+    """
+    The pure python implementation of the elliptic curve operations on secp256k1
+
+    Points are tuples of affine coordinates, (0, 0) is the point at infinity. Private keys and hashes are passed as
+    integers and 32 bytes, the conversion from the various key formats is done by the callers.
+    """
+    name = PYTHON
+
+    @staticmethod
+    def generator_multiply(n):
+        return from_jacobian(generator_multiply(n))
+
+    @staticmethod
+    def point_multiply(point, n):
+        return fast_multiply(point, n)
+
+    @staticmethod
+    def sign(msghash, secret):
+        """
+        Sign a hash with a deterministic nonce, the signature always has a low s value
+
+        :param msghash: The hash to sign as 32 bytes
+        :param secret: The private key as an integer
+        :return: A tuple containing v (27 + the recovery id), r and s
+        """
+        z = decode(msghash, 256)
+        k = rfc6979_nonce(msghash, secret)
+
+        r, y = from_jacobian(generator_multiply(k))
+        s = inv(k, N) * (z + r * secret) % N
+
+        return 27 + ((y % 2) ^ (0 if s * 2 < N else 1)), r, s if s * 2 < N else N - s
+
+    @staticmethod
+    def verify(msghash, r, s, point):
+        """
+        Verify a signature
+
+        :param msghash: The signed hash as 32 bytes
+        :param r: The r value of the signature
+        :param s: The s value of the signature
+        :param point: The public key as a point
+        :return: True if the signature is valid, False otherwise
+        """
+        if not (0 < r < N and 0 < s < N):
+            return False
+
+        w = inv(s, N)
+        x, y = from_jacobian(jacobian_add(generator_multiply(decode(msghash, 256) * w), jacobian_multiply(to_jacobian(point), r * w)))
+
+        return r == x % N
+
+    @staticmethod
+    def serialize_pubkey(point, compressed=True):
+        return encode_pubkey(point, 'bin_compressed' if compressed else 'bin')
+
+
+class CoincurveBackend(object):
+    """
+    The elliptic curve operations on secp256k1 with the native libsecp256k1 library through coincurve
+
+    Same interface as the PythonBackend, the results are identical.
+    """
+    name = COINCURVE
+
+    @staticmethod
+    def generator_multiply(n):
+        n %= N
+        if n == 0:
+            return 0, 0
+
+        return coincurve.PrivateKey(encode(n, 256, 32)).public_key.point()
+
+    @staticmethod
+    def point_multiply(point, n):
+        n %= N
+        if n == 0 or point[1] == 0:
+            return 0, 0
+
+        return coincurve.PublicKey.from_point(*point).multiply(encode(n, 256, 32)).point()
+
+    @staticmethod
+    def sign(msghash, secret):
+        signature = coincurve.PrivateKey(encode(secret, 256, 32)).sign_recoverable(msghash, hasher=None)
+
+        return 27 + signature[64], decode(signature[:32], 256), decode(signature[32:64], 256)
+
+    @staticmethod
+    def verify(msghash, r, s, point):
+        if not (0 < r < N and 0 < s < N):
+            return False
+
+        # libsecp256k1 only accepts signatures with a low s value, (r, s) and (r, N-s) are both valid signatures
+        s = s if s * 2 < N else N - s
+        signature = cdata_to_der(deserialize_compact(encode(r, 256, 32) + encode(s, 256, 32)))
+
+        try:
+            return coincurve.PublicKey.from_point(*point).verify(signature, msghash, hasher=None)
+        except ValueError:
+            # The point is not a valid public key
+            return False
+
+    @staticmethod
+    def serialize_pubkey(point, compressed=True):
+        return coincurve.PublicKey.from_point(*point).format(compressed=compressed)
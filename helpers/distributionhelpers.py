@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import operator
+
+from helpers.loghelpers import LOG
+
+
+def distribute(amount, distribution, minimum_output_value=0):
+    """
+    Divide an amount of satoshis over the recipients in a distribution, proportional to their shares
+
+    The distribution is sorted only once, then the recipients with the lowest shares are excluded one by one as long as
+    their part would be less than the minimum output value, keeping a running total of the remaining shares.
+    The amount is divided with the largest remainder method using integer arithmetic only: each recipient gets the
+    rounded down value of its part, then the satoshis that are left over go one by one to the recipients with the
+    largest remainders, so the total of the values is always exactly the given amount
+
+    :param amount: The total amount to distribute in satoshis (integer)
+    :param distribution: A dict containing the address as key and the share as value (integer)
+    :param minimum_output_value: The minimum value for each recipient, recipients below this value are excluded
+    :return: A list of (address, value) tuples, sorted from the lowest share to the highest share
+    """
+    # Sort the distribution from lowest share to highest share, recipients with an equal share keep their reversed original order
+    recipients = sorted(reversed(list(distribution.items())), key=operator.itemgetter(1))
+
+    total_shares = sum([share for address, share in recipients])
+
+    # Exclude the recipients with the lowest shares until the lowest receiving value is at least the minimum output value
+    # Once a recipient is above the minimum, all recipients with a higher share are as well
+    first = 0
+    while first < len(recipients) and total_shares > 0:
+        address, share = recipients[first]
+        receiving_value = share * amount // total_shares
+        if receiving_value >= minimum_output_value:
+            break
+
+        LOG.info('Excluding %s from distribution because output value is less than minimum output value: %s < %s' % (address, receiving_value, minimum_output_value))
+        total_shares -= share
+        first += 1
+
+    recipients = recipients[first:]
+    if total_shares <= 0 or len(recipients) == 0:
+        return []
+
+    values = []
+    remainders = []
+    for i, (address, share) in enumerate(recipients):
+        receiving_value, remainder = divmod(share * amount, total_shares)
+        values.append(receiving_value)
+        remainders.append((remainder, share, i))
+
+    # Give the remaining satoshis to the recipients with the largest remainders (the larger share wins a tie)
+    remaining_amount = amount - sum(values)
+    for remainder, share, i in sorted(remainders, reverse=True)[:remaining_amount]:
+        values[i] += 1
+
+    outputs = [(address, value) for (address, share), value in zip(recipients, values)]
+    for address, value in outputs:
+        LOG.info('receiving output: %s -> %s' % (value, address))
+
+    return outputs
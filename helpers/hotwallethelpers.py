@@ -3,15 +3,20 @@
 
 import os
 import getpass
+import threading
 import simplejson
 
 from AESCipher import AESCipher
-from bips.BIP44 import get_address_from_xpub, get_addresses_from_xpub, get_xpriv_key, get_xpub_key, get_private_key
-from helpers.configurationhelpers import get_wallet_dir, get_default_wallet
+from bips.BIP32 import bip32_privtopub
+from bips.BIP44 import get_address_from_xpub, get_addresses_from_xpub, get_xpriv_key_from_seed, get_private_key
+from helpers.configurationhelpers import get_wallet_dir, get_default_wallet, get_key_cache_lifetime
 from bips.BIP39 import get_seed
 
 HOT_WALLET_PASSWORD = None
 
+KEY_CACHE = None
+KEY_CACHE_LOCK = threading.Lock()
+
 
 def get_hot_wallet():
     global HOT_WALLET_PASSWORD
@@ -50,27 +55,11 @@ def get_address_from_wallet(account, index):
 
 
 def get_xpub_key_from_wallet(account):
-    hot_wallet = get_hot_wallet()
-    xpub_key = get_xpub_key(mnemonic=' '.join(hot_wallet['mnemonic']),
-                            passphrase=hot_wallet['passphrase'],
-                            account=account)
-
-    # Explicitly delete the local variable hot wallet from memory as soon as possible for security reasons
-    del hot_wallet
-
-    return xpub_key
+    return get_key_cache().get_xpub_key(account=account)
 
 
 def get_xpriv_key_from_wallet(account):
-    hot_wallet = get_hot_wallet()
-    xpriv_key = get_xpriv_key(mnemonic=' '.join(hot_wallet['mnemonic']),
-                              passphrase=hot_wallet['passphrase'],
-                              account=account)
-
-    # Explicitly delete the local variable hot wallet from memory as soon as possible for security reasons
-    del hot_wallet
-
-    return xpriv_key
+    return get_key_cache().get_xpriv_key(account=account)
 
 
 def get_private_key_from_wallet(account, index):
@@ -86,12 +75,8 @@ def get_single_address_private_key(address):
 
 
 def find_address_in_wallet(address, accounts=1, indexes=20):
-    hot_wallet = get_hot_wallet()
-
     for account in range(accounts):
-        xpub_key = get_xpub_key(mnemonic=' '.join(hot_wallet['mnemonic']),
-                                passphrase=hot_wallet['passphrase'],
-                                account=account)
+        xpub_key = get_xpub_key_from_wallet(account=account)
 
         addresses = get_addresses_from_xpub(xpub=xpub_key, i=indexes)
 
@@ -108,16 +93,140 @@ def find_single_address_in_wallet(address):
 
 
 def hot_wallet_seed():
-    hot_wallet = get_hot_wallet()
-    return get_seed(mnemonic=' '.join(hot_wallet['mnemonic']), passphrase=hot_wallet['passphrase'])
+    return get_key_cache().get_seed()
 
 
 def find_account_by_xpub(xpub, n=20):
-    hot_wallet = get_hot_wallet()
-
     for i in range(n):
-        account_xpub = get_xpub_key(mnemonic=' '.join(hot_wallet['mnemonic']),
-                                    passphrase=hot_wallet['passphrase'],
-                                    account=i)
+        account_xpub = get_xpub_key_from_wallet(account=i)
         if xpub == account_xpub:
             return i
+
+
+def get_key_cache():
+    """
+    Get the process-wide key cache of the hot wallet, the cache is created the first time it is needed
+
+    :return: The KeyCache object
+    """
+    global KEY_CACHE
+
+    with KEY_CACHE_LOCK:
+        if KEY_CACHE is None:
+            KEY_CACHE = KeyCache(lifetime=get_key_cache_lifetime())
+
+    return KEY_CACHE
+
+
+def clear_key_cache():
+    """
+    Wipe all keys of the hot wallet from memory, the next lookup decrypts the hot wallet again
+    """
+    get_key_cache().clear()
+
+
+class KeyCache(object):
+    """
+    Keeps the seed and the account-level xpriv and xpub keys of the hot wallet in memory
+
+    Deriving the seed from the mnemonic takes 2048 rounds of PBKDF2, with the cache this only happens when the hot wallet
+    is unlocked. The keys are kept in bytearrays so they can be wiped: all keys are wiped together when the lifetime has
+    passed since the hot wallet was unlocked or when clear is called, the next lookup unlocks the hot wallet again.
+    With a lifetime of 0 the keys are wiped after every lookup.
+
+    The keys that are returned by the lookups are immutable copies that can not be wiped, callers should drop them as
+    soon as possible.
+    """
+    def __init__(self, lifetime):
+        self.lifetime = lifetime
+        self.lock = threading.Lock()
+        self.seed = None
+        self.accounts = {}
+        self.timer = None
+
+    def get_seed(self):
+        """
+        Get the BIP39 seed of the hot wallet
+
+        :return: The seed in binary format
+        """
+        with self.lock:
+            try:
+                return bytes(self.unlock())
+            finally:
+                self.expire()
+
+    def get_xpriv_key(self, account):
+        """
+        Get the xpriv key of an account of the hot wallet
+
+        :param account: The index of the account
+        :return: The xpriv key of the account (m/44'/coin_type'/account')
+        """
+        with self.lock:
+            try:
+                return self.account_keys(account=account)[0].decode()
+            finally:
+                self.expire()
+
+    def get_xpub_key(self, account):
+        """
+        Get the xpub key of an account of the hot wallet
+
+        :param account: The index of the account
+        :return: The xpub key of the account (m/44'/coin_type'/account')
+        """
+        with self.lock:
+            try:
+                return self.account_keys(account=account)[1].decode()
+            finally:
+                self.expire()
+
+    def clear(self):
+        with self.lock:
+            self.wipe()
+
+    def unlock(self):
+        # This must be called while holding the lock
+        if self.seed is None:
+            hot_wallet = get_hot_wallet()
+            self.seed = bytearray(get_seed(mnemonic=' '.join(hot_wallet['mnemonic']), passphrase=hot_wallet['passphrase']))
+
+            # Explicitly delete the local variable hot wallet from memory as soon as possible for security reasons
+            del hot_wallet
+
+            if self.lifetime > 0:
+                self.timer = threading.Timer(self.lifetime, self.clear)
+                self.timer.daemon = True
+                self.timer.start()
+
+        return self.seed
+
+    def account_keys(self, account):
+        # This must be called while holding the lock
+        if account not in self.accounts:
+            xpriv_key = get_xpriv_key_from_seed(seed=bytes(self.unlock()), account=account)
+            self.accounts[account] = (bytearray(xpriv_key.encode()), bytearray(bip32_privtopub(xpriv_key).encode()))
+
+        return self.accounts[account]
+
+    def expire(self):
+        # This must be called while holding the lock
+        if self.lifetime <= 0:
+            self.wipe()
+
+    def wipe(self):
+        # This must be called while holding the lock
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        keys = [self.seed] if self.seed is not None else []
+        for xpriv_key, xpub_key in self.accounts.values():
+            keys.extend([xpriv_key, xpub_key])
+
+        for key in keys:
+            key[:] = bytearray(len(key))
+
+        self.seed = None
+        self.accounts = {}
@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import threading
+
 # Elliptic curve parameters (secp256k1)
 
 P = 2**256 - 2**32 - 977
@@ -11,12 +13,23 @@ Gx = 550662630222773436695787188951685343262506034537775941755001873603891167292
 Gy = 32670510020758816978083085130507043184471273380659243275938904335757337482424
 G = (Gx, Gy)
 
+# Width of the signed windows of the precomputed multiples of G, each window has a table of 2**(w-1) points
+GENERATOR_WINDOW = 6
+# Width of the non-adjacent form used to multiply any other point
+WNAF_WIDTH = 5
+
+GENERATOR_TABLE = None
+GENERATOR_TABLE_LOCK = threading.Lock()
+
 
 def fast_add(a, b):
     return from_jacobian(jacobian_add(to_jacobian(a), to_jacobian(b)))
 
 
 def fast_multiply(a, n):
+    if a == G:
+        return from_jacobian(generator_multiply(n))
+
     return from_jacobian(jacobian_multiply(to_jacobian(a), n))
 
 
@@ -25,6 +38,17 @@ def from_jacobian(p):
     return (p[0] * z ** 2) % P, (p[1] * z ** 3) % P
 
 
+def batch_from_jacobian(points):
+    """
+    Convert a list of points from jacobian to affine coordinates with a single inversion
+
+    :param points: A list of points in jacobian coordinates
+    :return: A list of points in affine coordinates
+    """
+    z_inverses = batch_inv([p[2] for p in points], P)
+    return [((p[0] * z * z) % P, (p[1] * z * z * z) % P) for p, z in zip(points, z_inverses)]
+
+
 def to_jacobian(p):
     o = (p[0], p[1], 1)
     return o
@@ -55,16 +79,149 @@ def jacobian_add(p, q):
 
 
 def jacobian_multiply(a, n):
+    """
+    Multiply a point in jacobian coordinates with an integer using the width-w non-adjacent form of the integer
+
+    :param a: A point in jacobian coordinates
+    :param n: An integer
+    :return: The point n*a in jacobian coordinates
+    """
+    n %= N
     if a[1] == 0 or n == 0:
         return 0, 0, 1
-    if n == 1:
-        return a
-    if n < 0 or n >= N:
-        return jacobian_multiply(a, n % N)
-    if (n % 2) == 0:
-        return jacobian_double(jacobian_multiply(a, n//2))
-    if (n % 2) == 1:
-        return jacobian_add(jacobian_double(jacobian_multiply(a, n//2)), a)
+
+    # The odd multiples a, 3a, 5a, ... that can be added or subtracted for a digit of the non-adjacent form, in affine
+    # coordinates so they can be added with fewer multiplications
+    double = jacobian_double(a)
+    multiples = [a]
+    for _ in range(2 ** (WNAF_WIDTH - 2) - 1):
+        multiples.append(jacobian_add(multiples[-1], double))
+    multiples = batch_from_jacobian(multiples)
+
+    result = 0, 0, 1
+    for digit in reversed(wnaf(n, WNAF_WIDTH)):
+        result = jacobian_double(result)
+        if digit > 0:
+            result = jacobian_add_affine(result, multiples[digit // 2])
+        elif digit < 0:
+            x, y = multiples[-digit // 2]
+            result = jacobian_add_affine(result, (x, P - y))
+
+    return result
+
+
+def wnaf(n, width):
+    """
+    Get the width-w non-adjacent form of a positive integer: odd digits smaller than 2**(w-1) in absolute value with at
+    least w-1 zeros after each non-zero digit
+
+    :param n: A positive integer
+    :param width: The width w
+    :return: A list containing the digits, least significant digit first
+    """
+    digits = []
+    while n > 0:
+        if n & 1:
+            digit = n & (2 ** width - 1)
+            if digit >= 2 ** (width - 1):
+                digit -= 2 ** width
+            n -= digit
+        else:
+            digit = 0
+        digits.append(digit)
+        n >>= 1
+
+    return digits
+
+
+def generator_table():
+    """
+    Get the precomputed multiples of G, the table is built the first time it is needed
+
+    Row i contains the points j * 2**(w*i) * G for j = 1 .. 2**(w-1) in affine coordinates, so any multiple of G is the
+    sum of one point (or its negation) per row, without any doublings.
+
+    :return: A list of lists of points in affine coordinates
+    """
+    global GENERATOR_TABLE
+
+    with GENERATOR_TABLE_LOCK:
+        if GENERATOR_TABLE is None:
+            table = []
+            base = to_jacobian(G)
+            # Signed digits can carry into one extra window
+            for _ in range(-(-256 // GENERATOR_WINDOW) + 1):
+                row = [base]
+                for _ in range(2 ** (GENERATOR_WINDOW - 1) - 1):
+                    row.append(jacobian_add(row[-1], base))
+                table.append(row)
+                base = jacobian_add(row[-1], row[-1])
+
+            # Convert all points to affine coordinates with a single inversion
+            points = batch_from_jacobian([point for row in table for point in row])
+            GENERATOR_TABLE = [points[i:i + 2 ** (GENERATOR_WINDOW - 1)] for i in range(0, len(points), 2 ** (GENERATOR_WINDOW - 1))]
+
+    return GENERATOR_TABLE
+
+
+def generator_multiply(n):
+    """
+    Multiply G with an integer using the precomputed multiples of G
+
+    :param n: An integer
+    :return: The point n*G in jacobian coordinates
+    """
+    n %= N
+    table = generator_table()
+
+    result = 0, 0, 1
+    row = 0
+    while n > 0:
+        digit = n & (2 ** GENERATOR_WINDOW - 1)
+        n >>= GENERATOR_WINDOW
+        if digit > 2 ** (GENERATOR_WINDOW - 1):
+            digit -= 2 ** GENERATOR_WINDOW
+            n += 1
+
+        if digit > 0:
+            result = jacobian_add_affine(result, table[row][digit - 1])
+        elif digit < 0:
+            x, y = table[row][-digit - 1]
+            result = jacobian_add_affine(result, (x, P - y))
+        row += 1
+
+    return result
+
+
+def jacobian_add_affine(p, q):
+    """
+    Add a point in affine coordinates to a point in jacobian coordinates, this saves the multiplications with the z
+    coordinate of the second point
+
+    :param p: A point in jacobian coordinates
+    :param q: A point in affine coordinates
+    :return: The sum in jacobian coordinates
+    """
+    if not p[1]:
+        return q[0], q[1], 1
+    z2 = (p[2] * p[2]) % P
+    u1 = p[0]
+    u2 = (q[0] * z2) % P
+    s1 = p[1]
+    s2 = (q[1] * z2 * p[2]) % P
+    if u1 == u2:
+        if s1 != s2:
+            return 0, 0, 1
+        return jacobian_double(p)
+    h = u2 - u1
+    r = s2 - s1
+    h2 = (h * h) % P
+    h3 = (h * h2) % P
+    u1_h2 = (u1 * h2) % P
+    nx = (r ** 2 - h3 - 2 * u1_h2) % P
+    ny = (r * (u1_h2 - nx) - s1 * h3) % P
+    nz = (h * p[2]) % P
+    return nx, ny, nz
 
 
 def jacobian_double(p):
@@ -89,3 +246,29 @@ def inv(a, n):
         nm, new = hm-lm*r, high-low*r
         lm, low, hm, high = nm, new, lm, low
     return lm % n
+
+
+def batch_inv(values, n):
+    """
+    Invert a list of integers modulo n with a single inversion (Montgomery's trick): the inverse of the product of all
+    values is multiplied with the products of the other values, this takes 3 multiplications per value
+
+    :param values: A list of integers
+    :param n: The modulus
+    :return: A list containing the inverse of each value (0 for a value of 0, like inv)
+    """
+    products = []
+    product = 1
+    for value in values:
+        if value % n:
+            product = (product * value) % n
+        products.append(product)
+
+    inverse = inv(product, n)
+    inverses = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        if values[i] % n:
+            inverses[i] = (inverse * (products[i - 1] if i > 0 else 1)) % n
+            inverse = (inverse * values[i]) % n
+
+    return inverses
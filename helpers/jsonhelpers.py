@@ -2,27 +2,68 @@
 # -*- coding: utf-8 -*-
 
 import os
+import platform
+import stat
+import threading
+
 import simplejson
 
 from helpers.loghelpers import LOG
 
 
-def save_to_json_file(filename, data):
+def save_to_json_file(filename, data, fsync=False):
     """
     Save data to a json file
+
+    The data is first written to a temporary file in the same directory, which then replaces the json file,
+    so a crash while writing can never leave a truncated json file behind. The temporary file gets the permissions of
+    the existing json file before any data is written to it, so a file that is only readable by its owner stays that way
+
     :param filename: The filename of the json file
     :param data: A dict containing the data to save (must be json-encodable)
+    :param fsync: Make sure the data is on disk before returning, so it also survives a power failure (optional)
     """
 
     # Make sure the destination directory exists
     if not os.path.isdir(os.path.dirname(filename)):
         os.makedirs(os.path.dirname(filename))
 
+    # The name of the temporary file is unique per process and thread and does not end with .json
+    temp_filename = '%s.%s-%s.tmp' % (filename, os.getpid(), threading.get_ident())
     try:
-        with open(filename, 'w') as output_file:
+        with open(temp_filename, 'w') as output_file:
+            if os.path.isfile(filename):
+                os.chmod(temp_filename, stat.S_IMODE(os.stat(filename).st_mode))
+
             simplejson.dump(data, output_file, indent=4, sort_keys=True)
+            if fsync is True:
+                output_file.flush()
+                os.fsync(output_file.fileno())
+
+        os.replace(temp_filename, filename)
+
+        if fsync is True:
+            fsync_directory(os.path.dirname(filename))
     except Exception as ex:
         LOG.error('Failed to save data to json file %s: %s' % (filename, ex))
+        if os.path.isfile(temp_filename):
+            os.remove(temp_filename)
+
+
+def fsync_directory(directory):
+    """
+    Make sure the renaming of a file in a directory is on disk, this is not possible on windows
+
+    :param directory: The directory
+    """
+    if platform.system() == 'Windows':
+        return
+
+    directory_fd = os.open(directory if directory != '' else '.', os.O_RDONLY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
 
 
 def load_from_json_file(filename):
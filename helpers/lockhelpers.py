@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+
+LOCKS = {}
+LOCKS_LOCK = threading.Lock()
+
+
+def get_lock(name):
+    """
+    Get a named lock, the same lock object is returned each time the same name is given
+
+    :param name: The name of the lock
+    :return: A threading.RLock object
+    """
+    with LOCKS_LOCK:
+        if name not in LOCKS:
+            LOCKS[name] = threading.RLock()
+
+        return LOCKS[name]
+
+
+def trigger_lock(trigger_id):
+    """
+    Get the lock that serializes the activations of a trigger
+
+    :param trigger_id: The id of the trigger
+    :return: A threading.RLock object
+    """
+    return get_lock('trigger:%s' % trigger_id)
+
+
+def activation_lock(trigger_id):
+    """
+    Get the lock that serializes the queued activation jobs of a trigger
+
+    :param trigger_id: The id of the trigger
+    :return: A threading.RLock object
+    """
+    return get_lock('activation:%s' % trigger_id)
+
+
+def address_lock(address):
+    """
+    Get the lock that serializes the transactions sent from an address, so two transactions never try to spend the same utxos
+
+    :param address: The sending address
+    :return: A threading.RLock object
+    """
+    return get_lock('address:%s' % address)
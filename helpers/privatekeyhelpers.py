@@ -3,7 +3,8 @@
 import re
 from .py3specials import *
 
-from .jacobianhelpers import fast_multiply, N, G
+from .cryptobackendhelpers import get_crypto_backend
+from .jacobianhelpers import N
 from .publickeyhelpers import encode_pubkey, pubkey_to_address
 
 # Regular expressions for private key formats
@@ -116,9 +117,9 @@ def privkey_to_pubkey(privkey):
     if privkey >= N:
         raise Exception("Invalid privkey")
     if f in ['bin', 'bin_compressed', 'hex', 'hex_compressed', 'decimal']:
-        return encode_pubkey(fast_multiply(G, privkey), f)
+        return encode_pubkey(get_crypto_backend().generator_multiply(privkey), f)
     else:
-        return encode_pubkey(fast_multiply(G, privkey), f.replace('wif', 'hex'))
+        return encode_pubkey(get_crypto_backend().generator_multiply(privkey), f.replace('wif', 'hex'))
 
 
 def add_privkeys(p1, p2):
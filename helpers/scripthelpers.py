@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import importlib
+import os
+import platform
+import threading
+import time
+
+from helpers.loghelpers import LOG
+
+# The directories in which spellbook scripts are searched, in this order
+SCRIPT_ROOT_DIRS = ['spellbookscripts', 'apps']
+
+# script -> dict with the path, module, class, modification time and load metrics of the script
+SCRIPTS = {}
+SCRIPTS_LOCK = threading.RLock()
+
+
+def find_script(script):
+    """
+    Search for a script in the allowed root directories
+
+    :param script: The filename of the script relative to the root directory, for example 'Echo.py'
+    :return: A tuple of (the path of the script, the name of the module) or (None, None) if the script is not found
+    """
+    script_name = script[:-3]  # script name without the .py extension
+    script_path = None
+    script_module_name = None
+
+    for root_dir in SCRIPT_ROOT_DIRS:
+        if os.path.isfile(os.path.join(root_dir, script)):
+            script_path = os.path.join(root_dir, script)
+            if platform.system() == 'Windows':
+                script_module_name = '%s.%s' % (root_dir, script_name.replace('\\', '.'))
+            elif platform.system() == 'Linux':
+                script_module_name = '%s.%s' % (root_dir, script_name.replace('/', '.'))
+            else:
+                raise NotImplementedError('Unsupported platform: only windows and linux are supported')
+
+    return script_path, script_module_name
+
+
+def get_script_class(script):
+    """
+    Get the class of a spellbook script
+
+    The script is only searched and imported the first time it is needed, after that the module is only reloaded when the
+    modification time of the script file has changed
+
+    :param script: The filename of the script relative to the root directory, for example 'Echo.py'
+    :return: The class of the script or None if the script can not be loaded
+    """
+    if not isinstance(script, str) or not script.endswith('.py'):
+        LOG.error('Script %s is invalid: does not end with .py extension' % script)
+        return
+
+    with SCRIPTS_LOCK:
+        entry = SCRIPTS.get(script)
+        try:
+            mtime = os.stat(entry['path']).st_mtime_ns if entry is not None else None
+        except OSError:
+            # The script was moved or deleted, search it again
+            entry, mtime = None, None
+
+        if entry is not None and entry['mtime'] == mtime:
+            entry['hits'] += 1
+            return entry['class']
+
+        script_path, script_module_name = find_script(script)
+        if script_path is None:
+            LOG.error('Can not find spellbook script %s' % script)
+            SCRIPTS.pop(script, None)
+            return
+
+        start_time = time.time()
+        try:
+            mtime = os.stat(script_path).st_mtime_ns
+            if entry is not None and entry['module_name'] == script_module_name:
+                LOG.info('Reloading Spellbook Script %s' % script_path)
+                script_module = importlib.reload(entry['module'])
+            else:
+                LOG.info('Loading Spellbook Script %s' % script_path)
+                script_module = importlib.import_module(script_module_name)
+
+            script_class_name = os.path.basename(script_path)[:-3]
+            spellbook_script = getattr(script_module, script_class_name)
+        except Exception as ex:
+            LOG.error('Failed to load Spellbook Script %s: %s' % (script_path, ex))
+            return
+
+        load_time = time.time() - start_time
+        LOG.info('Loaded Spellbook Script %s in %.3f seconds' % (script_path, load_time))
+
+        if entry is None:
+            entry = {'loads': 0, 'hits': 0, 'total_load_time': 0.0}
+            SCRIPTS[script] = entry
+
+        entry.update({'path': script_path,
+                      'module_name': script_module_name,
+                      'module': script_module,
+                      'class': spellbook_script,
+                      'mtime': mtime,
+                      'last_load_time': load_time})
+        entry['loads'] += 1
+        entry['total_load_time'] += load_time
+
+        return spellbook_script
+
+
+def preload_scripts(scripts):
+    """
+    Load the given scripts in advance, so the first activation of a trigger doesn't have to wait for its script
+
+    :param scripts: A list of script filenames
+    :return: The number of scripts that were loaded
+    """
+    return len([script for script in sorted(set(scripts)) if get_script_class(script) is not None])
+
+
+def get_script_metrics():
+    """
+    Get the load metrics of all scripts that have been loaded
+
+    :return: A dict with for each script: the path, the number of times the module was (re)loaded, the number of times
+             the cached module was used, the time it took to load the module the last time and in total
+    """
+    with SCRIPTS_LOCK:
+        return {script: {'path': entry['path'],
+                         'loads': entry['loads'],
+                         'hits': entry['hits'],
+                         'last_load_time': entry['last_load_time'],
+                         'total_load_time': entry['total_load_time']} for script, entry in SCRIPTS.items()}
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import atexit
+import bisect
+import hashlib
+import threading
+import time
+
+from helpers.loghelpers import LOG
+from helpers.storagehelpers import get_storage
+from helpers.triggerregistry import get_trigger_registry
+from storage.storage import LEASES
+
+SHARD_MANAGER = None
+
+
+def get_shard_manager():
+    """
+    Get the process-wide shard manager
+
+    :return: The ShardManager object or None if sharding is not enabled
+    """
+    return SHARD_MANAGER
+
+
+def start_shard_manager(worker_id, shards, lease_duration):
+    """
+    Start sharding the triggers with the other spellbook processes that share the same storage
+
+    :param worker_id: The unique id of this process
+    :param shards: The number of shards, this must be the same for all processes
+    :param lease_duration: The number of seconds a lease on a shard is valid without being renewed
+    :return: The ShardManager object
+    """
+    global SHARD_MANAGER
+
+    if not get_storage().supports_transactions:
+        raise Exception('Sharding needs a storage backend that supports transactions, use the sqlite backend')
+
+    SHARD_MANAGER = ShardManager(worker_id=worker_id, shards=shards, lease_duration=lease_duration)
+    SHARD_MANAGER.update()
+    SHARD_MANAGER.start()
+
+    # Give up the leases when the server stops, so the other processes don't have to wait until they expire
+    atexit.register(SHARD_MANAGER.stop)
+
+    return SHARD_MANAGER
+
+
+def sharding_enabled():
+    return SHARD_MANAGER is not None
+
+
+def owns_trigger(trigger_id):
+    """
+    Check if this process may check and activate a trigger
+
+    :param trigger_id: The id of the trigger
+    :return: True if sharding is not enabled or this process holds the lease on the shard of the trigger, False otherwise
+    """
+    return SHARD_MANAGER is None or SHARD_MANAGER.owns(trigger_id)
+
+
+class LeaseLost(Exception):
+    """
+    Raised when this process no longer holds the lease on the shard of a trigger it was activating
+    """
+    pass
+
+
+def hash_value(key):
+    """
+    Get a hash of a string that is the same in every process (unlike the built-in hash function)
+
+    :param key: A string
+    :return: An integer
+    """
+    return int(hashlib.sha1(key.encode('utf-8')).hexdigest()[:16], 16)
+
+
+def get_shard(trigger_id, shards):
+    """
+    Get the shard of a trigger
+
+    :param trigger_id: The id of the trigger
+    :param shards: The number of shards
+    :return: The number of the shard
+    """
+    return hash_value(trigger_id) % shards
+
+
+class HashRing(object):
+    """
+    A consistent hash ring: each worker is placed on the ring a number of times and a key belongs to the first worker
+    after it on the ring, so when a worker joins or leaves only the keys of that worker move to another worker
+    """
+    def __init__(self, workers, replicas=100):
+        self.ring = sorted([(hash_value('%s:%s' % (worker, i)), worker) for worker in workers for i in range(replicas)])
+        self.hashes = [point for point, worker in self.ring]
+
+    def get_worker(self, key):
+        """
+        Get the worker a key belongs to
+
+        :param key: A string
+        :return: The worker or None if there are no workers
+        """
+        if len(self.ring) == 0:
+            return None
+
+        index = bisect.bisect(self.hashes, hash_value(key)) % len(self.ring)
+        return self.ring[index][1]
+
+
+class ShardManager(threading.Thread):
+    """
+    Divides the shards of the triggers between all spellbook processes that share the same storage
+
+    Each process renews a heartbeat lease for itself and places all live processes on a hash ring, the shards that the
+    ring assigns to this process are claimed with a lease that expires after lease_duration seconds.
+    The leases are renewed three times per lease duration within a storage transaction, so two processes can never hold
+    the lease on the same shard at the same time. A shard of a process that died is taken over by another process
+    once its lease has expired, a shard that the ring assigns to a new process is handed over by no longer renewing it.
+
+    The expiration times of the leases are set and compared with the clock of the storage, not with the clocks of the
+    processes. A process stops checking the triggers of a shard a third of the lease duration before its lease expires,
+    measured with its own monotonic clock from the start of the last renewal.
+    Each time a shard gets a new owner, its lease gets a new epoch. The activation jobs are claimed with the epoch of
+    the lease (a fencing token), a process that lost a shard can no longer save the jobs of its triggers.
+    """
+    def __init__(self, worker_id, shards=64, lease_duration=60):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.worker_id = worker_id
+        self.shards = shards
+        self.lease_duration = lease_duration
+        self.margin = lease_duration / 3.0
+
+        # shard -> (epoch of the lease, monotonic time at which the lease expires)
+        self.owned = {}
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.stopped = threading.Event()
+
+    def add_listener(self, listener):
+        """
+        Add a function that will be called with the set of shards each time this process takes over shards
+
+        :param listener: A function that takes a set of shards as argument
+        """
+        self.listeners.append(listener)
+
+    def get_shard(self, trigger_id):
+        return get_shard(trigger_id, self.shards)
+
+    def owns(self, trigger_id):
+        return self.get_lease_epoch(trigger_id) is not None
+
+    def get_lease_epoch(self, trigger_id):
+        """
+        Get the epoch of the lease on the shard of a trigger
+
+        :param trigger_id: The id of the trigger
+        :return: The epoch or None if this process does not hold the lease (or it is about to expire)
+        """
+        with self.lock:
+            lease = self.owned.get(self.get_shard(trigger_id))
+
+        if lease is not None and lease[1] - time.monotonic() > self.margin:
+            return lease[0]
+
+    def holds_lease(self, trigger_id, epoch):
+        """
+        Check in the storage that this process still holds the lease on the shard of a trigger with the given epoch,
+        call this within a storage transaction to make the check and the changes that depend on it atomic
+
+        :param trigger_id: The id of the trigger
+        :param epoch: The epoch of the lease
+        :return: True or False
+        """
+        if self.get_lease_epoch(trigger_id) != epoch:
+            return False
+
+        storage = get_storage()
+        lease = storage.get(LEASES, 'shard-%s' % self.get_shard(trigger_id))
+
+        return lease is not None and lease['owner'] == self.worker_id and lease.get('epoch') == epoch and lease['expires'] > storage.now()
+
+    def get_live_workers(self, now):
+        """
+        Get the ids of the processes with a valid heartbeat, the heartbeats of processes that died are deleted
+
+        :param now: The current time
+        :return: A sorted list of worker ids
+        """
+        storage = get_storage()
+        workers = []
+        for lease_id in storage.find(LEASES, lease_type='worker'):
+            lease = storage.get(LEASES, lease_id)
+            if lease is not None and lease['expires'] > now:
+                workers.append(lease['owner'])
+            elif lease is not None:
+                storage.delete(LEASES, lease_id)
+
+        return sorted(workers)
+
+    def update(self):
+        """
+        Renew the heartbeat of this process and claim, renew or hand over the leases on the shards
+        """
+        storage = get_storage()
+        # The leases expire at the latest lease_duration seconds after the renewal started
+        deadline = time.monotonic() + self.lease_duration
+        owned = {}
+        acquired = set()
+        with self.lock:
+            previously_owned = set(self.owned.keys())
+
+        with storage.transaction():
+            now = storage.now()
+            expires = now + self.lease_duration
+            storage.save(LEASES, 'worker-%s' % self.worker_id, {'lease_type': 'worker', 'owner': self.worker_id, 'expires': expires})
+            ring = HashRing(workers=self.get_live_workers(now=now))
+
+            for shard in range(self.shards):
+                lease_id = 'shard-%s' % shard
+                lease = storage.get(LEASES, lease_id)
+                held = lease is not None and lease['owner'] == self.worker_id and lease['expires'] > now
+                free = lease is None or lease['expires'] <= now
+
+                if ring.get_worker(lease_id) == self.worker_id and (held or free):
+                    # The epoch changes each time the shard gets a new owner, also when this process restarted with the same id
+                    renewed = held and shard in previously_owned
+                    epoch = (lease.get('epoch', 0) if lease is not None else 0) + (0 if renewed else 1)
+                    storage.save(LEASES, lease_id, {'lease_type': 'shard', 'owner': self.worker_id, 'shard': shard, 'expires': expires, 'epoch': epoch})
+                    owned[shard] = (epoch, deadline)
+                    if not renewed:
+                        acquired.add(shard)
+
+        with self.lock:
+            handed_over = set(self.owned.keys()) - set(owned.keys())
+            self.owned = owned
+
+        if len(handed_over) > 0:
+            LOG.info('Worker %s handed over shards %s' % (self.worker_id, sorted(handed_over)))
+
+        if len(acquired) > 0:
+            LOG.info('Worker %s took over shards %s' % (self.worker_id, sorted(acquired)))
+            # The previous owner could have changed the triggers of these shards
+            get_trigger_registry().refresh(force=True)
+            for listener in self.listeners:
+                try:
+                    listener(acquired)
+                except Exception as ex:
+                    LOG.error('Shard listener failed: %s' % ex)
+
+    def release(self):
+        """
+        Give up all leases, so the other processes can take over the shards right away
+        """
+        with self.lock:
+            shards = sorted(self.owned.keys())
+            self.owned = {}
+
+        storage = get_storage()
+        with storage.transaction():
+            for shard in shards:
+                # The lease is expired instead of deleted, so the epoch keeps increasing
+                lease = storage.get(LEASES, 'shard-%s' % shard)
+                if lease is not None and lease['owner'] == self.worker_id:
+                    lease['expires'] = 0
+                    storage.save(LEASES, 'shard-%s' % shard, lease)
+
+            storage.delete(LEASES, 'worker-%s' % self.worker_id)
+
+        LOG.info('Worker %s released shards %s' % (self.worker_id, shards))
+
+    def run(self):
+        while not self.stopped.wait(timeout=self.lease_duration / 3.0):
+            try:
+                self.update()
+            except Exception as ex:
+                LOG.error('Failed to update the shard leases of worker %s: %s' % (self.worker_id, ex))
+
+    def stop(self):
+        self.stopped.set()
+        self.release()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import atexit
+import os
+
+from helpers.configurationhelpers import get_storage_backend, get_storage_database_file, get_storage_fsync
+from helpers.configurationhelpers import get_storage_write_behind, get_storage_write_behind_delay
+from helpers.loghelpers import LOG
+from storage.bufferedstorage import BufferedStorage
+from storage.jsonstorage import JSONStorage
+from storage.sqlitestorage import SQLiteStorage
+from storage.storage import TRIGGERS, ACTIONS
+
+# The directory that holds the triggers and actions directories of the json storage
+JSON_DIR = 'json/public'
+
+STORAGE = None
+
+
+def get_storage():
+    """
+    Get the process-wide storage of the triggers and actions, the backend is set in the configuration file
+
+    When the sqlite database is created, the existing json files of the triggers and actions are imported into it
+    If write-behind is enabled, the backend is wrapped in a BufferedStorage that is flushed when the program exits
+
+    :return: A Storage object
+    """
+    global STORAGE
+
+    if STORAGE is None:
+        backend = get_storage_backend()
+        if backend == 'sqlite':
+            storage = SQLiteStorage(database_file=get_storage_database_file(), fsync=get_storage_fsync())
+            if storage.is_empty() and os.path.isdir(JSON_DIR):
+                counts = import_from_json(storage=storage, directory=JSON_DIR)
+                LOG.info('Imported %s triggers and %s actions from %s into %s' % (counts[TRIGGERS], counts[ACTIONS], JSON_DIR, storage.database_file))
+        elif backend == 'json':
+            storage = JSONStorage(directory=JSON_DIR, fsync=get_storage_fsync())
+        else:
+            raise NotImplementedError('Unknown storage backend: %s' % backend)
+
+        if get_storage_write_behind() is True:
+            storage = BufferedStorage(storage=storage, delay=get_storage_write_behind_delay())
+            atexit.register(storage.flush)
+
+        STORAGE = storage
+
+    return STORAGE
+
+
+def import_from_json(storage, directory=JSON_DIR):
+    """
+    Import the triggers and actions from json files, existing objects with the same id are replaced
+
+    :param storage: The Storage object to import into
+    :param directory: The directory that holds the triggers and actions directories
+    :return: A dict with the number of imported objects of each kind
+    """
+    return copy_objects(source=JSONStorage(directory=directory), destination=storage)
+
+
+def export_to_json(storage, directory=JSON_DIR):
+    """
+    Export the triggers and actions to json files, one file per trigger and per action
+
+    :param storage: The Storage object to export
+    :param directory: The directory that will hold the triggers and actions directories
+    :return: A dict with the number of exported objects of each kind
+    """
+    return copy_objects(source=storage, destination=JSONStorage(directory=directory))
+
+
+def copy_objects(source, destination):
+    counts = {}
+    with destination.transaction():
+        for kind in [TRIGGERS, ACTIONS]:
+            counts[kind] = 0
+            for object_id in source.get_ids(kind):
+                config = source.get(kind, object_id)
+                if isinstance(config, dict):
+                    destination.save(kind, object_id, config)
+                    counts[kind] += 1
+                else:
+                    LOG.error('Skipping %s %s: invalid configuration' % (kind[:-1], object_id))
+
+    return counts
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import heapq
+import threading
+import time
+
+import simplejson
+
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+from helpers.loghelpers import LOG
+from data.snapshot import Snapshot
+from helpers.triggerhelpers import check_trigger_ids, get_trigger
+from helpers.triggerregistry import get_trigger_registry
+from trigger.triggertype import TriggerType
+
+# The same websocket as the one of listeners/block_listener.py, blockchain.info does not provide one for testnet
+WEBSOCKET_URL = 'wss://ws.blockchain.info/inv'
+
+# Types of the triggers that watch the balance of an address
+ADDRESS_TRIGGER_TYPES = [TriggerType.BALANCE, TriggerType.RECEIVED, TriggerType.SENT]
+
+# Types of the triggers that wait for a block height
+HEIGHT_TRIGGER_TYPES = [TriggerType.BLOCK_HEIGHT, TriggerType.TX_CONFIRMATION]
+
+# Addresses that were seen in a new transaction keep being checked on new blocks until the transaction has this many confirmations
+PENDING_BLOCKS = 6
+
+# Addresses that were seen in a new transaction with the block height at which they were seen (None if no block has been seen yet)
+PENDING_ADDRESSES = {}
+PENDING_ADDRESSES_LOCK = threading.Lock()
+
+LATEST_BLOCK_HEIGHT = None
+
+HEIGHT_INDEX = None
+
+
+def get_address_trigger_ids(addresses):
+    """
+    Get the active triggers that watch the balance of one of the given addresses
+
+    :param addresses: A list of addresses
+    :return: A set of trigger_ids
+    """
+    registry = get_trigger_registry()
+    trigger_ids = set()
+    for address in set(addresses):
+        for trigger_type in ADDRESS_TRIGGER_TYPES:
+            trigger_ids.update(registry.find(trigger_type=trigger_type, status='Active', address=address))
+
+    return trigger_ids
+
+
+def process_new_transaction(txid, addresses):
+    """
+    Check the triggers that are affected by a new transaction: the triggers watching one of the addresses in the
+    inputs or outputs of the transaction and the triggers waiting for confirmations of the transaction
+
+    :param txid: The txid of the new transaction
+    :param addresses: A list of the addresses in the inputs and outputs of the transaction
+    :return: A sorted list of the trigger_ids that were checked
+    """
+    registry = get_trigger_registry()
+
+    trigger_ids = get_address_trigger_ids(addresses=addresses)
+    trigger_ids.update(registry.find(trigger_type=TriggerType.TX_CONFIRMATION, status='Active', txid=txid))
+
+    # The balance of these addresses will change again when the transaction confirms
+    with PENDING_ADDRESSES_LOCK:
+        for address in set(addresses):
+            if len(get_address_trigger_ids(addresses=[address])) > 0:
+                PENDING_ADDRESSES[address] = LATEST_BLOCK_HEIGHT
+
+    if len(trigger_ids) > 0:
+        LOG.info('New transaction %s affects triggers %s' % (txid, sorted(trigger_ids)))
+        check_trigger_ids(trigger_ids=sorted(trigger_ids))
+
+    return sorted(trigger_ids)
+
+
+def process_new_block(block_height):
+    """
+    Check the triggers that are affected by a new block: the BlockHeight and TxConfirmation triggers whose target height
+    has been reached, the TxConfirmation triggers whose transaction is not in a block yet and the triggers watching an
+    address that was seen in a recent transaction
+
+    :param block_height: The height of the new block
+    :return: A sorted list of the trigger_ids that were checked
+    """
+    global LATEST_BLOCK_HEIGHT
+    LATEST_BLOCK_HEIGHT = block_height
+
+    registry = get_trigger_registry()
+    height_index = get_height_index()
+
+    # TxConfirmation triggers only join the height index once the block height of their transaction is known
+    trigger_ids = set([trigger_id for trigger_id in registry.find(trigger_type=TriggerType.TX_CONFIRMATION, status='Active') if trigger_id not in height_index])
+
+    reached_trigger_ids = height_index.pop_reached(block_height=block_height)
+    trigger_ids.update(reached_trigger_ids)
+
+    with PENDING_ADDRESSES_LOCK:
+        for address, seen_block_height in list(PENDING_ADDRESSES.items()):
+            if seen_block_height is None:
+                PENDING_ADDRESSES[address] = block_height
+            elif block_height - seen_block_height >= PENDING_BLOCKS:
+                del PENDING_ADDRESSES[address]
+
+        trigger_ids.update(get_address_trigger_ids(addresses=list(PENDING_ADDRESSES.keys())))
+
+    if len(trigger_ids) > 0:
+        LOG.info('New block %s affects triggers %s' % (block_height, sorted(trigger_ids)))
+
+        # The latest block is already known, so the BlockHeight and TxConfirmation triggers don't need to look it up
+        snapshot = Snapshot()
+        snapshot.set(dependency=(Snapshot.LATEST_BLOCK, None), data={'block': {'height': block_height}})
+        check_trigger_ids(trigger_ids=sorted(trigger_ids), snapshot=snapshot)
+
+    # Triggers that are still active after they were checked (multi triggers) go back into the index
+    for trigger_id in reached_trigger_ids:
+        height_index.reindex(trigger_id)
+
+    return sorted(trigger_ids)
+
+
+def get_height_index():
+    """
+    Get the process-wide height index, the index is created and loaded the first time it is needed
+
+    :return: The TriggerHeightIndex object
+    """
+    global HEIGHT_INDEX
+
+    if HEIGHT_INDEX is None:
+        HEIGHT_INDEX = TriggerHeightIndex()
+        HEIGHT_INDEX.load()
+
+    return HEIGHT_INDEX
+
+
+def get_target_height(trigger_id):
+    """
+    Get the block height at which the conditions of an active BlockHeight or TxConfirmation trigger are fulfilled
+
+    :param trigger_id: The id of the trigger
+    :return: A block height or None
+    """
+    trigger_config = get_trigger_registry().get_config(trigger_id)
+    if trigger_config.get('status') != 'Active' or trigger_config.get('trigger_type') not in HEIGHT_TRIGGER_TYPES:
+        return None
+
+    return get_trigger(trigger_id).target_height()
+
+
+class TriggerHeightIndex(object):
+    """
+    A min-heap of (target height, trigger_id) of the active BlockHeight and TxConfirmation triggers, so a new block only
+    needs to pop the triggers whose target height has been reached instead of checking all of them
+    """
+    def __init__(self):
+        self.heap = []
+        self.target_heights = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        registry = get_trigger_registry()
+        registry.add_listener(self.reindex)
+
+        for trigger_id in registry.find(status='Active'):
+            self.reindex(trigger_id)
+
+    def reindex(self, trigger_id):
+        """
+        Add, move or remove a trigger in the index according to its current configuration
+
+        :param trigger_id: The id of the trigger
+        """
+        target_height = get_target_height(trigger_id)
+
+        with self.lock:
+            if target_height is None:
+                self.target_heights.pop(trigger_id, None)
+            elif self.target_heights.get(trigger_id) != target_height:
+                # Entries that were replaced stay in the heap and are skipped when they are popped
+                self.target_heights[trigger_id] = target_height
+                heapq.heappush(self.heap, (target_height, trigger_id))
+
+    def pop_reached(self, block_height):
+        """
+        Remove all triggers whose target height has been reached from the index
+
+        :param block_height: The height of the latest block
+        :return: A list of trigger_ids
+        """
+        trigger_ids = []
+        with self.lock:
+            while len(self.heap) > 0 and self.heap[0][0] <= block_height:
+                target_height, trigger_id = heapq.heappop(self.heap)
+                if self.target_heights.get(trigger_id) == target_height:
+                    del self.target_heights[trigger_id]
+                    trigger_ids.append(trigger_id)
+
+        return trigger_ids
+
+    def __contains__(self, trigger_id):
+        return trigger_id in self.target_heights
+
+    def __len__(self):
+        return len(self.target_heights)
+
+
+class TriggerEventListener(threading.Thread):
+    """
+    Listens for new blocks and new transactions of the watched addresses on the websocket of blockchain.info and only
+    checks the triggers that are affected by them, instead of waiting for the next call to check_triggers
+
+    The scripts in the listeners directory are standalone command line tools that run a command for each event, so the
+    subscriptions are made here to keep the listener inside the server where it can use the trigger registry.
+    transaction_listener.py uses a different feed that can only watch all transactions, this listener subscribes to the
+    watched addresses instead. Because the websocket only serves mainnet, the listener is not started on testnet.
+    """
+    def __init__(self, url=WEBSOCKET_URL, reconnect_delay=10, subscription_interval=60):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.subscription_interval = subscription_interval
+
+        self.websocket_app = None
+        self.subscribed_addresses = set()
+        self.last_subscription_update = 0
+        self.stopped = False
+
+    def run(self):
+        if websocket is None:
+            LOG.error('Can not start the trigger event listener: the websocket_client module is not installed')
+            return
+
+        while not self.stopped:
+            self.subscribed_addresses = set()
+            self.websocket_app = websocket.WebSocketApp(self.url,
+                                                        on_open=self.on_open,
+                                                        on_message=self.on_message,
+                                                        on_error=self.on_error,
+                                                        on_close=self.on_close)
+            self.websocket_app.run_forever()
+
+            if not self.stopped:
+                LOG.warning('Trigger event listener disconnected, reconnecting in %s seconds' % self.reconnect_delay)
+                time.sleep(self.reconnect_delay)
+
+    def stop(self):
+        self.stopped = True
+        if self.websocket_app is not None:
+            self.websocket_app.close()
+
+    def update_subscriptions(self, ws):
+        """
+        Subscribe to the transactions of the addresses that are watched by active triggers
+        """
+        self.last_subscription_update = time.time()
+        registry = get_trigger_registry()
+        watched_addresses = set(registry.get_values('address', status='Active'))
+
+        for address in sorted(watched_addresses - self.subscribed_addresses):
+            ws.send(simplejson.dumps({'op': 'addr_sub', 'addr': address}))
+            self.subscribed_addresses.add(address)
+
+    def on_open(self, ws):
+        LOG.info('Trigger event listener connected to %s' % self.url)
+        ws.send(simplejson.dumps({'op': 'blocks_sub'}))
+        self.update_subscriptions(ws)
+
+    def on_message(self, ws, message):
+        try:
+            event = simplejson.loads(message)
+            if event.get('op') == 'block':
+                process_new_block(block_height=event['x']['height'])
+                self.update_subscriptions(ws)
+
+            elif event.get('op') == 'utx':
+                addresses = [tx_input['prev_out']['addr'] for tx_input in event['x'].get('inputs', []) if tx_input.get('prev_out', {}).get('addr') is not None]
+                addresses.extend([tx_output['addr'] for tx_output in event['x'].get('out', []) if tx_output.get('addr') is not None])
+                process_new_transaction(txid=event['x']['hash'], addresses=addresses)
+
+            if time.time() - self.last_subscription_update >= self.subscription_interval:
+                self.update_subscriptions(ws)
+
+        except Exception as ex:
+            LOG.error('Trigger event listener failed to process message: %s' % ex)
+
+    def on_error(self, ws, error):
+        LOG.error('Trigger event listener error: %s' % error)
+
+    def on_close(self, ws, *args):
+        LOG.info('Trigger event listener websocket closed')
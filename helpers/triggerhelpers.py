@@ -1,16 +1,20 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import glob
-import os
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 
+from helpers.configurationhelpers import get_check_triggers_workers, get_condition_timeout
+from helpers.lockhelpers import trigger_lock
 from helpers.loghelpers import LOG
+from data.snapshot import Snapshot
 from trigger.balancetrigger import BalanceTrigger
 from trigger.blockheighttrigger import BlockHeightTrigger
 from trigger.txconfirmationtrigger import TxConfirmationTrigger
 from trigger.deadmansswitchtrigger import DeadMansSwitchTrigger
-from helpers.jsonhelpers import load_from_json_file
+from helpers.shardhelpers import owns_trigger
+from helpers.storagehelpers import get_storage
+from helpers.triggerregistry import get_trigger_registry
 from trigger.manualtrigger import ManualTrigger
 from trigger.receivedtrigger import ReceivedTrigger
 from trigger.recurringtrigger import RecurringTrigger
@@ -24,11 +28,17 @@ from trigger.httppostrequesttrigger import HTTPPostRequestTrigger
 from trigger.httpdeleterequesttrigger import HTTPDeleteRequestTrigger
 from trigger.triggertype import TriggerType
 from helpers.actionhelpers import delete_action
+from helpers.activationhelpers import wait_for_activation, restore_activating_status
 from helpers.hotwallethelpers import get_private_key_from_wallet, find_address_in_wallet, find_single_address_in_wallet
 
 from validators.validators import valid_address
+from storage.storage import TRIGGERS
 
-TRIGGERS_DIR = 'json/public/triggers'
+CONDITIONS_POOL = None
+
+# The types of the triggers whose conditions only depend on time, these are checked by the trigger scheduler when it is running
+TIME_TRIGGER_TYPES = [TriggerType.TIMESTAMP, TriggerType.RECURRING, TriggerType.DEADMANSSWITCH]
+SCHEDULER_RUNNING = False
 
 
 def get_triggers():
@@ -37,9 +47,7 @@ def get_triggers():
 
     :return: A list of trigger_ids
     """
-    triggers = glob.glob(os.path.join(TRIGGERS_DIR, '*.json'))
-
-    return [os.path.splitext(os.path.basename(trigger))[0] for trigger in triggers]
+    return get_trigger_registry().get_ids()
 
 
 def get_trigger_config(trigger_id):
@@ -49,13 +57,8 @@ def get_trigger_config(trigger_id):
     :param trigger_id: id of the trigger
     :return: a dict containing the configuration of the trigger
     """
-    try:
-        trigger_config = load_from_json_file(os.path.join(TRIGGERS_DIR, '%s.json' % trigger_id))
-    except IOError:
-        # Trigger does not exist yet, return empty dict
-        trigger_config = {}
-
-    return trigger_config
+    # Returns an empty dict if the trigger does not exist yet
+    return get_trigger_registry().get_config(trigger_id)
 
 
 def get_trigger(trigger_id, trigger_type=None):
@@ -115,6 +118,7 @@ def get_trigger(trigger_id, trigger_type=None):
         raise NotImplementedError('Unknown trigger type: %s' % trigger_config['trigger_type'])
 
     trigger.configure(**trigger_config)
+    restore_activating_status(trigger=trigger, trigger_config=trigger_config)
 
     return trigger
 
@@ -141,9 +145,8 @@ def delete_trigger(trigger_id):
 
     :param trigger_id: The id of the trigger to delete
     """
-    filename = os.path.join(TRIGGERS_DIR, '%s.json' % trigger_id)
-    if os.path.isfile(filename):
-        os.remove(filename)
+    if get_storage().delete(TRIGGERS, trigger_id):
+        get_trigger_registry().remove(trigger_id)
     else:
         return {'error': 'Unknown trigger id: %s' % trigger_id}
 
@@ -154,80 +157,197 @@ def activate_trigger(trigger_id):
 
     :param trigger_id: The id of the trigger
     """
-    if not os.path.isfile(os.path.join(TRIGGERS_DIR, '%s.json' % trigger_id)):
+    if not get_trigger_registry().exists(trigger_id):
         return {'error': 'Unknown trigger id: %s' % trigger_id}
 
-    trigger = get_trigger(trigger_id)
-    if trigger.trigger_type == TriggerType.MANUAL:
-        trigger.activate()
-    elif trigger.trigger_type == TriggerType.DEADMANSSWITCH:
-        trigger.arm()
-    else:
-        return {'error': 'Only triggers of type Manual or DeadmansSwitch can be activated manually'}
+    with trigger_lock(trigger_id):
+        trigger = get_trigger(trigger_id)
+        if trigger.trigger_type == TriggerType.MANUAL:
+            response = trigger.activate(synchronous=trigger.synchronous)
+        elif trigger.trigger_type == TriggerType.DEADMANSSWITCH:
+            trigger.arm()
+            return
+        else:
+            return {'error': 'Only triggers of type Manual or DeadmansSwitch can be activated manually'}
+
+    return wait_for_activation(response=response, synchronous=trigger.synchronous)
 
 
 def check_triggers(trigger_id=None):
-    # Get a list of all trigger_ids that are configured
-    triggers = get_triggers()
+    registry = get_trigger_registry()
 
     # If a trigger_id is given, only check that specific trigger
-    if trigger_id is not None and trigger_id in triggers:
-        triggers = [trigger_id]
-    elif trigger_id is not None and trigger_id not in triggers:
+    if trigger_id is not None and registry.exists(trigger_id):
+        trigger_ids = [trigger_id]
+    elif trigger_id is not None:
         return {'error': 'Unknown trigger id: %s' % trigger_id}
+    elif SCHEDULER_RUNNING is True:
+        # Time-based triggers and self-destruct times are handled by the trigger scheduler
+        trigger_ids = set(registry.find(status='Active'))
+        for trigger_type in TIME_TRIGGER_TYPES:
+            trigger_ids -= set(registry.find(trigger_type=trigger_type))
+        trigger_ids = sorted(trigger_ids)
+    else:
+        # Only triggers that are active or have a self-destruct time need to be checked
+        trigger_ids = sorted(set(registry.find(status='Active')) | set(registry.find(has_self_destruct=True)))
 
-    for trigger_id in triggers:
-        trigger = get_trigger(trigger_id=trigger_id)
-        if trigger.status == 'Active':
-            LOG.info('Checking conditions of trigger %s' % trigger_id)
-            if trigger.conditions_fulfilled() is True:
-                trigger.activate()
+    check_trigger_ids(trigger_ids=trigger_ids)
+
+
+def set_scheduler_running(running):
+    """
+    Let check_triggers know if the trigger scheduler is running, so it can skip the time-based triggers
+
+    :param running: True or False
+    """
+    global SCHEDULER_RUNNING
+    SCHEDULER_RUNNING = running
+
+
+def check_trigger_ids(trigger_ids, snapshot=None):
+    """
+    Check the conditions of the given triggers, activate the triggers with fulfilled conditions and delete the triggers
+    that have reached their self-destruct time
+
+    :param trigger_ids: A list of trigger_ids
+    :param snapshot: A Snapshot object that already contains some of the data the triggers depend on (optional)
+    """
+    # A trigger could have been deleted in the meantime or be handled by another spellbook process
+    registry = get_trigger_registry()
+    triggers = [get_trigger(trigger_id=trigger_id) for trigger_id in trigger_ids if registry.exists(trigger_id) and owns_trigger(trigger_id)]
+
+    # Retrieve the blockchain data the active triggers depend on, each address, transaction and the latest block only once
+    active_triggers = [trigger for trigger in triggers if trigger.status == 'Active']
+    snapshot = Snapshot() if snapshot is None else snapshot
+    snapshot.prefetch(dependencies=[dependency for trigger in active_triggers for dependency in trigger.dependencies()],
+                      pool=get_conditions_pool(),
+                      timeout=get_condition_timeout())
 
+    # Check the conditions of all active triggers in parallel, then activate the triggers with fulfilled conditions
+    conditions_fulfilled = check_conditions(triggers=active_triggers, snapshot=snapshot)
+
+    for trigger in active_triggers:
+        if conditions_fulfilled[trigger.id] is True:
+            activate_checked_trigger(trigger=trigger)
+
+    for trigger in triggers:
         if trigger.self_destruct is not None:
             if trigger.self_destruct <= int(time.time()):
-                LOG.info('Trigger %s has reached its self-destruct time' % trigger_id)
+                LOG.info('Trigger %s has reached its self-destruct time' % trigger.id)
+
+                # The trigger and its actions are deleted together, so a crash can not leave the actions behind
+                with get_storage().transaction():
+                    # Also destruct any attached actions if needed
+                    if trigger.destruct_actions is True:
+                        for action_id in trigger.actions:
+                            LOG.info('Deleting action %s' % action_id)
+                            delete_action(action_id=action_id)
+
+                    LOG.info('Deleting trigger %s' % trigger.id)
+                    delete_trigger(trigger_id=trigger.id)
+                continue
 
-                # Also destruct any attached actions if needed
-                if trigger.destruct_actions is True:
-                    for action_id in trigger.actions:
-                        LOG.info('Deleting action %s' % action_id)
-                        delete_action(action_id=action_id)
+    # Write the changes of this check at once if the storage buffers them
+    get_storage().flush()
 
-                LOG.info('Deleting trigger %s' % trigger_id)
-                delete_trigger(trigger_id=trigger_id)
-                continue
+
+def get_conditions_pool():
+    """
+    Get the thread pool that is used to check the conditions of the triggers, the pool is created the first time it is needed
+
+    :return: A ThreadPoolExecutor object
+    """
+    global CONDITIONS_POOL
+
+    if CONDITIONS_POOL is None:
+        CONDITIONS_POOL = ThreadPoolExecutor(max_workers=get_check_triggers_workers())
+
+    return CONDITIONS_POOL
+
+
+def check_conditions(triggers, snapshot=None):
+    """
+    Check the conditions of the given triggers in parallel
+
+    A trigger that raises an exception or does not finish within the condition timeout counts as not fulfilled,
+    it will be checked again on the next run
+
+    :param triggers: A list of Trigger objects
+    :param snapshot: A Snapshot object containing the blockchain data the triggers depend on (optional)
+    :return: A dict containing the trigger_id as key and True or False as value
+    """
+    timeout = get_condition_timeout()
+    pool = get_conditions_pool()
+
+    futures = []
+    for trigger in triggers:
+        LOG.info('Checking conditions of trigger %s' % trigger.id)
+        futures.append((trigger, pool.submit(trigger.conditions_fulfilled, snapshot)))
+
+    conditions_fulfilled = {}
+    for trigger, future in futures:
+        try:
+            conditions_fulfilled[trigger.id] = future.result(timeout=timeout) is True
+        except TimeoutError:
+            LOG.error('Checking conditions of trigger %s timed out after %s seconds' % (trigger.id, timeout))
+            future.cancel()
+            conditions_fulfilled[trigger.id] = False
+        except Exception as ex:
+            LOG.error('Failed to check conditions of trigger %s: %s' % (trigger.id, ex))
+            conditions_fulfilled[trigger.id] = False
+
+    return conditions_fulfilled
+
+
+def activate_checked_trigger(trigger):
+    """
+    Activate a trigger after its conditions have been checked, activations of the same trigger are serialized
+
+    :param trigger: A Trigger object
+    """
+    with trigger_lock(trigger.id):
+        # The trigger could have been activated by someone else while its conditions were being checked
+        trigger_config = get_trigger_config(trigger.id)
+        if trigger_config.get('status') != 'Active' or trigger_config.get('triggered') != trigger.triggered:
+            LOG.info('Trigger %s was already activated while its conditions were being checked' % trigger.id)
+            return
+
+        trigger.activate()
 
 
 def verify_signed_message(trigger_id, **data):
     if not all(key in data for key in ['address', 'message', 'signature']):
         return {'error': 'Request data does not contain all required keys: address, message and signature'}
 
-    triggers = get_triggers()
-    if trigger_id not in triggers:
+    if not get_trigger_registry().exists(trigger_id):
         return {'error': 'Unknown trigger id: %s' % trigger_id}
 
-    trigger = get_trigger(trigger_id)
-    if trigger.trigger_type != TriggerType.SIGNEDMESSAGE:
-        return {'error': 'Trigger %s is not a Signedmessage trigger' % trigger.trigger_type}
-
-    if trigger.address is not None and trigger.address != data['address']:
-        return {'error': 'Trigger %s only listens to signed messages from address %s' % (trigger.id, trigger.address)}
-
-    if verify_message(address=data['address'], message=data['message'], signature=data['signature']) is True:
-        if trigger.status == 'Active':
-            LOG.info('Trigger %s received a verified signed message' % trigger_id)
-            trigger.process_message(address=data['address'],
-                                    message=data['message'],
-                                    signature=data['signature'],
-                                    data=data['data'] if 'data' in data else None,
-                                    ipfs_object=data['ipfs_object'] if 'ipfs_object' in data else None)
-            return trigger.activate()
-    else:
-        LOG.warning('Trigger %s received a bad signed message' % trigger_id)
-        LOG.warning('message: %s' % data['message'])
-        LOG.warning('address: %s' % data['address'])
-        LOG.warning('signature: %s' % data['signature'])
-        return {'error': 'Signature is invalid!'}
+    with trigger_lock(trigger_id):
+        trigger = get_trigger(trigger_id)
+        if trigger.trigger_type != TriggerType.SIGNEDMESSAGE:
+            return {'error': 'Trigger %s is not a Signedmessage trigger' % trigger.trigger_type}
+
+        if trigger.address is not None and trigger.address != data['address']:
+            return {'error': 'Trigger %s only listens to signed messages from address %s' % (trigger.id, trigger.address)}
+
+        response = None
+        if verify_message(address=data['address'], message=data['message'], signature=data['signature']) is True:
+            if trigger.status == 'Active':
+                LOG.info('Trigger %s received a verified signed message' % trigger_id)
+                trigger.process_message(address=data['address'],
+                                        message=data['message'],
+                                        signature=data['signature'],
+                                        data=data['data'] if 'data' in data else None,
+                                        ipfs_object=data['ipfs_object'] if 'ipfs_object' in data else None)
+                response = trigger.activate(synchronous=trigger.synchronous)
+        else:
+            LOG.warning('Trigger %s received a bad signed message' % trigger_id)
+            LOG.warning('message: %s' % data['message'])
+            LOG.warning('address: %s' % data['address'])
+            LOG.warning('signature: %s' % data['signature'])
+            return {'error': 'Signature is invalid!'}
+
+    return wait_for_activation(response=response, synchronous=trigger.synchronous)
 
 
 def sign_message(**data):
@@ -264,48 +384,57 @@ def sign_message(**data):
 
 
 def http_get_request(trigger_id, **data):
-    triggers = get_triggers()
-    if trigger_id not in triggers:
+    if not get_trigger_registry().exists(trigger_id):
         return {'error': 'Unknown trigger id: %s' % trigger_id}
 
-    trigger = get_trigger(trigger_id)
-    if trigger.trigger_type != TriggerType.HTTPGETREQUEST:
-        return {'error': 'Trigger %s is not a HTTP GET request trigger but a %s trigger' % (trigger_id, trigger.trigger_type)}
+    with trigger_lock(trigger_id):
+        trigger = get_trigger(trigger_id)
+        if trigger.trigger_type != TriggerType.HTTPGETREQUEST:
+            return {'error': 'Trigger %s is not a HTTP GET request trigger but a %s trigger' % (trigger_id, trigger.trigger_type)}
+
+        response = None
+        if trigger.status == 'Active':
+            LOG.info('Trigger %s received a HTTP GET request' % trigger_id)
+            if len(data) > 0:
+                trigger.set_json_data(data=data)
+            response = trigger.activate(synchronous=trigger.synchronous)
 
-    if trigger.status == 'Active':
-        LOG.info('Trigger %s received a HTTP GET request' % trigger_id)
-        if len(data) > 0:
-            trigger.set_json_data(data=data)
-        return trigger.activate()
+    return wait_for_activation(response=response, synchronous=trigger.synchronous)
 
 
 def http_post_request(trigger_id, **data):
-    triggers = get_triggers()
-    if trigger_id not in triggers:
+    if not get_trigger_registry().exists(trigger_id):
         return {'error': 'Unknown trigger id: %s' % trigger_id}
 
-    trigger = get_trigger(trigger_id)
-    if trigger.trigger_type != TriggerType.HTTPPOSTREQUEST:
-        return {'error': 'Trigger %s is not a HTTP POST request trigger but a %s trigger' % (trigger_id, trigger.trigger_type)}
+    with trigger_lock(trigger_id):
+        trigger = get_trigger(trigger_id)
+        if trigger.trigger_type != TriggerType.HTTPPOSTREQUEST:
+            return {'error': 'Trigger %s is not a HTTP POST request trigger but a %s trigger' % (trigger_id, trigger.trigger_type)}
+
+        response = None
+        if trigger.status == 'Active':
+            LOG.info('Trigger %s received a HTTP POST request' % trigger_id)
+            if len(data) > 0:
+                trigger.set_json_data(data=data)
+            response = trigger.activate(synchronous=trigger.synchronous)
 
-    if trigger.status == 'Active':
-        LOG.info('Trigger %s received a HTTP POST request' % trigger_id)
-        if len(data) > 0:
-            trigger.set_json_data(data=data)
-        return trigger.activate()
+    return wait_for_activation(response=response, synchronous=trigger.synchronous)
 
 
 def http_delete_request(trigger_id, **data):
-    triggers = get_triggers()
-    if trigger_id not in triggers:
+    if not get_trigger_registry().exists(trigger_id):
         return {'error': 'Unknown trigger id: %s' % trigger_id}
 
-    trigger = get_trigger(trigger_id)
-    if trigger.trigger_type != TriggerType.HTTPDELETEREQUEST:
-        return {'error': 'Trigger %s is not a HTTP DELETE request trigger but a %s trigger' % (trigger_id, trigger.trigger_type)}
+    with trigger_lock(trigger_id):
+        trigger = get_trigger(trigger_id)
+        if trigger.trigger_type != TriggerType.HTTPDELETEREQUEST:
+            return {'error': 'Trigger %s is not a HTTP DELETE request trigger but a %s trigger' % (trigger_id, trigger.trigger_type)}
+
+        response = None
+        if trigger.status == 'Active':
+            LOG.info('Trigger %s received a HTTP DELETE request' % trigger_id)
+            if len(data) > 0:
+                trigger.set_json_data(data=data)
+            response = trigger.activate(synchronous=trigger.synchronous)
 
-    if trigger.status == 'Active':
-        LOG.info('Trigger %s received a HTTP DELETE request' % trigger_id)
-        if len(data) > 0:
-            trigger.set_json_data(data=data)
-        return trigger.activate()
+    return wait_for_activation(response=response, synchronous=trigger.synchronous)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import copy
+import threading
+import time
+
+from helpers.configurationhelpers import get_trigger_registry_refresh_interval
+from helpers.loghelpers import LOG
+from helpers.storagehelpers import get_storage
+from storage.storage import TRIGGERS, INDEXED_KEYS as STORAGE_INDEXED_KEYS
+
+TRIGGER_REGISTRY = None
+
+# The keys of the trigger configurations that are indexed
+INDEXED_KEYS = STORAGE_INDEXED_KEYS[TRIGGERS]
+
+
+def get_trigger_registry():
+    """
+    Get the process-wide trigger registry, the registry is created and loaded the first time it is needed
+
+    :return: The TriggerRegistry object
+    """
+    global TRIGGER_REGISTRY
+
+    if TRIGGER_REGISTRY is None:
+        TRIGGER_REGISTRY = TriggerRegistry(storage=get_storage(), refresh_interval=get_trigger_registry_refresh_interval())
+
+    return TRIGGER_REGISTRY
+
+
+class TriggerRegistry(object):
+    """
+    An in-memory index of the configurations of all triggers, so looking up a trigger does not need to query the storage
+    and parse its configuration each time
+
+    The triggers are indexed by id, type, status, watched address and watched txid.
+    Triggers saved or deleted by this process are written through to the registry immediately, changes made to the storage
+    by anything else are picked up with the get_changes method of the storage, this is done at most once every
+    refresh_interval seconds
+    """
+    def __init__(self, storage, refresh_interval=5):
+        self.storage = storage
+        self.refresh_interval = refresh_interval
+
+        self.configs = {}
+        self.changes_token = None
+        self.indexes = {key: {} for key in INDEXED_KEYS}
+
+        self.last_refresh = None
+        self.lock = threading.RLock()
+        self.listeners = []
+
+    def refresh(self, force=False):
+        """
+        Synchronize the registry with the storage, only triggers that have changed since the last refresh are loaded
+
+        :param force: Refresh even if the refresh interval has not passed yet
+        """
+        with self.lock:
+            if force is False and self.last_refresh is not None and time.time() - self.last_refresh < self.refresh_interval:
+                return
+
+            self.last_refresh = time.time()
+
+            self.changes_token, changed, deleted = self.storage.get_changes(TRIGGERS, token=self.changes_token)
+            for trigger_id in deleted:
+                self._remove(trigger_id)
+
+            for trigger_id, config in changed.items():
+                self._add(trigger_id, config)
+
+        self.notify_listeners(trigger_ids=sorted(set(deleted) | set(changed.keys())))
+
+    def get_ids(self):
+        """
+        Get the list of trigger_ids
+
+        :return: A sorted list of trigger_ids
+        """
+        self.refresh()
+        with self.lock:
+            return sorted(self.configs.keys())
+
+    def exists(self, trigger_id):
+        self.refresh()
+        return trigger_id in self.configs
+
+    def get_config(self, trigger_id):
+        """
+        Get the configuration of a trigger
+
+        :param trigger_id: The id of the trigger
+        :return: A copy of the configuration of the trigger (an empty dict if the trigger does not exist)
+        """
+        self.refresh()
+        with self.lock:
+            return copy.deepcopy(self.configs.get(trigger_id, {}))
+
+    def find(self, trigger_type=None, status=None, address=None, txid=None, has_self_destruct=None):
+        """
+        Get the trigger_ids of all triggers matching the given criteria
+
+        :param trigger_type: The type of the triggers (optional)
+        :param status: The status of the triggers (optional)
+        :param address: The address the triggers are watching (optional)
+        :param txid: The txid the triggers are watching (optional)
+        :param has_self_destruct: True to only get the triggers that have a self-destruct time (optional)
+        :return: A sorted list of trigger_ids
+        """
+        self.refresh()
+        with self.lock:
+            trigger_ids = set(self.configs.keys())
+            for key, value in [('trigger_type', trigger_type), ('status', status), ('address', address), ('txid', txid)]:
+                if value is not None:
+                    trigger_ids &= self.indexes[key].get(value, set())
+
+            if has_self_destruct is True:
+                trigger_ids = set([trigger_id for trigger_id in trigger_ids if self.configs[trigger_id].get('self_destruct') is not None])
+
+            return sorted(trigger_ids)
+
+    def get_values(self, key, status=None):
+        """
+        Get all distinct values of an indexed key, for example all addresses that are being watched by active triggers
+
+        :param key: One of the indexed keys
+        :param status: Only include triggers with this status (optional)
+        :return: A sorted list of values
+        """
+        self.refresh()
+        with self.lock:
+            if status is None:
+                return sorted(self.indexes[key].keys())
+
+            active_ids = self.indexes['status'].get(status, set())
+            return sorted([value for value, trigger_ids in self.indexes[key].items() if len(trigger_ids & active_ids) > 0])
+
+    def add_listener(self, listener):
+        """
+        Add a function that will be called with the trigger_id each time a trigger is added, changed or deleted
+
+        :param listener: A function that takes a trigger_id as argument
+        """
+        self.listeners.append(listener)
+
+    def notify_listeners(self, trigger_ids):
+        for trigger_id in trigger_ids:
+            for listener in self.listeners:
+                try:
+                    listener(trigger_id)
+                except Exception as ex:
+                    LOG.error('Trigger registry listener failed for trigger %s: %s' % (trigger_id, ex))
+
+    def update(self, trigger_id, config):
+        """
+        Write-through of a trigger that has just been saved to the storage
+
+        :param trigger_id: The id of the trigger
+        :param config: The configuration of the trigger as it was saved
+        """
+        with self.lock:
+            self._add(trigger_id, copy.deepcopy(config))
+
+        self.notify_listeners(trigger_ids=[trigger_id])
+
+    def remove(self, trigger_id):
+        """
+        Write-through of a trigger that has just been deleted from the storage
+
+        :param trigger_id: The id of the trigger
+        """
+        with self.lock:
+            self._remove(trigger_id)
+
+        self.notify_listeners(trigger_ids=[trigger_id])
+
+    def _add(self, trigger_id, config):
+        self._remove(trigger_id)
+        self.configs[trigger_id] = config
+
+        for key in INDEXED_KEYS:
+            if config.get(key) is not None:
+                self.indexes[key].setdefault(config[key], set()).add(trigger_id)
+
+    def _remove(self, trigger_id):
+        config = self.configs.pop(trigger_id, None)
+        if config is None:
+            return
+
+        for key in INDEXED_KEYS:
+            index = self.indexes[key]
+            if config.get(key) is not None and config[key] in index:
+                index[config[key]].discard(trigger_id)
+                if len(index[config[key]]) == 0:
+                    del index[config[key]]
+
+    def __len__(self):
+        return len(self.configs)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import heapq
+import threading
+import time
+
+from helpers.loghelpers import LOG
+from helpers.shardhelpers import get_shard_manager, owns_trigger
+from helpers.triggerhelpers import get_trigger, check_trigger_ids, set_scheduler_running
+from helpers.triggerregistry import get_trigger_registry
+
+# A trigger that is still due after it was checked (for example because its actions failed) is checked again after this many seconds
+RETRY_DELAY = 60
+
+TRIGGER_SCHEDULER = None
+
+
+def get_trigger_scheduler():
+    """
+    Get the process-wide trigger scheduler, the scheduler is created the first time it is needed
+
+    :return: The TriggerScheduler object
+    """
+    global TRIGGER_SCHEDULER
+
+    if TRIGGER_SCHEDULER is None:
+        TRIGGER_SCHEDULER = TriggerScheduler()
+
+    return TRIGGER_SCHEDULER
+
+
+def get_due_time(trigger_id):
+    """
+    Get the next time at which a trigger needs to be checked
+
+    :param trigger_id: The id of the trigger
+    :return: A timestamp or None if the trigger does not exist, is handled by another spellbook process or does not need
+             to be checked at a specific time
+    """
+    if not get_trigger_registry().exists(trigger_id) or not owns_trigger(trigger_id):
+        return None
+
+    return get_trigger(trigger_id).next_due_time()
+
+
+class TriggerScheduler(threading.Thread):
+    """
+    Checks the triggers exactly when they are due, instead of checking all time-based triggers on every check_triggers call
+
+    The scheduler keeps a min-heap of (due time, trigger_id) of the Timestamp, Recurring and DeadMansSwitch triggers and
+    of all triggers with a self-destruct time, and sleeps until the first one is due.
+    The due times are derived from the trigger configurations (next_activation, the phase of a Dead Man's Switch,
+    self_destruct, ...), which are saved to disk, so the schedule is rebuilt when the server restarts and anything that
+    became due while the server was down is checked right away.
+    Each time a trigger is saved or deleted, the trigger registry notifies the scheduler so it can reschedule that trigger
+    """
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.heap = []
+        self.due_times = {}
+        self.condition = threading.Condition()
+        self.stopped = False
+
+    def load(self):
+        """
+        Schedule all triggers and start listening for changes to the triggers
+        """
+        registry = get_trigger_registry()
+        registry.add_listener(self.reschedule)
+
+        shard_manager = get_shard_manager()
+        if shard_manager is not None:
+            shard_manager.add_listener(self.reschedule_shards)
+
+        for trigger_id in registry.get_ids():
+            self.reschedule(trigger_id)
+
+        LOG.info('Trigger scheduler loaded %s scheduled triggers' % len(self.due_times))
+
+    def reschedule(self, trigger_id, not_before=None):
+        """
+        Schedule a trigger at its next due time
+
+        :param trigger_id: The id of the trigger
+        :param not_before: If the trigger is due before this time, it is scheduled after the retry delay instead (optional)
+        """
+        due_time = get_due_time(trigger_id)
+        if due_time is not None and not_before is not None and due_time <= not_before:
+            due_time = not_before + RETRY_DELAY
+
+        self.schedule(trigger_id=trigger_id, due_time=due_time)
+
+    def reschedule_shards(self, shards):
+        """
+        Schedule the triggers of the shards this process has taken over from another spellbook process
+
+        :param shards: A set of shards
+        """
+        shard_manager = get_shard_manager()
+        for trigger_id in get_trigger_registry().get_ids():
+            if shard_manager.get_shard(trigger_id) in shards:
+                self.reschedule(trigger_id)
+
+    def schedule(self, trigger_id, due_time):
+        """
+        Schedule a trigger at the given time, any earlier schedule of the trigger is replaced
+
+        :param trigger_id: The id of the trigger
+        :param due_time: A timestamp or None to unschedule the trigger
+        """
+        with self.condition:
+            if due_time is None:
+                self.due_times.pop(trigger_id, None)
+            elif self.due_times.get(trigger_id) != due_time:
+                # Entries that were replaced stay in the heap and are skipped when they reach the top
+                self.due_times[trigger_id] = due_time
+                heapq.heappush(self.heap, (due_time, trigger_id))
+
+            self.condition.notify()
+
+    def next_due_time(self):
+        """
+        Get the time at which the first trigger is due, this must be called while holding the condition
+
+        :return: A timestamp or None if no triggers are scheduled
+        """
+        while len(self.heap) > 0:
+            due_time, trigger_id = self.heap[0]
+            if self.due_times.get(trigger_id) == due_time:
+                return due_time
+
+            heapq.heappop(self.heap)
+
+    def pop_due(self, now):
+        """
+        Remove all triggers that are due from the schedule, this must be called while holding the condition
+
+        :param now: The current time
+        :return: A list of trigger_ids
+        """
+        trigger_ids = []
+        while self.next_due_time() is not None and self.heap[0][0] <= now:
+            due_time, trigger_id = heapq.heappop(self.heap)
+            del self.due_times[trigger_id]
+            trigger_ids.append(trigger_id)
+
+        return trigger_ids
+
+    def run(self):
+        self.load()
+        set_scheduler_running(True)
+
+        try:
+            while not self.stopped:
+                with self.condition:
+                    now = time.time()
+                    due_time = self.next_due_time()
+                    if due_time is None or due_time > now:
+                        self.condition.wait(timeout=None if due_time is None else due_time - now)
+                        continue
+
+                    trigger_ids = self.pop_due(now=now)
+
+                self.check(trigger_ids=trigger_ids, now=now)
+        finally:
+            set_scheduler_running(False)
+
+    def check(self, trigger_ids, now):
+        LOG.info('Scheduled triggers are due: %s' % trigger_ids)
+        try:
+            check_trigger_ids(trigger_ids=trigger_ids)
+        except Exception as ex:
+            LOG.error('Failed to check scheduled triggers %s: %s' % (trigger_ids, ex))
+
+        for trigger_id in trigger_ids:
+            self.reschedule(trigger_id, not_before=now)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+P2PKH = 'p2pkh'
+P2SH = 'p2sh'
+P2SH_P2WPKH = 'p2sh-p2wpkh'
+P2WPKH = 'p2wpkh'
+P2WSH = 'p2wsh'
+
+# The largest DER encoded signature with a low S value plus the sighash byte: r can need 33 bytes, s never needs more
+# than 32 bytes, shorter signatures are a byte smaller (about half of them), so estimates are at most 1 byte too high per input
+MAX_SIGNATURE_SIZE = 72
+
+COMPRESSED_PUBKEY_SIZE = 33
+UNCOMPRESSED_PUBKEY_SIZE = 65
+
+# outpoint (txid + index) + sequence
+INPUT_BASE_SIZE = 32 + 4 + 4
+
+# The sizes of the output scripts (scriptPubKey) of each script type
+OUTPUT_SCRIPT_SIZES = {P2PKH: 25,
+                       P2SH: 23,
+                       P2WPKH: 22,
+                       P2WSH: 34}
+
+# version + locktime
+TRANSACTION_BASE_SIZE = 4 + 4
+
+# The segwit marker and flag bytes
+SEGWIT_MARKER_SIZE = 2
+
+
+def var_int_size(n):
+    """
+    Get the number of bytes of a variable length integer
+
+    :param n: The integer
+    :return: The number of bytes
+    """
+    if n < 253:
+        return 1
+    elif n < 65536:
+        return 3
+    elif n < 4294967296:
+        return 5
+    else:
+        return 9
+
+
+def push_size(n):
+    """
+    Get the number of bytes of a script push of n bytes of data, including the data
+
+    :param n: The number of bytes to push
+    :return: The number of bytes
+    """
+    if n <= 75:
+        return 1 + n
+    elif n < 256:
+        return 2 + n
+    elif n < 65536:
+        return 3 + n
+    else:
+        return 5 + n
+
+
+def get_script_type(address):
+    """
+    Get the script type of an address, the same way address_to_script in the transaction factory does
+
+    :param address: A Bitcoin address
+    :return: The script type
+    """
+    if address[0] in ['3', '2']:
+        return P2SH
+    elif address[:3].lower() in ['bc1', 'tb1']:
+        return P2WPKH if len(address) == 42 else P2WSH
+    else:
+        return P2PKH
+
+
+def get_input_type(address):
+    """
+    Get the type of the input that spends an utxo of an address, P2SH addresses are assumed to be P2SH-P2WPKH (BIP49)
+
+    :param address: A Bitcoin address
+    :return: The script type of the input
+    """
+    script_type = get_script_type(address)
+    if script_type == P2SH:
+        return P2SH_P2WPKH
+    elif script_type == P2WSH:
+        raise NotImplementedError('Can not estimate the size of P2WSH inputs')
+
+    return script_type
+
+
+def input_size(input_type, compressed=True):
+    """
+    Get the size of an input
+
+    :param input_type: The script type of the input: p2pkh, p2sh-p2wpkh or p2wpkh
+    :param compressed: True if the public key is compressed (default=True)
+    :return: A tuple of (the number of non-witness bytes, the number of witness bytes)
+    """
+    pubkey_size = COMPRESSED_PUBKEY_SIZE if compressed is True else UNCOMPRESSED_PUBKEY_SIZE
+
+    if input_type == P2PKH:
+        script_sig_size = push_size(MAX_SIGNATURE_SIZE) + push_size(pubkey_size)
+        return INPUT_BASE_SIZE + var_int_size(script_sig_size) + script_sig_size, 0
+
+    # The witness of a P2WPKH input: the number of items, the signature and the public key
+    witness_size = var_int_size(2) + var_int_size(MAX_SIGNATURE_SIZE) + MAX_SIGNATURE_SIZE + var_int_size(COMPRESSED_PUBKEY_SIZE) + COMPRESSED_PUBKEY_SIZE
+
+    if input_type == P2WPKH:
+        return INPUT_BASE_SIZE + var_int_size(0), witness_size
+    elif input_type == P2SH_P2WPKH:
+        # The scriptSig only pushes the redeem script: 0 <20 byte pubkeyhash>
+        script_sig_size = push_size(22)
+        return INPUT_BASE_SIZE + var_int_size(script_sig_size) + script_sig_size, witness_size
+    else:
+        raise NotImplementedError('Unknown input type: %s' % input_type)
+
+
+def output_size(script_type):
+    """
+    Get the size of an output
+
+    :param script_type: The script type of the output: p2pkh, p2sh, p2wpkh or p2wsh
+    :return: The number of bytes
+    """
+    script_size = OUTPUT_SCRIPT_SIZES[script_type]
+
+    return 8 + var_int_size(script_size) + script_size
+
+
+def op_return_output_size(op_return_data):
+    """
+    Get the size of an OP_RETURN output
+
+    :param op_return_data: The message of the OP_RETURN output
+    :return: The number of bytes
+    """
+    script_size = 1 + push_size(len(op_return_data.encode('utf-8')))
+
+    return 8 + var_int_size(script_size) + script_size
+
+
+def estimate_size(input_types, output_types, op_return_data=None, compressed=True):
+    """
+    Estimate the size of a signed transaction without signing it
+
+    The estimate assumes the largest signature size, so it is never too low and at most 1 byte too high per input
+
+    :param input_types: A list with the script type of each input
+    :param output_types: A list with the script type of each output (not including the OP_RETURN output)
+    :param op_return_data: The message of the OP_RETURN output (optional)
+    :param compressed: True if the public keys of the inputs are compressed (default=True)
+    :return: A dict containing the size, the virtual size and the weight of the transaction
+    """
+    n_outputs = len(output_types) + (1 if op_return_data is not None else 0)
+    non_witness_size = TRANSACTION_BASE_SIZE + var_int_size(len(input_types)) + var_int_size(n_outputs)
+    witness_size = 0
+
+    for input_type in input_types:
+        input_non_witness_size, input_witness_size = input_size(input_type=input_type, compressed=compressed)
+        non_witness_size += input_non_witness_size
+        witness_size += input_witness_size
+
+    non_witness_size += sum([output_size(script_type) for script_type in output_types])
+    if op_return_data is not None:
+        non_witness_size += op_return_output_size(op_return_data)
+
+    if witness_size > 0:
+        # Inputs without a witness still need the number of witness items (0) once the transaction has a witness
+        witness_size += SEGWIT_MARKER_SIZE + len([input_type for input_type in input_types if input_type == P2PKH])
+
+    weight = non_witness_size * 4 + witness_size
+
+    return {'size': non_witness_size + witness_size,
+            'vsize': (weight + 3) // 4,
+            'weight': weight}
+
+
+def estimate_transaction_size(tx_inputs, tx_outputs, op_return_data=None, compressed=True):
+    """
+    Estimate the size of a signed transaction from the same inputs and outputs that make_custom_tx uses
+
+    :param tx_inputs: A list of dicts containing at least the 'address' of each input
+    :param tx_outputs: A list of dicts containing at least the 'address' of each output
+    :param op_return_data: The message of the OP_RETURN output (optional)
+    :param compressed: True if the public keys of the inputs are compressed (default=True)
+    :return: A dict containing the size, the virtual size and the weight of the transaction
+    """
+    return estimate_size(input_types=[get_input_type(tx_input['address']) for tx_input in tx_inputs],
+                         output_types=[get_script_type(tx_output['address']) for tx_output in tx_outputs],
+                         op_return_data=op_return_data,
+                         compressed=compressed)
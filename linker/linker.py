@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from data.data import balance
-from bips.BIP44 import get_addresses_from_xpub
+from bips.BIP44 import derive_addresses
 from inputs.inputs import get_sil
 from validators.validators import valid_address, valid_xpub
 
@@ -18,7 +18,7 @@ def get_lal(address, xpub, block_height=0):
 
     if 'SIL' in sil_data:
         sil = sil_data['SIL']
-        linked_addresses = get_addresses_from_xpub(xpub, len(sil))
+        linked_addresses = derive_addresses(xpub=xpub, start=0, count=len(sil))
 
         lal = []
         for i in range(0, len(sil)):
@@ -1,36 +1,215 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from validators.validators import valid_address, valid_xpub
+import bisect
+import os
+import threading
+from itertools import accumulate
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from validators.validators import valid_address, valid_xpub, valid_block_height
 from data.data import block_by_height, latest_block
+from helpers.configurationhelpers import get_random_number_cache_confirmations, get_use_testnet
+from helpers.jsonhelpers import save_to_json_file, load_from_json_file
 from inputs.inputs import get_sil, get_sul
 from linker.linker import get_lbl, get_lrl, get_lsl
 
+# The largest integer for which every smaller integer can be represented exactly as a float
+MAX_EXACT_FLOAT_INTEGER = 2**53
+
+PROGRAM_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RANDOM_NUMBERS_CACHE_DIR = os.path.join(PROGRAM_DIR, 'json', 'public')
+# The random numbers and the latest block height of mainnet and testnet are kept apart, keyed by the network
+RANDOM_NUMBERS_CACHES = {}
+RANDOM_NUMBERS_CACHE_LOCK = threading.Lock()
+LATEST_KNOWN_BLOCK_HEIGHTS = {}
+
+# The maximum number of blocks in a single request for a range of random numbers
+MAX_RANDOM_NUMBERS_RANGE = 1000
+
+
+def get_network():
+    """
+    Get the network of the blocks that are used for the random numbers
+
+    :return: 'testnet' or 'mainnet'
+    """
+    return 'testnet' if get_use_testnet() is True else 'mainnet'
+
+
+def get_random_numbers_cache_file(network):
+    return os.path.join(RANDOM_NUMBERS_CACHE_DIR, 'random_numbers_%s.json' % network)
+
+
+def get_random_numbers_cache():
+    """
+    Get the persistent cache of random numbers of the current network, keyed by block height
+    The cache is loaded from disk only once per process
 
-def random_number_from_blockhash(block_height=0):
+    :return: A dict containing the block height (int) as key and the random number as value
+    """
+    network = get_network()
+
+    if network not in RANDOM_NUMBERS_CACHES:
+        cache = {}
+        if os.path.isfile(get_random_numbers_cache_file(network)):
+            data = load_from_json_file(get_random_numbers_cache_file(network))
+            if isinstance(data, dict):
+                cache = {int(block_height): random_number for block_height, random_number in data.items()}
+
+        RANDOM_NUMBERS_CACHES[network] = cache
+
+    return RANDOM_NUMBERS_CACHES[network]
+
+
+def save_random_numbers_cache():
+    """
+    Write the cache of random numbers of the current network to disk
+    """
+    with RANDOM_NUMBERS_CACHE_LOCK:
+        cache = get_random_numbers_cache()
+        save_to_json_file(get_random_numbers_cache_file(get_network()), {str(height): number for height, number in cache.items()})
+
+
+def get_latest_known_block_height():
+    return LATEST_KNOWN_BLOCK_HEIGHTS.get(get_network(), 0)
+
+
+def set_latest_known_block_height(latest_block_height):
+    network = get_network()
+    LATEST_KNOWN_BLOCK_HEIGHTS[network] = max(LATEST_KNOWN_BLOCK_HEIGHTS.get(network, 0), latest_block_height)
+
+
+def cache_random_number(block_height, random_number, latest_block_height, save=True):
+    """
+    Store a random number in the persistent cache, but only if the block is buried deep enough that it will not be reorganized anymore
+
+    :param block_height: The height of the block that was used for the random number
+    :param random_number: The random number
+    :param latest_block_height: The height of the latest block
+    :param save: Write the cache to disk right away (default: True), otherwise save_random_numbers_cache must be called later
+    :return: True if the random number was added to the cache, False otherwise
+    """
+    set_latest_known_block_height(latest_block_height)
+
+    if latest_block_height - block_height + 1 < get_random_number_cache_confirmations():
+        return False
+
+    with RANDOM_NUMBERS_CACHE_LOCK:
+        cache = get_random_numbers_cache()
+        if block_height in cache:
+            return True
+
+        cache[block_height] = random_number
+
+    if save is True:
+        save_random_numbers_cache()
+
+    return True
+
+
+def get_latest_block_height():
+    """
+    Get the height of the latest block from the explorer and remember it
+
+    :return: The height of the latest block or None if it could not be retrieved
+    """
+    latest_block_data = latest_block()
+    if 'block' in latest_block_data and 'height' in latest_block_data['block']:
+        set_latest_known_block_height(latest_block_data['block']['height'])
+        return latest_block_data['block']['height']
+
+
+def random_number_from_hash(block_hash):
+    """
+    Convert a block hash to a random number between 0 and 1
+    The hash is converted to an integer and then the integer is added to '0.' in reverse order
+
+    :param block_hash: A block hash in hexadecimal format
+    :return: A random number between 0 and 1
+    """
+    # Convert the block_hash to an integer and add the digits in reversed order to '0.'
+    return float('0.' + str(int(block_hash, 16))[::-1])
+
+
+def random_number_from_blockhash(block_height=0, save_cache=True):
     """
     Get a random number between 0 and 1.
     The block_hash of a block at a given height is used to generate the random number in the following way:
     The hash is converted to an integer and then the integer is added to '0.' in reverse order
 
+    Random numbers of blocks with enough confirmations are cached on disk, so they only need to be retrieved once
+
     :param block_height: The block height of the block_hash to use as a random number (default=0 (latest block))
+    :param save_cache: Write the cache to disk right away if the random number was added to it (default: True)
     :return: A random number between 0 and 1
     """
+    if block_height != 0:
+        random_number = get_random_numbers_cache().get(block_height)
+        if random_number is not None:
+            return random_number
+
     block_data = block_by_height(block_height) if block_height != 0 else latest_block()
 
     if 'block' in block_data and 'hash' in block_data['block']:
-        block_hash = block_data['block']['hash']
+        random_number = random_number_from_hash(block_data['block']['hash'])
+
+        if block_height == 0 and 'height' in block_data['block']:
+            # The latest block only has 1 confirmation
+            cache_random_number(block_data['block']['height'], random_number, latest_block_height=block_data['block']['height'], save=save_cache)
 
-        # Convert the block_hash to an integer
-        hash_as_integer = int(block_hash, 16)
+        elif block_height != 0 and block_height + get_random_number_cache_confirmations() - 1 <= get_latest_known_block_height():
+            cache_random_number(block_height, random_number, latest_block_height=get_latest_known_block_height(), save=save_cache)
 
-        # Add the digits in reversed order to '0.'
-        random_number_as_string = '0.'
-        for digit in reversed(str(hash_as_integer)):
-            random_number_as_string += digit
+        elif block_height != 0:
+            latest_block_height = get_latest_block_height()
+            if latest_block_height is not None:
+                cache_random_number(block_height, random_number, latest_block_height=latest_block_height, save=save_cache)
 
-        # Convert the full string to a float
-        return float(random_number_as_string)
+        return random_number
+
+
+def random_numbers_from_blockhashes(from_block_height, to_block_height):
+    """
+    Get the random numbers of a range of block heights
+
+    :param from_block_height: The first block height of the range
+    :param to_block_height: The last block height of the range (inclusive)
+    :return: A dict containing 'random_numbers': a dict with the block height as key and the random number as value
+    """
+    if not valid_block_height(from_block_height) or not valid_block_height(to_block_height) or from_block_height == 0:
+        return {'error': 'Invalid block height range: %s - %s' % (from_block_height, to_block_height)}
+
+    if to_block_height < from_block_height:
+        return {'error': 'The end of the block height range must not be lower than the start: %s - %s' % (from_block_height, to_block_height)}
+
+    if to_block_height - from_block_height + 1 > MAX_RANDOM_NUMBERS_RANGE:
+        return {'error': 'Block height range can contain at most %s blocks' % MAX_RANDOM_NUMBERS_RANGE}
+
+    # Refresh the latest block height once for the whole range instead of once for each block that is not cached yet
+    cache = get_random_numbers_cache()
+    if any(block_height not in cache for block_height in range(from_block_height, to_block_height + 1)):
+        get_latest_block_height()
+
+    # The new random numbers are written to disk once for the whole range instead of once for each block
+    cached = len(cache)
+    random_numbers = {}
+    try:
+        for block_height in range(from_block_height, to_block_height + 1):
+            random_number = random_number_from_blockhash(block_height, save_cache=False)
+            if random_number is None:
+                return {'error': 'Unable to get the random number of block %s' % block_height}
+
+            random_numbers[block_height] = random_number
+    finally:
+        if len(get_random_numbers_cache()) > cached:
+            save_random_numbers_cache()
+
+    return {'random_numbers': random_numbers}
 
 
 def random_address_from_sil(address, sil_block_height=0, rng_block_height=0):
@@ -88,6 +267,66 @@ def random_address_from_lsl(address, xpub, sil_block_height=0, rng_block_height=
                                                                 rng_block_height=rng_block_height)
 
 
+class CumulativeDistribution(object):
+    """
+    The prefix sums of a list of values, built once so that many random numbers can be drawn against the same distribution
+
+    Each draw is a binary search over the prefix sums instead of a linear walk over the values.
+    When numpy is available, a batch of draws is done with a single vectorized searchsorted, but only if every prefix sum
+    is an integer that can be represented exactly as a float, so the results are always identical to the exact integer search
+    """
+    def __init__(self, values):
+        # Start the accumulation at 0.0 just like a linear walk would, so distributions containing floats give the exact same sums
+        self.cumulative_values = list(accumulate([0.0] + list(values)))[1:]
+        self.total = sum(values)
+
+        # Binary search only works if the prefix sums never decrease, negative values fall back to a linear walk
+        self.monotonic = all(value >= 0 for value in values)
+
+        self.numpy_cumulative_values = None
+        if numpy is not None and self.monotonic and all(isinstance(value, int) for value in values) and self.total <= MAX_EXACT_FLOAT_INTEGER:
+            self.numpy_cumulative_values = numpy.array([int(value) for value in self.cumulative_values], dtype=numpy.int64)
+
+    def __len__(self):
+        return len(self.cumulative_values)
+
+    def chosen_index(self, random_number):
+        """
+        Get the index of the value that was chosen by the random number
+        The chosen value is the first value where the cumulative value is higher or equal to the random_number * total_value
+
+        :param random_number: A floating number between 0 and 1 (None if the block hash could not be retrieved)
+        :return: The index of the value that was chosen (None if there is no value to choose or no random number)
+        """
+        if self.total > 0 and random_number is not None:
+            target = random_number*self.total
+
+            if self.monotonic:
+                index = bisect.bisect_left(self.cumulative_values, target)
+                return index if index < len(self.cumulative_values) else None
+
+            for i in range(0, len(self.cumulative_values)):
+                if self.cumulative_values[i] >= target:
+                    return i
+
+    def chosen_indexes(self, random_numbers):
+        """
+        Get the chosen index for each random number in a list
+
+        :param random_numbers: A list of floating numbers between 0 and 1 (None for a block hash that could not be retrieved)
+        :return: A list containing the chosen index for each random number (in the same order), None for a random number that is None
+        """
+        if self.total <= 0:
+            return [None for _ in random_numbers]
+
+        if self.numpy_cumulative_values is not None and None not in random_numbers:
+            targets = numpy.array(random_numbers, dtype=numpy.float64) * self.total
+            indexes = numpy.searchsorted(self.numpy_cumulative_values, targets, side='left')
+            return [int(index) if index < len(self.cumulative_values) else None for index in indexes]
+
+        return [self.chosen_index(random_number) for random_number in random_numbers]
+
+
 class RandomAddress(object):
     def __init__(self, address, sil_block_height=0, xpub=None):
         self.address = address
@@ -106,6 +345,30 @@ class RandomAddress(object):
 
         return response
 
+    def get_batch(self, source, rng_block_heights):
+        """
+        Draw a random address for each of the given block heights, all against the same distribution
+        The distribution is only retrieved once and its cumulative values are only calculated once
+
+        :param source: The type of the distribution source (SIL, LBL, LRL or LSL)
+        :param rng_block_heights: A list of block heights of which the blockhash will be used as a random number
+        :return: A dict containing the distribution and a list of draws, each draw contains the same results as get()
+        """
+        distribution = self.get_distribution(source)
+
+        cached = len(get_random_numbers_cache())
+        random_numbers = [random_number_from_blockhash(rng_block_height, save_cache=False) for rng_block_height in rng_block_heights]
+        if len(get_random_numbers_cache()) > cached:
+            save_random_numbers_cache()
+
+        draws = self.results_batch(distribution, random_numbers)
+        for rng_block_height, draw in zip(rng_block_heights, draws):
+            draw['rng_block_height'] = rng_block_height
+
+        return {'distribution_source': source,
+                'distribution': distribution,
+                'draws': draws}
+
     def get_distribution(self, source):
         """
         Get the distribution values for the random address
@@ -142,13 +405,31 @@ class RandomAddress(object):
         if not distribution:
             return {}
 
-        values = [item[1] for item in distribution]
-        chosen_index = self.get_chosen_index(values, random_number)
-        chosen_address = distribution[chosen_index][0]
+        result = self.results_batch(distribution, [random_number])[0]
+        del result['random_number']
 
-        return {'chosen_address': chosen_address,
-                'chosen_index': chosen_index,
-                'target': sum(values) * random_number}
+        return result
+
+    @staticmethod
+    def results_batch(distribution, random_numbers):
+        """
+        Pick an address from a given distribution for each of the given random numbers
+
+        :param distribution: A list of (address, value) tuples
+        :param random_numbers: A list of floating point numbers between 0 and 1
+        :return: A list containing a dict for each random number with the same keys as results() plus 'random_number'
+        """
+        if not distribution:
+            return [{'random_number': random_number} for random_number in random_numbers]
+
+        cumulative_distribution = CumulativeDistribution([item[1] for item in distribution])
+        chosen_indexes = cumulative_distribution.chosen_indexes(random_numbers)
+
+        return [{'random_number': random_number,
+                 'chosen_address': distribution[chosen_index][0] if chosen_index is not None else None,
+                 'chosen_index': chosen_index,
+                 'target': cumulative_distribution.total * random_number if random_number is not None else None}
+                for random_number, chosen_index in zip(random_numbers, chosen_indexes)]
 
     @staticmethod
     def get_chosen_index(values, random_number):
@@ -160,12 +441,4 @@ class RandomAddress(object):
         :param random_number: A floating number between 0 and 1
         :return: The index of the value that was chosen
         """
-        total = sum(values)
-
-        if total > 0:
-            target = random_number*total
-            cumulative = 0.0
-            for i in range(0, len(values)):
-                cumulative = cumulative + values[i]
-                if cumulative >= target:
-                    return i
+        return CumulativeDistribution(values).chosen_index(random_number)
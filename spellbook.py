@@ -259,6 +259,17 @@ get_random_address_parser.add_argument('-x', '--xpub', help='The xpub key (neede
 get_random_address_parser.add_argument('-b', '--block_height', help='The block height for the SIL to link with the corresponding address from the xpub (optional, default=latest block)', default=0)
 get_random_address_parser.add_argument('-e', '--explorer', help='Use specified explorer to retrieve data from the blockchain')
 
+# Create parser for the get_random_numbers subcommand
+get_random_numbers_parser = subparsers.add_parser(name='get_random_numbers',
+                                                  help='Get the random numbers derived from the blockhashes of a range of blocks',
+                                                  formatter_class=argparse.RawDescriptionHelpFormatter,
+                                                  description=texts.GET_RANDOM_NUMBERS_DESCRIPTION,
+                                                  epilog=texts.GET_RANDOM_NUMBERS_EPILOG)
+
+get_random_numbers_parser.add_argument('from_block_height', help='The first block height of the range', type=int)
+get_random_numbers_parser.add_argument('to_block_height', help='The last block height of the range (inclusive)', type=int)
+get_random_numbers_parser.add_argument('-e', '--explorer', help='Use specified explorer to retrieve data from the blockchain')
+
 
 # ----------------------------------------------------------------------------------------------------------------
 
@@ -315,6 +326,7 @@ save_trigger_parser.add_argument('-y', '--youtube', help='A video on youtube bel
 save_trigger_parser.add_argument('-v', '--visibility', help='The visibility of the trigger (Public or Private)', choices=['Public', 'Private'])
 save_trigger_parser.add_argument('-st', '--status', help='The status of the trigger (Pending, Active or Disabled)', choices=['Pending', 'Active', 'Disabled'])
 save_trigger_parser.add_argument('-ac', '--actions', help='The action ids to run when the trigger activates', nargs='*')
+save_trigger_parser.add_argument('-as', '--asynchronous', help='Respond to the requests of a HTTP request, Manual or SignedMessage trigger before its script and actions have run (only when the activation queue is enabled)', action='store_true')
 
 save_trigger_parser.add_argument('-k', '--api_key', help='API key for the spellbook REST API', default=key)
 save_trigger_parser.add_argument('-s', '--api_secret', help='API secret for the spellbook REST API', default=secret)
@@ -452,6 +464,8 @@ save_action_parser.add_argument('-reg_b', '--registration_block_height', help='T
 save_action_parser.add_argument('-reg_x', '--registration_xpub', help='The xpub key used for the registration of a distribution')
 save_action_parser.add_argument('-tft', '--tx_fee_type', help='The type of transaction fee to use: High, Medium, Low or Fixed', choices=['High', 'Medium', 'Low', 'Fixed'], default='Medium')
 save_action_parser.add_argument('-tf', '--tx_fee', help='The transaction fee in satoshis per byte to use in case of Fixed fee type', type=int)
+save_action_parser.add_argument('-cs', '--coin_selection', help='The strategy to select the utxos to spend when sending a specific amount (default: All)', choices=['All', 'BranchAndBound', 'Knapsack', 'LargestFirst', 'Consolidate'])
+save_action_parser.add_argument('-cfr', '--consolidation_fee_rate', help='The transaction fee in satoshis per byte at or below which the Consolidate strategy spends all utxos', type=int)
 
 save_action_parser.add_argument('-k', '--api_key', help='API key for the spellbook REST API', default=key)
 save_action_parser.add_argument('-s', '--api_secret', help='API secret for the spellbook REST API', default=secret)
@@ -657,6 +671,13 @@ def get_random_address():
                                                                                       source=args.source)
     do_get_request(url=url, data=data)
 
+
+def get_random_numbers():
+    url = 'http://{host}:{port}/spellbook/random/{from_block_height}/{to_block_height}'.format(host=host, port=port,
+                                                                                                from_block_height=args.from_block_height,
+                                                                                                to_block_height=args.to_block_height)
+    do_get_request(url=url)
+
 # ----------------------------------------------------------------------------------------------------------------
 # Triggers
 # ----------------------------------------------------------------------------------------------------------------
@@ -746,6 +767,9 @@ def save_trigger():
     if args.actions is not None:
         data['actions'] = args.actions
 
+    if args.asynchronous is True:
+        data['synchronous'] = False
+
     url = 'http://{host}:{port}/spellbook/triggers/{trigger_id}'.format(host=host, port=port, trigger_id=args.trigger_id)
     do_post_request(url=url, authenticate=True, data=data)
 
@@ -903,6 +927,12 @@ def save_action():
     if args.tx_fee is not None and args.tx_fee_type == 'Fixed':
         data['tx_fee'] = args.tx_fee
 
+    if args.coin_selection is not None:
+        data['coin_selection'] = args.coin_selection
+
+    if args.consolidation_fee_rate is not None:
+        data['consolidation_fee_rate'] = args.consolidation_fee_rate
+
     if args.distribution is not None and os.path.isfile(args.distribution):
         with open(args.distribution, 'r') as input_file:
             try:
@@ -1037,6 +1067,8 @@ elif args.command == 'get_lsl':
     get_lsl()
 elif args.command == 'get_random_address':
     get_random_address()
+elif args.command == 'get_random_numbers':
+    get_random_numbers()
 elif args.command == 'get_triggers':
     get_triggers()
 elif args.command == 'get_trigger_config':
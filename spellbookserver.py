@@ -18,16 +18,27 @@ from data.data import latest_block, block_by_height, block_by_hash, prime_input_
 from data.data import transactions, balance, utxos
 from decorators import authentication_required, use_explorer, output_json
 from helpers.actionhelpers import get_actions, get_action_config, save_action, delete_action, run_action, get_reveal
+from helpers.cryptobackendhelpers import get_crypto_backend
 from helpers.configurationhelpers import get_host, get_port, get_notification_email, get_mail_on_exception
+from helpers.configurationhelpers import get_enable_event_listener, get_enable_scheduler, get_use_testnet
+from helpers.configurationhelpers import get_preload_scripts, get_enable_activation_queue
+from helpers.configurationhelpers import get_batch_window
+from helpers.configurationhelpers import get_enable_sharding, get_shards, get_shard_lease_duration, get_shard_worker_id
 from helpers.hotwallethelpers import get_hot_wallet
 from helpers.loghelpers import LOG, REQUESTS_LOG, get_logs
+from helpers.scripthelpers import preload_scripts, get_script_metrics
+from helpers.shardhelpers import start_shard_manager
+from helpers.activationhelpers import get_activation_queue, get_job
+from helpers.triggerregistry import get_trigger_registry
+from helpers.triggereventhelpers import TriggerEventListener
+from helpers.triggerscheduler import get_trigger_scheduler
 from helpers.triggerhelpers import get_triggers, get_trigger_config, save_trigger, delete_trigger, activate_trigger, \
     check_triggers, verify_signed_message, http_get_request, http_post_request, http_delete_request, sign_message
 from helpers.mailhelpers import sendmail
 from inputs.inputs import get_sil, get_profile, get_sul
 from linker.linker import get_lal, get_lbl, get_lrl, get_lsl
 from randomaddress.randomaddress import random_address_from_sil, random_address_from_lbl, random_address_from_lrl, \
-    random_address_from_lsl
+    random_address_from_lsl, random_numbers_from_blockhashes
 from helpers.qrhelpers import generate_qr
 
 # Make sure the current working directory is correct
@@ -54,12 +65,55 @@ class SpellbookRESTAPI(Bottle):
 
         LOG.info('Starting Bitcoin Spellbook')
 
+        # Select the crypto backend now, so a native backend is self-tested before any keys are used
+        LOG.info('Crypto backend: %s' % get_crypto_backend().name)
+
         try:
             get_hot_wallet()
         except Exception as ex:
             LOG.error('Unable to decrypt hot wallet: %s' % ex)
             sys.exit(1)
 
+        # Load all triggers into the trigger registry
+        get_trigger_registry().refresh(force=True)
+        LOG.info('Loaded %s triggers' % len(get_trigger_registry()))
+
+        if get_preload_scripts() is True:
+            scripts = [get_trigger_config(trigger_id).get('script') for trigger_id in get_triggers()]
+            LOG.info('Preloaded %s spellbook scripts' % preload_scripts(scripts=[script for script in scripts if script is not None]))
+
+        # The shards must be known before the activation queue and the scheduler pick the triggers they handle
+        if get_enable_sharding() is True:
+            LOG.info('Starting shard manager')
+            try:
+                start_shard_manager(worker_id=get_shard_worker_id(), shards=get_shards(), lease_duration=get_shard_lease_duration())
+            except Exception as ex:
+                LOG.error('Unable to start shard manager: %s' % ex)
+                sys.exit(1)
+
+        # With sharding every activation is a job for the process that handles the trigger, so the queue is always needed
+        activation_queue_enabled = get_enable_activation_queue() is True or get_enable_sharding() is True
+
+        # Payments are batched by the workers of the activation queue, without the queue they would never be batched
+        if get_batch_window() > 0 and activation_queue_enabled is False:
+            LOG.error('Payments can only be batched by the activation queue: set enable_queue=true in [Activations] or batch_window=0 in [Transactions]')
+            sys.exit(1)
+
+        if activation_queue_enabled is True:
+            LOG.info('Starting activation queue')
+            get_activation_queue().start()
+
+        if get_enable_scheduler() is True:
+            LOG.info('Starting trigger scheduler')
+            get_trigger_scheduler().start()
+
+        if get_enable_event_listener() is True:
+            if get_use_testnet() is True:
+                LOG.warning('The trigger event listener is not available on testnet')
+            else:
+                LOG.info('Starting trigger event listener')
+                TriggerEventListener().start()
+
         LOG.info('To make the server run in the background: use Control-Z, then use command: bg %1')
 
         # Initialize the routes for the REST API
@@ -107,6 +161,9 @@ class SpellbookRESTAPI(Bottle):
         self.route('/spellbook/addresses/<address:re:[a-zA-Z1-9]+>/random/LRL', method='GET', callback=self.get_random_address_from_lrl)
         self.route('/spellbook/addresses/<address:re:[a-zA-Z1-9]+>/random/LSL', method='GET', callback=self.get_random_address_from_lsl)
 
+        # Routes for Random Numbers
+        self.route('/spellbook/random/<from_block_height:int>/<to_block_height:int>', method='GET', callback=self.get_random_numbers)
+
         # Routes for Triggers
         self.route('/spellbook/triggers', method='GET', callback=self.get_triggers)
         self.route('/spellbook/triggers/<trigger_id:re:[a-zA-Z0-9_\-.]+>', method='GET', callback=self.get_trigger)
@@ -118,6 +175,9 @@ class SpellbookRESTAPI(Bottle):
         self.route('/spellbook/triggers/<trigger_id:re:[a-zA-Z0-9_\-.]+>/post', method='POST', callback=self.http_post_request)
         self.route('/spellbook/triggers/<trigger_id:re:[a-zA-Z0-9_\-.]+>/delete', method='DELETE', callback=self.http_delete_request)
         self.route('/spellbook/triggers/<trigger_id:re:[a-zA-Z0-9_\-.]+>/check', method='GET', callback=self.check_trigger)
+
+        # Route for retrieving the status of a queued activation
+        self.route('/spellbook/jobs/<job_id:re:[a-zA-Z0-9_\-.]+>', method='GET', callback=self.get_job)
         self.route('/spellbook/check_triggers', method='GET', callback=self.check_all_triggers)
 
         # Additional routes for Rest API endpoints
@@ -142,6 +202,9 @@ class SpellbookRESTAPI(Bottle):
         # Routes for retrieving log messages
         self.route('/spellbook/logs/<filter_string>', method='GET', callback=self.get_logs)
 
+        # Route for retrieving the load times of the spellbook scripts
+        self.route('/spellbook/scripts/metrics', method='GET', callback=self.get_script_metrics)
+
         # Routes for RevealSecret actions
         self.route('/spellbook/actions/<action_id:re:[a-zA-Z0-9_\-.]+>/reveal', method='GET', callback=self.get_reveal)
 
@@ -431,6 +494,13 @@ class SpellbookRESTAPI(Bottle):
         xpub = request.json['xpub']
         return random_address_from_lsl(address=address, xpub=xpub, sil_block_height=sil_block_height, rng_block_height=rng_block_height)
 
+    @staticmethod
+    @output_json
+    @use_explorer
+    def get_random_numbers(from_block_height, to_block_height):
+        response.content_type = 'application/json'
+        return random_numbers_from_blockhashes(from_block_height=from_block_height, to_block_height=to_block_height)
+
     @staticmethod
     @output_json
     def get_triggers():
@@ -615,6 +685,24 @@ class SpellbookRESTAPI(Bottle):
         response.content_type = 'application/json'
         return get_logs(filter_string=filter_string)
 
+    @staticmethod
+    @output_json
+    @authentication_required
+    def get_job(job_id):
+        response.content_type = 'application/json'
+        job = get_job(job_id)
+        if len(job) > 0:
+            return job
+        else:
+            return {'error': 'Unknown job id: %s' % job_id}
+
+    @staticmethod
+    @output_json
+    @authentication_required
+    def get_script_metrics():
+        response.content_type = 'application/json'
+        return get_script_metrics()
+
 
 if __name__ == "__main__":
     SpellbookRESTAPI()
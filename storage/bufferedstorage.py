@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import copy
+import threading
+from contextlib import contextmanager
+
+from helpers.loghelpers import LOG
+from .storage import Storage
+
+# Marks an object that has been deleted but the deletion is not written yet
+DELETED = object()
+
+
+class BufferedStorage(Storage):
+    """
+    Write-behind buffer in front of another storage backend
+
+    Saves and deletes are kept in memory and written to the backend by flush, so saving the same object several times
+    (for example a trigger during its activation) only results in a single write.
+    The buffer is flushed after each check of the triggers, before each transaction, at most delay seconds after the
+    first buffered change and when the program exits; changes that are still buffered are lost when the program crashes.
+    """
+    def __init__(self, storage, delay=5):
+        self.storage = storage
+        self.delay = delay
+
+        self.pending = {}
+        self.lock = threading.RLock()
+        self.timer = None
+        self.local = threading.local()
+
+    @property
+    def supports_transactions(self):
+        return self.storage.supports_transactions
+
+    def now(self):
+        return self.storage.now()
+
+    def in_transaction(self):
+        return getattr(self.local, 'depth', 0) > 0
+
+    def start_timer(self):
+        # This must be called while holding the lock
+        if self.timer is None:
+            self.timer = threading.Timer(self.delay, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """
+        Write all buffered changes to the backend
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+            if len(self.pending) == 0:
+                return
+
+            pending, self.pending = self.pending, {}
+            try:
+                with self.storage.transaction():
+                    for (kind, object_id), config in sorted(pending.items(), key=lambda item: item[0]):
+                        if config is DELETED:
+                            self.storage.delete(kind, object_id)
+                        else:
+                            self.storage.save(kind, object_id, config)
+            except Exception as ex:
+                LOG.error('Failed to write %s buffered changes: %s' % (len(pending), ex))
+                # Keep the changes that have not been replaced by newer ones, so they are written on the next flush
+                for key, config in pending.items():
+                    self.pending.setdefault(key, config)
+                self.start_timer()
+                raise
+
+    def get_ids(self, kind):
+        with self.lock:
+            object_ids = set(self.storage.get_ids(kind))
+            for (pending_kind, object_id), config in self.pending.items():
+                if pending_kind == kind:
+                    if config is DELETED:
+                        object_ids.discard(object_id)
+                    else:
+                        object_ids.add(object_id)
+
+        return sorted(object_ids)
+
+    def get(self, kind, object_id):
+        with self.lock:
+            if (kind, object_id) in self.pending:
+                config = self.pending[(kind, object_id)]
+                return None if config is DELETED else copy.deepcopy(config)
+
+        return self.storage.get(kind, object_id)
+
+    def save(self, kind, object_id, config):
+        with self.lock:
+            if self.in_transaction():
+                self.pending.pop((kind, object_id), None)
+                self.storage.save(kind, object_id, config)
+            else:
+                self.pending[(kind, object_id)] = copy.deepcopy(config)
+                self.start_timer()
+
+    def delete(self, kind, object_id):
+        with self.lock:
+            if self.in_transaction():
+                self.pending.pop((kind, object_id), None)
+                return self.storage.delete(kind, object_id)
+
+            exists = self.get(kind, object_id) is not None
+            if exists:
+                self.pending[(kind, object_id)] = DELETED
+                self.start_timer()
+
+            return exists
+
+    def find(self, kind, **criteria):
+        self.flush()
+        return self.storage.find(kind, **criteria)
+
+    def get_changes(self, kind, token=None):
+        # Buffered changes made by this process are already known to this process
+        return self.storage.get_changes(kind, token=token)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Changes made within a transaction bypass the buffer, so they are written to the backend together
+        """
+        if not self.in_transaction():
+            self.flush()
+
+        self.local.depth = getattr(self.local, 'depth', 0) + 1
+        try:
+            with self.storage.transaction() as transaction:
+                yield transaction
+        finally:
+            self.local.depth -= 1
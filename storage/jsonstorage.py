@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import glob
+import os
+from contextlib import contextmanager
+
+from helpers.jsonhelpers import save_to_json_file, load_from_json_file
+from helpers.loghelpers import LOG
+from .storage import Storage, check_criteria
+
+
+class JSONStorage(Storage):
+    """
+    Stores each object as a json file, for example json/public/triggers/<trigger_id>.json
+    """
+    def __init__(self, directory, fsync=False):
+        self.directory = directory
+        self.fsync = fsync
+
+    def filename(self, kind, object_id):
+        return os.path.join(self.directory, kind, '%s.json' % object_id)
+
+    def get_ids(self, kind):
+        filenames = glob.glob(os.path.join(self.directory, kind, '*.json'))
+
+        return sorted([os.path.splitext(os.path.basename(filename))[0] for filename in filenames])
+
+    def get(self, kind, object_id):
+        try:
+            return load_from_json_file(self.filename(kind, object_id))
+        except IOError:
+            return None
+
+    def save(self, kind, object_id, config):
+        save_to_json_file(self.filename(kind, object_id), config, fsync=self.fsync)
+
+    def delete(self, kind, object_id):
+        filename = self.filename(kind, object_id)
+        if not os.path.isfile(filename):
+            return False
+
+        os.remove(filename)
+        return True
+
+    def find(self, kind, **criteria):
+        check_criteria(kind, criteria)
+
+        object_ids = []
+        for object_id in self.get_ids(kind):
+            config = self.get(kind, object_id)
+            if isinstance(config, dict) and all(config.get(key) == value for key, value in criteria.items()):
+                object_ids.append(object_id)
+
+        return object_ids
+
+    def get_changes(self, kind, token=None):
+        """
+        The token is a dict containing the modification time and size of each file, only the files that are new or
+        have a different modification time or size are loaded
+        """
+        token = {} if token is None else token
+
+        file_stats = {}
+        directory = os.path.join(self.directory, kind)
+        if os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                if entry.is_file() and entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    file_stats[entry.name[:-5]] = (stat.st_mtime_ns, stat.st_size)
+
+        changed = {}
+        for object_id, file_stat in file_stats.items():
+            if token.get(object_id) != file_stat:
+                config = self.get(kind, object_id)
+                if isinstance(config, dict):
+                    changed[object_id] = config
+                else:
+                    # The file was deleted after the directory was scanned or it is being written, try again next time
+                    LOG.error('Invalid configuration in %s' % self.filename(kind, object_id))
+                    file_stats.pop(object_id)
+
+        deleted = [object_id for object_id in token if object_id not in file_stats]
+
+        return file_stats, changed, deleted
+
+    @contextmanager
+    def transaction(self):
+        # Separate json files can not be updated atomically, each change is written right away
+        yield
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import simplejson
+
+from .storage import Storage, INDEXED_KEYS, check_criteria
+
+
+class SQLiteStorage(Storage):
+    """
+    Stores the objects in a SQLite database, with a table for each kind of object
+
+    Each table has a column with the json-encoded configuration and an indexed column for each of the INDEXED_KEYS,
+    so finding objects doesn't need to load all of them.
+    Each save or delete gets a new revision number, deleted objects are kept as a row without configuration, so other
+    processes can find out what changed since their last revision with get_changes.
+    """
+    supports_transactions = True
+
+    def __init__(self, database_file, fsync=False):
+        self.database_file = database_file
+        self.fsync = fsync
+        self.local = threading.local()
+
+        directory = os.path.dirname(self.database_file)
+        if directory != '' and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.create_tables()
+
+    def connection(self):
+        """
+        Get the connection of the current thread, sqlite connections can not be shared between threads
+
+        :return: A sqlite3 Connection object
+        """
+        if getattr(self.local, 'connection', None) is None:
+            # Transactions are started explicitly in transaction(), so isolation_level is None
+            connection = sqlite3.connect(self.database_file, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # With NORMAL, a power failure can undo the last transactions but never corrupts the database
+            connection.execute('PRAGMA synchronous=%s' % ('FULL' if self.fsync is True else 'NORMAL'))
+            self.local.connection = connection
+            self.local.depth = 0
+
+        return self.local.connection
+
+    def create_tables(self):
+        connection = self.connection()
+        for kind, keys in sorted(INDEXED_KEYS.items()):
+            columns = ''.join(['%s TEXT, ' % key for key in keys])
+            connection.execute('CREATE TABLE IF NOT EXISTS %s (id TEXT PRIMARY KEY, %sconfig TEXT, deleted INTEGER NOT NULL DEFAULT 0, revision INTEGER NOT NULL)' % (kind, columns))
+            connection.execute('CREATE INDEX IF NOT EXISTS %s_revision ON %s (revision)' % (kind, kind))
+            for key in keys:
+                connection.execute('CREATE INDEX IF NOT EXISTS %s_%s ON %s (%s)' % (kind, key, kind, key))
+
+    @contextmanager
+    def transaction(self):
+        connection = self.connection()
+        depth = self.local.depth
+
+        # Nested transactions are savepoints within the outermost transaction, so a nested transaction that fails is
+        # rolled back on its own, even if the caller catches the exception and the outermost transaction is committed
+        if depth == 0:
+            connection.execute('BEGIN IMMEDIATE')
+        else:
+            connection.execute('SAVEPOINT nested_%s' % depth)
+        self.local.depth += 1
+
+        try:
+            yield connection
+        except Exception:
+            self.local.depth -= 1
+            if depth == 0:
+                connection.execute('ROLLBACK')
+            else:
+                connection.execute('ROLLBACK TO nested_%s' % depth)
+                connection.execute('RELEASE nested_%s' % depth)
+            raise
+        else:
+            self.local.depth -= 1
+            if depth == 0:
+                connection.execute('COMMIT')
+            else:
+                connection.execute('RELEASE nested_%s' % depth)
+
+    @staticmethod
+    def next_revision(connection, kind):
+        return connection.execute('SELECT COALESCE(MAX(revision), 0) + 1 FROM %s' % kind).fetchone()[0]
+
+    def now(self):
+        # All processes that share a sqlite database in WAL mode must be on the same host, so they share this clock
+        return self.connection().execute("SELECT (julianday('now') - 2440587.5) * 86400.0").fetchone()[0]
+
+    def get_ids(self, kind):
+        rows = self.connection().execute('SELECT id FROM %s WHERE deleted = 0 ORDER BY id' % kind).fetchall()
+
+        return [row[0] for row in rows]
+
+    def get(self, kind, object_id):
+        row = self.connection().execute('SELECT config FROM %s WHERE id = ? AND deleted = 0' % kind, (object_id,)).fetchone()
+
+        return simplejson.loads(row[0]) if row is not None else None
+
+    def save(self, kind, object_id, config):
+        keys = INDEXED_KEYS[kind]
+        values = [config.get(key) for key in keys]
+
+        with self.transaction() as connection:
+            connection.execute('INSERT OR REPLACE INTO %s (id, %s, config, deleted, revision) VALUES (?, %s, ?, 0, ?)' % (kind, ', '.join(keys), ', '.join(['?'] * len(keys))),
+                               [object_id] + values + [simplejson.dumps(config, sort_keys=True), self.next_revision(connection, kind)])
+
+    def delete(self, kind, object_id):
+        with self.transaction() as connection:
+            cursor = connection.execute('UPDATE %s SET config = NULL, deleted = 1, revision = ? WHERE id = ? AND deleted = 0' % kind,
+                                        (self.next_revision(connection, kind), object_id))
+
+            return cursor.rowcount > 0
+
+    def find(self, kind, **criteria):
+        check_criteria(kind, criteria)
+
+        keys = sorted(criteria.keys())
+        where = ''.join([' AND %s = ?' % key for key in keys])
+        rows = self.connection().execute('SELECT id FROM %s WHERE deleted = 0%s ORDER BY id' % (kind, where), [criteria[key] for key in keys]).fetchall()
+
+        return [row[0] for row in rows]
+
+    def get_changes(self, kind, token=None):
+        """
+        The token is the highest revision that has been seen
+        """
+        token = 0 if token is None else token
+
+        rows = self.connection().execute('SELECT id, config, deleted, revision FROM %s WHERE revision > ? ORDER BY revision' % kind, (token,)).fetchall()
+
+        changed = {}
+        deleted = []
+        for object_id, config, is_deleted, revision in rows:
+            token = max(token, revision)
+            if is_deleted:
+                changed.pop(object_id, None)
+                deleted.append(object_id)
+            else:
+                changed[object_id] = simplejson.loads(config)
+
+        return token, changed, [object_id for object_id in deleted if object_id not in changed]
+
+    def is_empty(self):
+        """
+        Check if no objects have ever been stored in the database
+
+        :return: True or False
+        """
+        connection = self.connection()
+
+        return all(connection.execute('SELECT COUNT(*) FROM %s' % kind).fetchone()[0] == 0 for kind in INDEXED_KEYS)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+from abc import abstractmethod, ABCMeta
+
+TRIGGERS = 'triggers'
+ACTIONS = 'actions'
+JOBS = 'jobs'
+LEASES = 'leases'
+
+# The keys of the configurations that are stored in indexed columns, so objects can be found without loading all of them
+INDEXED_KEYS = {TRIGGERS: ['trigger_type', 'status', 'address', 'txid'],
+                ACTIONS: ['action_type'],
+                JOBS: ['status', 'trigger_id'],
+                LEASES: ['lease_type', 'owner']}
+
+
+class Storage(object):
+    """
+    Base class for the storage backends of the triggers and actions
+
+    Each object is stored as a dict with its configuration, the kind of object is TRIGGERS, ACTIONS, JOBS or LEASES
+    """
+    __metaclass__ = ABCMeta
+
+    # True if the changes within a transaction are stored atomically and transactions of other processes are serialized
+    supports_transactions = False
+
+    @abstractmethod
+    def get_ids(self, kind):
+        """
+        Get the ids of all objects of a kind
+
+        :param kind: TRIGGERS or ACTIONS
+        :return: A sorted list of ids
+        """
+        pass
+
+    @abstractmethod
+    def get(self, kind, object_id):
+        """
+        Get the configuration of an object
+
+        :param kind: TRIGGERS or ACTIONS
+        :param object_id: The id of the object
+        :return: A dict containing the configuration of the object or None if the object does not exist
+        """
+        pass
+
+    @abstractmethod
+    def save(self, kind, object_id, config):
+        """
+        Save the configuration of an object, an existing object with the same id is replaced
+
+        :param kind: TRIGGERS or ACTIONS
+        :param object_id: The id of the object
+        :param config: A dict containing the configuration of the object (must be json-encodable)
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, kind, object_id):
+        """
+        Delete an object
+
+        :param kind: TRIGGERS or ACTIONS
+        :param object_id: The id of the object
+        :return: True if the object was deleted, False if it did not exist
+        """
+        pass
+
+    @abstractmethod
+    def find(self, kind, **criteria):
+        """
+        Get the ids of all objects of a kind matching the given criteria
+
+        :param kind: TRIGGERS or ACTIONS
+        :param criteria: Values of the indexed keys, for example status='Active'
+        :return: A sorted list of ids
+        """
+        pass
+
+    @abstractmethod
+    def get_changes(self, kind, token=None):
+        """
+        Get the objects that were saved or deleted since the given token, also by other processes
+
+        :param kind: TRIGGERS or ACTIONS
+        :param token: The token returned by the previous call, None to get all objects
+        :return: A tuple of (new token, dict of id -> configuration of the changed objects, list of ids of the deleted objects)
+        """
+        pass
+
+    @abstractmethod
+    def transaction(self):
+        """
+        Context manager to save and delete multiple objects at once, either all changes are stored or none of them
+        Transactions can be nested, the changes of a nested transaction that fails are not stored
+
+        :return: A context manager
+        """
+        pass
+
+    def flush(self):
+        """
+        Write any buffered changes, backends without a buffer write each change right away
+        """
+        pass
+
+    def now(self):
+        """
+        Get the current time of the storage, all processes that share the storage compare the expiration times of the
+        leases with this clock instead of with their own clock
+
+        :return: A timestamp in seconds
+        """
+        return time.time()
+
+
+def check_criteria(kind, criteria):
+    unknown_keys = [key for key in criteria if key not in INDEXED_KEYS[kind]]
+    if len(unknown_keys) > 0:
+        raise ValueError('Can not find %s by %s, only by %s' % (kind, ', '.join(unknown_keys), ', '.join(INDEXED_KEYS[kind])))
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse
+import os
+
+# The storage paths in the configuration file are relative to the spellbook directory
+os.chdir(os.path.abspath(os.path.dirname(__file__)))
+
+from helpers.storagehelpers import get_storage, import_from_json, export_to_json, JSON_DIR
+from storage.storage import TRIGGERS, ACTIONS
+
+
+if __name__ == "__main__":
+    # Create main parser
+    parser = argparse.ArgumentParser(description='Import or export the triggers and actions as json files',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', help='import or export', choices=['import', 'export'])
+    parser.add_argument('-d', '--directory', help='The directory that holds the triggers and actions directories (default: %s)' % JSON_DIR, default=JSON_DIR)
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        counts = import_from_json(storage=get_storage(), directory=args.directory)
+    else:
+        counts = export_to_json(storage=get_storage(), directory=args.directory)
+
+    print('%sed %s triggers and %s actions' % (args.command.capitalize(), counts[TRIGGERS], counts[ACTIONS]))
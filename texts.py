@@ -287,6 +287,16 @@ examples:
     -> Get a random address from the LSL of address 1BAZ9hiAsMdSyw8CMeUoH4LeBnj7u6D7o8 with given xpub key using the blockhash of block 480000 as a random number
 '''
 
+########################################################################################################
+# get_random_numbers                                                                                   #
+########################################################################################################
+GET_RANDOM_NUMBERS_DESCRIPTION = 'Get the random numbers derived from the blockhashes of a range of blocks (at most 1000 blocks).'
+GET_RANDOM_NUMBERS_EPILOG = '''
+examples:
+  - spellbook.py get_random_numbers 480000 480009
+    -> Get the random numbers derived from the blockhashes of block 480000 up to and including block 480009
+'''
+
 ########################################################################################################
 # get_triggers                                                                                         #
 ########################################################################################################
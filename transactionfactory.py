@@ -1,14 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import hmac
 import copy
+import multiprocessing
 
 from helpers.py2specials import *
 from helpers.py3specials import *
 
 from helpers.privatekeyhelpers import privkey_to_pubkey, decode_privkey, get_privkey_format, encode_privkey
-from helpers.publickeyhelpers import pubkey_to_address
-from helpers.jacobianhelpers import fast_multiply, inv, G, N
+from helpers.publickeyhelpers import pubkey_to_address, bin_hash160, compress, decode_pubkey
+from helpers.cryptobackendhelpers import get_crypto_backend, set_crypto_backend, rfc6979_nonce
+from helpers.txsizehelpers import get_script_type, P2PKH, P2SH, P2WPKH
 from helpers.bech32 import bech32_decode
 from helpers.bech32 import decode as decode_witness_program
 
@@ -25,7 +26,7 @@ SIGHASH_ANYONECANPAY = 0x81
 is_python2 = sys.version_info.major == 2
 
 
-def make_custom_tx(private_keys, tx_inputs, tx_outputs, tx_fee=0, op_return_data=None, allow_zero_conf=False):
+def make_custom_tx(private_keys, tx_inputs, tx_outputs, tx_fee=0, op_return_data=None, allow_zero_conf=False, parallel_signing_min_inputs=0, signing_processes=None):
     """
     Construct a custom transaction
 
@@ -36,6 +37,8 @@ def make_custom_tx(private_keys, tx_inputs, tx_outputs, tx_fee=0, op_return_data
     :param tx_fee: The total transaction fee in satoshis (The fee must be equal to the difference of the inputs and the outputs, this is an extra safety precaution)
     :param op_return_data: an optional message to add as an OP_RETURN output (max 80 chars)
     :param allow_zero_conf: Allow zero confirmation inputs (default=False)
+    :param parallel_signing_min_inputs: Sign the inputs with a pool of worker processes if the transaction has at least this many inputs (default=0: never)
+    :param signing_processes: The number of worker processes for parallel signing (default=None: the number of cpus)
     :return: A raw transaction
     """
     # Check if the transaction fee is valid
@@ -71,18 +74,469 @@ def make_custom_tx(private_keys, tx_inputs, tx_outputs, tx_fee=0, op_return_data
         LOG.error('OP_RETURN data is longer than 80 characters')
         return
 
-    # All is good, make the transaction
-    tx = mktx(tx_inputs, tx_outputs)
+    # Utxos of P2WPKH addresses and of P2SH addresses (assumed to be P2SH-P2WPKH) are spent with a segwit signature
+    script_types = [get_script_type(tx_input['address']) for tx_input in tx_inputs]
+    for tx_input, script_type in zip(tx_inputs, script_types):
+        if script_type not in [P2PKH, P2SH, P2WPKH]:
+            LOG.error('Can not spend utxos of address %s' % tx_input['address'])
+            return
+
+        if script_type in [P2SH, P2WPKH] and not segwit_key_matches(address=tx_input['address'], priv=str(private_keys[tx_input['address']])):
+            LOG.error('Private key does not match the P2WPKH or P2SH-P2WPKH address %s (segwit requires a compressed key)' % tx_input['address'])
+            return
+
+    # All is good, make the transaction (including the OP_RETURN message if necessary)
+    tx = BinaryTransaction.build(tx_inputs=tx_inputs, tx_outputs=tx_outputs, op_return_data=op_return_data if isinstance(op_return_data, string_types) else None)
+
+    # Now sign each transaction input with the private key, the signatures are spliced into the binary transaction in place
+    if 0 < parallel_signing_min_inputs <= len(tx_inputs):
+        LOG.info('Signing %s inputs with a pool of worker processes' % len(tx_inputs))
+        sign_in_parallel(tx=tx, private_keys=private_keys, tx_inputs=tx_inputs, script_types=script_types, processes=signing_processes)
+    else:
+        sign_inputs(tx=tx, private_keys=private_keys, tx_inputs=tx_inputs, script_types=script_types)
+
+    return tx.to_hex()
+
+
+class BinaryTransaction(object):
+    """
+    A transaction in binary format that is signed in place
+
+    The transaction without witnesses is kept in a single bytearray together with the offsets of the script of each
+    input, so a signature can be spliced in without serializing the rest of the transaction again. The witnesses are kept
+    per input and are only added when the transaction is serialized.
+    """
+    def __init__(self, tx):
+        """
+        Constructor for a BinaryTransaction object
+
+        :param tx: A transaction in binary or hexadecimal format, with or without witnesses
+        """
+        if isinstance(tx, string_types) and re.match('^[0-9a-fA-F]*$', tx):
+            tx = binascii.unhexlify(tx)
+
+        self.data = bytearray()
+        self.scripts = []  # The start and end of the script of each input in self.data, including the length of the script
+        self.witnesses = []
+        self.hashes = None
+        self.blank = None
+        self.blank_positions = None
+
+        self.parse(memoryview(tx))
+
+    def parse(self, tx):
+        segwit = tx[4] == 0 and tx[5] == 1
+        pos = 6 if segwit else 4
+        self.data += tx[:4]
+
+        n_inputs, pos = read_var_int(tx, pos)
+        self.data += num_to_var_int(n_inputs)
+        for _ in range(n_inputs):
+            script_length, script_start = read_var_int(tx, pos + 36)
+            script_end = script_start + script_length
+            self.data += tx[pos:pos + 36]
+            self.scripts.append([len(self.data), len(self.data) + script_end - pos - 36])
+            self.data += tx[pos + 36:script_end + 4]
+            pos = script_end + 4
+
+        outputs_start = pos
+        n_outputs, pos = read_var_int(tx, pos)
+        for _ in range(n_outputs):
+            script_length, pos = read_var_int(tx, pos + 8)
+            pos += script_length
+        self.data += tx[outputs_start:pos]
+
+        for _ in range(n_inputs):
+            witness = []
+            if segwit:
+                n_items, pos = read_var_int(tx, pos)
+                for _ in range(n_items):
+                    item_length, pos = read_var_int(tx, pos)
+                    witness.append(bytes(tx[pos:pos + item_length]))
+                    pos += item_length
+            self.witnesses.append(witness)
+
+        self.data += tx[pos:pos + 4]
+
+    @classmethod
+    def build(cls, tx_inputs, tx_outputs, op_return_data=None, version=1, locktime=0):
+        """
+        Make an unsigned transaction
+
+        :param tx_inputs: a list of dicts containing the key 'output' formatted as 'txid:i'
+        :param tx_outputs: a list of dicts containing the keys 'address' and 'value'
+        :param op_return_data: an optional message to add as an OP_RETURN output (max 80 chars)
+        :param version: The version of the transaction (default=1)
+        :param locktime: The locktime of the transaction (default=0)
+        :return: A BinaryTransaction object
+        """
+        data = bytearray(encode(version, 256, 4)[::-1])
+        data += num_to_var_int(len(tx_inputs))
+        for tx_input in tx_inputs:
+            data += binascii.unhexlify(tx_input['output'][:64])[::-1] + encode(int(tx_input['output'][65:]), 256, 4)[::-1]
+            data += b'\x00\xff\xff\xff\xff'
+
+        outputs = [(tx_output['value'], binascii.unhexlify(address_to_script(tx_output['address']))) for tx_output in tx_outputs]
+        if op_return_data is not None:
+            outputs.append((0, binascii.unhexlify(add_op_return(op_return_data))))
+
+        data += num_to_var_int(len(outputs))
+        for value, script in outputs:
+            data += encode(value, 256, 8)[::-1] + num_to_var_int(len(script)) + script
+
+        data += encode(locktime, 256, 4)[::-1]
+
+        return cls(bytes(data))
+
+    def outpoint(self, i):
+        start = self.scripts[i][0]
+        return memoryview(self.data)[start - 36:start]
+
+    def sequence(self, i):
+        end = self.scripts[i][1]
+        return memoryview(self.data)[end:end + 4]
+
+    def outputs(self):
+        """
+        Get the serialized outputs
+
+        :return: A list of memoryviews, one for each output
+        """
+        data = memoryview(self.data)
+        n_outputs, pos = read_var_int(data, self.scripts[-1][1] + 4 if len(self.scripts) > 0 else 5)
+
+        outputs = []
+        for _ in range(n_outputs):
+            script_length, script_start = read_var_int(data, pos + 8)
+            outputs.append(data[pos:script_start + script_length])
+            pos = script_start + script_length
+
+        return outputs
+
+    def set_script(self, i, script):
+        """
+        Splice the script of an input into the transaction, only the offsets of the next inputs need to be updated
+
+        :param i: The index of the input
+        :param script: The script in binary format
+        """
+        start, end = self.scripts[i]
+        script = num_to_var_int(len(script)) + script
+        self.data[start:end] = script
+
+        shift = len(script) - (end - start)
+        self.scripts[i][1] += shift
+        if shift != 0:
+            for offsets in self.scripts[i + 1:]:
+                offsets[0] += shift
+                offsets[1] += shift
+
+    def set_witness(self, i, witness):
+        self.witnesses[i] = witness
+
+    def legacy_signature_hash(self, i, script_code, hashcode=SIGHASH_ALL):
+        """
+        Get the hash that is signed by a legacy input, the transaction with the script code as the script of the input
+        and empty scripts for all other inputs (only SIGHASH_ALL is supported)
+
+        The transaction with empty scripts is made once and hashed without copying it
+
+        :param i: The index of the input
+        :param script_code: The script code of the input in binary format
+        :param hashcode: SIGHASH_ALL
+        :return: The hash in binary format
+        """
+        if hashcode != SIGHASH_ALL:
+            raise NotImplementedError('Only SIGHASH_ALL is supported when signing a binary transaction')
+
+        if self.blank is None:
+            outputs = self.outputs()
+            self.blank = bytearray(self.data[:4]) + num_to_var_int(len(self.scripts))
+            self.blank_positions = []
+            for j in range(len(self.scripts)):
+                self.blank += self.outpoint(j)
+                self.blank_positions.append(len(self.blank))
+                self.blank += b'\x00' + self.sequence(j)
+            self.blank += num_to_var_int(len(outputs)) + b''.join(outputs) + self.data[-4:]
+
+        position = self.blank_positions[i]
+        blank = memoryview(self.blank)
+
+        sha256 = hashlib.sha256(blank[:position])
+        sha256.update(num_to_var_int(len(script_code)) + script_code)
+        sha256.update(blank[position + 1:])
+        sha256.update(encode(hashcode, 256, 4)[::-1])
+
+        return hashlib.sha256(sha256.digest()).digest()
+
+    def bip143_signature_hash(self, i, script_code, amount, hashcode=SIGHASH_ALL):
+        """
+        Get the hash that is signed by a segwit input (BIP143), hashPrevouts, hashSequence and hashOutputs are calculated
+        once for the transaction
+
+        :param i: The index of the input
+        :param script_code: The script code of the input in binary format
+        :param amount: The value of the utxo that is spent by the input in satoshis
+        :param hashcode: SIGHASH_ALL = 1, SIGHASH_NONE = 2, SIGHASH_SINGLE = 3, SIGHASH_ANYONECANPAY = 0x81
+        :return: The hash in binary format
+        """
+        if self.hashes is None:
+            self.hashes = {'prevouts': bin_dbl_sha256(b''.join([self.outpoint(j) for j in range(len(self.scripts))])),
+                           'sequence': bin_dbl_sha256(b''.join([self.sequence(j) for j in range(len(self.scripts))])),
+                           'outputs': bin_dbl_sha256(b''.join(self.outputs()))}
+
+        base_type = hashcode & 0x1f
+        anyone_can_pay = hashcode & 0x80 != 0
+        zero_hash = b'\x00' * 32
+
+        hash_prevouts = zero_hash if anyone_can_pay else self.hashes['prevouts']
+        hash_sequence = zero_hash if anyone_can_pay or base_type in [SIGHASH_NONE, SIGHASH_SINGLE] else self.hashes['sequence']
+        if base_type not in [SIGHASH_NONE, SIGHASH_SINGLE]:
+            hash_outputs = self.hashes['outputs']
+        elif base_type == SIGHASH_SINGLE and i < len(self.outputs()):
+            hash_outputs = bin_dbl_sha256(self.outputs()[i].tobytes())
+        else:
+            hash_outputs = zero_hash
+
+        return bin_dbl_sha256(bytes(self.data[:4]) + hash_prevouts + hash_sequence + self.outpoint(i).tobytes() +
+                              num_to_var_int(len(script_code)) + script_code + encode(amount, 256, 8)[::-1] +
+                              self.sequence(i).tobytes() + hash_outputs + bytes(self.data[-4:]) + encode(hashcode, 256, 4)[::-1])
+
+    def signature_hash(self, i, pub, amount=None, script_type=P2PKH, hashcode=SIGHASH_ALL):
+        """
+        Get the hash that is signed by an input, the hash does not depend on the signatures of the other inputs
+
+        :param i: The index of the input
+        :param pub: The public key of the input (see signing_pubkey)
+        :param amount: The value of the utxo that is spent by the input in satoshis (only needed for segwit inputs)
+        :param script_type: The script type of the address of the utxo: P2PKH, P2WPKH or P2SH (P2SH-P2WPKH)
+        :param hashcode: SIGHASH_ALL = 1
+        :return: The hash in binary format
+        """
+        if script_type == P2PKH:
+            return self.legacy_signature_hash(i, binascii.unhexlify(p2pkh_script(pubkey_to_address(pub))), hashcode)
+
+        # The script code of a P2WPKH input is the P2PKH script of the public key hash
+        script_code = binascii.unhexlify('76a9' + p2wpkh_redeem_script(pub)[2:] + '88ac')
+
+        return self.bip143_signature_hash(i, script_code, amount, hashcode)
+
+    def add_signature(self, i, sig, pub, script_type=P2PKH):
+        """
+        Splice the signature of an input into the transaction
+
+        :param i: The index of the input
+        :param sig: The DER encoded signature including the hashcode in hex format
+        :param pub: The public key of the input (see signing_pubkey)
+        :param script_type: The script type of the address of the utxo: P2PKH, P2WPKH or P2SH (P2SH-P2WPKH)
+        """
+        if script_type == P2PKH:
+            self.set_script(i, binascii.unhexlify(serialize_script([sig, pub])))
+            return
+
+        if script_type == P2SH:
+            self.set_script(i, binascii.unhexlify(serialize_script([p2wpkh_redeem_script(pub)])))
+        self.set_witness(i, [binascii.unhexlify(sig), binascii.unhexlify(pub)])
+
+    def sign(self, i, priv, amount=None, script_type=P2PKH, hashcode=SIGHASH_ALL):
+        """
+        Sign an input in place
+
+        :param i: The index of the input
+        :param priv: The private key
+        :param amount: The value of the utxo that is spent by the input in satoshis (only needed for segwit inputs)
+        :param script_type: The script type of the address of the utxo: P2PKH, P2WPKH or P2SH (P2SH-P2WPKH)
+        :param hashcode: SIGHASH_ALL = 1
+        """
+        if len(priv) <= 33:
+            priv = safe_hexlify(priv)
+
+        pub = signing_pubkey(priv, script_type)
+        signing_hash = self.signature_hash(i, pub, amount, script_type, hashcode)
+        sig = der_encode_sig(*ecdsa_raw_sign(signing_hash, priv)) + encode(hashcode, 16, 2)
+        self.add_signature(i, sig, pub, script_type)
+
+    def serialize(self):
+        """
+        Get the transaction in binary format, including the witnesses if there are any
+
+        :return: The transaction in binary format
+        """
+        if not any([len(witness) > 0 for witness in self.witnesses]):
+            return bytes(self.data)
+
+        witnesses = bytearray()
+        for witness in self.witnesses:
+            witnesses += num_to_var_int(len(witness))
+            for item in witness:
+                witnesses += num_to_var_int(len(item)) + item
+
+        return bytes(self.data[:4] + b'\x00\x01' + self.data[4:-4] + witnesses + self.data[-4:])
+
+    def to_hex(self):
+        return safe_hexlify(self.serialize())
+
+    def txid(self):
+        # The txid does not include the witnesses
+        return safe_hexlify(bin_dbl_sha256(bytes(self.data))[::-1])
+
+
+def signing_pubkey(priv, script_type=P2PKH):
+    """
+    Get the public key that goes into the script or the witness of an input
+
+    :param priv: The private key
+    :param script_type: The script type of the address of the utxo: P2PKH, P2WPKH or P2SH (P2SH-P2WPKH)
+    :return: The public key in hex format
+    """
+    if script_type == P2PKH:
+        return privkey_to_pubkey(priv)
+
+    # Segwit only allows compressed public keys
+    return compress(privkey_to_pubkey(priv))
+
+
+def signing_privkey(private_keys, address):
+    """
+    Get the private key of an address in the format that is used to sign an input
+
+    :param private_keys: a dict containing a key for each required address with the corresponding private key
+    :param address: The address of the input
+    :return: The private key
+    """
+    priv = str(private_keys[address])
+    if len(priv) <= 33:
+        priv = safe_hexlify(priv)
+
+    return priv
+
+
+def signature_hashes(tx, private_keys, tx_inputs, script_types, hashcode=SIGHASH_ALL):
+    """
+    Calculate the hashes that are signed by all inputs of a BinaryTransaction, the public key of each private key is
+    only calculated once
+
+    :param tx: A BinaryTransaction object
+    :param private_keys: a dict containing a key for each required address with the corresponding private key
+    :param tx_inputs: a list of dicts containing the keys 'address' and 'value'
+    :param script_types: a list containing the script type of each input
+    :param hashcode: SIGHASH_ALL = 1
+    :return: A list containing a tuple with the public key and the hash in binary format of each input
+    """
+    pubs, hashes = {}, []
+    for i, tx_input in enumerate(tx_inputs):
+        if (tx_input['address'], script_types[i]) not in pubs:
+            pubs[(tx_input['address'], script_types[i])] = signing_pubkey(signing_privkey(private_keys, tx_input['address']), script_types[i])
+
+        pub = pubs[(tx_input['address'], script_types[i])]
+        hashes.append((pub, tx.signature_hash(i, pub, tx_input['value'], script_types[i], hashcode)))
+
+    return hashes
+
+
+def sign_inputs(tx, private_keys, tx_inputs, script_types, hashcode=SIGHASH_ALL):
+    """
+    Sign all inputs of a BinaryTransaction in this process
+
+    :param tx: A BinaryTransaction object
+    :param private_keys: a dict containing a key for each required address with the corresponding private key
+    :param tx_inputs: a list of dicts containing the keys 'address' and 'value'
+    :param script_types: a list containing the script type of each input
+    :param hashcode: SIGHASH_ALL = 1
+    """
+    for i, (pub, signing_hash) in enumerate(signature_hashes(tx, private_keys, tx_inputs, script_types, hashcode)):
+        priv = signing_privkey(private_keys, tx_inputs[i]['address'])
+        tx.add_signature(i, der_encode_sig(*ecdsa_raw_sign(signing_hash, priv)) + encode(hashcode, 16, 2), pub, script_types[i])
+
+
+def sign_in_parallel(tx, private_keys, tx_inputs, script_types, processes=None, hashcode=SIGHASH_ALL):
+    """
+    Sign all inputs of a BinaryTransaction with a pool of worker processes
+
+    The hashes that are signed are calculated in this process, so the workers only need to calculate the signatures.
+    The worker processes are started fresh (spawn) for each transaction instead of forked, so they do not get a copy of
+    the memory of this process. Each worker only gets the hashes it signs and the private keys of those inputs as
+    bytearrays, the workers are stopped once the signatures are made.
+    Only those bytearrays are wiped afterwards, in the workers and in this process. The private_keys dict is not
+    changed and the copies of the keys that are made while converting and signing (strings, bytes and integers) are
+    not wiped, they stay in memory until they are garbage collected or the worker process is stopped.
+
+    :param tx: A BinaryTransaction object
+    :param private_keys: a dict containing a key for each required address with the corresponding private key
+    :param tx_inputs: a list of dicts containing the keys 'address' and 'value'
+    :param script_types: a list containing the script type of each input
+    :param processes: The number of worker processes (default: the number of cpus)
+    :param hashcode: SIGHASH_ALL = 1
+    """
+    processes = min(processes or multiprocessing.cpu_count(), len(tx_inputs))
+    hashes = signature_hashes(tx, private_keys, tx_inputs, script_types, hashcode)
+    addresses = [tx_input['address'] for tx_input in tx_inputs]
+
+    secrets = {}
+    try:
+        for address in addresses:
+            if address not in secrets:
+                secrets[address] = bytearray(encode_privkey(private_keys[address], 'bin'))
+
+        # Give each worker a contiguous slice of the inputs together with only the keys it needs
+        chunks = []
+        chunk_size = -(-len(hashes) // processes)
+        for start in range(0, len(hashes), chunk_size):
+            chunk_addresses = addresses[start:start + chunk_size]
+            keys = []
+            for address in chunk_addresses:
+                if address not in keys:
+                    keys.append(address)
+            chunks.append(([secrets[address] for address in keys], [(signing_hash, keys.index(address)) for address, (_, signing_hash) in zip(chunk_addresses, hashes[start:start + chunk_size])]))
+
+        # The workers use the crypto backend of this process, so they do not need to select and self-test a backend again
+        pool = multiprocessing.get_context('spawn').Pool(processes=processes, initializer=set_crypto_backend, initargs=(get_crypto_backend().name,))
+        try:
+            signatures = [sig for chunk_signatures in pool.map(sign_digests, chunks) for sig in chunk_signatures]
+        finally:
+            pool.terminate()
+            pool.join()
+    finally:
+        for secret in secrets.values():
+            secret[:] = bytearray(len(secret))
+
+    for i, sig in enumerate(signatures):
+        tx.add_signature(i, sig + encode(hashcode, 16, 2), hashes[i][0], script_types[i])
+
+
+def sign_digests(chunk):
+    """
+    Sign a list of hashes, this runs in the worker processes of sign_in_parallel
+
+    The bytearrays of the private keys are wiped when the signatures are made, the bytes and integers that are derived
+    from them can not be wiped but they are gone once the worker process is stopped.
+
+    :param chunk: A tuple containing a list of private keys as bytearrays and a list of tuples containing a hash and
+                  the index of the private key that signs it
+    :return: A list containing the DER encoded signatures in hex format (without the hashcode)
+    """
+    keys, digests = chunk
+    try:
+        return [der_encode_sig(*ecdsa_raw_sign(digest, decode(bytes(keys[key_index]), 256))) for digest, key_index in digests]
+    finally:
+        for key in keys:
+            key[:] = bytearray(len(key))
+
 
-    # Add OP_RETURN message if necessary
-    if isinstance(op_return_data, string_types):
-        tx = add_op_return(op_return_data, tx)
+def read_var_int(data, pos):
+    """
+    Read a variable length integer
 
-    # Now sign each transaction input with the private key
-    for i in range(0, len(tx_inputs)):
-        tx = sign(tx, i, str(private_keys[tx_inputs[i]['address']]))
+    :param data: The data in binary format (bytes, bytearray or memoryview)
+    :param pos: The position of the integer in the data
+    :return: A tuple with the integer and the position after it
+    """
+    prefix = data[pos]
+    if prefix < 253:
+        return prefix, pos + 1
 
-    return tx
+    length = {253: 2, 254: 4, 255: 8}[prefix]
+    return decode(bytes(data[pos + 1:pos + 1 + length])[::-1], 256), pos + 1 + length
 
 
 # def send_tx(tx):
@@ -174,7 +628,11 @@ def serialize(txobj):
         json_changedbase = json_changebase(txobj, lambda x: binascii.unhexlify(x))
         hexlified = safe_hexlify(serialize(json_changedbase))
         return hexlified
+    segwit = any([len(inp.get("witness", [])) > 0 for inp in txobj["ins"]])
     o.append(encode(txobj["version"], 256, 4)[::-1])
+    if segwit:
+        # marker and flag of the BIP144 serialization
+        o.append(b'\x00\x01')
     o.append(num_to_var_int(len(txobj["ins"])))
     for inp in txobj["ins"]:
         o.append(inp["outpoint"]["hash"][::-1])
@@ -185,6 +643,12 @@ def serialize(txobj):
     for out in txobj["outs"]:
         o.append(encode(out["value"], 256, 8)[::-1])
         o.append(num_to_var_int(len(out["script"]))+out["script"])
+    if segwit:
+        for inp in txobj["ins"]:
+            witness = inp.get("witness", [])
+            o.append(num_to_var_int(len(witness)))
+            for item in witness:
+                o.append(num_to_var_int(len(item))+item)
     o.append(encode(txobj["locktime"], 256, 4)[::-1])
 
     return ''.join(o) if is_python2 else reduce(lambda x,y: x+y, o, bytes())
@@ -221,6 +685,9 @@ def deserialize(tx):
         return read_bytes(size)
 
     obj = {"ins": [], "outs": [], "version": read_as_int(4)}
+    segwit = from_byte_to_int(tx[pos[0]]) == 0 and from_byte_to_int(tx[pos[0] + 1]) == 1
+    if segwit:
+        pos[0] += 2
     ins = read_var_int()
     for i in range(ins):
         obj["ins"].append({
@@ -237,6 +704,9 @@ def deserialize(tx):
             "value": read_as_int(8),
             "script": read_var_string()
         })
+    if segwit:
+        for inp in obj["ins"]:
+            inp["witness"] = [read_var_string() for _ in range(read_var_int())]
     obj["locktime"] = read_as_int(4)
     return obj
 
@@ -507,6 +977,7 @@ def signature_form(tx, i, script, hashcode=SIGHASH_ALL):
     newtx = copy.deepcopy(tx)
     for inp in newtx["ins"]:
         inp["script"] = ""
+        inp.pop("witness", None)
 
     newtx["ins"][i]["script"] = script
     if hashcode == SIGHASH_NONE:
@@ -524,6 +995,141 @@ def signature_form(tx, i, script, hashcode=SIGHASH_ALL):
     return newtx
 
 
+def is_segwit(tx):
+    """
+    Check if a transaction is serialized with witnesses (BIP144)
+
+    :param tx: The transaction in binary format
+    :return: True or False
+    """
+    return len(tx) > 6 and from_byte_to_int(tx[4]) == 0 and from_byte_to_int(tx[5]) == 1
+
+
+def p2wpkh_redeem_script(pub):
+    """
+    Make the witness program of a P2WPKH output, which is also the redeem script of a P2SH-P2WPKH output
+
+    :param pub: A compressed public key in hexadecimal format
+    :return: The script in hexadecimal format
+    """
+    return '0014' + safe_hexlify(bin_hash160(binascii.unhexlify(pub)))
+
+
+def segwit_key_matches(address, priv):
+    """
+    Check if a private key can spend the utxos of a P2WPKH or P2SH-P2WPKH address
+
+    :param address: A P2WPKH or P2SH address
+    :param priv: A private key
+    :return: True or False
+    """
+    if 'compressed' not in get_privkey_format(priv):
+        return False
+
+    redeem_script = p2wpkh_redeem_script(privkey_to_pubkey(priv))
+    if get_script_type(address) == P2SH:
+        return address_to_script(address) == 'a914' + safe_hexlify(bin_hash160(binascii.unhexlify(redeem_script))) + '87'
+
+    return address_to_script(address) == redeem_script
+
+
+def bip143_hashes(txobj):
+    """
+    Calculate hashPrevouts, hashSequence and hashOutputs of the BIP143 signature hash, these are the same for each input
+    so they only need to be calculated once per transaction
+
+    :param txobj: A deserialized transaction in hexadecimal format
+    :return: A dict containing the hashes in binary format
+    """
+    prevouts = b''.join([binascii.unhexlify(inp['outpoint']['hash'])[::-1] + encode(inp['outpoint']['index'], 256, 4)[::-1] for inp in txobj['ins']])
+    sequences = b''.join([encode(inp['sequence'], 256, 4)[::-1] for inp in txobj['ins']])
+
+    return {'prevouts': bin_dbl_sha256(prevouts),
+            'sequence': bin_dbl_sha256(sequences),
+            'outputs': bin_dbl_sha256(b''.join([serialize_output(out) for out in txobj['outs']]))}
+
+
+def serialize_output(out):
+    script = binascii.unhexlify(out['script'])
+    return encode(out['value'], 256, 8)[::-1] + num_to_var_int(len(script)) + script
+
+
+def bip143_signature_form(txobj, i, script_code, amount, hashcode=SIGHASH_ALL, hashes=None):
+    """
+    Make the message that is signed by a segwit input (BIP143)
+
+    Unlike the legacy signature form, this does not contain the rest of the transaction but only hashes of it, which are
+    the same for every input, so signing each input of a transaction does not need to serialize the transaction again
+
+    :param txobj: A deserialized transaction in hexadecimal format
+    :param i: The index of the input
+    :param script_code: The script code of the input in hexadecimal format
+    :param amount: The value of the utxo that is spent by the input in satoshis
+    :param hashcode: SIGHASH_ALL = 1, SIGHASH_NONE = 2, SIGHASH_SINGLE = 3, SIGHASH_ANYONECANPAY = 0x81
+    :param hashes: The result of bip143_hashes for the transaction (optional, calculated if not given)
+    :return: The message in binary format
+    """
+    i, hashcode = int(i), int(hashcode)
+    hashes = hashes if hashes is not None else bip143_hashes(txobj)
+    base_type = hashcode & 0x1f
+    anyone_can_pay = hashcode & 0x80 != 0
+    zero_hash = b'\x00' * 32
+
+    hash_prevouts = zero_hash if anyone_can_pay else hashes['prevouts']
+    hash_sequence = zero_hash if anyone_can_pay or base_type in [SIGHASH_NONE, SIGHASH_SINGLE] else hashes['sequence']
+    if base_type not in [SIGHASH_NONE, SIGHASH_SINGLE]:
+        hash_outputs = hashes['outputs']
+    elif base_type == SIGHASH_SINGLE and i < len(txobj['outs']):
+        hash_outputs = bin_dbl_sha256(serialize_output(txobj['outs'][i]))
+    else:
+        hash_outputs = zero_hash
+
+    inp = txobj['ins'][i]
+    script_code = binascii.unhexlify(script_code)
+
+    return (encode(txobj['version'], 256, 4)[::-1] +
+            hash_prevouts +
+            hash_sequence +
+            binascii.unhexlify(inp['outpoint']['hash'])[::-1] + encode(inp['outpoint']['index'], 256, 4)[::-1] +
+            num_to_var_int(len(script_code)) + script_code +
+            encode(amount, 256, 8)[::-1] +
+            encode(inp['sequence'], 256, 4)[::-1] +
+            hash_outputs +
+            encode(txobj['locktime'], 256, 4)[::-1] +
+            encode(hashcode, 256, 4)[::-1])
+
+
+def segwit_sign(txobj, i, priv, amount, nested=False, hashcode=SIGHASH_ALL, hashes=None):
+    """
+    Sign a P2WPKH or P2SH-P2WPKH input, the signature and public key are set as the witness of the input
+
+    :param txobj: A deserialized transaction in hexadecimal format, the input is signed in place
+    :param i: The index of the input
+    :param priv: The private key, must be compressed
+    :param amount: The value of the utxo that is spent by the input in satoshis
+    :param nested: True for a P2SH-P2WPKH input, False for a P2WPKH input (default=False)
+    :param hashcode: SIGHASH_ALL = 1, SIGHASH_NONE = 2, SIGHASH_SINGLE = 3, SIGHASH_ANYONECANPAY = 0x81
+    :param hashes: The result of bip143_hashes for the transaction (optional, calculated if not given)
+    :return: The transaction object
+    """
+    if len(priv) <= 33:
+        priv = safe_hexlify(priv)
+
+    # Segwit only allows compressed public keys
+    pub = compress(privkey_to_pubkey(priv))
+    redeem_script = p2wpkh_redeem_script(pub)
+    # The script code of a P2WPKH input is the P2PKH script of the public key hash
+    script_code = '76a9' + redeem_script[2:] + '88ac'
+
+    signing_hash = bin_dbl_sha256(bip143_signature_form(txobj, i, script_code, amount, hashcode, hashes))
+    sig = der_encode_sig(*ecdsa_raw_sign(signing_hash, priv)) + encode(hashcode, 16, 2)
+
+    txobj['ins'][i]['script'] = serialize_script([redeem_script]) if nested else ''
+    txobj['ins'][i]['witness'] = [sig, pub]
+
+    return txobj
+
+
 if is_python2:
     def serialize_script(script):
         if json_is_base(script, 16):
@@ -582,20 +1188,26 @@ def ecdsa_tx_sign(tx, priv, hashcode=SIGHASH_ALL):
 
 
 def ecdsa_raw_sign(msghash, priv):
-
-    z = hash_to_int(msghash)
-    k = deterministic_generate_k(msghash, priv)
-
-    r, y = fast_multiply(G, k)
-    s = inv(k, N) * (z + r*decode_privkey(priv)) % N
-
-    v, r, s = 27+((y % 2) ^ (0 if s * 2 < N else 1)), r, s if s * 2 < N else N - s
+    v, r, s = get_crypto_backend().sign(encode(hash_to_int(msghash), 256, 32), decode_privkey(priv))
     if 'compressed' in get_privkey_format(priv):
         v += 4
 
     return v, r, s
 
 
+def ecdsa_raw_verify(msghash, vrs, pub):
+    """
+    Verify a signature
+
+    :param msghash: The signed hash
+    :param vrs: A tuple containing the v, r and s values of the signature (v is not used)
+    :param pub: The public key
+    :return: True if the signature is valid, False otherwise
+    """
+    v, r, s = vrs
+    return get_crypto_backend().verify(encode(hash_to_int(msghash), 256, 32), r, s, decode_pubkey(pub))
+
+
 def hash_to_int(string):
     """
     Convert a hash string to an integer
@@ -610,16 +1222,7 @@ def hash_to_int(string):
 
 
 def deterministic_generate_k(msghash, priv):
-    v = b'\x01' * 32
-    k = b'\x00' * 32
-    priv = encode_privkey(priv, 'bin')
-    msghash = encode(hash_to_int(msghash), 256, 32)
-    k = hmac.new(k, v+b'\x00'+priv+msghash, hashlib.sha256).digest()
-    v = hmac.new(k, v, hashlib.sha256).digest()
-    k = hmac.new(k, v+b'\x01'+priv+msghash, hashlib.sha256).digest()
-    v = hmac.new(k, v, hashlib.sha256).digest()
-
-    return decode(hmac.new(k, v, hashlib.sha256).digest(), 256)
+    return rfc6979_nonce(encode(hash_to_int(msghash), 256, 32), decode_privkey(priv))
 
 
 def bin_txhash(tx, hashcode=None):
@@ -644,6 +1247,13 @@ def txhash(tx, hashcode=None):
     if isinstance(tx, str) and re.match('^[0-9a-fA-F]*$', tx):
         tx = changebase(tx, 16, 256)
 
+    # The txid of a segwit transaction does not include the witnesses
+    if not hashcode and is_segwit(tx):
+        txobj = deserialize(tx)
+        for inp in txobj["ins"]:
+            inp.pop("witness", None)
+        tx = serialize(txobj)
+
     # [::-1] means the same as the list in reverse order
     if hashcode:
         return double_sha256(from_string_to_bytes(tx) + encode(int(hashcode), 256, 4)[::-1])
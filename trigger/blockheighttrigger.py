@@ -3,6 +3,7 @@
 
 from .trigger import Trigger
 from .triggertype import TriggerType
+from data.snapshot import Snapshot
 from data.data import latest_block
 from validators.validators import valid_block_height, valid_amount
 
@@ -14,11 +15,11 @@ class BlockHeightTrigger(Trigger):
         self.block_height = None
         self.confirmations = 0
 
-    def conditions_fulfilled(self):
+    def conditions_fulfilled(self, snapshot=None):
         if self.block_height is None:
             return False
 
-        data = latest_block()
+        data = latest_block() if snapshot is None else snapshot.latest_block()
         if isinstance(data, dict) and 'block' in data and 'height' in data['block']:
             latest_block_height = data['block']['height']
         else:
@@ -27,6 +28,12 @@ class BlockHeightTrigger(Trigger):
 
         return True if self.block_height + self.confirmations <= latest_block_height else False
 
+    def target_height(self):
+        return self.block_height + self.confirmations if self.block_height is not None else None
+
+    def dependencies(self):
+        return [(Snapshot.LATEST_BLOCK, None)] if self.block_height is not None else []
+
     def configure(self, **config):
         super(BlockHeightTrigger, self).configure(**config)
         if 'block_height' in config and valid_block_height(config['block_height']):
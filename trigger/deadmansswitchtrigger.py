@@ -19,7 +19,7 @@ class DeadMansSwitchTrigger(Trigger):
         self.phase = 0
         self.activation_time = None
 
-    def conditions_fulfilled(self):
+    def conditions_fulfilled(self, snapshot=None):
         if self.timeout is None or self.activation_time is None or self.warning_email is None:
             return False
 
@@ -55,6 +55,20 @@ class DeadMansSwitchTrigger(Trigger):
 
         return self.phase == SwitchPhase.PHASE_5
 
+    def condition_due_time(self):
+        if self.timeout is None or self.activation_time is None or self.warning_email is None:
+            return None
+
+        # The time at which the switch moves to the next phase
+        if self.phase == SwitchPhase.PHASE_1:
+            return int(self.activation_time - (self.timeout * 0.5))
+        elif self.phase == SwitchPhase.PHASE_2:
+            return int(self.activation_time - (self.timeout * 0.25))
+        elif self.phase == SwitchPhase.PHASE_3:
+            return int(self.activation_time - (self.timeout * 0.1))
+        elif self.phase in [SwitchPhase.PHASE_4, SwitchPhase.PHASE_5]:
+            return int(self.activation_time)
+
     def arm(self):
         if self.phase == SwitchPhase.PHASE_0:
             self.phase = SwitchPhase.PHASE_1
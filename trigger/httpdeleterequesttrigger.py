@@ -10,16 +10,20 @@ class HTTPDeleteRequestTrigger(Trigger):
         super(HTTPDeleteRequestTrigger, self).__init__(trigger_id=trigger_id)
         self.trigger_type = TriggerType.HTTPDELETEREQUEST
         self.json = None
+        self.synchronous = True  # Run the script and actions before responding to the request, even if the activation queue is running
 
-    def conditions_fulfilled(self):
+    def conditions_fulfilled(self, snapshot=None):
         # HTTP request triggers can only be triggered when a http request is received, so always return False
         return False
 
     def configure(self, **config):
         super(HTTPDeleteRequestTrigger, self).configure(**config)
+        if 'synchronous' in config and config['synchronous'] in [True, False]:
+            self.synchronous = config['synchronous']
 
     def json_encodable(self):
         ret = super(HTTPDeleteRequestTrigger, self).json_encodable()
+        ret.update({'synchronous': self.synchronous})
         return ret
 
     def get_script_variables(self):
@@ -9,7 +9,18 @@ class ManualTrigger(Trigger):
     def __init__(self, trigger_id):
         super(ManualTrigger, self).__init__(trigger_id=trigger_id)
         self.trigger_type = TriggerType.MANUAL
+        self.synchronous = True  # Run the script and actions before responding to the request, even if the activation queue is running
 
-    def conditions_fulfilled(self):
+    def conditions_fulfilled(self, snapshot=None):
         # Manual triggers can only be triggered manually, so always return False
         return False
+
+    def configure(self, **config):
+        super(ManualTrigger, self).configure(**config)
+        if 'synchronous' in config and config['synchronous'] in [True, False]:
+            self.synchronous = config['synchronous']
+
+    def json_encodable(self):
+        ret = super(ManualTrigger, self).json_encodable()
+        ret.update({'synchronous': self.synchronous})
+        return ret
@@ -18,7 +18,7 @@ class RecurringTrigger(Trigger):
         self.end_time = None
         self.interval = None
 
-    def conditions_fulfilled(self):
+    def conditions_fulfilled(self, snapshot=None):
         if self.interval is None or self.begin_time is None:
             return False
 
@@ -33,13 +33,27 @@ class RecurringTrigger(Trigger):
 
         return self.next_activation <= int(time.time()) <= self.end_time
 
-    def activate(self):
-        super(RecurringTrigger, self).activate()
+    def condition_due_time(self):
+        if self.interval is None or self.begin_time is None:
+            return None
+
+        # The trigger also needs to be checked at its end time to set its status to Succeeded
+        return self.next_activation if self.end_time is None else min(self.next_activation, self.end_time)
+
+    def activate(self, synchronous=None):
+        response = super(RecurringTrigger, self).activate(synchronous=synchronous)
 
         if self.end_time is None or self.next_activation + self.interval <= self.end_time:
             self.next_activation += self.interval  # Todo what if trigger was activated after interval has passed??
             LOG.info('Setting next activation of recurring trigger %s to %s' % (self.id, datetime.fromtimestamp(self.next_activation)))
-            self.save()
+        else:
+            # This was the last activation, otherwise the trigger would activate again each time it is checked until its end time
+            self.next_activation = self.end_time
+            LOG.info('Recurring trigger %s will not activate again before its end time' % self.id)
+
+        self.save()
+
+        return response
 
     def configure(self, **config):
         super(RecurringTrigger, self).configure(**config)
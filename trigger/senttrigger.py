@@ -3,6 +3,7 @@
 
 from .trigger import Trigger
 from .triggertype import TriggerType
+from data.snapshot import Snapshot
 from data.data import balance
 from validators.validators import valid_address, valid_amount
 
@@ -14,11 +15,11 @@ class SentTrigger(Trigger):
         self.address = None
         self.amount = None
 
-    def conditions_fulfilled(self):
+    def conditions_fulfilled(self, snapshot=None):
         if self.address is None or self.amount is None:
             return False
 
-        data = balance(self.address)
+        data = balance(self.address) if snapshot is None else snapshot.balance(self.address)
         if isinstance(data, dict) and 'balance' in data and 'sent' in data['balance']:
             total_sent = data['balance']['sent']
         else:
@@ -27,6 +28,9 @@ class SentTrigger(Trigger):
 
         return True if self.amount <= total_sent else False
 
+    def dependencies(self):
+        return [(Snapshot.BALANCE, self.address)] if self.address is not None else []
+
     def configure(self, **config):
         super(SentTrigger, self).configure(**config)
         if 'address' in config and valid_address(config['address']):
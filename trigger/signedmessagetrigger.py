@@ -15,8 +15,9 @@ class SignedMessageTrigger(Trigger):
         self.message_signature = None
         self.message_data = None
         self.ipfs_object = None
+        self.synchronous = True  # Run the script and actions before responding to the request, even if the activation queue is running
 
-    def conditions_fulfilled(self):
+    def conditions_fulfilled(self, snapshot=None):
         # SignedMessage triggers can only be triggered when a verified signed message is received, so always return False
         return False
 
@@ -27,9 +28,13 @@ class SignedMessageTrigger(Trigger):
         elif 'address' in config and config['address'] == '':
             self.address = None
 
+        if 'synchronous' in config and config['synchronous'] in [True, False]:
+            self.synchronous = config['synchronous']
+
     def json_encodable(self):
         ret = super(SignedMessageTrigger, self).json_encodable()
-        ret.update({'address': self.address})
+        ret.update({'address': self.address,
+                    'synchronous': self.synchronous})
         return ret
 
     def get_script_variables(self):
@@ -18,12 +18,15 @@ class TimestampTrigger(Trigger):
         if 'timestamp' in config and valid_timestamp(config['timestamp']):
             self.timestamp = config['timestamp']
 
-    def conditions_fulfilled(self):
+    def conditions_fulfilled(self, snapshot=None):
         if self.timestamp is None:
             return False
 
         return self.timestamp <= time.time()
 
+    def condition_due_time(self):
+        return self.timestamp
+
     def json_encodable(self):
         ret = super(TimestampTrigger, self).json_encodable()
         ret.update({'timestamp': self.timestamp})
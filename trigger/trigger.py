@@ -1,22 +1,22 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import importlib
-import os
-import platform
 import time
 from abc import abstractmethod, ABCMeta
 from datetime import datetime
 
 from helpers.actionhelpers import get_actions, get_action
-from helpers.jsonhelpers import save_to_json_file
+from helpers.activationhelpers import activation_queue_running, queue_activation
 from helpers.loghelpers import LOG
+from helpers.scripthelpers import get_script_class
+from helpers.shardhelpers import sharding_enabled
+from helpers.storagehelpers import get_storage
+from helpers.triggerregistry import get_trigger_registry
 from spellbookscripts.spellbookscript import SpellbookScript
 from validators.validators import valid_actions, valid_trigger_type, valid_amount, valid_script
 from validators.validators import valid_description, valid_creator, valid_email, valid_youtube_id
 from validators.validators import valid_status, valid_visibility, valid_timestamp
-
-TRIGGERS_DIR = 'json/public/triggers'
+from storage.storage import TRIGGERS
 
 
 class Trigger(object):
@@ -94,15 +94,68 @@ class Trigger(object):
             self.destruct_actions = config['destruct_actions']
 
     @abstractmethod
-    def conditions_fulfilled(self):
+    def conditions_fulfilled(self, snapshot=None):
         """
         Abstract method to check if the conditions of the trigger have been fulfilled.
 
+        :param snapshot: A Snapshot object containing the blockchain data of the current run (optional)
         :return: True or False
         """
         pass
 
-    def activate(self):
+    def dependencies(self):
+        """
+        Get the blockchain data the conditions of this trigger depend on, so it can be retrieved once for all triggers
+
+        :return: A list of tuples of (dependency type, key)
+        """
+        return []
+
+    def target_height(self):
+        """
+        Get the block height at which the conditions of this trigger are fulfilled, for triggers whose conditions only depend on the block height
+
+        :return: A block height or None if the conditions do not depend on the block height (or it is not known yet)
+        """
+        return None
+
+    def condition_due_time(self):
+        """
+        Get the time at which the conditions of this trigger need to be checked, for triggers whose conditions only depend on time
+
+        :return: A timestamp or None if the conditions do not depend on time
+        """
+        return None
+
+    def next_due_time(self):
+        """
+        Get the next time at which this trigger needs to be checked: when its conditions are due or when it self-destructs
+
+        :return: A timestamp or None if the trigger does not need to be checked at a specific time
+        """
+        due_times = [self.condition_due_time() if self.status == 'Active' else None, self.self_destruct]
+        due_times = [due_time for due_time in due_times if due_time is not None]
+
+        return min(due_times) if len(due_times) > 0 else None
+
+    def activate(self, synchronous=None):
+        """
+        Activate the trigger
+
+        If the activation queue is running, the activation is queued as a job and its script and actions are run by the
+        workers of the queue, otherwise they are run right away.
+        With sharding, each activation is queued as a job for the spellbook process that handles the trigger, the caller
+        of a synchronous activation waits for the job with wait_for_activation once it has released the trigger lock.
+
+        :param synchronous: Run the script and actions right away, even if the activation queue is running (optional)
+        :return: The http response of the script, or a dict containing the job_id if the activation was queued
+        """
+        if sharding_enabled() or (synchronous is not True and activation_queue_running()):
+            return queue_activation(trigger=self)
+
+        return self.activate_synchronously()
+
+    def activate_synchronously(self):
         """
         Activate all actions on this trigger, if all actions are successful the 'triggered' status will be True
         If an action fails, the remaining actions will not be executed and the 'triggered' status remains False so another attempt can be made the next time the trigger is checked
@@ -153,7 +206,9 @@ class Trigger(object):
         return self.json_encodable()
 
     def save(self):
-        save_to_json_file(os.path.join(TRIGGERS_DIR, '%s.json' % self.id), self.json_encodable())
+        trigger_config = self.json_encodable()
+        get_storage().save(TRIGGERS, self.id, trigger_config)
+        get_trigger_registry().update(self.id, trigger_config)
 
     def json_encodable(self):
         return {'trigger_id': self.id,
@@ -173,41 +228,19 @@ class Trigger(object):
                 'self_destruct': self.self_destruct,
                 'destruct_actions': self.destruct_actions}
 
-    def load_script(self):
-        if self.script is not None:
-            if not valid_script(self.script):
-                return
-
-            script_name = self.script[:-3]  # script name without the .py extension
-            script_path = None
-            script_module_name = None
-
-            # Search for the script in the allowed root directories
-            for root_dir in ['spellbookscripts', 'apps']:
-                if os.path.isfile(os.path.join(root_dir, self.script)):
-                    script_path = os.path.join(root_dir, self.script)
-                    if platform.system() == 'Windows':
-                        script_module_name = '%s.%s' % (root_dir, script_name.replace('\\', '.'))
-                    elif platform.system() == 'Linux':
-                        script_module_name = '%s.%s' % (root_dir, script_name.replace('/', '.'))
-                    else:
-                        raise NotImplementedError('Unsupported platform: only windows and linux are supported')
-
-            if script_path is None:
-                LOG.error('Can not find spellbook script %s' % self.script)
-                return
+    def load_script(self, variables=None):
+        """
+        Load the script of the trigger
 
-            LOG.info('Loading Spellbook Script %s' % script_path)
-            LOG.info('Script module: %s (%s)' % (script_module_name, type(script_module_name)))
-            try:
-                script_module = importlib.import_module(script_module_name)
-            except Exception as ex:
-                LOG.error('Failed to load Spellbook Script %s: %s' % (script_path, ex))
+        :param variables: The variables for the script (optional, by default the current configuration of the trigger)
+        :return: A SpellbookScript object or None
+        """
+        if self.script is not None:
+            spellbook_script = get_script_class(self.script)
+            if spellbook_script is None:
                 return
 
-            script_class_name = os.path.basename(script_path)[:-3]
-            spellbook_script = getattr(script_module, script_class_name)
-            kwargs = self.get_script_variables()
+            kwargs = self.get_script_variables() if variables is None else variables
             script = spellbook_script(**kwargs)
 
             if not isinstance(script, SpellbookScript):
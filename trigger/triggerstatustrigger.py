@@ -12,7 +12,7 @@ class TriggerStatusTrigger(Trigger):
         self.previous_trigger = None
         self.previous_trigger_status = None
 
-    def conditions_fulfilled(self):
+    def conditions_fulfilled(self, snapshot=None):
         # Avoid circular import here
         from helpers.triggerhelpers import get_trigger
 
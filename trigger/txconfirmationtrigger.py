@@ -3,8 +3,9 @@
 
 from .trigger import Trigger
 from .triggertype import TriggerType
-from data.data import transaction
-from validators.validators import valid_amount, valid_txid
+from data.snapshot import Snapshot
+from data.data import transaction, latest_block
+from validators.validators import valid_amount, valid_txid, valid_block_height
 
 
 class TxConfirmationTrigger(Trigger):
@@ -13,20 +14,45 @@ class TxConfirmationTrigger(Trigger):
         self.trigger_type = TriggerType.TX_CONFIRMATION
         self.txid = None
         self.confirmations = 1
+        self.block_height = None  # The height of the block containing the transaction, once it is known
 
-    def conditions_fulfilled(self):
+    def conditions_fulfilled(self, snapshot=None):
         if self.txid is None:
             return False
 
-        data = transaction(txid=self.txid)
+        if self.block_height is not None:
+            # The block height of the transaction is known, so only the latest block height is needed
+            data = latest_block() if snapshot is None else snapshot.latest_block()
+            if isinstance(data, dict) and 'block' in data and 'height' in data['block']:
+                latest_block_height = data['block']['height']
+            else:
+                # Something went wrong during retrieval of latest block height
+                return False
+
+            return True if self.target_height() <= latest_block_height else False
+
+        data = transaction(txid=self.txid) if snapshot is None else snapshot.transaction(txid=self.txid)
         if isinstance(data, dict) and 'transaction' in data and 'confirmations' in data['transaction']:
             confirmations = data['transaction']['confirmations']
         else:
             # Something went wrong during retrieval of transaction
             return False
 
+        if confirmations > 0 and valid_block_height(data['transaction'].get('block_height')):
+            self.block_height = data['transaction']['block_height']
+            self.save()
+
         return True if self.confirmations <= confirmations else False
 
+    def target_height(self):
+        return self.block_height + self.confirmations - 1 if self.block_height is not None else None
+
+    def dependencies(self):
+        if self.txid is None:
+            return []
+
+        return [(Snapshot.LATEST_BLOCK, None)] if self.block_height is not None else [(Snapshot.TRANSACTION, self.txid)]
+
     def configure(self, **config):
         super(TxConfirmationTrigger, self).configure(**config)
         if 'txid' in config and valid_txid(config['txid']):
@@ -35,10 +61,14 @@ class TxConfirmationTrigger(Trigger):
         if 'confirmations' in config and valid_amount(config['confirmations']):
             self.confirmations = config['confirmations']
 
+        if 'block_height' in config and valid_block_height(config['block_height']):
+            self.block_height = config['block_height']
+
     def json_encodable(self):
         ret = super(TxConfirmationTrigger, self).json_encodable()
 
         ret.update({
             'txid': self.txid,
-            'confirmations': self.confirmations})
+            'confirmations': self.confirmations,
+            'block_height': self.block_height})
         return ret
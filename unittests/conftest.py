@@ -0,0 +1,11 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import shutil
+
+# The spellbook configuration file is local to each installation and is not in the repository, the tests use a copy of
+# the example configuration file if there is none yet
+CONFIGURATION_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'configuration'))
+
+if not os.path.isfile(os.path.join(CONFIGURATION_DIR, 'spellbook.conf')):
+    shutil.copyfile(os.path.join(CONFIGURATION_DIR, 'example_configuration_file.conf'), os.path.join(CONFIGURATION_DIR, 'spellbook.conf'))
@@ -3,7 +3,7 @@
 import pytest
 import binascii
 
-from .BIP32_test_vectors import bip32_test_vectors
+from bips.BIP32_test_vectors import bip32_test_vectors
 from .BIP39_test_vectors import BIP39_test_vectors, BIP39_test_vectors_japanese
 
 from bips.BIP32 import parse_derivation_path, get_xpriv, get_xpub, get_xpub_child, set_chain_mode, bip32_master_key
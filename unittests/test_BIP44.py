@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from bips.BIP32 import bip32_ckd, bip32_extract_key, set_chain_mode
+from bips.BIP44 import derive_addresses, get_addresses_from_xpub, get_change_addresses_from_xpub, get_address_from_xpub, MAGICBYTE
+from helpers.configurationhelpers import get_use_testnet
+from helpers.publickeyhelpers import encode_pubkey, pubkey_to_address
+
+XPUB = 'xpub6D4BDPcP2GT577Vvch3R8wDkScZWzQzMMUm3PWbmWvVJrZwQY4VUNgqFJPMM3No2dFDFGTsxxpG5uJh7n7epu4trkrX7x7DogT5Uv6fcLW5'
+
+
+def setup_module(module):
+    set_chain_mode(mainnet=True)
+
+
+def teardown_module(module):
+    set_chain_mode(mainnet=(get_use_testnet() is False))
+
+
+def child_address(xpub, k, i):
+    # Derive the address one child key at a time as a reference
+    public_key = bip32_ckd(bip32_ckd(xpub, k), i)
+    return pubkey_to_address(encode_pubkey(bip32_extract_key(public_key), 'hex_compressed'), magicbyte=MAGICBYTE)
+
+
+class TestBIP44(object):
+    @pytest.mark.parametrize('start, count, k', [(0, 10, 0), (0, 5, 1), (95, 10, 0), (2 ** 31 - 3, 3, 0)])
+    def test_derive_addresses(self, start, count, k):
+        assert derive_addresses(xpub=XPUB, start=start, count=count, k=k) == [child_address(XPUB, k, i) for i in range(start, start + count)]
+
+    def test_derive_no_addresses(self):
+        assert derive_addresses(xpub=XPUB, start=0, count=0) == []
+
+    def test_get_addresses_from_xpub(self):
+        addresses = get_addresses_from_xpub(XPUB, 20)
+        change_addresses = get_change_addresses_from_xpub(XPUB, 3)
+
+        assert addresses == [child_address(XPUB, 0, i) for i in range(20)]
+        assert change_addresses == [child_address(XPUB, 1, i) for i in range(3)]
+        assert get_address_from_xpub(XPUB, 7) == addresses[7]
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+import helpers.activationhelpers as activationhelpers
+import helpers.batchhelpers as batchhelpers
+import helpers.storagehelpers as storagehelpers
+import helpers.triggerregistry as triggerregistry
+from action.sendtransactionaction import SendTransactionAction
+from helpers.batchhelpers import PaymentBatcher
+from helpers.triggerhelpers import get_trigger, get_trigger_config, activate_trigger, save_trigger
+from helpers.triggerregistry import TriggerRegistry
+from storage.jsonstorage import JSONStorage
+from storage.storage import JOBS
+from trigger.manualtrigger import ManualTrigger
+
+
+class FakeAction(object):
+    def __init__(self, results, at_most_once=False, while_running=None):
+        self.results = results
+        self.at_most_once = at_most_once
+        self.while_running = while_running
+        self.runs = 0
+
+    def run(self):
+        self.runs += 1
+        if self.while_running is not None and self.runs == 1:
+            self.while_running()
+            time.sleep(0.2)
+
+        return self.results.pop(0)
+
+
+class FakePayment(SendTransactionAction):
+    def __init__(self, action_id):
+        super(FakePayment, self).__init__(action_id=action_id)
+        self.sending_address = 'address1'
+        self.amount = 10000
+
+    def get_batch_key(self):
+        return self.sending_address
+
+
+class TestActivationQueue(object):
+    @pytest.fixture(autouse=True)
+    def storage(self, tmpdir, monkeypatch):
+        storage = JSONStorage(directory=str(tmpdir))
+        monkeypatch.setattr(storagehelpers, 'STORAGE', storage)
+        monkeypatch.setattr(triggerregistry, 'TRIGGER_REGISTRY', TriggerRegistry(storage=storage))
+        monkeypatch.setattr(activationhelpers, 'ACTIVATION_QUEUE', activationhelpers.ActivationQueue(workers=1))
+        monkeypatch.setattr(activationhelpers, 'get_activation_max_attempts', lambda: 3)
+        monkeypatch.setattr(activationhelpers, 'get_activation_retry_delay', lambda: 10)
+
+        return storage
+
+    @pytest.fixture
+    def actions(self, monkeypatch):
+        actions = {}
+        monkeypatch.setattr(activationhelpers, 'get_actions', lambda: list(actions.keys()))
+        monkeypatch.setattr(activationhelpers, 'get_action', lambda action_id: actions[action_id])
+
+        return actions
+
+    @staticmethod
+    def create_trigger(action_ids, multi=False, trigger_id='trigger1'):
+        trigger = ManualTrigger(trigger_id)
+        trigger.configure(trigger_type='Manual', status='Active', multi=multi)
+        trigger.actions = action_ids
+        trigger.save()
+
+        return get_trigger(trigger_id)
+
+    def test_queue_activation(self, storage):
+        trigger = self.create_trigger(action_ids=['action1'])
+
+        assert activationhelpers.queue_activation(trigger=trigger) == {'job_id': 'trigger1-0'}
+        assert get_trigger_config('trigger1')['status'] == 'Activating'
+        assert get_trigger_config('trigger1')['triggered'] == 1
+        assert activationhelpers.get_job('trigger1-0')['status'] == 'Queued'
+
+        # The same activation is only queued once
+        trigger = get_trigger('trigger1')
+        trigger.triggered = 0
+        assert activationhelpers.queue_activation(trigger=trigger) == {'job_id': 'trigger1-0'}
+        assert storage.get_ids(JOBS) == ['trigger1-0']
+
+    def test_run_job(self, actions):
+        actions['action1'] = FakeAction(results=[True])
+        actions['action2'] = FakeAction(results=[True])
+        activationhelpers.queue_activation(trigger=self.create_trigger(action_ids=['action1', 'action2']))
+
+        activationhelpers.run_job('trigger1-0')
+
+        assert activationhelpers.get_job('trigger1-0')['status'] == 'Succeeded'
+        assert get_trigger_config('trigger1')['status'] == 'Succeeded'
+        assert actions['action1'].runs == 1 and actions['action2'].runs == 1
+
+    def test_failed_action_is_retried(self, actions):
+        actions['action1'] = FakeAction(results=[True])
+        actions['action2'] = FakeAction(results=[False, True])
+        activationhelpers.queue_activation(trigger=self.create_trigger(action_ids=['action1', 'action2']))
+
+        activationhelpers.run_job('trigger1-0')
+        job = activationhelpers.get_job('trigger1-0')
+        assert job['status'] == 'Retrying'
+        assert job['next_attempt'] >= job['created'] + 10
+        assert get_trigger_config('trigger1')['status'] == 'Activating'
+
+        activationhelpers.run_job('trigger1-0')
+        assert activationhelpers.get_job('trigger1-0')['status'] == 'Succeeded'
+        assert actions['action1'].runs == 1 and actions['action2'].runs == 2
+
+    def test_job_fails_after_max_attempts(self, actions):
+        actions['action1'] = FakeAction(results=[False, False, False])
+        activationhelpers.queue_activation(trigger=self.create_trigger(action_ids=['action1'], multi=True))
+
+        for attempt in range(3):
+            activationhelpers.run_job('trigger1-0')
+
+        assert activationhelpers.get_job('trigger1-0')['status'] == 'Failed'
+        assert actions['action1'].runs == 3
+        # A trigger that can activate multiple times stays active
+        assert get_trigger_config('trigger1')['status'] == 'Active'
+
+    def test_at_most_once_action_is_not_retried(self, actions):
+        actions['action1'] = FakeAction(results=[False, True], at_most_once=True)
+        activationhelpers.queue_activation(trigger=self.create_trigger(action_ids=['action1']))
+
+        activationhelpers.run_job('trigger1-0')
+
+        assert activationhelpers.get_job('trigger1-0')['status'] == 'Failed'
+        assert get_trigger_config('trigger1')['status'] == 'Failed'
+        assert actions['action1'].runs == 1
+
+    def test_at_most_once_action_is_not_run_again_after_a_crash(self, actions):
+        actions['action1'] = FakeAction(results=[True], at_most_once=True)
+        activationhelpers.queue_activation(trigger=self.create_trigger(action_ids=['action1']))
+
+        # The action was started before the crash, but the job was not updated after it
+        job = activationhelpers.get_job('trigger1-0')
+        job.update({'status': 'Running', 'started_actions': [0]})
+        activationhelpers.save_job(job)
+
+        activationhelpers.run_job('trigger1-0')
+
+        assert activationhelpers.get_job('trigger1-0')['status'] == 'Failed'
+        assert actions['action1'].runs == 0
+
+    def test_job_scheduled_twice_is_run_once(self, actions):
+        # The second run reads the job while the first run is running the action and holds the activation lock
+        second_run = threading.Thread(target=activationhelpers.run_job, args=('trigger1-0',))
+        actions['action1'] = FakeAction(results=[True, True], at_most_once=True, while_running=second_run.start)
+        activationhelpers.queue_activation(trigger=self.create_trigger(action_ids=['action1']))
+
+        activationhelpers.run_job('trigger1-0')
+        second_run.join()
+
+        assert activationhelpers.get_job('trigger1-0')['status'] == 'Succeeded'
+        assert actions['action1'].runs == 1
+
+    def test_activating_status_can_only_be_set_by_the_activation_queue(self):
+        self.create_trigger(action_ids=[])
+        save_trigger('trigger1', status='Activating')
+        assert get_trigger_config('trigger1')['status'] == 'Active'
+
+        activationhelpers.queue_activation(trigger=get_trigger('trigger1'))
+        assert get_trigger('trigger1').status == 'Activating'
+
+        # Saving another setting of the trigger keeps the status
+        save_trigger('trigger1', description='test')
+        assert get_trigger_config('trigger1')['status'] == 'Activating'
+
+    def test_unfinished_jobs_are_resumed(self):
+        activationhelpers.queue_activation(trigger=self.create_trigger(action_ids=[]))
+
+        queue = activationhelpers.ActivationQueue(workers=1)
+        queue.load()
+        assert queue.pop_due(now=2 ** 40) == ['trigger1-0']
+
+    def test_activate_queues_the_activation_when_the_queue_is_running(self, monkeypatch, actions):
+        actions['action1'] = FakeAction(results=[True])
+        monkeypatch.setattr(activationhelpers.ACTIVATION_QUEUE, 'running', True)
+        trigger = self.create_trigger(action_ids=['action1'])
+
+        assert trigger.activate() == {'job_id': 'trigger1-0'}
+        assert actions['action1'].runs == 0
+
+    @pytest.mark.parametrize('synchronous', [True, False])
+    def test_manual_activation_is_only_queued_if_not_synchronous(self, storage, monkeypatch, synchronous):
+        monkeypatch.setattr(activationhelpers.ACTIVATION_QUEUE, 'running', True)
+        trigger = self.create_trigger(action_ids=[])
+        trigger.configure(synchronous=synchronous)
+        trigger.save()
+
+        response = activate_trigger('trigger1')
+
+        if synchronous is True:
+            assert response is None
+            assert get_trigger_config('trigger1')['status'] == 'Succeeded'
+            assert storage.get_ids(JOBS) == []
+        else:
+            assert response == {'job_id': 'trigger1-0'}
+            assert get_trigger_config('trigger1')['status'] == 'Activating'
+
+    def test_workers_do_not_wait_for_a_payment_batch(self, monkeypatch, actions):
+        batches = []
+
+        def send_batch(batch):
+            batches.append([action.id for action in batch])
+            for i, action in enumerate(batch):
+                action.txid, action.outputs = 'txid1', [i]
+            return [True] * len(batch)
+
+        monkeypatch.setattr(SendTransactionAction, 'send_batch', staticmethod(send_batch))
+        monkeypatch.setattr(activationhelpers, 'get_batch_window', lambda: 0.5)
+        monkeypatch.setattr(batchhelpers, 'PAYMENT_BATCHER', PaymentBatcher(window=0.5))
+        actions.update({'payment1': FakePayment('payment1'), 'payment2': FakePayment('payment2')})
+        activationhelpers.queue_activation(trigger=self.create_trigger(action_ids=['payment1'], multi=True))
+        activationhelpers.queue_activation(trigger=self.create_trigger(action_ids=['payment2'], trigger_id='trigger2'))
+        activationhelpers.queue_activation(trigger=get_trigger('trigger1'))
+        queue = activationhelpers.ActivationQueue(workers=1)
+
+        # Both payments join the same batch, even though there is only one worker
+        start_time = time.time()
+        for job_id in ['trigger1-0', 'trigger2-0', 'trigger1-1']:
+            queue.run_job(job_id)
+
+        assert time.time() - start_time < 0.5
+        assert [activationhelpers.get_job(job_id)['status'] for job_id in ['trigger1-0', 'trigger2-0', 'trigger1-1']] == ['Waiting', 'Waiting', 'Queued']
+        # The next activation of the same trigger is run after the activation that is waiting for the batch
+        assert queue.deferred == {'trigger1': ['trigger1-1']}
+
+        while len(queue.batch_results) < 2:
+            time.sleep(0.1)
+
+        for job_id in sorted(queue.pop_due(now=time.time())):
+            queue.run_job(job_id)
+
+        assert batches == [['payment1', 'payment2']]
+        for job_id in ['trigger1-0', 'trigger2-0']:
+            job = activationhelpers.get_job(job_id)
+            assert job['status'] == 'Succeeded'
+            assert job['transactions']['0']['txid'] == 'txid1'
+
+        assert queue.pop_due(now=time.time()) == ['trigger1-1']
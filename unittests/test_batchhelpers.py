@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+import action.sendtransactionaction as sendtransactionaction
+from action.sendtransactionaction import SendTransactionAction
+from helpers.batchhelpers import PaymentBatcher
+from helpers.privatekeyhelpers import encode_privkey, privkey_to_address
+from transactionfactory import deserialize
+
+PRIVATE_KEY = encode_privkey(123456789, 'wif_compressed')
+SENDING_ADDRESS = privkey_to_address(PRIVATE_KEY)
+
+
+class FakeAction(object):
+    def __init__(self, action_id, key='address1'):
+        self.id = action_id
+        self.key = key
+        self.sending_address = key
+
+    def get_batch_key(self):
+        return self.key
+
+    def send_transaction(self):
+        return True
+
+
+class TestPaymentBatcher(object):
+    @pytest.fixture
+    def batches(self, monkeypatch):
+        batches = []
+
+        def send_batch(actions):
+            batches.append([action.id for action in actions])
+            return [action.id != 'fail' for action in actions]
+
+        monkeypatch.setattr(SendTransactionAction, 'send_batch', staticmethod(send_batch))
+        return batches
+
+    @staticmethod
+    def add_all(batcher, actions):
+        results = {}
+        done = threading.Event()
+
+        def callback(action_id, success):
+            results[action_id] = success
+            if len(results) == len(actions):
+                done.set()
+
+        for action in actions:
+            batcher.add(action, callback=lambda success, action_id=action.id: callback(action_id, success))
+
+        done.wait(timeout=10)
+        return results
+
+    def test_actions_within_the_window_are_merged(self, batches):
+        batcher = PaymentBatcher(window=0.5)
+        actions = [FakeAction('action%s' % i) for i in range(3)] + [FakeAction('fail'), FakeAction('other', key='address2')]
+
+        start_time = time.time()
+        results = self.add_all(batcher=batcher, actions=actions)
+
+        assert results == {'action0': True, 'action1': True, 'action2': True, 'fail': False, 'other': True}
+        assert time.time() - start_time >= 0.5
+        # A batch with a single action is sent as a normal transaction
+        assert len(batches) == 1
+        assert sorted(batches[0]) == ['action0', 'action1', 'action2', 'fail']
+
+    def test_adding_an_action_does_not_wait_for_the_window(self, batches):
+        batcher = PaymentBatcher(window=60)
+
+        start_time = time.time()
+        batcher.add(FakeAction('action1'), callback=lambda success: None)
+
+        assert time.time() - start_time < 1
+        assert batches == []
+
+    def test_full_batch_is_sent_without_waiting_for_the_window(self, batches):
+        batcher = PaymentBatcher(window=60, max_size=2)
+
+        results = self.add_all(batcher=batcher, actions=[FakeAction('action1'), FakeAction('action2')])
+
+        assert results == {'action1': True, 'action2': True}
+        assert len(batches) == 1
+
+
+class TestSendBatch(object):
+    @pytest.fixture
+    def pushed(self, monkeypatch):
+        pushed = []
+        tx_utxos = [{'output_hash': '%064x' % (i + 1), 'output_n': 0, 'value': value, 'confirmations': 1} for i, value in enumerate([100000, 200000])]
+        monkeypatch.setattr(sendtransactionaction, 'utxos', lambda address, confirmations: {'utxos': tx_utxos})
+        monkeypatch.setattr(sendtransactionaction, 'push_tx', lambda tx: pushed.append(tx) or {'success': True})
+        monkeypatch.setattr(SendTransactionAction, 'is_fee_acceptable', staticmethod(lambda transaction_fee, total_value_in_inputs: True))
+
+        return pushed
+
+    @staticmethod
+    def make_action(action_id, receiving_address, amount, fee_address=None):
+        action = SendTransactionAction(action_id)
+        action.configure(sending_address=SENDING_ADDRESS, private_key=PRIVATE_KEY, receiving_address=receiving_address, amount=amount,
+                         tx_fee_type='Fixed', tx_fee=10, minimum_output_value=1000)
+        if fee_address is not None:
+            action.configure(fee_address=fee_address, fee_percentage=1)
+
+        return action
+
+    def test_each_action_gets_its_own_outputs(self, pushed):
+        actions = [self.make_action('action1', '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E', 50000),
+                   self.make_action('action2', 'bc1qnda5w4t7zp00hz79tylsa4kwhmda68puv82yav', 80000, fee_address='36qa5uhG8qE9JFEYKnJ1fKgyfEPJA8Fx9i'),
+                   self.make_action('too_much', '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E', 250000)]
+
+        assert SendTransactionAction.send_batch(actions) == [True, True, False]
+        assert len(pushed) == 1
+
+        tx = deserialize(pushed[0])
+        assert len(tx['ins']) == 2
+        assert [output['value'] for output in tx['outs'][1:]] == [50000, 80000, 1000]
+
+        assert actions[0].txid == actions[1].txid
+        assert actions[0].outputs == [1]
+        assert actions[1].outputs == [2]
+        assert actions[2].txid is None
+
+        # The change pays the transaction fee, the size is estimated at most 1 byte too high per input
+        transaction_fee = 300000 - 131000 - tx['outs'][0]['value']
+        assert len(pushed[0]) // 2 * 10 <= transaction_fee <= (len(pushed[0]) // 2 + 2) * 10
+
+    def test_nothing_is_sent_if_no_action_can_be_paid(self, pushed):
+        actions = [self.make_action('action1', '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E', 500000),
+                   self.make_action('action2', '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E', 500000)]
+
+        assert SendTransactionAction.send_batch(actions) == [False, False]
+        assert len(pushed) == 0
+
+    def test_change_below_the_minimum_output_value_goes_to_the_transaction_fee(self, pushed):
+        actions = [self.make_action('action1', '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E', 150000),
+                   self.make_action('action2', 'bc1qnda5w4t7zp00hz79tylsa4kwhmda68puv82yav', 145500)]
+
+        assert SendTransactionAction.send_batch(actions) == [True, True]
+
+        tx = deserialize(pushed[0])
+        assert [output['value'] for output in tx['outs']] == [150000, 145500]
+        assert actions[0].outputs == [0]
+        assert actions[1].outputs == [1]
+
+    def test_spellbook_fee_is_a_share_of_the_amount_of_each_action(self, pushed):
+        actions = [self.make_action('action1', '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E', 200000, fee_address='36qa5uhG8qE9JFEYKnJ1fKgyfEPJA8Fx9i'),
+                   self.make_action('action2', 'bc1qnda5w4t7zp00hz79tylsa4kwhmda68puv82yav', 50000)]
+
+        assert SendTransactionAction.send_batch(actions) == [True, True]
+
+        # 1% of the amount of the action, the same fee as when the action is sent on its own
+        tx = deserialize(pushed[0])
+        assert [output['value'] for output in tx['outs'][1:]] == [200000, 2000, 50000]
+        assert actions[0].calculate_spellbook_fee(300000) == 2000
@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from benchmarks.benchmark_triggers import run_benchmark, synthetic_address, TRIGGER_TYPES
+from validators.validators import valid_address
+
+
+class TestBenchmarkTriggers(object):
+    def test_synthetic_addresses_are_valid(self):
+        addresses = [synthetic_address(i) for i in range(1000)]
+
+        assert len(set(addresses)) == 1000
+        assert all(valid_address(address) for address in addresses)
+
+    @pytest.mark.parametrize('backend', ['sqlite', 'json'])
+    def test_run_benchmark(self, backend):
+        result = run_benchmark(count=2 * len(TRIGGER_TYPES), backend=backend, fulfilled_ratio=0.5)
+
+        assert result['triggers'] == 28
+        # Of each type of trigger that can be activated by its conditions, one trigger is fulfilled
+        assert result['activations'] == 7
+        assert result['sweep_triggers'] == 14
+        assert result['storage_bytes'] > 0
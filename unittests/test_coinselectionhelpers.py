@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from helpers.coinselectionhelpers import select_coins, branch_and_bound, select_knapsack
+from helpers.coinselectionhelpers import ALL, BRANCH_AND_BOUND, KNAPSACK, LARGEST_FIRST, CONSOLIDATE, COIN_SELECTION_STRATEGIES
+from helpers.txsizehelpers import estimate_transaction_size
+
+ADDRESS = '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E'
+RECEIVING_ADDRESS = 'bc1qnda5w4t7zp00hz79tylsa4kwhmda68puv82yav'
+
+
+def make_utxos(values):
+    return [{'address': ADDRESS, 'value': value, 'output': '%064x:0' % i, 'confirmations': 1} for i, value in enumerate(values)]
+
+
+class TestCoinSelectionHelpers(object):
+    @pytest.mark.parametrize('strategy', COIN_SELECTION_STRATEGIES)
+    def test_selection_pays_for_outputs_and_fee(self, strategy):
+        generator = random.Random(1)
+        utxos = make_utxos([generator.randrange(1000, 1000000) for _ in range(200)])
+        outputs = [{'address': RECEIVING_ADDRESS, 'value': 1234567}]
+
+        selection = select_coins(utxos=utxos, outputs=outputs, change_address=ADDRESS, fee_rate=20, strategy=strategy, generator=generator)
+
+        change_outputs = [{'address': ADDRESS, 'value': 1}] if selection['change'] else []
+        size = estimate_transaction_size(tx_inputs=selection['inputs'], tx_outputs=outputs + change_outputs)['vsize']
+        change = sum([utxo['value'] for utxo in selection['inputs']]) - 1234567 - selection['fee']
+
+        assert selection['fee'] >= size * 20
+        assert change >= 546 if selection['change'] else change == 0
+        if strategy == ALL:
+            assert len(selection['inputs']) == 200
+        else:
+            assert len(selection['inputs']) < 50
+
+    def test_insufficient_funds(self):
+        utxos = make_utxos([10000, 20000])
+        outputs = [{'address': RECEIVING_ADDRESS, 'value': 30000}]
+
+        for strategy in COIN_SELECTION_STRATEGIES:
+            assert select_coins(utxos=utxos, outputs=outputs, change_address=ADDRESS, fee_rate=1, strategy=strategy) is None
+
+    def test_unknown_strategy(self):
+        with pytest.raises(NotImplementedError):
+            select_coins(utxos=make_utxos([10000]), outputs=[], change_address=ADDRESS, fee_rate=1, strategy='Foo')
+
+    def test_branch_and_bound_finds_exact_match(self):
+        assert sorted(branch_and_bound(effective_values=[50, 40, 25, 12], target=65, cost_of_change=0)) == [1, 2]
+        assert branch_and_bound(effective_values=[50, 40, 30], target=65, cost_of_change=4) is None
+        # The set with the least waste within the window is chosen
+        assert sorted(branch_and_bound(effective_values=[50, 40, 30, 21], target=69, cost_of_change=5)) == [1, 2]
+
+    def test_branch_and_bound_is_changeless(self):
+        utxos = make_utxos([100000, 50000, 30000, 27000, 9000])
+        outputs = [{'address': RECEIVING_ADDRESS, 'value': 75000}]
+
+        selection = select_coins(utxos=utxos, outputs=outputs, change_address=ADDRESS, fee_rate=5, strategy=BRANCH_AND_BOUND)
+
+        assert selection['change'] is False
+        assert [utxo['value'] for utxo in selection['inputs']] == [50000, 27000]
+
+    def test_knapsack_prefers_lowest_larger_utxo(self):
+        assert select_knapsack(effective_values=[5, 5, 100, 200], target_without_change=50, target_with_change=60, generator=random.Random(0)) == [2]
+        assert sorted(select_knapsack(effective_values=[30, 30, 35, 200], target_without_change=50, target_with_change=60, generator=random.Random(0))) == [0, 1]
+
+    def test_largest_first(self):
+        utxos = make_utxos([1000, 500000, 2000, 300000])
+        outputs = [{'address': RECEIVING_ADDRESS, 'value': 600000}]
+
+        selection = select_coins(utxos=utxos, outputs=outputs, change_address=ADDRESS, fee_rate=10, strategy=LARGEST_FIRST)
+
+        assert [utxo['value'] for utxo in selection['inputs']] == [500000, 300000]
+        assert selection['change'] is True
+
+    @pytest.mark.parametrize('fee_rate, n_inputs', [[2, 4], [50, 1]])
+    def test_consolidate_only_sweeps_when_fees_are_low(self, fee_rate, n_inputs):
+        utxos = make_utxos([100000, 50000, 30000, 20000])
+        outputs = [{'address': RECEIVING_ADDRESS, 'value': 20000}]
+
+        selection = select_coins(utxos=utxos, outputs=outputs, change_address=ADDRESS, fee_rate=fee_rate, strategy=CONSOLIDATE, consolidation_fee_rate=5)
+
+        assert len(selection['inputs']) == n_inputs
+
+    def test_dust_utxos_are_not_spent(self):
+        utxos = make_utxos([100000, 600, 700])
+        outputs = [{'address': RECEIVING_ADDRESS, 'value': 20000}]
+
+        for strategy in [BRANCH_AND_BOUND, KNAPSACK, LARGEST_FIRST, CONSOLIDATE]:
+            selection = select_coins(utxos=utxos, outputs=outputs, change_address=ADDRESS, fee_rate=10, strategy=strategy, consolidation_fee_rate=10)
+            assert [utxo['value'] for utxo in selection['inputs']] == [100000]
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import hashlib
+
+import pytest
+
+import helpers.cryptobackendhelpers as cryptobackendhelpers
+from helpers.cryptobackendhelpers import PythonBackend, CoincurveBackend, select_crypto_backend, set_crypto_backend, self_test, PYTHON, COINCURVE
+from helpers.jacobianhelpers import G, N
+from helpers.publickeyhelpers import encode_pubkey
+
+requires_coincurve = pytest.mark.skipif(cryptobackendhelpers.coincurve is None, reason='coincurve is not installed')
+BACKENDS = [PythonBackend(), pytest.param(CoincurveBackend(), marks=requires_coincurve)]
+SCALARS = [1, 2, 12345, 2 ** 200 + 7, N - 1]
+MSGHASH = hashlib.sha256(b'spellbook').digest()
+
+
+class BrokenBackend(PythonBackend):
+    @staticmethod
+    def serialize_pubkey(point, compressed=True):
+        return encode_pubkey((point[0], point[1] + 1), 'bin_compressed')
+
+
+class TestCryptoBackends(object):
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_self_test(self, backend):
+        assert self_test(backend=backend) == []
+
+    def test_self_test_detects_a_broken_backend(self):
+        assert len(self_test(backend=BrokenBackend())) > 0
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_multiply(self, backend):
+        reference = PythonBackend()
+        point = reference.generator_multiply(987654321)
+
+        for n in SCALARS + [0, N]:
+            assert backend.generator_multiply(n) == reference.point_multiply(G, n)
+            assert backend.point_multiply(point, n) == reference.point_multiply(point, n)
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_sign_and_verify(self, backend):
+        for secret in SCALARS:
+            point = backend.generator_multiply(secret)
+            v, r, s = backend.sign(MSGHASH, secret)
+
+            assert (v, r, s) == PythonBackend.sign(MSGHASH, secret)
+            assert s * 2 < N
+            assert backend.verify(MSGHASH, r, s, point) is True
+            # The signature with the high s value is valid too
+            assert backend.verify(MSGHASH, r, N - s, point) is True
+            assert backend.verify(hashlib.sha256(b'other').digest(), r, s, point) is False
+            assert backend.verify(MSGHASH, r, s, backend.generator_multiply(secret + 1)) is False
+            assert backend.verify(MSGHASH, 0, s, point) is False
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_serialize_pubkey(self, backend):
+        point = PythonBackend.generator_multiply(12345)
+
+        assert backend.serialize_pubkey(point, compressed=True) == encode_pubkey(point, 'bin_compressed')
+        assert backend.serialize_pubkey(point, compressed=False) == encode_pubkey(point, 'bin')
+
+
+class TestSelectCryptoBackend(object):
+    def test_python(self):
+        assert select_crypto_backend(name=PYTHON).name == PYTHON
+
+    def test_unknown_backend_falls_back_to_python(self):
+        assert select_crypto_backend(name='unknown').name == PYTHON
+
+    def test_missing_native_backend_falls_back_to_python(self, monkeypatch):
+        monkeypatch.setattr(cryptobackendhelpers, 'coincurve', None)
+        assert select_crypto_backend(name=COINCURVE).name == PYTHON
+
+    @requires_coincurve
+    def test_native_backend_is_used_if_installed(self):
+        assert select_crypto_backend().name == COINCURVE
+
+    @requires_coincurve
+    def test_native_backend_failing_the_self_test_falls_back_to_python(self, monkeypatch):
+        monkeypatch.setattr(CoincurveBackend, 'serialize_pubkey', staticmethod(BrokenBackend.serialize_pubkey))
+        assert select_crypto_backend().name == PYTHON
+
+    @pytest.mark.parametrize('name', [PYTHON, pytest.param(COINCURVE, marks=requires_coincurve)])
+    def test_backend_of_another_process_is_used_without_the_self_test(self, monkeypatch, name):
+        monkeypatch.setattr(cryptobackendhelpers, 'CRYPTO_BACKEND', None)
+        monkeypatch.setattr(cryptobackendhelpers, 'self_test', lambda backend: pytest.fail('The backend was self-tested again'))
+
+        assert set_crypto_backend(name=name).name == name
+        assert cryptobackendhelpers.get_crypto_backend().name == name
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+from random import randint, seed
+
+from helpers.distributionhelpers import distribute
+
+
+class TestDistribute(object):
+    @pytest.mark.parametrize('amount, distribution, minimum_output_value, expected', [
+        [100, {'A': 1}, 0, [('A', 100)]],
+        [100, {'A': 1, 'B': 1}, 0, [('B', 50), ('A', 50)]],
+        [100, {'A': 1, 'B': 1, 'C': 1}, 0, [('C', 33), ('B', 33), ('A', 34)]],
+        [100, {'A': 2, 'B': 1, 'C': 1}, 0, [('C', 25), ('B', 25), ('A', 50)]],
+        [10, {'A': 3, 'B': 3, 'C': 3}, 0, [('C', 3), ('B', 3), ('A', 4)]],
+        [1000, {'A': 50, 'B': 49, 'C': 1}, 100, [('B', 495), ('A', 505)]],
+        [1000, {'A': 1, 'B': 1}, 1000, [('A', 1000)]],
+        [1000, {'A': 1, 'B': 1}, 1001, []],
+        [1000, {'A': 0, 'B': 0}, 0, []],
+        [1000, {'A': 0, 'B': 5}, 1, [('B', 1000)]],
+    ])
+    def test_distribute(self, amount, distribution, minimum_output_value, expected):
+        assert distribute(amount=amount, distribution=distribution, minimum_output_value=minimum_output_value) == expected
+
+    def test_distribute_largest_remainder(self):
+        # 7 / 3 = 2.33, 2 / 3 = 0.67 -> 2 and 0 with 1 satoshi remaining which goes to the largest remainder (B)
+        assert distribute(amount=3, distribution={'A': 7, 'B': 2}) == [('B', 1), ('A', 2)]
+
+    def test_distribute_always_sends_the_exact_amount(self):
+        seed(42)
+        for _ in range(200):
+            distribution = {'address%s' % i: randint(0, 10**randint(0, 10)) for i in range(randint(1, 300))}
+            amount = randint(0, 10**10)
+            minimum_output_value = randint(0, 1000)
+
+            outputs = distribute(amount=amount, distribution=distribution, minimum_output_value=minimum_output_value)
+
+            if len(outputs) > 0:
+                assert sum([value for address, value in outputs]) == amount
+
+            # Every output must be at least the minimum output value (the rounding can only add a satoshi)
+            assert all(value >= minimum_output_value for address, value in outputs)
+
+            # Outputs are sorted from lowest share to highest share
+            shares = [distribution[address] for address, value in outputs]
+            assert shares == sorted(shares)
+
+    def test_distribute_excludes_only_the_lowest_shares(self):
+        distribution = {'address%s' % i: i for i in range(1, 101)}
+        outputs = distribute(amount=5050, distribution=distribution, minimum_output_value=50)
+
+        excluded = set(distribution.keys()) - set([address for address, value in outputs])
+        assert max([distribution[address] for address in excluded]) < min([distribution[address] for address, value in outputs])
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+import helpers.hotwallethelpers as hotwallethelpers
+from bips.BIP32 import bip32_privtopub
+from bips.BIP39 import get_seed
+from bips.BIP44 import get_xpriv_key, get_address_from_xpub
+from helpers.hotwallethelpers import KeyCache
+
+MNEMONIC = 'abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon about'
+PASSPHRASE = 'TREZOR'
+
+
+class TestKeyCache(object):
+    @pytest.fixture
+    def stretches(self, monkeypatch):
+        stretches = []
+
+        def counting_get_seed(mnemonic, passphrase):
+            stretches.append(mnemonic)
+            return get_seed(mnemonic=mnemonic, passphrase=passphrase)
+
+        monkeypatch.setattr(hotwallethelpers, 'get_hot_wallet', lambda: {'mnemonic': MNEMONIC.split(' '), 'passphrase': PASSPHRASE})
+        monkeypatch.setattr(hotwallethelpers, 'get_seed', counting_get_seed)
+        return stretches
+
+    def test_keys_are_derived_once(self, stretches):
+        key_cache = KeyCache(lifetime=60)
+
+        for account in [0, 1, 0, 1]:
+            assert key_cache.get_xpriv_key(account=account) == get_xpriv_key(mnemonic=MNEMONIC, passphrase=PASSPHRASE, account=account)
+            assert key_cache.get_xpub_key(account=account) == bip32_privtopub(get_xpriv_key(mnemonic=MNEMONIC, passphrase=PASSPHRASE, account=account))
+
+        assert key_cache.get_seed() == get_seed(mnemonic=MNEMONIC, passphrase=PASSPHRASE)
+        assert len(stretches) == 1
+        key_cache.clear()
+
+    def test_clear_wipes_the_keys(self, stretches):
+        key_cache = KeyCache(lifetime=60)
+        key_cache.get_xpriv_key(account=0)
+        keys = [key_cache.seed] + list(key_cache.accounts[0])
+
+        key_cache.clear()
+
+        assert all([key == bytearray(len(key)) for key in keys])
+        assert key_cache.seed is None and key_cache.accounts == {}
+
+        key_cache.get_xpub_key(account=0)
+        assert len(stretches) == 2
+        key_cache.clear()
+
+    def test_keys_expire_after_the_lifetime(self, stretches):
+        key_cache = KeyCache(lifetime=0.2)
+        key_cache.get_xpub_key(account=0)
+        assert key_cache.seed is not None
+
+        time.sleep(0.5)
+        assert key_cache.seed is None and key_cache.accounts == {}
+
+    def test_no_keys_are_kept_with_a_lifetime_of_0(self, stretches):
+        key_cache = KeyCache(lifetime=0)
+
+        assert key_cache.get_xpub_key(account=0) == key_cache.get_xpub_key(account=0)
+        assert key_cache.seed is None and key_cache.accounts == {}
+        assert len(stretches) == 2
+
+    def test_find_address_in_wallet(self, stretches, monkeypatch):
+        monkeypatch.setattr(hotwallethelpers, 'KEY_CACHE', KeyCache(lifetime=60))
+        address = get_address_from_xpub(xpub=bip32_privtopub(get_xpriv_key(mnemonic=MNEMONIC, passphrase=PASSPHRASE, account=2)), i=5)
+
+        assert hotwallethelpers.find_address_in_wallet(address=address, accounts=3, indexes=10) == (2, 5)
+        assert hotwallethelpers.get_address_from_wallet(account=2, index=5) == address
+        assert len(stretches) == 1
+        hotwallethelpers.clear_key_cache()
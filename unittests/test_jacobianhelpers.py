@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from helpers.jacobianhelpers import fast_multiply, jacobian_add, jacobian_double, from_jacobian, to_jacobian, wnaf, G, N, P
+from helpers.jacobianhelpers import batch_inv, batch_from_jacobian, inv
+
+generator = random.Random(0)
+SCALARS = [0, 1, 2, 3, 127, 128, 129, 2 ** 128, N - 1, N, N + 1, -1, -12345, 2 ** 256 - 1] + [generator.randrange(1, N) for _ in range(20)]
+
+
+def double_and_add(a, n):
+    # The plain double-and-add multiplication as a reference
+    n %= N
+    result = 0, 0, 1
+    for bit in bin(n)[2:]:
+        result = jacobian_double(result)
+        if bit == '1':
+            result = jacobian_add(result, a)
+
+    return result
+
+
+class TestJacobianHelpers(object):
+    @pytest.mark.parametrize('n', SCALARS)
+    def test_multiply_generator(self, n):
+        assert fast_multiply(G, n) == from_jacobian(double_and_add(to_jacobian(G), n))
+
+    @pytest.mark.parametrize('n', SCALARS)
+    def test_multiply_other_point(self, n):
+        point = from_jacobian(double_and_add(to_jacobian(G), 987654321))
+        assert fast_multiply(point, n) == from_jacobian(double_and_add(to_jacobian(point), n))
+
+    def test_multiply_point_at_infinity(self):
+        assert fast_multiply((0, 0), 12345) == (0, 0)
+
+    @pytest.mark.parametrize('n', [1, 7, 255, 256, 2 ** 64 + 1] + [generator.randrange(1, N) for _ in range(10)])
+    def test_wnaf(self, n):
+        digits = wnaf(n, 5)
+
+        assert sum([digit * 2 ** i for i, digit in enumerate(digits)]) == n
+        assert all([digit == 0 or (digit % 2 == 1 and abs(digit) < 16) for digit in digits])
+        non_zero = [i for i, digit in enumerate(digits) if digit != 0]
+        assert all([j - i >= 5 for i, j in zip(non_zero, non_zero[1:])])
+
+    def test_batch_inv(self):
+        values = [generator.randrange(0, P) for _ in range(20)] + [0, 1, 0]
+        assert batch_inv(values, P) == [inv(value, P) for value in values]
+        assert batch_inv([], P) == []
+
+    def test_batch_from_jacobian(self):
+        points = [double_and_add(to_jacobian(G), n) for n in [1, 5, N - 1, 0]]
+        assert batch_from_jacobian(points) == [from_jacobian(point) for point in points]
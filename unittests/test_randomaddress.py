@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+from random import randint, random, seed
+
+import randomaddress.randomaddress as randomaddress_module
+from helpers.jsonhelpers import save_to_json_file
+from randomaddress.randomaddress import RandomAddress, CumulativeDistribution
+
+
+def linear_chosen_index(values, random_number):
+    # Reference implementation: walk the distribution linearly with float accumulation
+    total = sum(values)
+
+    if total > 0:
+        target = random_number*total
+        cumulative = 0.0
+        for i in range(0, len(values)):
+            cumulative = cumulative + values[i]
+            if cumulative >= target:
+                return i
+
+
+class TestRandomAddress(object):
+    @pytest.mark.parametrize('values, random_number, expected', [
+        [[1, 1, 1, 1], 0.0, 0],
+        [[1, 1, 1, 1], 0.25, 0],
+        [[1, 1, 1, 1], 0.2500001, 1],
+        [[1, 1, 1, 1], 0.9999999, 3],
+        [[0, 0, 5, 0], 0.0, 0],
+        [[0, 0, 5, 0], 0.5, 2],
+        [[100000000, 1, 1], 0.99999998, 0],
+        [[100000000, 1, 1], 0.99999999, 1],
+        [[0, 0, 0], 0.5, None],
+        [[], 0.5, None],
+    ])
+    def test_get_chosen_index(self, values, random_number, expected):
+        assert RandomAddress.get_chosen_index(values, random_number) == expected
+
+    def test_get_chosen_index_is_identical_to_linear_walk(self):
+        seed(42)
+        for _ in range(200):
+            values = [randint(0, 10**randint(0, 15)) for _ in range(randint(1, 50))]
+            for _ in range(20):
+                random_number = random()
+                assert RandomAddress.get_chosen_index(values, random_number) == linear_chosen_index(values, random_number)
+
+    def test_get_chosen_index_with_negative_values_is_identical_to_linear_walk(self):
+        seed(42)
+        for _ in range(200):
+            values = [randint(-100, 1000) for _ in range(randint(1, 20))]
+            random_number = random()
+            assert RandomAddress.get_chosen_index(values, random_number) == linear_chosen_index(values, random_number)
+
+    @pytest.mark.parametrize('use_numpy', [True, False])
+    def test_chosen_indexes_in_batch_are_identical_to_single_draws(self, use_numpy, monkeypatch):
+        if use_numpy is False:
+            monkeypatch.setattr(randomaddress_module, 'numpy', None)
+
+        seed(42)
+        for _ in range(50):
+            values = [randint(0, 10**randint(0, 12)) for _ in range(randint(1, 500))]
+            random_numbers = [random() for _ in range(100)] + [0.0]
+            cumulative_distribution = CumulativeDistribution(values)
+
+            assert (cumulative_distribution.numpy_cumulative_values is not None) == (use_numpy and randomaddress_module.numpy is not None)
+            assert cumulative_distribution.chosen_indexes(random_numbers) == [linear_chosen_index(values, random_number) for random_number in random_numbers]
+
+    def test_results_batch(self):
+        distribution = [('address1', 1000), ('address2', 3000)]
+        draws = RandomAddress.results_batch(distribution, [0.1, 0.5])
+
+        assert [draw['chosen_address'] for draw in draws] == ['address1', 'address2']
+        assert [draw['chosen_index'] for draw in draws] == [0, 1]
+        assert [draw['target'] for draw in draws] == [4000 * 0.1, 4000 * 0.5]
+
+    def test_results_matches_results_batch(self):
+        distribution = [('address1', 1000), ('address2', 3000)]
+
+        assert RandomAddress(address=None).results(distribution, 0.2) == {'chosen_address': 'address1',
+                                                                          'chosen_index': 0,
+                                                                          'target': 4000 * 0.2}
+
+    @pytest.mark.parametrize('use_numpy', [True, False])
+    def test_failed_block_lookup_has_no_chosen_address(self, use_numpy, monkeypatch):
+        if use_numpy is False:
+            monkeypatch.setattr(randomaddress_module, 'numpy', None)
+
+        distribution = [('address1', 1000), ('address2', 3000)]
+        monkeypatch.setattr(RandomAddress, 'get_distribution', lambda self, source: distribution)
+        monkeypatch.setattr(randomaddress_module, 'random_number_from_blockhash', lambda block_height, save_cache=True: {100: 0.5}.get(block_height))
+
+        response = RandomAddress(address=None).get(source='SIL', rng_block_height=101)
+        assert (response['random_number'], response['chosen_address'], response['chosen_index'], response['target']) == (None, None, None, None)
+
+        draws = RandomAddress(address=None).get_batch(source='SIL', rng_block_heights=[100, 101])['draws']
+        assert [draw['chosen_address'] for draw in draws] == ['address2', None]
+        assert [draw['chosen_index'] for draw in draws] == [1, None]
+        assert [draw['target'] for draw in draws] == [4000 * 0.5, None]
+
+
+class TestRandomNumbersCache(object):
+    block_hash = '0000000000000000000f1fbe26d3e68e12c0d4e2e2b4bd4a4b68fae3e3e7bd6a'
+
+    @pytest.fixture(autouse=True)
+    def empty_cache(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(randomaddress_module, 'RANDOM_NUMBERS_CACHE_DIR', str(tmpdir))
+        monkeypatch.setattr(randomaddress_module, 'RANDOM_NUMBERS_CACHES', {})
+        monkeypatch.setattr(randomaddress_module, 'LATEST_KNOWN_BLOCK_HEIGHTS', {})
+        monkeypatch.setattr(randomaddress_module, 'get_random_number_cache_confirmations', lambda: 6)
+        monkeypatch.setattr(randomaddress_module, 'get_use_testnet', lambda: False)
+
+    @pytest.fixture
+    def saves(self, monkeypatch):
+        saves = []
+
+        def counting_save_to_json_file(filename, data):
+            saves.append(filename)
+            save_to_json_file(filename, data)
+
+        monkeypatch.setattr(randomaddress_module, 'save_to_json_file', counting_save_to_json_file)
+        return saves
+
+    def mock_explorer(self, monkeypatch, latest_block_height):
+        calls = {'block_by_height': 0, 'latest_block': 0}
+
+        def block_by_height(height):
+            calls['block_by_height'] += 1
+            return {'block': {'height': height, 'hash': self.block_hash}}
+
+        def latest_block():
+            calls['latest_block'] += 1
+            return {'block': {'height': latest_block_height, 'hash': self.block_hash}}
+
+        monkeypatch.setattr(randomaddress_module, 'block_by_height', block_by_height)
+        monkeypatch.setattr(randomaddress_module, 'latest_block', latest_block)
+        return calls
+
+    def test_random_number_from_hash(self):
+        expected = float('0.' + ''.join(reversed(str(int(self.block_hash, 16)))))
+        assert randomaddress_module.random_number_from_hash(self.block_hash) == expected
+
+    def test_random_number_of_a_block_with_enough_confirmations_is_only_retrieved_once(self, monkeypatch):
+        calls = self.mock_explorer(monkeypatch, latest_block_height=1000)
+
+        first = randomaddress_module.random_number_from_blockhash(900)
+        second = randomaddress_module.random_number_from_blockhash(900)
+
+        assert first == second == randomaddress_module.random_number_from_hash(self.block_hash)
+        assert calls['block_by_height'] == 1
+
+        # The cache must survive a restart
+        monkeypatch.setattr(randomaddress_module, 'RANDOM_NUMBERS_CACHES', {})
+        assert randomaddress_module.random_number_from_blockhash(900) == first
+        assert calls['block_by_height'] == 1
+
+    def test_random_number_of_a_block_without_enough_confirmations_is_not_cached(self, monkeypatch):
+        calls = self.mock_explorer(monkeypatch, latest_block_height=1000)
+
+        randomaddress_module.random_number_from_blockhash(996)
+        randomaddress_module.random_number_from_blockhash(996)
+
+        assert calls['block_by_height'] == 2
+        assert 996 not in randomaddress_module.get_random_numbers_cache()
+
+    def test_random_numbers_of_mainnet_are_not_used_on_testnet(self, monkeypatch):
+        calls = self.mock_explorer(monkeypatch, latest_block_height=1000)
+        mainnet_random_number = randomaddress_module.random_number_from_blockhash(900)
+
+        monkeypatch.setattr(randomaddress_module, 'get_use_testnet', lambda: True)
+        self.block_hash = '00000000000000000001' + self.block_hash[20:]
+        testnet_random_number = randomaddress_module.random_number_from_blockhash(900)
+
+        assert testnet_random_number == randomaddress_module.random_number_from_hash(self.block_hash) != mainnet_random_number
+        assert calls['block_by_height'] == 2
+
+        # Each network keeps its own cache, also after a restart
+        monkeypatch.setattr(randomaddress_module, 'RANDOM_NUMBERS_CACHES', {})
+        assert randomaddress_module.random_number_from_blockhash(900) == testnet_random_number
+        monkeypatch.setattr(randomaddress_module, 'get_use_testnet', lambda: False)
+        assert randomaddress_module.random_number_from_blockhash(900) == mainnet_random_number
+        assert calls['block_by_height'] == 2
+
+    def test_random_numbers_from_blockhashes(self, monkeypatch, saves):
+        calls = self.mock_explorer(monkeypatch, latest_block_height=1000)
+
+        data = randomaddress_module.random_numbers_from_blockhashes(900, 909)
+
+        assert sorted(data['random_numbers'].keys()) == list(range(900, 910))
+        assert calls['latest_block'] == 1
+        assert calls['block_by_height'] == 10
+        # The new random numbers are written to disk at once
+        assert len(saves) == 1
+
+        monkeypatch.setattr(randomaddress_module, 'RANDOM_NUMBERS_CACHES', {})
+        randomaddress_module.random_numbers_from_blockhashes(900, 909)
+        assert calls['latest_block'] == 1
+        assert calls['block_by_height'] == 10
+        assert len(saves) == 1
+
+    @pytest.mark.parametrize('from_block_height, to_block_height', [
+        [0, 10],
+        [10, 9],
+        [-1, 10],
+        [1, 1001],
+    ])
+    def test_random_numbers_from_blockhashes_with_invalid_range(self, from_block_height, to_block_height):
+        assert 'error' in randomaddress_module.random_numbers_from_blockhashes(from_block_height, to_block_height)
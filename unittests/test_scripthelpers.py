@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import importlib
+import os
+import sys
+
+import pytest
+
+import helpers.scripthelpers as scripthelpers
+
+SCRIPT = '''
+class {name}(object):
+    VERSION = {version}
+'''
+
+
+class TestScriptHelpers(object):
+    @pytest.fixture(autouse=True)
+    def scripts_dir(self, tmpdir, monkeypatch):
+        scripts_dir = tmpdir.mkdir('testscripts')
+        scripts_dir.join('__init__.py').write('')
+        scripts_dir.join('Hello.py').write(SCRIPT.format(name='Hello', version=1))
+
+        monkeypatch.chdir(str(tmpdir))
+        monkeypatch.syspath_prepend(str(tmpdir))
+        monkeypatch.setattr(scripthelpers, 'SCRIPT_ROOT_DIRS', ['testscripts'])
+        monkeypatch.setattr(scripthelpers, 'SCRIPTS', {})
+
+        self.unload_test_scripts()
+        yield scripts_dir
+        self.unload_test_scripts()
+
+    @staticmethod
+    def unload_test_scripts():
+        for module_name in [module_name for module_name in sys.modules if module_name.split('.')[0] == 'testscripts']:
+            del sys.modules[module_name]
+        importlib.invalidate_caches()
+
+    def test_script_is_loaded_once(self):
+        script_class = scripthelpers.get_script_class('Hello.py')
+        assert script_class.VERSION == 1
+        assert scripthelpers.get_script_class('Hello.py') is script_class
+
+        metrics = scripthelpers.get_script_metrics()['Hello.py']
+        assert metrics['loads'] == 1
+        assert metrics['hits'] == 1
+        assert metrics['path'] == os.path.join('testscripts', 'Hello.py')
+
+    def test_script_is_reloaded_when_it_changes(self, scripts_dir):
+        assert scripthelpers.get_script_class('Hello.py').VERSION == 1
+
+        scripts_dir.join('Hello.py').write(SCRIPT.format(name='Hello', version=1000))
+        stat = os.stat(str(scripts_dir.join('Hello.py')))
+        os.utime(str(scripts_dir.join('Hello.py')), ns=(stat.st_atime_ns, stat.st_mtime_ns + 2000000000))
+
+        assert scripthelpers.get_script_class('Hello.py').VERSION == 1000
+        assert scripthelpers.get_script_metrics()['Hello.py']['loads'] == 2
+
+    def test_unknown_and_invalid_scripts(self):
+        assert scripthelpers.get_script_class('Unknown.py') is None
+        assert scripthelpers.get_script_class('Hello.txt') is None
+        assert scripthelpers.get_script_metrics() == {}
+
+    def test_preload_scripts(self, scripts_dir):
+        scripts_dir.join('World.py').write(SCRIPT.format(name='World', version=1))
+
+        assert scripthelpers.preload_scripts(['Hello.py', 'World.py', 'Hello.py', 'Unknown.py']) == 2
+        assert sorted(scripthelpers.get_script_metrics().keys()) == ['Hello.py', 'World.py']
@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+import helpers.activationhelpers as activationhelpers
+import helpers.shardhelpers as shardhelpers
+import helpers.storagehelpers as storagehelpers
+import helpers.triggerregistry as triggerregistry
+from helpers.lockhelpers import activation_lock
+from helpers.shardhelpers import HashRing, ShardManager, LeaseLost, get_shard
+from helpers.triggerhelpers import get_trigger, activate_trigger
+from helpers.triggerregistry import TriggerRegistry
+from storage.sqlitestorage import SQLiteStorage
+from storage.storage import LEASES
+from trigger.manualtrigger import ManualTrigger
+
+
+class TestHashRing(object):
+    def test_get_shard_is_stable(self):
+        assert get_shard('trigger1', 64) == get_shard('trigger1', 64)
+        assert 0 <= get_shard('trigger1', 64) < 64
+        assert len(set(get_shard('trigger%s' % i, 64) for i in range(1000))) == 64
+
+    def test_empty_ring(self):
+        assert HashRing(workers=[]).get_worker('shard-0') is None
+
+    def test_keys_are_balanced(self):
+        ring = HashRing(workers=['worker1', 'worker2', 'worker3'])
+        keys = ['shard-%s' % i for i in range(3000)]
+        counts = {}
+        for key in keys:
+            counts[ring.get_worker(key)] = counts.get(ring.get_worker(key), 0) + 1
+
+        assert sorted(counts.keys()) == ['worker1', 'worker2', 'worker3']
+        assert min(counts.values()) > 600
+
+    def test_only_keys_of_new_worker_move(self):
+        keys = ['shard-%s' % i for i in range(1000)]
+        ring = HashRing(workers=['worker1', 'worker2'])
+        new_ring = HashRing(workers=['worker1', 'worker2', 'worker3'])
+
+        for key in keys:
+            if ring.get_worker(key) != new_ring.get_worker(key):
+                assert new_ring.get_worker(key) == 'worker3'
+
+
+class TestShardManager(object):
+    @pytest.fixture(autouse=True)
+    def storage(self, tmpdir, monkeypatch):
+        storage = SQLiteStorage(database_file=os.path.join(str(tmpdir), 'spellbook.db'))
+        monkeypatch.setattr(storagehelpers, 'STORAGE', storage)
+        monkeypatch.setattr(triggerregistry, 'TRIGGER_REGISTRY', TriggerRegistry(storage=storage))
+
+        return storage
+
+    @pytest.fixture
+    def clock(self, storage, monkeypatch):
+        # The clock of the storage is far from the clock of the processes, the expiration times only use the storage clock
+        clock = [1000.0]
+        monkeypatch.setattr(shardhelpers.time, 'monotonic', lambda: clock[0])
+        monkeypatch.setattr(storage, 'now', lambda: clock[0] + 10 ** 6)
+
+        return clock
+
+    def test_single_worker_owns_all_shards(self):
+        manager = ShardManager(worker_id='worker1', shards=16)
+        manager.update()
+
+        assert sorted(manager.owned.keys()) == list(range(16))
+        assert manager.owns('trigger1') is True
+
+    def test_workers_own_disjoint_shards(self, clock):
+        manager1 = ShardManager(worker_id='worker1', shards=16, lease_duration=60)
+        manager2 = ShardManager(worker_id='worker2', shards=16, lease_duration=60)
+        manager1.update()
+
+        # worker1 stops renewing the shards that the ring assigns to worker2, worker2 claims them once they expire
+        for i in range(4):
+            manager2.update()
+            manager1.update()
+            clock[0] += 20
+
+        shards1, shards2 = set(manager1.owned.keys()), set(manager2.owned.keys())
+        assert len(shards1) > 0 and len(shards2) > 0
+        assert shards1 & shards2 == set()
+        assert shards1 | shards2 == set(range(16))
+
+        for i in range(100):
+            assert [manager1.owns('trigger%s' % i), manager2.owns('trigger%s' % i)].count(True) == 1
+
+    def test_shards_of_stopped_worker_are_taken_over(self, storage):
+        manager1 = ShardManager(worker_id='worker1', shards=16)
+        manager1.update()
+        manager2 = ShardManager(worker_id='worker2', shards=16)
+        manager2.update()
+        assert len(manager2.owned) == 0
+
+        manager1.release()
+        manager2.update()
+
+        assert sorted(manager2.owned.keys()) == list(range(16))
+        assert storage.find(LEASES, lease_type='worker') == ['worker-worker2']
+
+    def test_shards_of_dead_worker_are_taken_over_after_expiry(self, clock):
+        manager1 = ShardManager(worker_id='worker1', shards=16, lease_duration=60)
+        manager1.update()
+        manager2 = ShardManager(worker_id='worker2', shards=16, lease_duration=60)
+
+        clock[0] += 30
+        manager2.update()
+        assert len(manager2.owned) == 0
+        assert manager1.owns('trigger1') is True
+
+        # worker1 stops handling its triggers well before its leases expire
+        clock[0] += 11
+        assert manager1.owns('trigger1') is False
+
+        clock[0] += 20
+        manager2.update()
+        assert sorted(manager2.owned.keys()) == list(range(16))
+
+    def test_epoch_of_a_lease_changes_with_its_owner(self, clock):
+        manager1 = ShardManager(worker_id='worker1', shards=4, lease_duration=60)
+        manager1.update()
+        manager1.update()
+        epoch = manager1.get_lease_epoch('trigger1')
+        assert manager1.holds_lease('trigger1', epoch) is True
+
+        manager1.release()
+        manager2 = ShardManager(worker_id='worker2', shards=4, lease_duration=60)
+        manager2.update()
+
+        assert manager2.get_lease_epoch('trigger1') == epoch + 1
+        assert manager1.holds_lease('trigger1', epoch) is False
+        # The process that lost the lease can not use its old epoch anymore, even if its own bookkeeping is outdated
+        manager1.owned = {manager1.get_shard('trigger1'): (epoch, clock[0] + 60)}
+        assert manager1.holds_lease('trigger1', epoch) is False
+
+    def test_listeners_are_notified_of_acquired_shards(self):
+        acquired = []
+        manager = ShardManager(worker_id='worker1', shards=4)
+        manager.add_listener(acquired.append)
+
+        manager.update()
+        manager.update()
+
+        assert acquired == [{0, 1, 2, 3}]
+
+
+class FakeAction(object):
+    def __init__(self, while_running=None, at_most_once=False):
+        self.while_running = while_running
+        self.at_most_once = at_most_once
+        self.runs = 0
+
+    def run(self):
+        self.runs += 1
+        if self.while_running is not None:
+            self.while_running()
+
+        return True
+
+
+class TestShardedActivations(object):
+    @pytest.fixture(autouse=True)
+    def storage(self, tmpdir, monkeypatch):
+        storage = SQLiteStorage(database_file=os.path.join(str(tmpdir), 'spellbook.db'))
+        monkeypatch.setattr(storagehelpers, 'STORAGE', storage)
+        monkeypatch.setattr(triggerregistry, 'TRIGGER_REGISTRY', TriggerRegistry(storage=storage))
+        monkeypatch.setattr(activationhelpers, 'ACTIVATION_QUEUE', activationhelpers.ActivationQueue(workers=1))
+        monkeypatch.setattr(activationhelpers, 'get_shard_synchronous_timeout', lambda: 0)
+
+        return storage
+
+    @pytest.fixture
+    def clock(self, storage, monkeypatch):
+        clock = [1000.0]
+        monkeypatch.setattr(shardhelpers.time, 'monotonic', lambda: clock[0])
+        monkeypatch.setattr(storage, 'now', lambda: clock[0] + 10 ** 6)
+
+        return clock
+
+    @pytest.fixture
+    def actions(self, monkeypatch):
+        actions = {}
+        monkeypatch.setattr(activationhelpers, 'get_actions', lambda: list(actions.keys()))
+        monkeypatch.setattr(activationhelpers, 'get_action', lambda action_id: actions[action_id])
+
+        return actions
+
+    @staticmethod
+    def create_trigger(action_ids):
+        trigger = ManualTrigger('trigger1')
+        trigger.configure(trigger_type='Manual', status='Active')
+        trigger.actions = action_ids
+        trigger.save()
+
+        return get_trigger('trigger1')
+
+    def test_job_is_not_saved_after_the_shard_was_taken_over(self, clock, actions, monkeypatch):
+        manager1 = ShardManager(worker_id='worker1', shards=4, lease_duration=60)
+        manager1.update()
+        manager2 = ShardManager(worker_id='worker2', shards=4, lease_duration=60)
+        monkeypatch.setattr(shardhelpers, 'SHARD_MANAGER', manager1)
+
+        def take_over():
+            # The action takes longer than the lease of worker1, worker2 takes over the shard in the meantime
+            clock[0] += 61
+            manager2.update()
+
+        actions['action1'] = FakeAction(while_running=take_over)
+        actions['action2'] = FakeAction()
+        assert self.create_trigger(action_ids=['action1', 'action2']).activate() == {'job_id': 'trigger1-0'}
+
+        activationhelpers.run_job('trigger1-0')
+
+        job = activationhelpers.get_job('trigger1-0')
+        assert (job['status'], job['owner'], job['next_action']) == ('Running', 'worker1', 0)
+        assert actions['action2'].runs == 0
+
+        # The new owner claims the job with the new epoch of the lease and runs it
+        actions['action1'].while_running = None
+        monkeypatch.setattr(shardhelpers, 'SHARD_MANAGER', manager2)
+        activationhelpers.run_job('trigger1-0')
+
+        job = activationhelpers.get_job('trigger1-0')
+        assert (job['status'], job['owner'], job['lease_epoch']) == ('Succeeded', 'worker2', manager2.get_lease_epoch('trigger1'))
+        assert actions['action2'].runs == 1
+
+    def test_old_owner_can_not_save_a_job_claimed_by_the_new_owner(self, clock, actions, monkeypatch):
+        manager1 = ShardManager(worker_id='worker1', shards=4, lease_duration=60)
+        manager1.update()
+        monkeypatch.setattr(shardhelpers, 'SHARD_MANAGER', manager1)
+        actions['action1'] = FakeAction()
+        self.create_trigger(action_ids=['action1']).activate()
+
+        with activation_lock('trigger1'):
+            job = activationhelpers.claim_job('trigger1-0')
+
+        # worker1 still believes it holds the lease, but it was released and claimed by worker2
+        owned = dict(manager1.owned)
+        manager1.release()
+        manager1.owned = owned
+        manager2 = ShardManager(worker_id='worker2', shards=4, lease_duration=60)
+        manager2.update()
+
+        with pytest.raises(LeaseLost):
+            activationhelpers.save_job(job)
+
+    def test_activation_of_a_trigger_of_another_process_is_queued_for_its_owner(self, clock, actions, monkeypatch):
+        owner = ShardManager(worker_id='worker1', shards=4, lease_duration=60)
+        owner.update()
+        other = ShardManager(worker_id='worker2', shards=4, lease_duration=60)
+        other.update()
+        assert other.owns('trigger1') is False
+
+        monkeypatch.setattr(shardhelpers, 'SHARD_MANAGER', other)
+        actions['action1'] = FakeAction()
+        queue = activationhelpers.get_activation_queue()
+
+        # The synchronous activation waits for the owner at most synchronous_timeout seconds
+        self.create_trigger(action_ids=['action1'])
+        assert activate_trigger('trigger1') == {'job_id': 'trigger1-0'}
+        assert activationhelpers.get_job('trigger1-0')['status'] == 'Queued'
+        assert queue.pop_due(now=2 ** 40) == []
+
+        # The owner picks up the job when it polls for new jobs
+        monkeypatch.setattr(shardhelpers, 'SHARD_MANAGER', owner)
+        queue.poll()
+        assert queue.pop_due(now=2 ** 40) == ['trigger1-0']
+
+        activationhelpers.run_job('trigger1-0')
+        assert activationhelpers.get_job('trigger1-0')['status'] == 'Succeeded'
+        assert actions['action1'].runs == 1
+
+    def test_synchronous_activation_of_an_owned_trigger_returns_the_response(self, clock, actions, monkeypatch):
+        manager = ShardManager(worker_id='worker1', shards=4, lease_duration=60)
+        manager.update()
+        monkeypatch.setattr(shardhelpers, 'SHARD_MANAGER', manager)
+        actions['action1'] = FakeAction()
+        self.create_trigger(action_ids=['action1'])
+
+        assert activate_trigger('trigger1') is None
+        assert activationhelpers.get_job('trigger1-0')['status'] == 'Succeeded'
+        assert actions['action1'].runs == 1
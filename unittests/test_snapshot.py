@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+
+import data.snapshot as snapshot_module
+from data.snapshot import Snapshot
+from helpers.triggerhelpers import check_conditions
+from trigger.balancetrigger import BalanceTrigger
+from trigger.blockheighttrigger import BlockHeightTrigger
+from trigger.txconfirmationtrigger import TxConfirmationTrigger
+
+ADDRESS = '1BitcoinEaterAddressDontSendf59kuE'
+
+
+class TestSnapshot(object):
+    def mock_explorer(self, monkeypatch):
+        calls = {'balance': 0, 'latest_block': 0}
+
+        def balance(address):
+            calls['balance'] += 1
+            return {'balance': {'final': 1000, 'received': 1000, 'sent': 0}}
+
+        def latest_block():
+            calls['latest_block'] += 1
+            return {'block': {'height': 500000}}
+
+        monkeypatch.setattr(snapshot_module, 'balance', balance)
+        monkeypatch.setattr(snapshot_module, 'latest_block', latest_block)
+        return calls
+
+    def test_each_dependency_is_retrieved_only_once(self, monkeypatch):
+        calls = self.mock_explorer(monkeypatch)
+
+        triggers = []
+        for i in range(100):
+            trigger = BalanceTrigger('balance%s' % i)
+            trigger.configure(address=ADDRESS, amount=i * 20)
+            triggers.append(trigger)
+
+            trigger = BlockHeightTrigger('blockheight%s' % i)
+            trigger.configure(block_height=499950 + i)
+            triggers.append(trigger)
+
+        snapshot = Snapshot()
+        snapshot.prefetch(dependencies=[dependency for trigger in triggers for dependency in trigger.dependencies()],
+                          pool=ThreadPoolExecutor(max_workers=4),
+                          timeout=10)
+
+        assert calls == {'balance': 1, 'latest_block': 1}
+
+        conditions_fulfilled = check_conditions(triggers=triggers, snapshot=snapshot)
+
+        assert calls == {'balance': 1, 'latest_block': 1}
+        assert set([trigger_id for trigger_id, fulfilled in conditions_fulfilled.items() if fulfilled is False]) == \
+            set(['balance%s' % i for i in range(51, 100)] + ['blockheight%s' % i for i in range(51, 100)])
+
+    def test_dependencies_that_were_not_prefetched_are_retrieved_when_needed(self, monkeypatch):
+        calls = self.mock_explorer(monkeypatch)
+
+        snapshot = Snapshot()
+        assert snapshot.latest_block() == snapshot.latest_block() == {'block': {'height': 500000}}
+        assert calls['latest_block'] == 1
+
+    def test_txconfirmation_trigger_resolves_its_block_height_once(self, monkeypatch):
+        txid = 'a' * 64
+        trigger = TxConfirmationTrigger('txconfirmation')
+        trigger.configure(txid=txid, confirmations=6)
+        monkeypatch.setattr(trigger, 'save', lambda: None)
+        assert trigger.dependencies() == [(Snapshot.TRANSACTION, txid)]
+
+        snapshot = Snapshot()
+        snapshot.set(dependency=(Snapshot.TRANSACTION, txid), data={'transaction': {'confirmations': 2, 'block_height': 499999}})
+        assert trigger.conditions_fulfilled(snapshot=snapshot) is False
+        assert trigger.block_height == 499999
+        assert trigger.target_height() == 500004
+        assert trigger.dependencies() == [(Snapshot.LATEST_BLOCK, None)]
+
+        snapshot = Snapshot()
+        snapshot.set(dependency=(Snapshot.LATEST_BLOCK, None), data={'block': {'height': 500004}})
+        assert trigger.conditions_fulfilled(snapshot=snapshot) is True
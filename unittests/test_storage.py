@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import platform
+import stat
+import time
+
+import pytest
+
+from helpers.storagehelpers import import_from_json, export_to_json
+from helpers.jsonhelpers import save_to_json_file, load_from_json_file
+from storage.bufferedstorage import BufferedStorage
+from storage.jsonstorage import JSONStorage
+from storage.sqlitestorage import SQLiteStorage
+from storage.storage import TRIGGERS, ACTIONS
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def storage(request, tmpdir):
+    if request.param == 'json':
+        return JSONStorage(directory=str(tmpdir.join('json')))
+    else:
+        return SQLiteStorage(database_file=str(tmpdir.join('spellbook.db')))
+
+
+class TestStorage(object):
+    def test_save_get_and_delete(self, storage):
+        assert storage.get(TRIGGERS, 'trigger1') is None
+
+        storage.save(TRIGGERS, 'trigger1', {'trigger_id': 'trigger1', 'trigger_type': 'Manual', 'status': 'Active'})
+        storage.save(ACTIONS, 'action1', {'id': 'action1', 'action_type': 'Command'})
+        assert storage.get(TRIGGERS, 'trigger1')['status'] == 'Active'
+        assert storage.get_ids(TRIGGERS) == ['trigger1']
+        assert storage.get_ids(ACTIONS) == ['action1']
+
+        assert storage.delete(TRIGGERS, 'trigger1') is True
+        assert storage.delete(TRIGGERS, 'trigger1') is False
+        assert storage.get(TRIGGERS, 'trigger1') is None
+        assert storage.get_ids(TRIGGERS) == []
+
+    def test_find(self, storage):
+        storage.save(TRIGGERS, 'trigger1', {'trigger_type': 'Balance', 'status': 'Active', 'address': '1address'})
+        storage.save(TRIGGERS, 'trigger2', {'trigger_type': 'Balance', 'status': 'Succeeded', 'address': '1address'})
+        storage.save(TRIGGERS, 'trigger3', {'trigger_type': 'Manual', 'status': 'Active'})
+
+        assert storage.find(TRIGGERS, status='Active') == ['trigger1', 'trigger3']
+        assert storage.find(TRIGGERS, trigger_type='Balance', address='1address') == ['trigger1', 'trigger2']
+
+        with pytest.raises(ValueError):
+            storage.find(TRIGGERS, description='foo')
+
+    def test_get_changes(self, storage):
+        storage.save(TRIGGERS, 'trigger1', {'status': 'Active'})
+        storage.save(TRIGGERS, 'trigger2', {'status': 'Active'})
+
+        token, changed, deleted = storage.get_changes(TRIGGERS)
+        assert sorted(changed.keys()) == ['trigger1', 'trigger2']
+        assert deleted == []
+
+        storage.save(TRIGGERS, 'trigger1', {'status': 'Succeeded'})
+        storage.delete(TRIGGERS, 'trigger2')
+
+        token, changed, deleted = storage.get_changes(TRIGGERS, token=token)
+        assert changed == {'trigger1': {'status': 'Succeeded'}}
+        assert deleted == ['trigger2']
+
+        assert storage.get_changes(TRIGGERS, token=token)[1:] == ({}, [])
+
+    def test_import_and_export(self, storage, tmpdir):
+        source = JSONStorage(directory=str(tmpdir.join('source')))
+        source.save(TRIGGERS, 'trigger1', {'trigger_id': 'trigger1', 'trigger_type': 'Manual', 'status': 'Active'})
+        source.save(ACTIONS, 'action1', {'id': 'action1', 'action_type': 'Command'})
+        source.save(ACTIONS, 'action2', {'id': 'action2', 'action_type': 'Command'})
+
+        assert import_from_json(storage=storage, directory=source.directory) == {TRIGGERS: 1, ACTIONS: 2}
+        assert storage.get(ACTIONS, 'action2') == {'id': 'action2', 'action_type': 'Command'}
+
+        destination = str(tmpdir.join('destination'))
+        assert export_to_json(storage=storage, directory=destination) == {TRIGGERS: 1, ACTIONS: 2}
+        assert JSONStorage(directory=destination).get(TRIGGERS, 'trigger1') == source.get(TRIGGERS, 'trigger1')
+
+
+class TestSQLiteStorage(object):
+    def test_transaction_is_rolled_back(self, tmpdir):
+        storage = SQLiteStorage(database_file=str(tmpdir.join('spellbook.db')))
+        storage.save(TRIGGERS, 'trigger1', {'status': 'Active', 'actions': ['action1']})
+        storage.save(ACTIONS, 'action1', {'action_type': 'Command'})
+
+        with pytest.raises(Exception):
+            with storage.transaction():
+                storage.delete(ACTIONS, 'action1')
+                raise Exception('crash before the trigger is deleted')
+
+        assert storage.get(ACTIONS, 'action1') is not None
+
+        with storage.transaction():
+            storage.delete(ACTIONS, 'action1')
+            storage.delete(TRIGGERS, 'trigger1')
+
+        assert storage.get_ids(TRIGGERS) == [] and storage.get_ids(ACTIONS) == []
+
+    def test_failed_nested_transaction_is_rolled_back(self, tmpdir):
+        storage = SQLiteStorage(database_file=str(tmpdir.join('spellbook.db')))
+
+        with storage.transaction():
+            storage.save(TRIGGERS, 'trigger1', {'status': 'Active'})
+            try:
+                with storage.transaction():
+                    storage.save(TRIGGERS, 'trigger2', {'status': 'Active'})
+                    storage.save(TRIGGERS, 'trigger1', {'status': 'Failed'})
+                    raise Exception('crash in the nested transaction')
+            except Exception:
+                pass
+
+            with storage.transaction():
+                storage.save(ACTIONS, 'action1', {'action_type': 'Command'})
+
+        assert storage.get_ids(TRIGGERS) == ['trigger1']
+        assert storage.get(TRIGGERS, 'trigger1') == {'status': 'Active'}
+        assert storage.get_ids(ACTIONS) == ['action1']
+
+    def test_changes_are_visible_to_other_connections(self, tmpdir):
+        database_file = str(tmpdir.join('spellbook.db'))
+        storage = SQLiteStorage(database_file=database_file)
+        other_process = SQLiteStorage(database_file=database_file)
+
+        token = other_process.get_changes(TRIGGERS)[0]
+        storage.save(TRIGGERS, 'trigger1', {'status': 'Active'})
+
+        assert other_process.get_changes(TRIGGERS, token=token)[1] == {'trigger1': {'status': 'Active'}}
+        assert other_process.is_empty() is False
+
+
+class TestBufferedStorage(object):
+    @pytest.fixture
+    def backend(self, tmpdir):
+        return JSONStorage(directory=str(tmpdir.join('json')))
+
+    def test_saves_are_coalesced(self, backend, monkeypatch):
+        saved = []
+        original_save = backend.save
+        monkeypatch.setattr(backend, 'save', lambda kind, object_id, config: saved.append(object_id) or original_save(kind, object_id, config))
+
+        storage = BufferedStorage(storage=backend, delay=3600)
+        for triggered in range(5):
+            storage.save(TRIGGERS, 'trigger1', {'status': 'Active', 'triggered': triggered})
+
+        # Buffered changes are visible before they are written
+        assert storage.get(TRIGGERS, 'trigger1')['triggered'] == 4
+        assert storage.get_ids(TRIGGERS) == ['trigger1']
+        assert backend.get(TRIGGERS, 'trigger1') is None
+
+        storage.flush()
+        assert saved == ['trigger1']
+        assert backend.get(TRIGGERS, 'trigger1')['triggered'] == 4
+
+    def test_delete(self, backend):
+        backend.save(TRIGGERS, 'trigger1', {'status': 'Active'})
+        storage = BufferedStorage(storage=backend, delay=3600)
+
+        assert storage.delete(TRIGGERS, 'trigger1') is True
+        assert storage.delete(TRIGGERS, 'trigger1') is False
+        assert storage.get(TRIGGERS, 'trigger1') is None and storage.get_ids(TRIGGERS) == []
+        assert backend.get(TRIGGERS, 'trigger1') is not None
+
+        storage.flush()
+        assert backend.get_ids(TRIGGERS) == []
+
+    def test_buffer_is_flushed_after_the_delay(self, backend):
+        storage = BufferedStorage(storage=backend, delay=0.1)
+        storage.save(ACTIONS, 'action1', {'action_type': 'Command'})
+
+        time.sleep(0.5)
+        assert backend.get(ACTIONS, 'action1') == {'action_type': 'Command'}
+
+    def test_transactions_bypass_the_buffer(self, backend):
+        storage = BufferedStorage(storage=backend, delay=3600)
+        storage.save(TRIGGERS, 'trigger1', {'status': 'Active'})
+
+        with storage.transaction():
+            # Changes buffered before the transaction are written first
+            assert backend.get(TRIGGERS, 'trigger1') is not None
+            storage.save(ACTIONS, 'action1', {'action_type': 'Command'})
+            storage.delete(TRIGGERS, 'trigger1')
+
+        assert backend.get_ids(ACTIONS) == ['action1']
+        assert backend.get_ids(TRIGGERS) == []
+
+
+class TestAtomicJSONWrites(object):
+    @pytest.mark.parametrize('fsync', [False, True])
+    def test_save_to_json_file(self, tmpdir, fsync):
+        filename = str(tmpdir.join('data', 'trigger1.json'))
+        save_to_json_file(filename, {'status': 'Active'}, fsync=fsync)
+        save_to_json_file(filename, {'status': 'Succeeded'}, fsync=fsync)
+
+        assert load_from_json_file(filename) == {'status': 'Succeeded'}
+        assert os.listdir(str(tmpdir.join('data'))) == ['trigger1.json']
+
+    def test_failed_write_keeps_the_old_file(self, tmpdir):
+        filename = str(tmpdir.join('trigger1.json'))
+        save_to_json_file(filename, {'status': 'Active'})
+
+        # Objects that are not json-encodable make the write fail halfway
+        save_to_json_file(filename, {'status': 'Succeeded', 'data': object()})
+
+        assert load_from_json_file(filename) == {'status': 'Active'}
+        assert os.listdir(str(tmpdir)) == ['trigger1.json']
+
+    @pytest.mark.skipif(platform.system() == 'Windows', reason='file permissions are not supported on windows')
+    def test_permissions_of_the_old_file_are_kept(self, tmpdir):
+        filename = str(tmpdir.join('api_keys.json'))
+        save_to_json_file(filename, {'key': 'value1'})
+        os.chmod(filename, 0o600)
+
+        save_to_json_file(filename, {'key': 'value2'})
+
+        assert load_from_json_file(filename) == {'key': 'value2'}
+        assert stat.S_IMODE(os.stat(filename).st_mode) == 0o600
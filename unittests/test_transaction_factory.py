@@ -7,6 +7,14 @@ from random import choice, randint
 
 from transactionfactory import p2pkh_script, p2sh_script, p2wpkh_script, p2wsh_script, address_to_script
 from transactionfactory import op_return_script, num_to_op_push
+from transactionfactory import make_custom_tx, deserialize, serialize, txhash, bip143_hashes, bip143_signature_form, segwit_sign, p2wpkh_redeem_script
+from transactionfactory import BinaryTransaction, mktx, sign, add_op_return, sign_digests
+from helpers.bech32 import encode as bech32_encode
+from helpers.cryptobackendhelpers import get_crypto_backend
+from helpers.privatekeyhelpers import encode_privkey, privkey_to_address, privkey_to_pubkey
+from helpers.publickeyhelpers import bin_hash160
+from helpers.py3specials import safe_hexlify, bin_dbl_sha256, bin_to_b58check
+from helpers.txsizehelpers import estimate_transaction_size
 from data.transaction import TX
 
 
@@ -89,3 +97,127 @@ class TestTransactionFactory(object):
             assert TX().decode_op_return(hex_data=script) == random_string
 
 
+class TestSegwitSigning(object):
+    # Test vectors of BIP143
+    NATIVE_P2WPKH_TX = '0100000002fff7f7881a8099afa6940d42d1e7f6362bec38171ea3edf433541db4e4ad969f0000000000eeffffffef51e1b804cc89d182d279655c3aa89e815b1b309fe287d9b2b55d57b90ec68a0100000000ffffffff02202cb206000000001976a9148280b37df378db99f66f85c95a783a76ac7a6d5988ac9093510d000000001976a9143bde42dbee7e4dbe6a21b2d50ce2f0167faa815988ac11000000'
+    P2SH_P2WPKH_TX = '0100000001db6b1b20aa0fd7b23880be2ecbd4a98130974cf4748fb66092ac4d3ceb1a54770100000000feffffff02b8b4eb0b000000001976a914a457b684d7f0d539a46a45bbc043f35b59d0d96388ac0008af2f000000001976a914fd270b1ee6abcaea97fea7ad0402e8bd8ad6d77c88ac92040000'
+    P2SH_P2WPKH_SIGNED_TX = '01000000000101db6b1b20aa0fd7b23880be2ecbd4a98130974cf4748fb66092ac4d3ceb1a5477010000001716001479091972186c449eb1ded22b78e40d009bdf0089feffffff02b8b4eb0b000000001976a914a457b684d7f0d539a46a45bbc043f35b59d0d96388ac0008af2f000000001976a914fd270b1ee6abcaea97fea7ad0402e8bd8ad6d77c88ac02473044022047ac8e878352d3ebbde1c94ce3a10d057c24175747116f8288e5d794d12d482f0220217f36a485cae903c713331d877c1f64677e3622ad4010726870540656fe9dcb012103ad1d8e89212f0b92c74d23bb710c00662ad1470198ac48c43f7d6f93a2a2687392040000'
+
+    def test_bip143_native_p2wpkh(self):
+        txobj = deserialize(self.NATIVE_P2WPKH_TX)
+        hashes = bip143_hashes(txobj)
+
+        assert safe_hexlify(hashes['prevouts']) == '96b827c8483d4e9b96712b6713a7b68d6e8003a781feba36c31143470b4efd37'
+        assert safe_hexlify(hashes['sequence']) == '52b0a642eea2fb7ae638c36f6252b6750293dbe574a806984b8e4d8548339a3b'
+        assert safe_hexlify(hashes['outputs']) == '863ef3e1a92afbfdb97f31ad0fc7683ee943e9abcf2501590ff8f6551f47e5e5'
+
+        signature_form = bip143_signature_form(txobj, 1, '76a9141d0f172a0ecb48aee1be1f2687d2963ae33f71a188ac', 600000000, hashes=hashes)
+        assert safe_hexlify(bin_dbl_sha256(signature_form)) == 'c37af31116d1b27caf68aae9e3ac82f1477929014d5b917657d0eb49478cb670'
+
+    def test_bip143_p2sh_p2wpkh(self):
+        txobj = deserialize(self.P2SH_P2WPKH_TX)
+        segwit_sign(txobj, 0, 'eb696a065ef48a2192da5b28b694f87544b30fae8327c4510137a922f32c6dcf', 1000000000, nested=True)
+
+        assert serialize(txobj) == self.P2SH_P2WPKH_SIGNED_TX
+        assert serialize(deserialize(self.P2SH_P2WPKH_SIGNED_TX)) == self.P2SH_P2WPKH_SIGNED_TX
+        # The txid does not include the witness
+        assert txhash(self.P2SH_P2WPKH_SIGNED_TX) == txhash(serialize(dict(txobj, ins=[dict(txobj['ins'][0], witness=[])])))
+
+    def test_make_custom_tx_with_segwit_inputs(self):
+        private_key = encode_privkey(987654321, 'wif_compressed')
+        redeem_script = p2wpkh_redeem_script(privkey_to_pubkey(private_key))
+        addresses = [privkey_to_address(private_key),
+                     bech32_encode('bc', 0, list(binascii.unhexlify(redeem_script[4:]))),
+                     bin_to_b58check(bin_hash160(binascii.unhexlify(redeem_script)), 5)]
+
+        tx_inputs = [{'address': address, 'value': 100000, 'output': '%064x:%s' % (i + 1, i), 'confirmations': 1} for i, address in enumerate(addresses)]
+        tx_outputs = [{'address': '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E', 'value': 290000}]
+        private_keys = dict((address, private_key) for address in addresses)
+
+        tx = make_custom_tx(private_keys=private_keys, tx_inputs=tx_inputs, tx_outputs=tx_outputs, tx_fee=10000)
+        txobj = deserialize(tx)
+
+        assert [len(inp['witness']) for inp in txobj['ins']] == [0, 2, 2]
+        assert txobj['ins'][1]['script'] == ''
+        assert txobj['ins'][2]['script'] == '16' + redeem_script
+        assert serialize(txobj) == tx
+
+        estimate = estimate_transaction_size(tx_inputs=tx_inputs, tx_outputs=tx_outputs)
+        assert 0 <= estimate['size'] - len(tx) // 2 <= len(tx_inputs)
+
+        # A private key that does not belong to the segwit address can not spend its utxos
+        private_keys[addresses[1]] = encode_privkey(123456789, 'wif_compressed')
+        assert make_custom_tx(private_keys=private_keys, tx_inputs=tx_inputs, tx_outputs=tx_outputs, tx_fee=10000) is None
+
+
+class TestBinaryTransaction(object):
+    def test_parse_and_serialize(self):
+        for tx in [TestSegwitSigning.NATIVE_P2WPKH_TX, TestSegwitSigning.P2SH_P2WPKH_TX, TestSegwitSigning.P2SH_P2WPKH_SIGNED_TX]:
+            binary_tx = BinaryTransaction(tx)
+            assert binary_tx.to_hex() == tx
+            assert binary_tx.txid() == txhash(tx)
+
+    def test_set_script_updates_the_offsets_of_the_next_inputs(self):
+        binary_tx = BinaryTransaction(TestSegwitSigning.NATIVE_P2WPKH_TX)
+        binary_tx.set_script(0, b'\x01' * 300)
+        binary_tx.set_script(1, b'\x02' * 10)
+        binary_tx.set_script(0, b'\x03' * 5)
+
+        txobj = deserialize(binary_tx.to_hex())
+        assert [inp['script'] for inp in txobj['ins']] == ['03' * 5, '02' * 10]
+        assert [inp['sequence'] for inp in txobj['ins']] == [0xffffffee, 0xffffffff]
+        assert len(txobj['outs']) == 2
+
+    def test_same_transaction_as_signing_the_hex_transaction(self):
+        legacy_key = encode_privkey(1234567, 'wif')
+        segwit_key = encode_privkey(7654321, 'wif_compressed')
+        redeem_script = p2wpkh_redeem_script(privkey_to_pubkey(segwit_key))
+        private_keys = {privkey_to_address(legacy_key): legacy_key,
+                        bech32_encode('bc', 0, list(binascii.unhexlify(redeem_script[4:]))): segwit_key,
+                        bin_to_b58check(bin_hash160(binascii.unhexlify(redeem_script)), 5): segwit_key}
+
+        tx_inputs = [{'address': address, 'value': 50000, 'output': '%064x:%s' % (i + 7, i), 'confirmations': 1} for i, address in enumerate(sorted(private_keys) * 2)]
+        tx_outputs = [{'address': 'bc1qnda5w4t7zp00hz79tylsa4kwhmda68puv82yav', 'value': 290000}]
+
+        tx = make_custom_tx(private_keys=private_keys, tx_inputs=tx_inputs, tx_outputs=tx_outputs, tx_fee=10000, op_return_data='Spellbook')
+
+        # Sign the same transaction with the functions that work on the transaction in hexadecimal format
+        expected = add_op_return('Spellbook', mktx(tx_inputs, tx_outputs))
+        for i, tx_input in enumerate(tx_inputs):
+            if tx_input['address'][0] == '1':
+                expected = sign(expected, i, private_keys[tx_input['address']])
+
+        txobj = deserialize(expected)
+        for i, tx_input in enumerate(tx_inputs):
+            if tx_input['address'][0] != '1':
+                segwit_sign(txobj, i, private_keys[tx_input['address']], amount=50000, nested=tx_input['address'][0] == '3')
+
+        assert tx == serialize(txobj)
+
+
+class TestParallelSigning(object):
+    def test_same_transaction_as_signing_in_a_single_process(self):
+        legacy_key = encode_privkey(1234567, 'wif')
+        segwit_key = encode_privkey(7654321, 'wif_compressed')
+        redeem_script = p2wpkh_redeem_script(privkey_to_pubkey(segwit_key))
+        private_keys = {privkey_to_address(legacy_key): legacy_key,
+                        bech32_encode('bc', 0, list(binascii.unhexlify(redeem_script[4:]))): segwit_key,
+                        bin_to_b58check(bin_hash160(binascii.unhexlify(redeem_script)), 5): segwit_key}
+
+        tx_inputs = [{'address': address, 'value': 50000, 'output': '%064x:%s' % (i + 7, i), 'confirmations': 1} for i, address in enumerate(sorted(private_keys) * 2)]
+        tx_outputs = [{'address': 'bc1qnda5w4t7zp00hz79tylsa4kwhmda68puv82yav', 'value': 290000}]
+
+        expected = make_custom_tx(private_keys=private_keys, tx_inputs=tx_inputs, tx_outputs=tx_outputs, tx_fee=10000)
+        tx = make_custom_tx(private_keys=private_keys, tx_inputs=tx_inputs, tx_outputs=tx_outputs, tx_fee=10000, parallel_signing_min_inputs=6, signing_processes=2)
+
+        assert tx == expected
+
+    def test_keys_are_wiped_after_signing(self):
+        backend = get_crypto_backend()
+        keys = [bytearray(encode_privkey(1234567, 'bin'))]
+        signatures = sign_digests((keys, [(bin_dbl_sha256(b'spellbook'), 0)]))
+
+        assert len(signatures) == 1
+        assert keys == [bytearray(32)]
+        # The crypto backend of the workers is set when they start, signing does not replace the backend of this process
+        assert get_crypto_backend() is backend
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+import simplejson
+
+import helpers.triggereventhelpers as triggereventhelpers
+import helpers.triggerregistry as triggerregistry
+from helpers.triggerregistry import TriggerRegistry
+from storage.jsonstorage import JSONStorage
+from storage.storage import TRIGGERS
+
+
+class FakeWebSocket(object):
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(simplejson.loads(message))
+
+
+class TestTriggerEvents(object):
+    @pytest.fixture(autouse=True)
+    def registry(self, tmpdir, monkeypatch):
+        storage = JSONStorage(directory=str(tmpdir))
+        for trigger_id, config in [('balance', {'trigger_type': 'Balance', 'status': 'Active', 'address': '1address'}),
+                                   ('received', {'trigger_type': 'Received', 'status': 'Active', 'address': '1other'}),
+                                   ('succeeded', {'trigger_type': 'Sent', 'status': 'Succeeded', 'address': '1address'}),
+                                   ('blockheight', {'trigger_type': 'Block_height', 'status': 'Active', 'block_height': 100}),
+                                   ('blockheight_later', {'trigger_type': 'Block_height', 'status': 'Active', 'block_height': 100, 'confirmations': 3}),
+                                   ('txconfirmation', {'trigger_type': 'Tx_confirmation', 'status': 'Active', 'txid': 'abc'}),
+                                   ('txconfirmation_in_block', {'trigger_type': 'Tx_confirmation', 'status': 'Active', 'txid': 'def', 'block_height': 95, 'confirmations': 6}),
+                                   ('manual', {'trigger_type': 'Manual', 'status': 'Active'})]:
+            storage.save(TRIGGERS, trigger_id, config)
+
+        registry = TriggerRegistry(storage=storage)
+        monkeypatch.setattr(triggerregistry, 'TRIGGER_REGISTRY', registry)
+        monkeypatch.setattr(triggereventhelpers, 'HEIGHT_INDEX', None)
+        monkeypatch.setattr(triggereventhelpers, 'PENDING_ADDRESSES', {})
+        monkeypatch.setattr(triggereventhelpers, 'LATEST_BLOCK_HEIGHT', None)
+
+        self.checked = []
+        self.snapshots = []
+
+        def check_trigger_ids(trigger_ids, snapshot=None):
+            self.checked.append(trigger_ids)
+            self.snapshots.append(snapshot)
+
+        monkeypatch.setattr(triggereventhelpers, 'check_trigger_ids', check_trigger_ids)
+
+    def test_new_transaction(self):
+        assert triggereventhelpers.process_new_transaction(txid='abc', addresses=['1address', '1unknown']) == ['balance', 'txconfirmation']
+        assert self.checked == [['balance', 'txconfirmation']]
+
+        assert triggereventhelpers.process_new_transaction(txid='ghi', addresses=['1unknown']) == []
+        assert len(self.checked) == 1
+
+    def test_new_block(self):
+        assert triggereventhelpers.process_new_block(block_height=99) == ['txconfirmation']
+        assert triggereventhelpers.process_new_block(block_height=100) == ['blockheight', 'txconfirmation', 'txconfirmation_in_block']
+        assert self.snapshots[-1].latest_block() == {'block': {'height': 100}}
+
+        # Triggers that were not activated are checked again on the next block
+        assert triggereventhelpers.process_new_block(block_height=103) == ['blockheight', 'blockheight_later', 'txconfirmation', 'txconfirmation_in_block']
+
+    def test_height_index(self):
+        height_index = triggereventhelpers.get_height_index()
+        assert len(height_index) == 3
+        assert 'txconfirmation' not in height_index
+
+        assert height_index.pop_reached(block_height=99) == []
+        assert height_index.pop_reached(block_height=102) == ['blockheight', 'txconfirmation_in_block']
+        assert len(height_index) == 1
+
+        # Once the block height of a transaction is known, the trigger joins the index
+        registry = triggerregistry.TRIGGER_REGISTRY
+        config = registry.get_config('txconfirmation')
+        config['block_height'] = 110
+        registry.storage.save(TRIGGERS, 'txconfirmation', config)
+        registry.update('txconfirmation', config)
+
+        assert 'txconfirmation' in height_index
+        assert height_index.pop_reached(block_height=200) == ['blockheight_later', 'txconfirmation']
+
+    def test_addresses_of_new_transactions_are_checked_on_new_blocks_until_confirmed(self):
+        triggereventhelpers.process_new_transaction(txid='ghi', addresses=['1other', '1unknown'])
+        assert list(triggereventhelpers.PENDING_ADDRESSES.keys()) == ['1other']
+
+        for block_height in range(10, 10 + triggereventhelpers.PENDING_BLOCKS):
+            assert triggereventhelpers.process_new_block(block_height=block_height) == ['received', 'txconfirmation']
+
+        assert triggereventhelpers.process_new_block(block_height=10 + triggereventhelpers.PENDING_BLOCKS) == ['txconfirmation']
+
+    def test_listener(self):
+        ws = FakeWebSocket()
+        listener = triggereventhelpers.TriggerEventListener()
+
+        listener.on_open(ws)
+        assert ws.sent == [{'op': 'blocks_sub'}, {'op': 'addr_sub', 'addr': '1address'}, {'op': 'addr_sub', 'addr': '1other'}]
+
+        listener.on_message(ws, simplejson.dumps({'op': 'utx', 'x': {'hash': 'ghi',
+                                                                     'inputs': [{'prev_out': {'addr': '1unknown'}}],
+                                                                     'out': [{'addr': '1other'}, {'script': '6a'}]}}))
+        assert self.checked == [['received']]
+
+        listener.on_message(ws, simplejson.dumps({'op': 'block', 'x': {'height': 101}}))
+        assert self.checked[-1] == ['blockheight', 'received', 'txconfirmation', 'txconfirmation_in_block']
+        assert len(ws.sent) == 3
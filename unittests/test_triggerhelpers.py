@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import helpers.triggerhelpers as triggerhelpers
+from helpers.lockhelpers import trigger_lock, address_lock
+
+
+class FakeTrigger(object):
+    def __init__(self, trigger_id, conditions_fulfilled=None, triggered=0):
+        self.id = trigger_id
+        self.triggered = triggered
+        self.activated = 0
+        self._conditions_fulfilled = conditions_fulfilled
+
+    def conditions_fulfilled(self, snapshot=None):
+        return self._conditions_fulfilled()
+
+    def activate(self):
+        self.activated += 1
+
+
+class TestCheckConditions(object):
+    def test_check_conditions(self, monkeypatch):
+        monkeypatch.setattr(triggerhelpers, 'get_condition_timeout', lambda: 1)
+
+        def fail():
+            raise Exception('explorer is down')
+
+        def hang():
+            time.sleep(3)
+            return True
+
+        triggers = [FakeTrigger('fulfilled', lambda: True),
+                    FakeTrigger('not_fulfilled', lambda: False),
+                    FakeTrigger('exception', fail),
+                    FakeTrigger('timeout', hang)]
+
+        assert triggerhelpers.check_conditions(triggers=triggers) == {'fulfilled': True,
+                                                                      'not_fulfilled': False,
+                                                                      'exception': False,
+                                                                      'timeout': False}
+
+    def test_conditions_are_checked_in_parallel(self):
+        barrier = threading.Barrier(4, timeout=5)
+
+        def wait_for_the_others():
+            barrier.wait()
+            return True
+
+        triggers = [FakeTrigger('trigger%s' % i, wait_for_the_others) for i in range(4)]
+
+        assert all(triggerhelpers.check_conditions(triggers=triggers).values())
+
+
+class TestActivateCheckedTrigger(object):
+    def test_activate_checked_trigger(self, monkeypatch):
+        monkeypatch.setattr(triggerhelpers, 'get_trigger_config', lambda trigger_id: {'status': 'Active', 'triggered': 0})
+        trigger = FakeTrigger('trigger1')
+
+        triggerhelpers.activate_checked_trigger(trigger=trigger)
+        assert trigger.activated == 1
+
+    def test_trigger_that_was_already_activated_is_not_activated_again(self, monkeypatch):
+        monkeypatch.setattr(triggerhelpers, 'get_trigger_config', lambda trigger_id: {'status': 'Active', 'triggered': 1})
+        trigger = FakeTrigger('trigger1')
+
+        triggerhelpers.activate_checked_trigger(trigger=trigger)
+        assert trigger.activated == 0
+
+
+class TestLocks(object):
+    def test_locks(self):
+        assert trigger_lock('id1') is trigger_lock('id1')
+        assert trigger_lock('id1') is not trigger_lock('id2')
+        assert trigger_lock('id1') is not address_lock('id1')
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from helpers.triggerregistry import TriggerRegistry
+from storage.jsonstorage import JSONStorage
+from storage.sqlitestorage import SQLiteStorage
+from storage.storage import TRIGGERS
+
+
+class TestTriggerRegistry(object):
+    @pytest.fixture(params=['json', 'sqlite'])
+    def storage(self, request, tmpdir):
+        if request.param == 'json':
+            return JSONStorage(directory=str(tmpdir))
+        else:
+            return SQLiteStorage(database_file=str(tmpdir.join('spellbook.db')))
+
+    @pytest.fixture
+    def registry(self, storage):
+        storage.save(TRIGGERS, 'trigger1', {'trigger_id': 'trigger1', 'trigger_type': 'Balance', 'status': 'Active', 'address': '1address'})
+        storage.save(TRIGGERS, 'trigger2', {'trigger_id': 'trigger2', 'trigger_type': 'Balance', 'status': 'Succeeded', 'address': '1address'})
+        storage.save(TRIGGERS, 'trigger3', {'trigger_id': 'trigger3', 'trigger_type': 'Manual', 'status': 'Active', 'self_destruct': 1000})
+
+        return TriggerRegistry(storage=storage, refresh_interval=3600)
+
+    def test_get_ids(self, registry):
+        assert registry.get_ids() == ['trigger1', 'trigger2', 'trigger3']
+        assert len(registry) == 3
+
+    def test_get_config(self, registry):
+        assert registry.get_config('trigger1')['address'] == '1address'
+        assert registry.get_config('unknown') == {}
+
+        # Changing the returned config must not change the registry
+        registry.get_config('trigger1')['status'] = 'Disabled'
+        assert registry.get_config('trigger1')['status'] == 'Active'
+
+    @pytest.mark.parametrize('criteria, expected', [
+        [{'trigger_type': 'Balance'}, ['trigger1', 'trigger2']],
+        [{'status': 'Active'}, ['trigger1', 'trigger3']],
+        [{'address': '1address'}, ['trigger1', 'trigger2']],
+        [{'trigger_type': 'Balance', 'status': 'Active'}, ['trigger1']],
+        [{'has_self_destruct': True}, ['trigger3']],
+        [{'trigger_type': 'Received'}, []],
+    ])
+    def test_find(self, registry, criteria, expected):
+        assert registry.find(**criteria) == expected
+
+    def test_write_through(self, registry):
+        config = {'trigger_id': 'trigger4', 'trigger_type': 'Received', 'status': 'Active', 'address': '1other'}
+        registry.storage.save(TRIGGERS, 'trigger4', config)
+        registry.update('trigger4', config)
+        assert registry.find(address='1other') == ['trigger4']
+
+        config['status'] = 'Succeeded'
+        registry.storage.save(TRIGGERS, 'trigger4', config)
+        registry.update('trigger4', config)
+        assert registry.find(status='Active') == ['trigger1', 'trigger3']
+
+        registry.storage.delete(TRIGGERS, 'trigger4')
+        registry.remove('trigger4')
+        assert registry.exists('trigger4') is False
+        assert registry.find(address='1other') == []
+
+    def test_changes_in_the_storage_are_detected(self, registry):
+        assert registry.exists('trigger1')
+
+        registry.storage.save(TRIGGERS, 'trigger1', {'trigger_id': 'trigger1', 'trigger_type': 'Balance', 'status': 'Disabled', 'address': '1address'})
+        registry.storage.delete(TRIGGERS, 'trigger2')
+        registry.storage.save(TRIGGERS, 'trigger5', {'trigger_id': 'trigger5', 'trigger_type': 'Manual', 'status': 'Active'})
+
+        # Changes are only picked up once the refresh interval has passed
+        assert registry.get_ids() == ['trigger1', 'trigger2', 'trigger3']
+
+        registry.refresh(force=True)
+        assert registry.get_ids() == ['trigger1', 'trigger3', 'trigger5']
+        assert registry.find(status='Active') == ['trigger3', 'trigger5']
+        assert registry.find(address='1address') == ['trigger1']
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+import trigger.recurringtrigger as recurringtrigger
+
+import helpers.triggerscheduler as triggerscheduler
+from helpers.triggerscheduler import TriggerScheduler
+from trigger.deadmansswitchtrigger import DeadMansSwitchTrigger
+from trigger.manualtrigger import ManualTrigger
+from trigger.recurringtrigger import RecurringTrigger
+from trigger.timestamptrigger import TimestampTrigger
+from trigger.trigger import Trigger
+
+
+class TestNextDueTime(object):
+    def test_timestamp_trigger(self):
+        trigger = TimestampTrigger('trigger1')
+        trigger.configure(timestamp=1000, status='Active')
+        assert trigger.next_due_time() == 1000
+
+        trigger.configure(self_destruct=900)
+        assert trigger.next_due_time() == 900
+
+        trigger.configure(self_destruct=1100)
+        assert trigger.next_due_time() == 1000
+
+        # Only the self-destruct time matters once the trigger is no longer active
+        trigger.configure(status='Succeeded')
+        assert trigger.next_due_time() == 1100
+
+    def test_trigger_without_time_conditions(self):
+        trigger = ManualTrigger('trigger1')
+        trigger.configure(status='Active')
+        assert trigger.next_due_time() is None
+
+        trigger.configure(self_destruct=1100)
+        assert trigger.next_due_time() == 1100
+
+    @pytest.mark.parametrize('config, expected', [
+        [{'begin_time': 1000, 'interval': 100}, 1000],
+        [{'begin_time': 1000, 'interval': 100, 'next_activation': 1200}, 1200],
+        [{'begin_time': 1000, 'interval': 100, 'next_activation': 1200, 'end_time': 1150}, 1150],
+        [{'begin_time': 1000}, None],
+    ])
+    def test_recurring_trigger(self, config, expected):
+        trigger = RecurringTrigger('trigger1')
+        trigger.configure(status='Active', **config)
+        assert trigger.next_due_time() == expected
+
+    def test_last_activation_of_a_recurring_trigger(self, monkeypatch):
+        activations = []
+        monkeypatch.setattr(Trigger, 'activate', lambda self, synchronous=None: activations.append(synchronous) or {'job_id': 'trigger1-%s' % len(activations)})
+        monkeypatch.setattr(RecurringTrigger, 'save', lambda self: None)
+        trigger = RecurringTrigger('trigger1')
+        trigger.configure(status='Active', begin_time=1000, interval=100, end_time=1250)
+
+        assert trigger.activate(synchronous=True) == {'job_id': 'trigger1-1'}
+        assert trigger.next_due_time() == 1100
+        trigger.activate()
+        assert trigger.next_due_time() == 1200
+        assert activations == [True, None]
+
+        # After the last activation the trigger is only checked again at its end time, it does not activate again
+        trigger.activate()
+        assert trigger.next_activation == 1250
+        monkeypatch.setattr(recurringtrigger.time, 'time', lambda: 1220)
+        assert trigger.conditions_fulfilled() is False
+        assert trigger.next_due_time() == 1250
+
+        monkeypatch.setattr(recurringtrigger.time, 'time', lambda: 1250)
+        assert trigger.conditions_fulfilled() is False
+        assert trigger.status == 'Succeeded'
+
+    @pytest.mark.parametrize('phase, expected', [
+        [0, None],
+        [1, 1500],
+        [2, 1750],
+        [3, 1900],
+        [4, 2000],
+        [5, 2000],
+    ])
+    def test_deadmansswitch_trigger(self, phase, expected):
+        trigger = DeadMansSwitchTrigger('trigger1')
+        trigger.configure(status='Active', timeout=1000, activation_time=2000, warning_email='someone@example.com', phase=phase)
+        assert trigger.next_due_time() == expected
+
+
+class TestTriggerScheduler(object):
+    def test_schedule(self):
+        scheduler = TriggerScheduler()
+        scheduler.schedule(trigger_id='trigger1', due_time=300)
+        scheduler.schedule(trigger_id='trigger2', due_time=100)
+        scheduler.schedule(trigger_id='trigger3', due_time=200)
+
+        # Rescheduling replaces the earlier schedule, unscheduling removes it
+        scheduler.schedule(trigger_id='trigger2', due_time=250)
+        scheduler.schedule(trigger_id='trigger3', due_time=None)
+
+        assert scheduler.next_due_time() == 250
+        assert scheduler.pop_due(now=99) == []
+        assert scheduler.pop_due(now=250) == ['trigger2']
+        assert scheduler.pop_due(now=1000) == ['trigger1']
+        assert scheduler.next_due_time() is None
+
+    def test_check(self, monkeypatch):
+        due_times = {'trigger1': 2000, 'trigger2': 900, 'trigger3': None}
+        checked = []
+        monkeypatch.setattr(triggerscheduler, 'get_due_time', lambda trigger_id: due_times[trigger_id])
+        monkeypatch.setattr(triggerscheduler, 'check_trigger_ids', lambda trigger_ids: checked.append(trigger_ids))
+
+        scheduler = TriggerScheduler()
+        scheduler.check(trigger_ids=['trigger1', 'trigger2', 'trigger3'], now=1000)
+
+        assert checked == [['trigger1', 'trigger2', 'trigger3']]
+        # A trigger that is still due after it was checked is retried later instead of right away
+        assert scheduler.due_times == {'trigger1': 2000, 'trigger2': 1000 + triggerscheduler.RETRY_DELAY}
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from helpers.privatekeyhelpers import encode_privkey, privkey_to_address
+from helpers.txsizehelpers import estimate_size, estimate_transaction_size, output_size, op_return_output_size, get_script_type
+from helpers.txsizehelpers import P2PKH, P2SH_P2WPKH, P2WPKH
+from transactionfactory import make_custom_tx, address_to_script, add_op_return
+
+
+class TestTxSizeHelpers(object):
+    @pytest.mark.parametrize('address', [
+        '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E',
+        '36qa5uhG8qE9JFEYKnJ1fKgyfEPJA8Fx9i',
+        'bc1qnda5w4t7zp00hz79tylsa4kwhmda68puv82yav',
+        'bc1qlcnha82hwtualy7ky25mr8y2mkkj8r3lgfg299s47yhsxday4lms9zqnq8',
+    ])
+    def test_output_size(self, address):
+        # value + script length + script
+        assert output_size(get_script_type(address)) == 8 + 1 + len(address_to_script(address)) // 2
+
+    @pytest.mark.parametrize('message', ['a', 'a' * 75, 'a' * 76, 'a' * 80])
+    def test_op_return_output_size(self, message):
+        assert op_return_output_size(message) == 8 + 1 + len(add_op_return(message)) // 2
+
+    @pytest.mark.parametrize('n_inputs, compressed, op_return_data', [
+        [1, True, None],
+        [3, True, 'Spellbook'],
+        [10, True, None],
+        [3, False, 'Spellbook'],
+    ])
+    def test_estimate_is_within_a_byte_per_input(self, n_inputs, compressed, op_return_data):
+        generator = random.Random(n_inputs)
+        private_key = encode_privkey(generator.randrange(1, 2 ** 255), 'wif_compressed' if compressed else 'wif')
+        address = privkey_to_address(private_key)
+        tx_inputs = [{'address': address,
+                      'value': 10000,
+                      'output': '%064x:%s' % (generator.getrandbits(256), i),
+                      'confirmations': 1} for i in range(n_inputs)]
+        tx_outputs = [{'address': '1PYmZMCgKFKVth5W9kaRpdYq9Lf8eLQ95E', 'value': n_inputs * 10000 - 1000},
+                      {'address': '36qa5uhG8qE9JFEYKnJ1fKgyfEPJA8Fx9i', 'value': 500},
+                      {'address': 'bc1qnda5w4t7zp00hz79tylsa4kwhmda68puv82yav', 'value': 500}]
+
+        transaction = make_custom_tx(private_keys={address: private_key}, tx_inputs=tx_inputs, tx_outputs=tx_outputs, op_return_data=op_return_data)
+        estimate = estimate_transaction_size(tx_inputs=tx_inputs, tx_outputs=tx_outputs, op_return_data=op_return_data, compressed=compressed)
+
+        assert 0 <= estimate['size'] - len(transaction) // 2 <= n_inputs
+        assert estimate['vsize'] == estimate['size']
+
+    def test_segwit_inputs(self):
+        # 1 input, 1 output P2WPKH transaction: 82 non-witness bytes and 110 witness bytes
+        assert estimate_size(input_types=[P2WPKH], output_types=[P2WPKH]) == {'size': 192, 'vsize': 110, 'weight': 438}
+        assert estimate_size(input_types=[P2SH_P2WPKH], output_types=[P2WPKH])['vsize'] == 133
+
+        # A legacy input in a segwit transaction needs an empty witness
+        mixed = estimate_size(input_types=[P2PKH, P2WPKH], output_types=[P2WPKH])
+        legacy = estimate_size(input_types=[P2PKH], output_types=[P2WPKH])
+        assert mixed['weight'] == legacy['weight'] + 41 * 4 + 108 + 2 + 1